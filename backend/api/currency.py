@@ -1,7 +1,10 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, make_response, request
 from flask_jwt_extended import jwt_required
 
-from backend.services.currency_service import get_rates, update_rates_now, convert_amounts
+from backend.services.currency_service import (
+    convert_amounts, convert_amounts_as_of, convert_batch, convert_batch_as_of, get_history, get_snapshot,
+    import_history)
+from backend.services.currency_update_service import request_rates_update, get_update_job
 
 
 currency_bp = Blueprint('currency', __name__)
@@ -10,15 +13,86 @@ currency_bp = Blueprint('currency', __name__)
 @currency_bp.route('/api/currency/rates', methods=['GET'])
 @jwt_required()
 def rates():
-    rates, last_update = get_rates()
-    return jsonify({'rates': rates, 'last_update': last_update}), 200
+    snapshot = get_snapshot()
+    # Клиент, у которого уже есть эта версия курсов, получает пустой 304
+    if request.if_none_match.contains(snapshot.etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify({'rates': dict(snapshot.rates), 'last_update': snapshot.last_update})
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@currency_bp.route('/api/currency/rates/history', methods=['GET'])
+@jwt_required()
+def rate_history():
+    """
+    История курса валюты.
+
+    Параметры запроса:
+        code (str): Код валюты
+        from, to (str, опционально): Границы периода, ГГГГ-ММ-ДД включительно
+
+    Возвращает:
+        JSON {'code': код, 'dates': [даты], 'rates': [курсы за 1 CNY]}
+    """
+    code = request.args.get('code', type=str)
+    if not code:
+        return jsonify({'error': 'Параметр "code" обязателен'}), 400
+    try:
+        points = get_history().points(code, request.args.get('from'), request.args.get('to'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'code': code.upper(),
+        'dates': [day for day, _ in points],
+        'rates': [rate for _, rate in points],
+    }), 200
+
+
+@currency_bp.route('/api/currency/rates/history', methods=['POST'])
+@jwt_required()
+def rate_history_import():
+    """
+    Загрузка исторических курсов; точка за тот же день заменяется.
+
+    Тело запроса:
+        rates (list[dict]): Точки {'code', 'date', 'rate'}, курс — единиц валюты за 1 CNY
+        source (str, опционально): Источник курсов
+
+    Возвращает:
+        JSON {'imported': число сохраненных точек}
+    """
+    data = request.get_json(silent=True) or {}
+    points = data.get('rates')
+    if not isinstance(points, list) or not all(isinstance(point, dict) for point in points):
+        return jsonify({'error': 'Поле "rates" должно быть списком объектов'}), 400
+    try:
+        imported = import_history(((p.get('code'), p.get('date'), p.get('rate')) for p in points),
+                                  source=str(data.get('source') or 'import'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'imported': imported}), 200
 
 
 @currency_bp.route('/api/currency/update-now', methods=['POST'])
 @jwt_required()
 def update_now():
-    rates, last_update = update_rates_now()
-    return jsonify({'status': 'success', 'rates': rates, 'last_update': last_update}), 200
+    # Обновление выполняется в фоновом потоке; клиент может опросить статус задачи
+    job_id = request_rates_update()
+    if job_id is None:
+        return jsonify({'error': 'Обновление курсов отключено (CURRENCY_UPDATE_ENABLED)'}), 503
+    return jsonify({'status': 'queued', 'job_id': job_id}), 202
+
+
+@currency_bp.route('/api/currency/update-jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def update_job(job_id):
+    job = get_update_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    return jsonify(job), 200
 
 
 @currency_bp.route('/api/currency/conversions', methods=['GET'])
@@ -26,11 +100,49 @@ def update_now():
 def conversions():
     amount = request.args.get('amount', type=float)
     from_code = request.args.get('from', default='CNY', type=str)
+    # date=ГГГГ-ММ-ДД: конвертация по курсам на эту дату
+    day = request.args.get('date')
     if amount is None:
         return jsonify({'error': 'Query param "amount" is required'}), 400
     try:
-        result = convert_amounts(amount, from_code)
+        if day:
+            result = convert_amounts_as_of(amount, from_code, day)
+        else:
+            result = convert_amounts(amount, from_code)
         return jsonify(result), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+
+
+@currency_bp.route('/api/currency/conversions/batch', methods=['POST'])
+@jwt_required()
+def conversions_batch():
+    """
+    Тело запроса:
+        amounts (list[float]): Суммы
+        from (str | list[str]): Валюта всех сумм или валюта каждой суммы
+        to (str | list[str], опционально): Целевая валюта или валюты; по
+            умолчанию все известные
+        date (str, опционально): Конвертация по курсам на дату ГГГГ-ММ-ДД
+        dates (list[str], опционально): Дата курса для каждой суммы,
+            например даты заявок
+
+    Возвращает:
+        JSON по столбцам: {'count': n, 'conversions': {код: [суммы]}}
+    """
+    data = request.get_json(silent=True) or {}
+    amounts = data.get('amounts')
+    if not isinstance(amounts, list):
+        return jsonify({'error': 'Поле "amounts" должно быть списком'}), 400
+    days = data.get('dates', data.get('date'))
+    if days is not None and not isinstance(days, (str, list)):
+        return jsonify({'error': 'Поле "dates" должно быть списком дат'}), 400
+    try:
+        if days is None:
+            result = convert_batch(amounts, data.get('from', 'CNY'), data.get('to'))
+        else:
+            result = convert_batch_as_of(amounts, data.get('from', 'CNY'), days, data.get('to'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'count': len(amounts), 'conversions': result}), 200
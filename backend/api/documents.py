@@ -0,0 +1,317 @@
+from flask import Blueprint, current_app, jsonify, request, send_file
+from flask_jwt_extended import jwt_required
+from werkzeug.http import parse_content_range_header
+
+from backend.services import document_service
+
+
+documents_bp = Blueprint('documents', __name__)
+
+# Документ по идентификатору не меняется (содержимое адресуется SHA-256),
+# поэтому браузер может хранить его в своем кеше
+DOCUMENT_CACHE_MAX_AGE = 24 * 3600
+
+
+@documents_bp.route('/api/documents', methods=['GET'])
+@jwt_required()
+def get_documents():
+    """
+    Получает страницу документов.
+
+    Параметры запроса:
+        order_id (int): Фильтр по заявке
+        shipment_id (int): Фильтр по отгрузке
+        doc_type (str): Фильтр по типу документа
+        q (str): Поиск по имени и тексту документа (начала слов)
+        limit (int): Размер страницы
+        cursor (int): next_cursor из предыдущего ответа
+
+    Возвращает:
+        JSON со списком документов и курсором следующей страницы.
+        Код состояния: 200 OK или 400 Bad Request
+    """
+    try:
+        result = document_service.list_documents(
+            order_id=request.args.get('order_id', type=int),
+            shipment_id=request.args.get('shipment_id', type=int),
+            doc_type=request.args.get('doc_type') or None,
+            limit=request.args.get('limit', document_service.DEFAULT_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor', type=int),
+            q=request.args.get('q') or None,
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при получении списка документов: {str(e)}'}), 500
+
+
+@documents_bp.route('/api/documents/uploads', methods=['POST'])
+@jwt_required()
+def create_upload():
+    """
+    Начинает загрузку документа по частям.
+
+    Тело запроса:
+        JSON с полями filename, size (обязательно), content_type, doc_type,
+        order_id, shipment_id, sha256
+
+    Возвращает:
+        JSON загрузки и chunk_size — наибольший размер части в одном запросе.
+        Код состояния: 201 Created или 400 Bad Request
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Тело запроса должно содержать JSON'}), 400
+    try:
+        upload = document_service.create_upload(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при создании загрузки: {str(e)}'}), 500
+    upload['chunk_size'] = current_app.config['DOCUMENTS_CHUNK_SIZE']
+    return jsonify(upload), 201
+
+
+@documents_bp.route('/api/documents/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """
+    Состояние загрузки: с какого байта (received) ее продолжать.
+
+    Возвращает:
+        JSON загрузки.
+        Код состояния: 200 OK или 404 Not Found
+    """
+    upload = document_service.get_upload(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Загрузка не найдена'}), 404
+    return jsonify(upload), 200
+
+
+@documents_bp.route('/api/documents/uploads/<upload_id>', methods=['PUT'])
+@jwt_required()
+def put_chunk(upload_id):
+    """
+    Принимает часть файла. Тело запроса — байты части; ее положение задается
+    заголовком Content-Range: bytes <start>-<end>/<size> или параметром offset.
+
+    Возвращает:
+        JSON {'upload', 'document', 'job'}; document и job (задание обработки,
+        выполняется в фоне) появляются после последней части.
+        Код состояния: 200 OK, 201 Created (файл загружен), 400 Bad Request,
+        404 Not Found, 409 Conflict (часть не с того байта; в ответе received)
+        или 413 Payload Too Large
+    """
+    length = request.content_length
+    if length is not None and length > current_app.config['DOCUMENTS_CHUNK_SIZE']:
+        return jsonify({'error': 'Слишком большая часть файла',
+                        'chunk_size': current_app.config['DOCUMENTS_CHUNK_SIZE']}), 413
+
+    header = request.headers.get('Content-Range')
+    if header:
+        content_range = parse_content_range_header(header)
+        if content_range is None or content_range.units != 'bytes':
+            return jsonify({'error': 'Некорректный заголовок Content-Range'}), 400
+        offset = content_range.start
+        if length is None:
+            length = content_range.stop - content_range.start
+    else:
+        offset = request.args.get('offset', 0, type=int)
+
+    try:
+        result = document_service.write_chunk(upload_id, offset, request.stream, length)
+    except document_service.UploadOffsetError as e:
+        return jsonify({'error': str(e), 'received': e.received}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при загрузке части файла: {str(e)}'}), 500
+    if result is None:
+        return jsonify({'error': 'Загрузка не найдена'}), 404
+    return jsonify(result), 201 if result['document'] else 200
+
+
+@documents_bp.route('/api/documents/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def abort_upload(upload_id):
+    """
+    Отменяет загрузку.
+
+    Возвращает:
+        Код состояния: 200 OK или 404 Not Found
+    """
+    if not document_service.abort_upload(upload_id):
+        return jsonify({'error': 'Загрузка не найдена'}), 404
+    return jsonify({'message': 'Загрузка отменена'}), 200
+
+
+@documents_bp.route('/api/documents/<int:document_id>', methods=['GET'])
+@jwt_required()
+def get_document(document_id):
+    """
+    Получает метаданные документа.
+
+    Возвращает:
+        JSON документа.
+        Код состояния: 200 OK или 404 Not Found
+    """
+    document = document_service.get_document(document_id)
+    if document is None:
+        return jsonify({'error': 'Документ не найден'}), 404
+    return jsonify(document), 200
+
+
+@documents_bp.route('/api/documents/<int:document_id>/content', methods=['GET'])
+@jwt_required()
+def get_document_content(document_id):
+    """
+    Отдает содержимое документа.
+
+    Файл передается через send_file: поддерживаются запросы Range (206) и
+    If-None-Match по SHA-256 (304); под gunicorn тело отправляется sendfile,
+    при USE_X_SENDFILE — обратным прокси.
+
+    Параметры запроса:
+        inline (int): 1 — открыть в браузере вместо скачивания
+
+    Возвращает:
+        Содержимое файла.
+        Код состояния: 200 OK, 206 Partial Content, 304 Not Modified или 404 Not Found
+    """
+    document = document_service.get_document(document_id)
+    if document is None:
+        return jsonify({'error': 'Документ не найден'}), 404
+    try:
+        response = send_file(
+            document_service.blob_path(document['sha256']),
+            mimetype=document['content_type'] or 'application/octet-stream',
+            as_attachment=request.args.get('inline') != '1',
+            download_name=document['filename'],
+            conditional=True,
+            etag=document['sha256'],
+            max_age=None,
+        )
+    except FileNotFoundError:
+        return jsonify({'error': 'Файл документа не найден в хранилище'}), 404
+    # Ответ требует авторизации, поэтому кешировать его может только браузер
+    response.cache_control.private = True
+    response.cache_control.max_age = DOCUMENT_CACHE_MAX_AGE
+    return response
+
+
+@documents_bp.route('/api/documents/<int:document_id>/thumbnail', methods=['GET'])
+@jwt_required()
+def get_document_thumbnail(document_id):
+    """
+    Отдает миниатюру документа (JPEG), если она построена.
+
+    Возвращает:
+        Изображение.
+        Код состояния: 200 OK, 304 Not Modified или 404 Not Found
+    """
+    document = document_service.get_document(document_id)
+    if document is None or not document['thumbnail']:
+        return jsonify({'error': 'Миниатюра не найдена'}), 404
+    try:
+        response = send_file(document_service.thumbnail_path(document['sha256']), mimetype='image/jpeg',
+                             conditional=True, etag=document['sha256'], max_age=None)
+    except FileNotFoundError:
+        return jsonify({'error': 'Миниатюра не найдена'}), 404
+    response.cache_control.private = True
+    response.cache_control.max_age = DOCUMENT_CACHE_MAX_AGE
+    return response
+
+
+@documents_bp.route('/api/documents/<int:document_id>/jobs', methods=['GET'])
+@jwt_required()
+def get_document_jobs(document_id):
+    """
+    Задания обработки документа, последние первыми.
+
+    Возвращает:
+        JSON {'document_id', 'jobs'}.
+        Код состояния: 200 OK или 404 Not Found
+    """
+    if document_service.get_document(document_id) is None:
+        return jsonify({'error': 'Документ не найден'}), 404
+    return jsonify({'document_id': document_id, 'jobs': document_service.get_document_jobs(document_id)}), 200
+
+
+@documents_bp.route('/api/documents/<int:document_id>/process', methods=['POST'])
+@jwt_required()
+def process_document(document_id):
+    """
+    Ставит документ в очередь обработки повторно (например, после ошибки).
+
+    Возвращает:
+        JSON задания.
+        Код состояния: 202 Accepted или 404 Not Found
+    """
+    try:
+        job = document_service.enqueue_processing(document_id)
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при постановке документа в очередь: {str(e)}'}), 500
+    if job is None:
+        return jsonify({'error': 'Документ не найден'}), 404
+    return jsonify(job), 202
+
+
+@documents_bp.route('/api/documents/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """
+    Состояние задания обработки: queued, running, done или failed.
+
+    Возвращает:
+        JSON задания.
+        Код состояния: 200 OK или 404 Not Found
+    """
+    job = document_service.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Задание не найдено'}), 404
+    return jsonify(job), 200
+
+
+@documents_bp.route('/api/documents/<int:document_id>', methods=['PUT'])
+@jwt_required()
+def update_document(document_id):
+    """
+    Изменяет имя, тип документа или его привязку к заявке и отгрузке.
+
+    Тело запроса:
+        JSON с полями filename, doc_type, order_id, shipment_id
+
+    Возвращает:
+        JSON обновленного документа.
+        Код состояния: 200 OK, 400 Bad Request или 404 Not Found
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Тело запроса должно содержать JSON'}), 400
+    try:
+        document = document_service.update_document(document_id, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при обновлении документа: {str(e)}'}), 500
+    if document is None:
+        return jsonify({'error': 'Документ не найден'}), 404
+    return jsonify(document), 200
+
+
+@documents_bp.route('/api/documents/<int:document_id>', methods=['DELETE'])
+@jwt_required()
+def delete_document(document_id):
+    """
+    Удаляет документ.
+
+    Возвращает:
+        Код состояния: 200 OK, 404 Not Found или 500 Internal Server Error
+    """
+    try:
+        if not document_service.delete_document(document_id):
+            return jsonify({'error': 'Документ не найден'}), 404
+        return jsonify({'message': 'Документ удален'}), 200
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при удалении документа: {str(e)}'}), 500
@@ -0,0 +1,45 @@
+from flask import Blueprint, current_app, jsonify
+from flask_jwt_extended import jwt_required
+
+from backend.services import integration_service
+
+
+integrations_bp = Blueprint('integrations', __name__)
+
+
+@integrations_bp.route('/api/integrations/tracking/metrics', methods=['GET'])
+@jwt_required()
+def tracking_metrics():
+    """
+    Метрики опроса перевозчиков: задержки запросов по перевозчикам и
+    устаревание статусов активных отгрузок.
+
+    Возвращает:
+        JSON с метриками.
+        Код состояния: 200 OK
+    """
+    try:
+        return jsonify(integration_service.get_tracking_metrics()), 200
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при получении метрик отслеживания: {str(e)}'}), 500
+
+
+@integrations_bp.route('/api/integrations/tracking/poll', methods=['POST'])
+@jwt_required()
+def tracking_poll():
+    """
+    Запускает внеочередной опрос перевозчиков в фоне.
+
+    Возвращает:
+        Код состояния: 202 Accepted или 409 Conflict, если опрос отключен
+        или его ведет другой воркер gunicorn
+    """
+    poller = integration_service.get_poller()
+    config = current_app.config
+    if poller is None and config['TRACKING_POLL_ENABLED'] and config['BACKGROUND_LOCK_FILE']:
+        # Внеочередной такт в этом воркере обошел бы ограничение частоты лидера
+        return jsonify({'error': 'Опрос перевозчиков ведет другой воркер'}), 409
+    if poller is None:
+        return jsonify({'error': 'Опрос перевозчиков отключен (TRACKING_POLL_ENABLED)'}), 409
+    poller.trigger()
+    return jsonify({'status': 'queued'}), 202
@@ -0,0 +1,144 @@
+import hmac
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from backend.services import message_service
+
+
+messages_bp = Blueprint('messages', __name__)
+
+
+def _webhook_authorized() -> bool:
+    # Мессенджер не может получить JWT: webhook защищен общим секретом.
+    # Telegram передает его в X-Telegram-Bot-Api-Secret-Token (secret_token в setWebhook)
+    secret = current_app.config['MESSAGES_WEBHOOK_SECRET']
+    supplied = (request.headers.get('X-Webhook-Secret')
+                or request.headers.get('X-Telegram-Bot-Api-Secret-Token') or '')
+    return bool(secret) and hmac.compare_digest(supplied.encode(), secret.encode())
+
+
+@messages_bp.route('/api/messages/webhook', methods=['POST'])
+def webhook():
+    """
+    Принимает входящие сообщения мессенджера.
+
+    Сообщения кладутся в буфер и записываются в базу пачками в фоне. При
+    MESSAGES_ACK_AFTER_FLUSH ответ отправляется после записи пачки: так
+    мессенджер повторит доставку, если процесс упадет до записи.
+
+    Заголовки:
+        X-Webhook-Secret или X-Telegram-Bot-Api-Secret-Token: MESSAGES_WEBHOOK_SECRET
+
+    Тело запроса:
+        JSON сообщения (channel, chat_id, external_id, sender, body, sent_at,
+        direction, order_id), {'messages': [...]} или update Telegram Bot API
+
+    Возвращает:
+        JSON {'accepted': число сообщений}.
+        Код состояния: 202 Accepted (200 OK после записи), 400 Bad Request,
+        403 Forbidden или 503 Service Unavailable (буфер заполнен — повторить позже)
+    """
+    if not _webhook_authorized():
+        return jsonify({'error': 'Неверный секрет webhook'}), 403
+    ingestor = message_service.get_ingestor()
+    if ingestor is None:
+        return jsonify({'error': 'Прием сообщений отключен (MESSAGES_INGEST_ENABLED)'}), 503
+    try:
+        rows = message_service.parse_webhook(request.get_json(silent=True))
+        ticket = ingestor.submit(rows)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except message_service.BufferFullError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    if not current_app.config['MESSAGES_ACK_AFTER_FLUSH']:
+        return jsonify({'accepted': len(rows)}), 202
+    if not ingestor.wait_flushed(ticket, timeout=current_app.config['MESSAGES_ACK_TIMEOUT']):
+        return jsonify({'error': 'Сообщения не записаны, повторите доставку'}), 503
+    return jsonify({'accepted': len(rows)}), 200
+
+
+@messages_bp.route('/api/messages/conversations', methods=['GET'])
+@jwt_required()
+def get_conversations():
+    """
+    Получает страницу переписок, самые свежие первыми.
+
+    Параметры запроса:
+        limit (int): Размер страницы
+        cursor (int): next_cursor из предыдущего ответа
+
+    Возвращает:
+        JSON со списком переписок и курсором следующей страницы.
+        Код состояния: 200 OK
+    """
+    try:
+        result = message_service.list_conversations(
+            limit=request.args.get('limit', message_service.DEFAULT_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor', type=int),
+        )
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при получении списка переписок: {str(e)}'}), 500
+
+
+@messages_bp.route('/api/messages/conversations/<channel>/<chat_id>', methods=['GET'])
+@jwt_required()
+def get_messages(channel, chat_id):
+    """
+    Сообщения переписки в порядке приема.
+
+    Параметры запроса:
+        after_id (int): Только сообщения после этого id (дочитать новые)
+        before_id (int): Сообщения до этого id (листать историю назад)
+        limit (int): Сколько сообщений вернуть
+
+    Возвращает:
+        JSON {'channel', 'chat_id', 'messages'}.
+        Код состояния: 200 OK
+    """
+    try:
+        messages = message_service.get_messages(
+            channel, chat_id,
+            after_id=request.args.get('after_id', type=int),
+            before_id=request.args.get('before_id', type=int),
+            limit=request.args.get('limit', message_service.DEFAULT_PAGE_SIZE, type=int),
+        )
+        return jsonify({'channel': channel, 'chat_id': chat_id, 'messages': messages}), 200
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при получении сообщений: {str(e)}'}), 500
+
+
+@messages_bp.route('/api/messages/conversations/<channel>/<chat_id>/read', methods=['POST'])
+@jwt_required()
+def mark_read(channel, chat_id):
+    """
+    Отмечает входящие сообщения переписки прочитанными.
+
+    Возвращает:
+        JSON {'marked': число сообщений}.
+        Код состояния: 200 OK
+    """
+    try:
+        return jsonify({'marked': message_service.mark_read(channel, chat_id)}), 200
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при отметке сообщений: {str(e)}'}), 500
+
+
+@messages_bp.route('/api/messages/ingest/metrics', methods=['GET'])
+@jwt_required()
+def ingest_metrics():
+    """
+    Метрики приема: принято, записано, дубликаты, отказы при переполнении,
+    размер пачек, время записи пачки и ожидания в буфере.
+
+    Возвращает:
+        JSON с метриками.
+        Код состояния: 200 OK
+    """
+    ingestor = message_service.get_ingestor()
+    return jsonify({'enabled': ingestor is not None,
+                    **(ingestor.snapshot() if ingestor is not None else {})}), 200
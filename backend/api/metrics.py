@@ -0,0 +1,69 @@
+import hmac
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from backend import monitoring
+from backend.monitoring import metrics, sql
+
+
+metrics_bp = Blueprint('metrics', __name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@metrics_bp.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Метрики в текстовом формате Prometheus.
+
+    Если задан METRICS_TOKEN, сборщик передает его в заголовке
+    Authorization: Bearer <токен>; без него эндпоинт открыт (доступ
+    ограничивается сетью).
+
+    Возвращает:
+        text/plain с метриками. Код состояния: 200 OK или 401 Unauthorized
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        provided = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(provided.encode(), f'Bearer {token}'.encode()):
+            return jsonify({'error': 'Неверный токен доступа к метрикам'}), 401
+    return Response(metrics.render(monitoring.collect_snapshot()), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
+@metrics_bp.route('/api/metrics/sql', methods=['GET'])
+@jwt_required()
+def sql_statements():
+    """
+    Самые затратные SQL-запросы по суммарному времени выполнения.
+
+    Параметры запроса:
+        limit (int): Сколько запросов вернуть (по умолчанию 20, не больше 300)
+
+    Возвращает:
+        JSON {'statements': [...]}; у запроса поля statement, calls, total_ms,
+        avg_ms, p95_ms (верхняя граница корзины гистограммы), fetch_ms и errors
+    """
+    limit = max(1, min(request.args.get('limit', 20, type=int), sql.MAX_STATEMENTS))
+    snapshot = monitoring.collect_snapshot()
+    durations = snapshot.get(sql.SQL_DURATION.name)
+    if durations is None:
+        return jsonify({'statements': []}), 200
+
+    fetch = {labels[0]: value for labels, value in snapshot.get(sql.SQL_FETCH.name, {}).get('series', [])}
+    errors = {labels[0]: value for labels, value in snapshot.get(sql.SQL_ERRORS.name, {}).get('series', [])}
+    statements = []
+    for labels, (counts, total, calls) in durations['series']:
+        p95 = metrics.quantile(durations['buckets'], counts, 0.95)
+        statements.append({
+            'statement': labels[0],
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'avg_ms': round(total * 1000 / calls, 3) if calls else 0.0,
+            'p95_ms': round(p95 * 1000, 3) if p95 is not None else None,
+            'fetch_ms': round(fetch.get(labels[0], 0.0) * 1000, 3),
+            'errors': int(errors.get(labels[0], 0)),
+        })
+    statements.sort(key=lambda item: item['total_ms'], reverse=True)
+    return jsonify({'statements': statements[:limit]}), 200
@@ -1,35 +1,170 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, make_response, request, stream_with_context
 from flask_jwt_extended import jwt_required
-import sys
-import os
+import csv
+import hashlib
+import io
+import json
 
-# Добавляем путь к проекту для корректных импортов
-project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
-
-from backend.services import order_service
+from backend.services import order_service, revaluation_service
 
 # Создаем Blueprint для маршрутов заявок
 # ВАЖНО: убираем префикс из Blueprint, чтобы не дублировать его с main.py
 orders_bp = Blueprint('orders', __name__)
 
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Сколько закодированных строк отправлять одним фрагментом потокового ответа
+STREAM_CHUNK_ROWS = 200
+
+# Клиент может хранить заявки, но перед показом сверяет ETag (If-None-Match):
+# неизменившиеся данные приходят пустым ответом 304
+ORDER_CACHE_CONTROL = 'private, no-cache'
+
+
+def _order_filter_args():
+    """Читает фильтры и сортировку списка заявок из параметров запроса."""
+    return {
+        'status': request.args.get('status') or None,
+        'client_id': request.args.get('client_id', type=int),
+        'supplier_id': request.args.get('supplier_id', type=int),
+        'search': request.args.get('q') or None,
+        'sort': request.args.get('sort', 'date-desc'),
+    }
+
+
+def _encode_stream(orders, ndjson):
+    """
+    Кодирует заявки в JSON по мере чтения из курсора.
+
+    NDJSON — одна заявка на строку; иначе — JSON-массив, открывающая скобка
+    которого уходит клиенту еще до первой строки результата.
+    """
+    if not ndjson:
+        yield '['
+    first = True
+    chunk = []
+    for order in orders:
+        chunk.append(json.dumps(order, ensure_ascii=False))
+        if len(chunk) >= STREAM_CHUNK_ROWS:
+            yield _join_chunk(chunk, ndjson, first)
+            first = False
+            chunk = []
+    if chunk:
+        yield _join_chunk(chunk, ndjson, first)
+    if not ndjson:
+        yield ']'
+
+
+def _join_chunk(chunk, ndjson, first):
+    if ndjson:
+        return '\n'.join(chunk) + '\n'
+    return ('' if first else ',') + ','.join(chunk)
+
+
 @orders_bp.route('/api/orders', methods=['GET'])
 @jwt_required()
 def get_orders():
     """
-    Получает список всех заявок.
+    Получает страницу заявок.
+    
+    Параметры запроса:
+        status (str): Фильтр по статусу
+        client_id (int): Фильтр по клиенту
+        supplier_id (int): Фильтр по поставщику
+        q (str): Поиск по номеру и названию заявки
+        sort (str): date-desc (по умолчанию), date-asc, amount-desc, amount-asc
+        limit (int): Размер страницы
+        cursor (str): next_cursor из предыдущего ответа
+        stream (int): 1 — выгрузить все подходящие заявки потоковым JSON-массивом
+    
+    При заголовке Accept: application/x-ndjson все подходящие заявки
+    выгружаются потоком, по одной на строку.
+    
+    Страница отдается с ETag; при If-None-Match с тем же значением — 304 без тела.
     
     Возвращает:
-        JSON-ответ со списком всех заявок в системе.
-        Код состояния: 200 OK
+        JSON-ответ со списком заявок и курсором следующей страницы.
+        Код состояния: 200 OK, 304 Not Modified или 400 Bad Request
     """
     try:
-        orders = order_service.get_all_orders()
-        return jsonify({'orders': orders}), 200
+        filters = _order_filter_args()
+        ndjson = request.accept_mimetypes.best_match(
+            ['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+        if ndjson or request.args.get('stream', type=int) == 1:
+            orders = order_service.iter_orders(**filters)
+            return Response(
+                stream_with_context(_encode_stream(orders, ndjson)),
+                mimetype=NDJSON_MIMETYPE if ndjson else 'application/json',
+            )
+
+        page = order_service.list_orders(
+            limit=request.args.get('limit', order_service.DEFAULT_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor') or None,
+            **filters,
+        )
+        return _conditional_response(_page_etag(page), lambda: jsonify(page))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Ошибка при получении заявок: {str(e)}'}), 500
 
+def _order_etag(order):
+    return f"{order['id']}-{order['version']}"
+
+
+def _page_etag(page):
+    """ETag страницы списка: меняется, если изменился состав страницы или версия любой заявки на ней."""
+    digest = hashlib.sha1()
+    for order in page['orders']:
+        digest.update(f"{order['id']}-{order.get('version')},".encode())
+    digest.update(str(page.get('next_cursor')).encode())
+    return f'orders-{digest.hexdigest()[:16]}'
+
+
+def _conditional_response(etag, build):
+    """Ответ 304, если у клиента уже есть данные с этим ETag, иначе build()."""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = ORDER_CACHE_CONTROL
+    return response
+
+
+def _order_response(order):
+    """JSON заявки с ETag, содержащим её версию."""
+    response = jsonify(order)
+    if 'version' in order:
+        response.set_etag(_order_etag(order))
+    return response
+
+
+# Версии заявок начинаются с 1: условие с этой версией всегда дает конфликт
+_NO_MATCHING_VERSION = 0
+
+
+def _expected_version(order_id):
+    """
+    Извлекает версию заявки из заголовка If-Match.
+    Возвращает None, если заголовка нет или он равен *. Если ни один ETag
+    не относится к этой заявке, возвращает версию, которая не совпадет
+    с текущей: клиент получит 412 и актуальную версию, как при конфликте.
+
+    Исключения:
+        ValueError: Заголовок содержит ETag не в формате <id>-<версия>
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    tags = [etag.rpartition('-') for etag in request.if_match.as_set()]
+    if not tags or any(not prefix or not version.isdigit() for prefix, _, version in tags):
+        raise ValueError('Некорректный заголовок If-Match')
+    for prefix, _, version in tags:
+        if prefix == str(order_id):
+            return int(version)
+    return _NO_MATCHING_VERSION
+
+
 @orders_bp.route('/api/orders/<order_id>', methods=['GET'])
 @jwt_required()
 def get_order(order_id):
@@ -39,15 +174,21 @@ def get_order(order_id):
     Аргументы:
         order_id (str): Уникальный идентификатор заявки (например, '2024-110')
         
+    Заголовки:
+        If-None-Match (опционально): ETag из предыдущего ответа; если заявка
+        не изменилась, возвращается 304 без тела
+        
     Возвращает:
         JSON-ответ с данными заявки или сообщением об ошибке.
-        Код состояния: 200 OK или 404 Not Found
+        Код состояния: 200 OK, 304 Not Modified или 404 Not Found
     """
     try:
         order = order_service.get_order_by_id(order_id)
         if order is None:
             return jsonify({'error': 'Заявка не найдена'}), 404
-        return jsonify(order), 200
+        if 'version' not in order:
+            return _order_response(order), 200
+        return _conditional_response(_order_etag(order), lambda: jsonify(order))
     except Exception as e:
         return jsonify({'error': f'Ошибка при получении заявки: {str(e)}'}), 500
 
@@ -63,6 +204,8 @@ def create_order():
         - supplier_id (int): Идентификатор поставщика
         - name (str): Название заявки
         - status (str): Статус заявки
+        Необязательное поле items — позиции заявки (как в PATCH
+        /api/orders/<order_id>/items); суммы заявки тогда считаются по ним.
         
     Возвращает:
         JSON-ответ с идентификатором созданной заявки или сообщением об ошибке.
@@ -87,9 +230,87 @@ def create_order():
             return jsonify({'error': 'Не удалось создать заявку'}), 500
             
         return jsonify({'id': order_id}), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Ошибка при создании заявки: {str(e)}'}), 500
 
+def _read_bulk_rows():
+    """Читает строки импорта из JSON-массива, загруженного CSV-файла или тела text/csv."""
+    upload = request.files.get('file')
+    if upload is not None:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        return list(csv.DictReader(stream))
+    if request.mimetype == 'text/csv':
+        text = request.get_data(as_text=True).lstrip('\ufeff')
+        return list(csv.DictReader(io.StringIO(text, newline='')))
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('orders')
+    return data if isinstance(data, list) else None
+
+
+@orders_bp.route('/api/orders/bulk', methods=['POST'])
+@jwt_required()
+def bulk_create_orders():
+    """
+    Создает заявки пакетом.
+    
+    Тело запроса:
+        JSON-массив заявок (или {"orders": [...]}), CSV-файл в поле file
+        формы либо CSV с Content-Type text/csv. Колонки те же, что у
+        POST /api/orders.
+        
+    Возвращает:
+        JSON с количеством созданных заявок и ошибками по строкам.
+        Код состояния: 200 OK или 400 Bad Request
+    """
+    try:
+        rows = _read_bulk_rows()
+        if rows is None:
+            return jsonify({'error': 'Ожидается JSON-массив заявок или CSV-файл'}), 400
+        if not rows:
+            return jsonify({'error': 'Нет строк для импорта'}), 400
+
+        result = order_service.bulk_create_orders(rows)
+        result['total'] = len(rows)
+        return jsonify(result), 200
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': f'Не удалось прочитать CSV: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при импорте заявок: {str(e)}'}), 500
+
+@orders_bp.route('/api/orders/revaluation', methods=['POST'])
+@jwt_required()
+def start_revaluation():
+    """
+    Ставит в очередь переоценку сумм открытых заявок по текущим курсам.
+
+    Возвращает:
+        JSON {'status': 'queued', 'job_id': id задания}.
+        Код состояния: 202 Accepted или 503 Service Unavailable (переоценка отключена)
+    """
+    worker = revaluation_service.get_worker()
+    if worker is None:
+        return jsonify({'error': 'Переоценка заявок отключена (REVALUATION_ENABLED)'}), 503
+    return jsonify({'status': 'queued', 'job_id': worker.enqueue()}), 202
+
+
+@orders_bp.route('/api/orders/revaluation/<job_id>', methods=['GET'])
+@jwt_required()
+def revaluation_job(job_id):
+    """
+    Состояние задания переоценки: status (queued, running, success, error,
+    cancelled), total — открытых заявок, processed — просмотрено,
+    changed — заявок с измененными суммами, items_changed — позиций.
+    """
+    worker = revaluation_service.get_worker()
+    job = worker.get_job(job_id) if worker is not None else None
+    if job is None:
+        return jsonify({'error': 'Задание не найдено'}), 404
+    return jsonify(job), 200
+
+
 @orders_bp.route('/api/orders/<order_id>', methods=['PUT'])
 @jwt_required()
 def update_order(order_id):
@@ -99,33 +320,32 @@ def update_order(order_id):
     Аргументы:
         order_id (str): Уникальный идентификатор заявки для обновления
         
+    Заголовки:
+        If-Match (опционально): ETag из GET /api/orders/<order_id>; если заявку
+        успели изменить, обновление не применяется и возвращается 412
+        
     Тело запроса:
         JSON с полями, которые нужно обновить
         
     Возвращает:
         JSON-ответ с обновленными данными заявки или сообщением об ошибке.
-        Код состояния: 200 OK, 404 Not Found или 400 Bad Request
+        Код состояния: 200 OK, 404 Not Found, 400 Bad Request или 412 Precondition Failed
     """
     try:
         data = request.get_json()
         
         if not data:
             return jsonify({'error': 'Тело запроса должно содержать JSON'}), 400
-        
-        # Проверяем, существует ли заявка
-        existing_order = order_service.get_order_by_id(order_id)
-        if existing_order is None:
+
+        expected_version = _expected_version(order_id)
+        updated_order = order_service.update_order(order_id, data, expected_version)
+        if updated_order is None:
             return jsonify({'error': 'Заявка не найдена'}), 404
-        
-        # Обновляем заявку
-        updated_rows = order_service.update_order(order_id, data)
-        
-        if updated_rows == 0:
-            return jsonify({'error': 'Не удалось обновить заявку'}), 500
-        
-        # Возвращаем обновленную заявку
-        updated_order = order_service.get_order_by_id(order_id)
-        return jsonify(updated_order), 200
+        return _order_response(updated_order), 200
+    except order_service.OrderVersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 412
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Ошибка при обновлении заявки: {str(e)}'}), 500
 
@@ -156,4 +376,61 @@ def delete_order(order_id):
             
         return jsonify({'message': 'Заявка удалена'}), 200
     except Exception as e:
-        return jsonify({'error': f'Ошибка при удалении заявки: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Ошибка при удалении заявки: {str(e)}'}), 500
+
+
+@orders_bp.route('/api/orders/<order_id>/items', methods=['GET'])
+@jwt_required()
+def get_order_items(order_id):
+    """
+    Получает позиции заявки.
+
+    Возвращает:
+        JSON {'items': [...]}; у позиции поля product, quantity, unit_price,
+        currency и суммы amount_cny/amount_rub/amount_usd.
+        Код состояния: 200 OK или 404 Not Found
+    """
+    try:
+        if order_service.get_order_by_id(order_id) is None:
+            return jsonify({'error': 'Заявка не найдена'}), 404
+        return jsonify({'items': order_service.get_order_items(order_id)}), 200
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при получении позиций заявки: {str(e)}'}), 500
+
+
+@orders_bp.route('/api/orders/<order_id>/items', methods=['PATCH'])
+@jwt_required()
+def save_order_items(order_id):
+    """
+    Добавляет, изменяет и удаляет позиции заявки одним запросом.
+
+    Заголовки:
+        If-Match (опционально): ETag заявки; если заявку успели изменить,
+        позиции не сохраняются и возвращается 412
+
+    Тело запроса:
+        JSON {"items": [...], "delete": [id, ...]}. Позиция без id добавляется,
+        позиция с id изменяется (передаются только меняющиеся поля).
+
+    Возвращает:
+        JSON {'order': заявка с пересчитанными суммами, 'items': все позиции}.
+        Код состояния: 200 OK, 400 Bad Request, 404 Not Found или 412 Precondition Failed
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Тело запроса должно содержать JSON-объект'}), 400
+
+        result = order_service.save_order_items(order_id, data.get('items') or [], data.get('delete') or [],
+                                                _expected_version(order_id))
+        if result is None:
+            return jsonify({'error': 'Заявка не найдена'}), 404
+        response = jsonify(result)
+        response.set_etag(_order_etag(result['order']))
+        return response, 200
+    except order_service.OrderVersionConflict as e:
+        return jsonify({'error': str(e), 'version': e.current_version}), 412
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при изменении позиций заявки: {str(e)}'}), 500
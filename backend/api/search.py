@@ -0,0 +1,39 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from backend.services import search_service
+
+
+search_bp = Blueprint('search', __name__)
+
+
+@search_bp.route('/api/search', methods=['GET'])
+@jwt_required()
+def search():
+    """
+    Полнотекстовый поиск по заявкам, клиентам, поставщикам, сообщениям и документам.
+
+    Параметры запроса:
+        q (str): Поисковая строка; слова ищутся по началу, все должны встретиться
+        types (str): Типы результатов через запятую (order, client, supplier,
+                     message, document); по умолчанию все
+        limit (int): Сколько результатов вернуть
+
+    Возвращает:
+        JSON {'query', 'results'}; результаты отсортированы по релевантности,
+        найденные слова во фрагменте snippet обрамлены <mark></mark>.
+        Код состояния: 200 OK или 400 Bad Request
+    """
+    q = request.args.get('q', '')
+    types = [kind.strip() for kind in request.args.get('types', '').split(',') if kind.strip()]
+    try:
+        result = search_service.search(
+            q,
+            types=types or None,
+            limit=request.args.get('limit', search_service.DEFAULT_LIMIT, type=int),
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка поиска: {str(e)}'}), 500
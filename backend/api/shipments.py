@@ -0,0 +1,190 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from backend.services import shipment_service
+
+
+shipments_bp = Blueprint('shipments', __name__)
+
+
+@shipments_bp.route('/api/shipments', methods=['GET'])
+@jwt_required()
+def get_shipments():
+    """
+    Получает страницу отгрузок.
+
+    Параметры запроса:
+        stage (str): Фильтр по текущему этапу
+        order_id (int): Фильтр по заявке
+        carrier (str): Фильтр по перевозчику
+        limit (int): Размер страницы
+        cursor (int): next_cursor из предыдущего ответа
+
+    Возвращает:
+        JSON со списком отгрузок и курсором следующей страницы.
+        Код состояния: 200 OK или 400 Bad Request
+    """
+    try:
+        result = shipment_service.list_shipments(
+            stage=request.args.get('stage') or None,
+            order_id=request.args.get('order_id', type=int),
+            carrier=request.args.get('carrier') or None,
+            limit=request.args.get('limit', shipment_service.DEFAULT_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor', type=int),
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при получении списка отгрузок: {str(e)}'}), 500
+
+
+@shipments_bp.route('/api/shipments', methods=['POST'])
+@jwt_required()
+def create_shipment():
+    """
+    Создает отгрузку.
+
+    Тело запроса:
+        JSON с полями order_id, carrier, tracking_number, origin, destination, eta
+
+    Возвращает:
+        JSON созданной отгрузки.
+        Код состояния: 201 Created или 400 Bad Request
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Тело запроса должно содержать JSON'}), 400
+    try:
+        return jsonify(shipment_service.create_shipment(data)), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при создании отгрузки: {str(e)}'}), 500
+
+
+@shipments_bp.route('/api/shipments/track/<tracking_number>', methods=['GET'])
+@jwt_required()
+def track_shipment(tracking_number):
+    """
+    «Где мой груз»: текущий этап отгрузки по трек-номеру.
+
+    Параметры запроса:
+        carrier (str): Перевозчик, если трек-номер неоднозначен
+
+    Возвращает:
+        JSON отгрузки с текущим этапом.
+        Код состояния: 200 OK или 404 Not Found
+    """
+    shipment = shipment_service.get_shipment_by_tracking(tracking_number, request.args.get('carrier'))
+    if shipment is None:
+        return jsonify({'error': 'Отгрузка не найдена'}), 404
+    return jsonify(shipment), 200
+
+
+@shipments_bp.route('/api/shipments/<int:shipment_id>', methods=['GET'])
+@jwt_required()
+def get_shipment(shipment_id):
+    """
+    Получает отгрузку по идентификатору.
+
+    Параметры запроса:
+        timeline (int): 1 — добавить в ответ историю этапов
+
+    Возвращает:
+        JSON отгрузки.
+        Код состояния: 200 OK или 404 Not Found
+    """
+    shipment = shipment_service.get_shipment(shipment_id)
+    if shipment is None:
+        return jsonify({'error': 'Отгрузка не найдена'}), 404
+    if request.args.get('timeline') == '1':
+        shipment['stages'] = shipment_service.get_timeline(shipment_id) or []
+    return jsonify(shipment), 200
+
+
+@shipments_bp.route('/api/shipments/<int:shipment_id>', methods=['PUT'])
+@jwt_required()
+def update_shipment(shipment_id):
+    """
+    Изменяет данные отгрузки (без этапов).
+
+    Возвращает:
+        JSON обновленной отгрузки.
+        Код состояния: 200 OK, 400 Bad Request или 404 Not Found
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Тело запроса должно содержать JSON'}), 400
+    try:
+        shipment = shipment_service.update_shipment(shipment_id, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при обновлении отгрузки: {str(e)}'}), 500
+    if shipment is None:
+        return jsonify({'error': 'Отгрузка не найдена'}), 404
+    return jsonify(shipment), 200
+
+
+@shipments_bp.route('/api/shipments/<int:shipment_id>', methods=['DELETE'])
+@jwt_required()
+def delete_shipment(shipment_id):
+    """
+    Удаляет отгрузку вместе с историей этапов.
+
+    Возвращает:
+        Код состояния: 200 OK, 404 Not Found или 500 Internal Server Error
+    """
+    try:
+        if not shipment_service.delete_shipment(shipment_id):
+            return jsonify({'error': 'Отгрузка не найдена'}), 404
+        return jsonify({'message': 'Отгрузка удалена'}), 200
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при удалении отгрузки: {str(e)}'}), 500
+
+
+@shipments_bp.route('/api/shipments/<int:shipment_id>/stages', methods=['GET'])
+@jwt_required()
+def get_stages(shipment_id):
+    """
+    История этапов отгрузки в хронологическом порядке.
+
+    Возвращает:
+        JSON {'shipment_id', 'stages'}.
+        Код состояния: 200 OK или 404 Not Found
+    """
+    stages = shipment_service.get_timeline(shipment_id)
+    if stages is None:
+        return jsonify({'error': 'Отгрузка не найдена'}), 404
+    return jsonify({'shipment_id': shipment_id, 'stages': stages}), 200
+
+
+@shipments_bp.route('/api/shipments/<int:shipment_id>/stages', methods=['POST'])
+@jwt_required()
+def append_stage(shipment_id):
+    """
+    Добавляет этап отгрузки.
+
+    Тело запроса:
+        JSON с полями stage (обязательно), ts, location, note
+
+    Возвращает:
+        JSON {'stage': добавленный этап, 'shipment': отгрузка с текущим этапом}.
+        Код состояния: 201 Created, 400 Bad Request или 404 Not Found
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('stage'):
+        return jsonify({'error': 'Не указан этап (stage)'}), 400
+    try:
+        result = shipment_service.append_stage(
+            shipment_id, data['stage'], ts=data.get('ts'),
+            location=data.get('location'), note=data.get('note'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при добавлении этапа: {str(e)}'}), 500
+    if result is None:
+        return jsonify({'error': 'Отгрузка не найдена'}), 404
+    return jsonify(result), 201
@@ -0,0 +1,39 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from backend.services import stats_service
+
+
+stats_bp = Blueprint('stats', __name__)
+
+
+@stats_bp.route('/api/stats', methods=['GET'])
+@jwt_required()
+def stats():
+    """
+    Статистика заявок для дашборда.
+
+    Параметры запроса:
+        group (str): client, supplier или day; без него — сводка по статусам
+        key (str): Конкретный клиент, поставщик или день
+        from, to (str): Диапазон ключей, например дат для group=day
+
+    Возвращает:
+        JSON со сводкой или строками агрегатов.
+        Код состояния: 200 OK или 400 Bad Request
+    """
+    group = request.args.get('group')
+    try:
+        if not group:
+            return jsonify(stats_service.get_summary()), 200
+        groups = stats_service.get_groups(
+            group,
+            key=request.args.get('key'),
+            key_from=request.args.get('from'),
+            key_to=request.args.get('to'),
+        )
+        return jsonify({'group': group, 'groups': groups}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Ошибка при получении статистики: {str(e)}'}), 500
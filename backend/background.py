@@ -0,0 +1,169 @@
+"""
+Фоновые компоненты, которые должны работать в одном экземпляре на все
+развертывание: плановое обновление курсов валют, опрос перевозчиков и
+конвейер обработки документов.
+
+Пока BACKGROUND_LOCK_FILE не задан (один процесс), они запускаются сразу.
+При нескольких воркерах gunicorn (gunicorn.conf.py задает файл) их запускает
+только воркер, который взял блокировку файла. Остальные воркеры повторяют
+попытку раз в BACKGROUND_LOCK_RETRY секунд: если лидер завершился (например,
+перезапуск по max_requests), его место занимает другой воркер. Блокировку
+снимает ОС при выходе процесса, поэтому и аварийно завершенный лидер ее
+не удерживает.
+
+Ручное обновление курсов (POST /api/currency/update-now) выполняется в том
+воркере, который принял запрос; переоценка заявок запускается событием
+обновления курсов в процессе, где курсы обновились, поэтому тоже выполняется
+один раз.
+"""
+import functools
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """
+    Блокировка файла, которую держит один процесс из нескольких.
+
+    Аргументы:
+        path (str): Файл блокировки, общий для всех воркеров
+        on_acquired (Callable): Вызывается один раз, когда процесс стал лидером
+        retry_interval (float): Как часто процесс без блокировки пытается ее взять, секунды
+    """
+
+    def __init__(self, path: str, on_acquired: Callable[[], None], retry_interval: float = 5.0):
+        self.path = path
+        self.on_acquired = on_acquired
+        self.retry_interval = retry_interval
+
+        self._file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """Берет блокировку без ожидания; возвращает True, если процесс стал лидером."""
+        try:
+            import fcntl
+        except ImportError:
+            # Нет flock (Windows): gunicorn там не работает, процесс единственный
+            self._file = open(self.path, 'a')
+            return True
+        f = open(self.path, 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def start(self) -> None:
+        """Становится лидером сразу или запускает поток повторных попыток."""
+        if self.try_acquire():
+            self._acquired()
+            return
+        logger.info(f"Фоновые компоненты работают в другом процессе (блокировка {self.path})")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='background-leader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._file is not None:
+            # Закрытие файла снимает блокировку: ее сможет взять другой воркер
+            self._file.close()
+            self._file = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.retry_interval):
+            if self.try_acquire():
+                self._acquired()
+                return
+
+    def _acquired(self) -> None:
+        logger.info(f"Процесс запускает фоновые компоненты (блокировка {self.path})")
+        try:
+            self.on_acquired()
+        except Exception as e:
+            logger.error(f"Ошибка запуска фоновых компонентов: {e}")
+
+
+_lock: Optional[LeaderLock] = None
+_lock_guard = threading.Lock()
+
+
+def init_app(app) -> None:
+    """
+    Запускает фоновые компоненты приложения: сразу или, если задан
+    BACKGROUND_LOCK_FILE, когда процесс возьмет блокировку.
+    """
+    global _lock
+    config = app.config
+    lock_file = config['BACKGROUND_LOCK_FILE']
+
+    # Компоненты, которые запускает только лидер
+    leader_tasks: List[Callable[[], None]] = []
+
+    # Планировщик курсов есть в каждом процессе, чтобы ручное обновление работало
+    # в любом воркере; по расписанию курсы обновляет только лидер
+    # (CURRENCY_UPDATE_ENABLED=0 отключает)
+    if config['CURRENCY_UPDATE_ENABLED']:
+        from backend.services import currency_update_service
+
+        scheduler = currency_update_service.start_scheduler(
+            currency_update_service.provider_from_spec(config['CURRENCY_PROVIDER']),
+            config['CURRENCY_UPDATE_INTERVAL'], periodic=not lock_file)
+        if lock_file:
+            leader_tasks.append(lambda: scheduler.set_periodic(True))
+
+    # Опрос перевозчиков по активным отгрузкам (TRACKING_POLL_ENABLED=1 включает):
+    # ограничение частоты запросов к перевозчику действует внутри процесса,
+    # поэтому опрашивает только лидер
+    if config['TRACKING_POLL_ENABLED']:
+        from backend.services import integration_service
+
+        carriers = integration_service.carriers_from_config(config['TRACKING_CARRIERS'])
+        if carriers:
+            leader_tasks.append(functools.partial(integration_service.start_poller, carriers,
+                                                  config['TRACKING_POLL_INTERVAL']))
+        else:
+            logger.warning("Опрос перевозчиков включен, но TRACKING_CARRIERS пуст")
+
+    # Извлечение текста и миниатюры загруженных документов (DOCUMENT_JOBS_ENABLED=0 отключает)
+    if config['DOCUMENT_JOBS_ENABLED']:
+        from backend.services import document_service
+
+        leader_tasks.append(functools.partial(document_service.start_pipeline, config['DOCUMENTS_DIR'],
+                                              config['DOCUMENT_WORKERS'], config['DOCUMENT_JOB_ATTEMPTS']))
+
+    def on_acquired():
+        for task in leader_tasks:
+            task()
+
+    if not lock_file:
+        on_acquired()
+        return
+
+    with _lock_guard:
+        if _lock is None:
+            _lock = LeaderLock(lock_file, on_acquired, config['BACKGROUND_LOCK_RETRY'])
+            _lock.start()
+
+
+def stop() -> None:
+    """Снимает блокировку лидера; сами компоненты останавливаются их сервисами."""
+    global _lock
+    with _lock_guard:
+        if _lock is not None:
+            _lock.stop()
+            _lock = None
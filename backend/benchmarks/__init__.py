@@ -0,0 +1,6 @@
+"""
+Бенчмарки backend. Запуск: python -m backend.benchmarks.<модуль>
+
+Синтетическую базу строит dataset, результаты сохраняются и сравниваются
+между запусками через results (ключ --json у micro, http_load и dataset).
+"""
@@ -0,0 +1,62 @@
+"""
+Сравнение пакетной конвертации (convert_batch) с поштучным циклом convert_amounts.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.currency_conversion --items 100000
+"""
+import argparse
+import random
+import time
+
+from backend.services import currency_service
+
+
+def _install_rates(currencies: int) -> None:
+    rates = {'RUB': 12.0, 'USD': 0.137}
+    for i in range(currencies - 3):
+        rates[f'C{i:02d}'] = random.uniform(0.01, 100)
+    with currency_service._refresh_lock:
+        currency_service._publish(rates)
+
+
+def run(items: int, currencies: int, repeat: int = 3) -> dict:
+    random.seed(42)
+    _install_rates(currencies)
+    codes = ['CNY', 'RUB', 'USD']
+    amounts = [random.uniform(1, 10_000) for _ in range(items)]
+    from_codes = [random.choice(codes) for _ in range(items)]
+
+    def loop():
+        return [currency_service.convert_amounts(a, c) for a, c in zip(amounts, from_codes)]
+
+    def batch():
+        return currency_service.convert_batch(amounts, from_codes, codes)
+
+    results = {}
+    for name, fn in (('loop', loop), ('batch', batch)):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        results[name] = best
+    results['speedup'] = results['loop'] / results['batch']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--currencies', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = run(args.items, args.currencies, args.repeat)
+    print(f"{args.items} сумм, {args.currencies} валют")
+    print(f"  поштучно: {results['loop'] * 1000:.1f} мс")
+    print(f"  пакетно:  {results['batch'] * 1000:.1f} мс")
+    print(f"  ускорение: x{results['speedup']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
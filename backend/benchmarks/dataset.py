@@ -0,0 +1,235 @@
+"""
+Синтетическая база для бенчмарков: клиенты, поставщики, заявки с позициями и история курсов.
+
+База создается миграциями (bootstrap_database), строки пишутся обычными
+INSERT, поэтому order_stats, итоги заявок по позициям и индексы поиска
+заполняются теми же триггерами, что и в работе. Генератор детерминирован:
+одинаковые параметры и seed дают одинаковые данные.
+
+Распределения приближены к рабочим:
+- заявки идут по возрастанию даты за rate_years лет, их число растет со временем;
+- клиенты и поставщики выбираются по закону Ципфа (немного крупных, много мелких);
+- суммы — логнормальные, в RUB и USD пересчитаны по курсу на дату заявки;
+- часть заявок состоит из позиций в разных валютах;
+- курсы RUB, USD и нескольких других валют — ежедневное случайное блуждание.
+
+Рядом с базой пишется <база>.json с параметрами; open_dataset() пересоздает
+базу, только если параметры изменились (10 млн заявок пишутся десятки минут).
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.dataset --orders 1000000 --db /tmp/bench.db
+"""
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from backend.database import bootstrap_database
+
+STATUSES = ('новая', 'в работе', 'на таможне', 'доставлен', 'отменен')
+STATUS_WEIGHTS = (0.08, 0.25, 0.07, 0.55, 0.05)
+CITIES = 'Москва Новосибирск Екатеринбург Казань Иркутск Владивосток Гуанчжоу Иу Шэньчжэнь Шанхай'.split()
+PRODUCTS = (
+    'игрушки кроссовки запчасти электроника одежда обувь ткань посуда мебель инструменты '
+    'телефоны чехлы кабели лампы сумки часы косметика упаковка контейнер паллета'
+).split()
+ADJECTIVES = 'детские летние зимние оптовые пластиковые металлические хлопковые кожаные светодиодные'.split()
+
+# Начальные курсы (единиц за 1 CNY) и дневная волатильность
+RATE_START = {'RUB': 12.0, 'USD': 0.137, 'EUR': 0.127, 'KZT': 63.0, 'BYN': 0.45}
+RATE_VOLATILITY = {'RUB': 0.008, 'USD': 0.002, 'EUR': 0.003, 'KZT': 0.006, 'BYN': 0.004}
+ITEM_CURRENCIES = (('CNY', 0.7), ('USD', 0.2), ('RUB', 0.1))
+
+
+class DatasetSpec(NamedTuple):
+    orders: int
+    clients: int
+    suppliers: int
+    item_share: float = 0.2
+    rate_years: int = 3
+    seed: int = 42
+
+
+def default_spec(orders: int, seed: int = 42) -> DatasetSpec:
+    """Параметры по числу заявок: клиентов в 50 раз, поставщиков в 500 раз меньше."""
+    return DatasetSpec(orders=orders, clients=max(100, orders // 50), suppliers=max(20, orders // 500), seed=seed)
+
+
+class RateSeries:
+    """Дневные курсы за период: rates[code][день от начала]."""
+
+    def __init__(self, start: date, days: int, rnd: random.Random):
+        self.start = start
+        self.days = days
+        self.rates: Dict[str, List[float]] = {}
+        for code, rate in RATE_START.items():
+            series = []
+            for _ in range(days):
+                rate *= 1 + rnd.gauss(0, RATE_VOLATILITY[code])
+                series.append(rate)
+            self.rates[code] = series
+
+    def on(self, code: str, day: int) -> float:
+        return 1.0 if code == 'CNY' else self.rates[code][day]
+
+
+def _zipf_picker(count: int, rnd: random.Random, exponent: float = 1.1):
+    """Функция выбора id 1..count с вероятностью ~ 1/ранг^exponent (ранги перемешаны)."""
+    weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+    ids = list(range(1, count + 1))
+    rnd.shuffle(ids)
+    total = weights[-1]
+    return lambda: ids[min(bisect.bisect_left(weights, rnd.random() * total), count - 1)]
+
+
+def _people(count: int, rnd: random.Random, kind: str) -> List[Tuple]:
+    return [(f'{kind} {i}', f'Контакт {i}', f'+7 9{rnd.randrange(10 ** 9):09d}', f'{kind.lower()}{i}@mail.ru',
+             rnd.choice(CITIES), None) for i in range(1, count + 1)]
+
+
+def generate(db_path: str, spec: DatasetSpec, batch: int = 50_000) -> Dict[str, float]:
+    """
+    Создает базу db_path (файл не должен существовать) и заполняет ее по spec.
+
+    Аргументы:
+        db_path (str): Путь к новой базе
+        spec (DatasetSpec): Размеры и seed
+        batch (int): Сколько заявок писать в одной транзакции
+
+    Возвращает:
+        Dict: {'orders', 'items', 'rate_points', 'load_s', 'db_mb'}
+    """
+    if os.path.exists(db_path):
+        raise FileExistsError(db_path)
+    rnd = random.Random(spec.seed)
+    bootstrap_database(db_path)
+    conn = sqlite3.connect(db_path)
+    # Данные можно пересоздать, поэтому надежность записи не нужна
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    started = time.perf_counter()
+
+    days = max(1, spec.rate_years * 365)
+    start = date.today() - timedelta(days=days - 1)
+    rates = RateSeries(start, days, rnd)
+    with conn:
+        conn.execute("DELETE FROM CurrencyRates")
+        conn.executemany(
+            "INSERT INTO CurrencyRates (currency_code, rate_date, rate, source) VALUES (?, ?, ?, 'benchmark')",
+            [(code, (start + timedelta(days=day)).isoformat(), rate)
+             for code, series in rates.rates.items() for day, rate in enumerate(series)])
+        conn.executemany("INSERT OR REPLACE INTO currency_rates (currency_code, rate) VALUES (?, ?)",
+                         [(code, series[-1]) for code, series in rates.rates.items()])
+        for table, count, kind in (('Clients', spec.clients, 'Клиент'), ('Suppliers', spec.suppliers, 'Поставщик')):
+            conn.executemany(f"INSERT INTO {table} (name, contact, phone, email, city, notes) "
+                             f"VALUES (?, ?, ?, ?, ?, ?)", _people(count, rnd, kind))
+
+    pick_client = _zipf_picker(spec.clients, rnd)
+    pick_supplier = _zipf_picker(spec.suppliers, rnd)
+    item_codes = [code for code, _ in ITEM_CURRENCIES]
+    item_weights = [weight for _, weight in ITEM_CURRENCIES]
+    start_dt = datetime.combine(start, datetime.min.time())
+    items_total = 0
+    for chunk_start in range(0, spec.orders, batch):
+        orders, items = [], []
+        for order_id in range(chunk_start + 1, min(spec.orders, chunk_start + batch) + 1):
+            # Квадратный корень: заявок в последние месяцы больше, чем в первые
+            position = ((order_id - 0.5) / spec.orders) ** 0.5
+            created = start_dt + timedelta(seconds=int(position * days * 86400))
+            day = min(days - 1, (created.date() - start).days)
+            status = rnd.choices(STATUSES, STATUS_WEIGHTS)[0]
+            name = f'{rnd.choice(ADJECTIVES)} {rnd.choice(PRODUCTS)} {order_id}'
+            if rnd.random() < spec.item_share:
+                # Итоги заявки посчитают триггеры позиций
+                cny = 0.0
+                for _ in range(rnd.randint(1, 5)):
+                    code = rnd.choices(item_codes, item_weights)[0]
+                    quantity = float(rnd.randint(1, 500))
+                    price = round(rnd.lognormvariate(3, 1) * rates.on(code, day), 2)
+                    amount_cny = quantity * price / rates.on(code, day)
+                    items.append((order_id, rnd.choice(PRODUCTS), quantity, price, code, amount_cny,
+                                  amount_cny * rates.on('RUB', day), amount_cny * rates.on('USD', day)))
+            else:
+                cny = round(rnd.lognormvariate(9, 1.2), 2)
+            orders.append((order_id, pick_client(), pick_supplier(), name, status, cny,
+                           cny * rates.on('RUB', day), cny * rates.on('USD', day),
+                           created.isoformat(sep=' ')))
+        with conn:
+            conn.executemany(
+                "INSERT INTO orders (id, client_id, supplier_id, name, status, total_cny, total_rub, total_usd, "
+                "created_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", orders)
+            conn.executemany(
+                "INSERT INTO Order_Products (order_id, product, quantity, unit_price, currency, "
+                "amount_cny, amount_rub, amount_usd) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", items)
+        items_total += len(items)
+
+    conn.execute("PRAGMA optimize")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return {
+        'orders': spec.orders,
+        'items': items_total,
+        'rate_points': days * len(RATE_START),
+        'load_s': round(time.perf_counter() - started, 1),
+        'db_mb': round(os.path.getsize(db_path) / 2 ** 20, 1),
+    }
+
+
+def open_dataset(db_path: str, spec: DatasetSpec) -> Optional[Dict[str, float]]:
+    """
+    Готовит базу db_path для spec: существующая база с теми же параметрами
+    используется повторно (возвращает None), иначе создается заново
+    (возвращает результат generate).
+    """
+    meta_path = db_path + '.json'
+    if os.path.exists(db_path) and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            if json.load(f) == spec._asdict():
+                return None
+    for path in (db_path, meta_path, db_path + '-wal', db_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    summary = generate(db_path, spec)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(spec._asdict(), f)
+    return summary
+
+
+def main():
+    from backend.benchmarks import results
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--clients', type=int)
+    parser.add_argument('--suppliers', type=int)
+    parser.add_argument('--item-share', type=float, default=0.2, help='Доля заявок с позициями')
+    parser.add_argument('--rate-years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', required=True, help='Файл базы; пересоздается, если параметры изменились')
+    parser.add_argument('--json', help='Сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    spec = default_spec(args.orders, args.seed)._replace(item_share=args.item_share, rate_years=args.rate_years)
+    if args.clients:
+        spec = spec._replace(clients=args.clients)
+    if args.suppliers:
+        spec = spec._replace(suppliers=args.suppliers)
+    summary = open_dataset(args.db, spec)
+    if summary is None:
+        print(f"База {args.db} уже создана с этими параметрами")
+        return
+    print(f"{summary['orders']} заявок, {summary['items']} позиций, {summary['rate_points']} точек курсов: "
+          f"{summary['load_s']} с, {summary['db_mb']} МБ")
+    if args.json:
+        results.save(args.json, 'dataset', spec._asdict(), summary)
+
+
+if __name__ == '__main__':
+    main()
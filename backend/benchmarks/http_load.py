@@ -0,0 +1,209 @@
+"""
+Нагрузочный сценарий HTTP API: приложение create_app() на синтетической базе и смесь запросов клиента.
+
+Приложение обслуживается в этом процессе многопоточным WSGI-сервером
+werkzeug; клиенты — отдельные процессы с keep-alive соединениями, каждый
+выбирает запросы по весам SCENARIO: списки заявок с фильтрами и
+прокруткой, карточка заявки, позиции, создание и изменение заявок.
+По каждому виду запроса печатаются число запросов, ошибки и p50/p95/p99.
+Созданные сценарием заявки в конце удаляются.
+
+Пропускную способность разных серверов (dev-сервер, gunicorn) сравнивает
+backend.benchmarks.http_throughput; этот сценарий замеряет код приложения.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.http_load --orders 100000 --duration 20 --clients 8 --json http.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+
+from backend.benchmarks import dataset, results
+
+HOST = '127.0.0.1'
+BENCH_PREFIX = 'bench http '
+
+# Вид запроса и его доля в нагрузке
+SCENARIO = (
+    ('list', 0.30),
+    ('list_status', 0.10),
+    ('list_next_page', 0.10),
+    ('get_order', 0.25),
+    ('get_items', 0.05),
+    ('conversions', 0.05),
+    ('create', 0.10),
+    ('update', 0.05),
+)
+STATUSES = ('новая', 'в работе', 'на таможне')
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def _client(args) -> List[Tuple[str, float, int]]:
+    """Процесс-клиент: (вид запроса, время, код ответа) для каждого запроса до deadline."""
+    port, token, max_id, seed, deadline = args
+    rnd = random.Random(seed)
+    kinds = [kind for kind, _ in SCENARIO]
+    weights = [weight for _, weight in SCENARIO]
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+    created: List[int] = []
+    next_cursor = None
+    samples = []
+    while time.time() < deadline:
+        kind = rnd.choices(kinds, weights)[0]
+        method, body = 'GET', None
+        if kind == 'list':
+            path = '/api/orders?limit=50'
+        elif kind == 'list_status':
+            path = f'/api/orders?limit=50&status={quote(rnd.choice(STATUSES))}'
+        elif kind == 'list_next_page':
+            path = '/api/orders?limit=50' + (f'&cursor={quote(next_cursor)}' if next_cursor else '')
+        elif kind == 'get_order':
+            path = f'/api/orders/{rnd.randint(1, max_id)}'
+        elif kind == 'get_items':
+            path = f'/api/orders/{rnd.randint(1, max_id)}/items'
+        elif kind == 'conversions':
+            path = f'/api/currency/conversions?amount={rnd.uniform(1, 10000):.2f}&from=RUB'
+        elif kind == 'create':
+            method, path = 'POST', '/api/orders'
+            body = json.dumps({'client_id': rnd.randint(1, 100), 'supplier_id': rnd.randint(1, 20),
+                               'name': f'{BENCH_PREFIX}{seed}', 'status': 'новая',
+                               'total_cny': round(rnd.uniform(100, 10000), 2)})
+        else:
+            if not created:
+                continue
+            method, path = 'PUT', f'/api/orders/{rnd.choice(created)}'
+            body = json.dumps({'status': rnd.choice(STATUSES)})
+
+        started = time.perf_counter()
+        try:
+            status, payload = _request(conn, method, path, body, headers)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            samples.append((kind, time.perf_counter() - started, 0))
+            continue
+        samples.append((kind, time.perf_counter() - started, status))
+        if status in (200, 201):
+            data = json.loads(payload)
+            if kind == 'create' and 'id' in data:
+                created.append(data['id'])
+            elif kind == 'list_next_page':
+                next_cursor = data.get('next_cursor')
+    conn.close()
+    return samples
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summarize(samples: List[Tuple[str, float, int]], duration: float) -> Dict[str, dict]:
+    """Сводка по видам запросов и итог 'total'."""
+    by_kind: Dict[str, List[Tuple[float, int]]] = {}
+    for kind, elapsed, status in samples:
+        by_kind.setdefault(kind, []).append((elapsed, status))
+    by_kind['total'] = [(elapsed, status) for _, elapsed, status in samples]
+
+    summary = {}
+    for kind, values in by_kind.items():
+        latencies = sorted(elapsed for elapsed, _ in values)
+        if not latencies:
+            continue
+        summary[kind] = {
+            'requests': len(values),
+            'errors': sum(1 for _, status in values if status == 0 or status >= 500),
+            'throughput_rps': round(len(values) / duration, 1),
+            'p50_ms': round(_percentile(latencies, 0.5) * 1000, 2),
+            'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        }
+    return summary
+
+
+def run(db_path: str, duration: float, clients: int, port: int, threaded: bool = True) -> Dict[str, dict]:
+    """
+    Запускает create_app() на db_path и нагружает его clients процессами duration секунд.
+
+    Возвращает:
+        Dict: summarize() по видам запросов
+    """
+    from flask_jwt_extended import create_access_token
+    from werkzeug.serving import make_server
+
+    from backend.database import close_pool, get_db
+    from backend.main import create_app
+
+    app = create_app({
+        'DATABASE_PATH': db_path, 'DB_MIGRATE': False, 'CURRENCY_UPDATE_ENABLED': False, 'WS_ENABLED': False,
+        'TRACKING_POLL_ENABLED': False, 'DOCUMENT_JOBS_ENABLED': False, 'MESSAGES_INGEST_ENABLED': False,
+        'REVALUATION_ENABLED': False,
+    })
+    with app.app_context():
+        token = create_access_token(identity='bench')
+        max_id = get_db().execute("SELECT MAX(id) FROM orders").fetchone()[0] or 1
+
+    # Строка журнала на каждый запрос искажала бы замер
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server(HOST, port, app, threaded=threaded)
+    thread = threading.Thread(target=server.serve_forever, name='bench-http', daemon=True)
+    thread.start()
+    try:
+        deadline = time.time() + duration
+        # spawn: клиенты не наследуют потоки и соединения сервера
+        with multiprocessing.get_context('spawn').Pool(clients) as pool:
+            batches = pool.map(_client, [(port, token, max_id, seed, deadline) for seed in range(clients)])
+    finally:
+        server.shutdown()
+        thread.join(10)
+
+    with app.app_context():
+        db = get_db()
+        with db:
+            db.execute("DELETE FROM orders WHERE name LIKE ?", (f'{BENCH_PREFIX}%',))
+    close_pool()
+    return summarize([sample for batch in batches for sample in batch], duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000, help='Размер синтетической базы')
+    parser.add_argument('--db', help='Файл базы: создается при первом запуске и используется повторно')
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5060)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    spec = dataset.default_spec(args.orders, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'bench.db')
+        dataset.open_dataset(db_path, spec)
+        summary = run(db_path, args.duration, args.clients, args.port)
+
+    print(f"{args.orders} заявок, {args.clients} клиентов, {args.duration:.0f} с")
+    for kind, stats in summary.items():
+        print(f"  {kind:16s} {stats['requests']:7d} запр  {stats['throughput_rps']:8.1f} запр/с  "
+              f"ошибок {stats['errors']:4d}  p50 {stats['p50_ms']:7.2f} мс  p95 {stats['p95_ms']:7.2f} мс  "
+              f"p99 {stats['p99_ms']:7.2f} мс")
+    if args.json:
+        results.save(args.json, 'http_load', {'orders': args.orders, 'clients': args.clients,
+                                              'duration': args.duration, 'seed': args.seed}, summary)
+
+
+if __name__ == '__main__':
+    main()
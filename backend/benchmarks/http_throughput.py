@@ -0,0 +1,157 @@
+"""
+Пропускная способность API: dev-сервер Flask против gunicorn (backend/gunicorn.conf.py).
+
+Оба сервера запускаются отдельными процессами на временной базе с одинаковыми
+данными, нагрузку дают несколько процессов-клиентов с keep-alive соединениями.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.http_throughput --duration 10 --clients 16
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend.database import bootstrap_database
+from backend.services.auth_service import hash_password
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HOST = '127.0.0.1'
+BENCH_USER = ('bench', 'bench-password')
+
+SERVERS = {
+    'dev': [sys.executable, '-m', 'backend.main'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', os.path.join('backend', 'gunicorn.conf.py')],
+}
+
+
+def _create_database(path: str, orders: int) -> None:
+    random.seed(42)
+    bootstrap_database(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO orders (client_id, supplier_id, name, status, total_cny, total_rub, total_usd) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(random.randint(1, 200), random.randint(1, 50), f'Заявка {i}',
+          random.choice(('new', 'in_progress', 'done')), cny, cny * 12.0, cny * 0.137)
+         for i, cny in ((i, random.uniform(100, 100_000)) for i in range(orders))],
+    )
+    conn.execute("INSERT INTO Users (username, password_hash) VALUES (?, ?)",
+                 (BENCH_USER[0], hash_password(BENCH_USER[1])))
+    conn.commit()
+    conn.close()
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def _wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=1)
+            status, _ = _request(conn, 'GET', '/api/health')
+            conn.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Сервер на порту {port} не запустился за {timeout} с')
+
+
+def _login(port: int) -> str:
+    conn = http.client.HTTPConnection(HOST, port, timeout=5)
+    _, body = _request(conn, 'POST', '/api/login',
+                       json.dumps({'username': BENCH_USER[0], 'password': BENCH_USER[1]}),
+                       {'Content-Type': 'application/json'})
+    conn.close()
+    return json.loads(body)['access_token']
+
+
+def _client(args) -> list:
+    port, token, path, deadline = args
+    headers = {'Authorization': f'Bearer {token}'}
+    conn = http.client.HTTPConnection(HOST, port, timeout=10)
+    latencies = []
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            status, _ = _request(conn, 'GET', path, headers=headers)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            continue
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+    conn.close()
+    return latencies
+
+
+def run_server(name: str, db_path: str, port: int, duration: float, clients: int,
+               path: str, workers: int, threads: int) -> dict:
+    env = dict(os.environ,
+               HOST=HOST, PORT=str(port), DATABASE_PATH=db_path,
+               CURRENCY_UPDATE_ENABLED='0', WS_ENABLED='0',
+               GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads))
+    process = subprocess.Popen(SERVERS[name], cwd=PROJECT_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    try:
+        _wait_ready(port)
+        token = _login(port)
+        deadline = time.time() + duration
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.map(_client, [(port, token, path, deadline)] * clients)
+    finally:
+        # Dev-сервер с перезагрузчиком запускает дочерний процесс — завершаем всю группу
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(10)
+
+    latencies = sorted(latency for result in results for latency in result)
+    if not latencies:
+        raise RuntimeError(f'{name}: ни одного успешного запроса')
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--path', default='/api/orders?limit=50')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS), choices=list(SERVERS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'cargo_manager.db')
+        _create_database(db_path, args.orders)
+        print(f"GET {args.path}: {args.clients} клиентов, {args.duration:.0f} с, "
+              f"gunicorn {args.workers}x{args.threads}")
+        for name in args.servers:
+            result = run_server(name, db_path, args.port, args.duration, args.clients,
+                                args.path, args.workers, args.threads)
+            print(f"  {name:8s} {result['rps']:8.0f} запр/с  "
+                  f"p50 {result['p50_ms']:6.1f} мс  p99 {result['p99_ms']:6.1f} мс")
+
+
+if __name__ == '__main__':
+    main()
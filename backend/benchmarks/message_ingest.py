@@ -0,0 +1,142 @@
+"""
+Прием сообщений мессенджеров под постоянной нагрузкой: запись пачками против
+записи каждого сообщения отдельной транзакцией.
+
+API запускается через gunicorn (один воркер, чтобы весь поток шел через один
+буфер) на временной базе; нагрузку дает FakeMessenger с заданной частотой.
+После прогона проверяется, что все сообщения записаны и порядок внутри
+каждого чата совпадает с порядком отправки.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.message_ingest --rate 1000 --duration 10
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend.database import bootstrap_database
+from backend.integrations.fake_messenger import FakeMessenger, check_order
+from backend.services.auth_service import hash_password
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HOST = '127.0.0.1'
+SECRET = 'benchmark-webhook-secret'
+BENCH_USER = ('bench', 'bench-password')
+
+# Режимы записи: размер пачки и сколько секунд сообщение может ждать в буфере
+MODES = {
+    'batched': {'MESSAGES_BATCH_SIZE': '500', 'MESSAGES_FLUSH_INTERVAL': '0.2'},
+    'single': {'MESSAGES_BATCH_SIZE': '1', 'MESSAGES_FLUSH_INTERVAL': '0'},
+}
+
+
+def _request(port: int, method: str, path: str, body=None, headers=None):
+    conn = http.client.HTTPConnection(HOST, port, timeout=5)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def _wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if _request(port, 'GET', '/api/health')[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Сервер на порту {port} не запустился за {timeout} с')
+
+
+def _metrics(port: int, token: str) -> dict:
+    _, body = _request(port, 'GET', '/api/messages/ingest/metrics', headers={'Authorization': f'Bearer {token}'})
+    return json.loads(body)
+
+
+def run_mode(mode: str, port: int, rate: float, duration: float, chats: int, threads: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'cargo_manager.db')
+        bootstrap_database(db_path)
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("INSERT INTO Users (username, password_hash) VALUES (?, ?)",
+                         (BENCH_USER[0], hash_password(BENCH_USER[1])))
+        conn.close()
+        env = dict(os.environ, HOST=HOST, PORT=str(port), DATABASE_PATH=db_path, DOCUMENTS_DIR=tmp,
+                   CURRENCY_UPDATE_ENABLED='0', WS_ENABLED='0', DOCUMENT_JOBS_ENABLED='0',
+                   MESSAGES_WEBHOOK_SECRET=SECRET, GUNICORN_WORKERS='1', GUNICORN_THREADS=str(threads),
+                   **MODES[mode])
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', os.path.join('backend', 'gunicorn.conf.py')],
+            cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True)
+        try:
+            _wait_ready(port)
+            _, body = _request(port, 'POST', '/api/login',
+                               json.dumps({'username': BENCH_USER[0], 'password': BENCH_USER[1]}),
+                               {'Content-Type': 'application/json'})
+            token = json.loads(body)['access_token']
+
+            messenger = FakeMessenger(f'http://{HOST}:{port}/api/messages/webhook', SECRET,
+                                      chats=chats, rate=rate)
+            result = asyncio.run(messenger.run(duration))
+
+            # Ждем, пока буфер допишется в базу
+            deadline = time.monotonic() + 30
+            metrics = _metrics(port, token)
+            while metrics['buffered'] and time.monotonic() < deadline:
+                time.sleep(0.05)
+                metrics = _metrics(port, token)
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(10)
+
+        conn = sqlite3.connect(db_path)
+        stored = conn.execute("SELECT COUNT(*) FROM Communications").fetchone()[0]
+        conn.close()
+        result.update(
+            stored=stored,
+            out_of_order_chats=check_order(db_path),
+            batches=metrics['batches'],
+            avg_batch=metrics['avg_batch'],
+            flush_ms=metrics['flush_ms'],
+            buffer_wait_ms=metrics['buffer_wait_ms'],
+            rejected=metrics['rejected'],
+        )
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rate', type=float, default=1000.0)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--chats', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5060)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    print(f"Webhook: {args.rate:.0f} сообщ/с, {args.chats} чатов, {args.duration:.0f} с")
+    for mode in args.modes:
+        result = run_mode(mode, args.port, args.rate, args.duration, args.chats, args.threads)
+        print(f"  {mode:8s} {result['rate']:7.0f} сообщ/с  webhook p50 {result['latency_ms']['p50']:6.1f} мс "
+              f"p99 {result['latency_ms']['p99']:6.1f} мс  пачек {result['batches']} "
+              f"(в среднем {result['avg_batch']})  запись пачки p50 {result['flush_ms']['p50']} мс  "
+              f"записано {result['stored']}/{result['sent']}  повторов {result['retries']}  "
+              f"нарушений порядка {result['out_of_order_chats']}")
+
+
+if __name__ == '__main__':
+    main()
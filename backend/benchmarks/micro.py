@@ -0,0 +1,193 @@
+"""
+Микробенчмарки order_service и currency_service на синтетической базе (backend.benchmarks.dataset).
+
+Каждая функция вызывается number раз (тяжелые — реже) после прогрева;
+для каждого случая печатаются p50/p95 одного вызова и число вызовов в секунду.
+Чтение заявок замеряется без кеша (cold — запрос к SQLite) и с кешем (cached).
+Заявки, созданные бенчмарками записи, в конце удаляются.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.micro --orders 100000 --db /tmp/bench.db --json micro.json
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from backend.benchmarks import dataset, results
+from backend.database import close_db, close_pool, configure_pool, get_db
+
+BENCH_PREFIX = 'bench '
+
+
+def _summary(timings: List[float]) -> Dict[str, float]:
+    timings = sorted(timings)
+    total = sum(timings)
+    return {
+        'calls': len(timings),
+        'p50_us': round(timings[len(timings) // 2] * 1e6, 1),
+        'p95_us': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1e6, 1),
+        'mean_us': round(total / len(timings) * 1e6, 1),
+        'ops_per_s': round(len(timings) / total, 1) if total else 0.0,
+    }
+
+
+def measure(fn: Callable[[], object], number: int, warmup: int = 3) -> Dict[str, float]:
+    """Время каждого из number вызовов fn после warmup вызовов прогрева."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(max(1, number)):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return _summary(timings)
+
+
+def _cycle(values: list) -> Callable[[], object]:
+    position = [0]
+
+    def next_value():
+        position[0] = (position[0] + 1) % len(values)
+        return values[position[0]]
+    return next_value
+
+
+def _cases(number: int, rnd: random.Random) -> Dict[str, tuple]:
+    """{имя: (функция, число вызовов, кеш заявок включен)}."""
+    from backend.services import currency_service, order_service
+
+    db = get_db()
+    max_id = db.execute("SELECT MAX(id) FROM orders").fetchone()[0] or 1
+    hot_client = db.execute("SELECT client_id FROM orders GROUP BY client_id ORDER BY COUNT(*) DESC LIMIT 1") \
+        .fetchone()[0]
+    itemised = [row[0] for row in db.execute("SELECT id FROM orders WHERE items_count > 0 LIMIT 1000")] or [1]
+
+    order_ids = _cycle([rnd.randint(1, max_id) for _ in range(number)])
+    hot_ids = _cycle([rnd.randint(1, max_id) for _ in range(100)])
+    item_ids = _cycle(itemised)
+    amounts = _cycle([(rnd.uniform(1, 100_000), rnd.choice(('CNY', 'RUB', 'USD'))) for _ in range(number)])
+    batch_amounts = [rnd.uniform(1, 100_000) for _ in range(1000)]
+    batch_codes = [rnd.choice(('CNY', 'RUB', 'USD')) for _ in range(1000)]
+
+    cursor = [None]
+
+    def deep_pages():
+        # Листает список страница за страницей, как бесконечная прокрутка
+        page = order_service.list_orders(cursor=cursor[0])
+        cursor[0] = page['next_cursor']
+
+    def iter_first_rows(count=10_000):
+        for _ in zip(range(count), order_service.iter_orders()):
+            pass
+
+    created: List[int] = []
+
+    def create():
+        created.append(order_service.create_order({
+            'client_id': hot_client, 'supplier_id': 1, 'name': f'{BENCH_PREFIX}{len(created)}',
+            'status': 'новая', 'total_cny': rnd.uniform(100, 10_000)}))
+
+    def update():
+        if not created:
+            create()
+        order_service.update_order(rnd.choice(created), {'status': rnd.choice(('новая', 'в работе'))})
+
+    def bulk():
+        order_service.bulk_create_orders([
+            {'client_id': hot_client, 'supplier_id': 1, 'name': f'{BENCH_PREFIX}bulk', 'status': 'новая',
+             'total_rub': rnd.uniform(1000, 100_000)} for _ in range(1000)])
+
+    heavy = max(1, number // 20)
+    return {
+        'currency.convert_amounts': (lambda: currency_service.convert_amounts(*amounts()), number, False),
+        'currency.convert_batch_1000': (
+            lambda: currency_service.convert_batch(batch_amounts, batch_codes, ['CNY', 'RUB', 'USD']), heavy, False),
+        'orders.get_by_id_cold': (lambda: order_service.get_order_by_id(order_ids()), number, False),
+        'orders.get_by_id_cached': (lambda: order_service.get_order_by_id(hot_ids()), number, True),
+        'orders.list_first_page': (lambda: order_service.list_orders(), number, False),
+        'orders.list_first_page_cached': (lambda: order_service.list_orders(), number, True),
+        'orders.list_by_status': (lambda: order_service.list_orders(status='в работе'), number, False),
+        'orders.list_by_client': (lambda: order_service.list_orders(client_id=hot_client), number, False),
+        'orders.list_by_amount': (lambda: order_service.list_orders(sort='amount-desc'), number, False),
+        'orders.list_next_pages': (deep_pages, number, False),
+        'orders.list_search': (lambda: order_service.list_orders(search='кроссовки'), heavy, False),
+        'orders.get_items': (lambda: order_service.get_order_items(item_ids()), number, False),
+        'orders.iter_10k_rows': (iter_first_rows, max(1, number // 100), False),
+        'orders.create': (create, number, False),
+        'orders.update': (update, number, False),
+        'orders.bulk_create_1000': (bulk, max(1, number // 200), False),
+    }
+
+
+def _cleanup() -> int:
+    db = get_db()
+    with db:
+        removed = db.execute("DELETE FROM orders WHERE name LIKE ?", (f'{BENCH_PREFIX}%',)).rowcount
+    return removed
+
+
+def run(db_path: str, number: int = 1000, only: Optional[str] = None, seed: int = 42) -> Dict[str, dict]:
+    """
+    Выполняет случаи на готовой базе db_path.
+
+    Аргументы:
+        db_path (str): База, созданная backend.benchmarks.dataset
+        number (int): Вызовов на легкий случай
+        only (str, опционально): Выполнить только случаи, имя которых содержит эту строку
+
+    Возвращает:
+        Dict: {группа: {случай: {'calls', 'p50_us', 'p95_us', 'mean_us', 'ops_per_s'}}}
+    """
+    from backend.services import order_service
+
+    configure_pool(db_path)
+    rnd = random.Random(seed)
+    summary: Dict[str, dict] = {}
+    try:
+        for name, (fn, calls, cached) in _cases(number, rnd).items():
+            if only and only not in name:
+                continue
+            if cached:
+                order_service.configure_cache(10_000, 1000, 60.0)
+            else:
+                order_service.configure_cache(0, 0, 0)
+            group, case = name.split('.', 1)
+            summary.setdefault(group, {})[case] = measure(fn, calls)
+    finally:
+        _cleanup()
+        close_db()
+        close_pool()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100_000, help='Размер синтетической базы')
+    parser.add_argument('--db', help='Файл базы: создается при первом запуске и используется повторно')
+    parser.add_argument('--number', type=int, default=1000, help='Вызовов на легкий случай')
+    parser.add_argument('--only', help='Только случаи, имя которых содержит эту строку')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    spec = dataset.default_spec(args.orders, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'bench.db')
+        dataset.open_dataset(db_path, spec)
+        summary = run(db_path, args.number, args.only, args.seed)
+
+    print(f"{args.orders} заявок, {args.number} вызовов на случай")
+    for group, cases in summary.items():
+        for case, stats in cases.items():
+            print(f"  {group}.{case:28s} p50 {stats['p50_us']:10.1f} мкс  p95 {stats['p95_us']:10.1f} мкс  "
+                  f"{stats['ops_per_s']:10.1f} выз/с")
+    if args.json:
+        results.save(args.json, 'micro', {'orders': args.orders, 'number': args.number, 'seed': args.seed,
+                                          'only': args.only}, summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Конвертация по историческим курсам (convert_batch_as_of) на многолетней истории.
+
+Во временную базу пишутся ежедневные курсы нескольких десятков валют за
+несколько лет, затем замеряются загрузка индекса истории, пакетная конвертация
+сумм по датам заявок и поштучный поиск курса на дату.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.rate_history --years 10 --items 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from backend.database import bootstrap_database, close_db, configure_pool
+from backend.services import currency_service
+
+
+def _seed(years: int, currencies: int) -> int:
+    start = date.today() - timedelta(days=365 * years)
+    codes = ['RUB', 'USD'] + [f'C{i:02d}' for i in range(currencies - 3)]
+    points = []
+    for code in codes:
+        rate = random.uniform(0.01, 100)
+        for offset in range(365 * years):
+            rate *= random.uniform(0.99, 1.01)
+            points.append((code, start + timedelta(days=offset), rate))
+    return currency_service.import_history(points, source='benchmark')
+
+
+def run(years: int, currencies: int, items: int, repeat: int = 3) -> dict:
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'rates.db')
+        bootstrap_database(db_path)
+        configure_pool(db_path)
+        try:
+            points = _seed(years, currencies)
+            started = time.perf_counter()
+            currency_service.invalidate_history()
+            history = currency_service.get_history()
+            load = time.perf_counter() - started
+
+            first = date.today() - timedelta(days=365 * years - 1)
+            days = [(first + timedelta(days=random.randrange(365 * years))).isoformat() for _ in range(items)]
+            amounts = [random.uniform(1, 10_000) for _ in range(items)]
+            from_codes = [random.choice(('CNY', 'RUB', 'USD')) for _ in range(items)]
+
+            def batch():
+                return currency_service.convert_batch_as_of(amounts, from_codes, days, ['CNY', 'RUB', 'USD'])
+
+            def loop():
+                return [history.rate_on(code, day) for code, day in zip(from_codes, days)]
+
+            results = {'points': points, 'load': load}
+            for name, fn in (('batch', batch), ('loop', loop)):
+                best = float('inf')
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    fn()
+                    best = min(best, time.perf_counter() - started)
+                results[name] = best
+            return results
+        finally:
+            close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--currencies', type=int, default=30)
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = run(args.years, args.currencies, args.items, args.repeat)
+    print(f"{results['points']} точек истории ({args.years} лет, {args.currencies} валют), {args.items} сумм")
+    print(f"  загрузка индекса:           {results['load'] * 1000:.1f} мс")
+    print(f"  пакетная конвертация:       {results['batch'] * 1000:.1f} мс")
+    print(f"  поштучный поиск курса:      {results['loop'] * 1000:.1f} мс")
+
+
+if __name__ == '__main__':
+    main()
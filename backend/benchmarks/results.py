@@ -0,0 +1,137 @@
+"""
+Результаты бенчмарков в JSON и сравнение двух запусков.
+
+Файл результата: {'benchmark', 'params', 'environment', 'metrics'}, где
+metrics — плоский словарь «имя: число». По окончанию имени понятно, что
+лучше: меньшее значение у времени (_ms, _us, _s), большее у пропускной
+способности (_rps, _per_s); остальные метрики только показываются.
+
+Сравнение запусков из корня проекта (код возврата 1 при регрессии):
+    python -m backend.benchmarks.results base.json new.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOWER_IS_BETTER = ('_ms', '_us', '_s')
+HIGHER_IS_BETTER = ('_rps', '_per_s')
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def environment() -> Dict[str, Any]:
+    """Описание окружения запуска: без него числа разных машин сравнивать нельзя."""
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def flatten(data: Dict[str, Any], prefix: str = '') -> Dict[str, float]:
+    """{'a': {'p50_ms': 1}} -> {'a.p50_ms': 1}; нечисловые значения пропускаются."""
+    flat = {}
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def save(path: str, benchmark: str, params: Dict[str, Any], metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """Сохраняет результат запуска в path (каталоги создаются) и возвращает его."""
+    result = {
+        'benchmark': benchmark,
+        'params': params,
+        'environment': environment(),
+        'metrics': flatten(metrics),
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return result
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _direction(name: str) -> int:
+    """-1 — лучше меньше, 1 — лучше больше, 0 — не сравнивается."""
+    if name.endswith(HIGHER_IS_BETTER):
+        return 1
+    if name.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Сравнивает метрики двух запусков одного бенчмарка.
+
+    Аргументы:
+        baseline, current (Dict): Результаты save()/load()
+        threshold (float): Допустимое ухудшение, доля (0.1 — 10%)
+
+    Возвращает:
+        List[Dict]: По общей метрике {'metric', 'baseline', 'current', 'change',
+        'regression'}; change — относительное изменение, положительное — улучшение
+    """
+    if baseline.get('benchmark') != current.get('benchmark'):
+        raise ValueError(f"Разные бенчмарки: {baseline.get('benchmark')} и {current.get('benchmark')}")
+    rows = []
+    for name in sorted(baseline['metrics'].keys() & current['metrics'].keys()):
+        old, new = baseline['metrics'][name], current['metrics'][name]
+        direction = _direction(name)
+        change = (new - old) / old * direction if old and direction else 0.0
+        rows.append({
+            'metric': name,
+            'baseline': old,
+            'current': new,
+            'change': change,
+            'regression': direction != 0 and change < -threshold,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение двух результатов бенчмарка')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Допустимое ухудшение, доля')
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    rows = compare(baseline, current, args.threshold)
+    print(f"{current['benchmark']}: {baseline['environment'].get('commit')} -> {current['environment'].get('commit')}")
+    for row in rows:
+        mark = '  РЕГРЕССИЯ' if row['regression'] else ''
+        print(f"  {row['metric']:48s} {row['baseline']:12.3f} -> {row['current']:12.3f}  "
+              f"{row['change'] * 100:+6.1f}%{mark}")
+    sys.exit(1 if any(row['regression'] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
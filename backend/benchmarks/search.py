@@ -0,0 +1,169 @@
+"""
+Задержка полнотекстового поиска (search_service.search) на миллионе строк в индексах.
+
+Во временную базу, созданную миграциями, пишутся заявки, клиенты, поставщики
+и сообщения (индексы FTS5 заполняются теми же триггерами, что и в работе).
+Текст строится из словаря с распределением Ципфа: несколько слов встречаются
+в большой доле строк, большинство — редко. Запросы делятся на классы по
+частоте слов, для каждого класса печатаются p50/p95/max.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.search --rows 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from backend.database import bootstrap_database, close_db, configure_pool
+
+# Доли строк по таблицам
+SHARES = {'orders': 0.45, 'Communications': 0.45, 'Clients': 0.05, 'Suppliers': 0.05}
+
+BASE_WORDS = (
+    'игрушки кроссовки запчасти электроника одежда обувь ткань посуда мебель инструменты '
+    'телефоны чехлы кабели лампы сумки часы косметика упаковка контейнер паллета '
+    'доставка оплата таможня склад груз отправка инвойс счет договор образцы'
+).split()
+CITIES = 'Москва Новосибирск Екатеринбург Казань Иркутск Владивосток Гуанчжоу Иу Шэньчжэнь Шанхай'.split()
+SYLLABLES = 'ка ло ми ну ра те со ви да пе ро ба ли ма ге ду зо ки ле ны ша чу'.split()
+
+
+def _vocabulary(size: int) -> List[str]:
+    words = list(BASE_WORDS)
+    for length in (2, 3, 4):
+        for combo in itertools.product(SYLLABLES, repeat=length):
+            if len(words) >= size:
+                return words
+            words.append(''.join(combo))
+    return words
+
+
+class TextGenerator:
+    """Тексты из словаря, где частота слова убывает как 1/ранг."""
+
+    def __init__(self, vocabulary: List[str], seed: int = 42):
+        self.vocabulary = vocabulary
+        self.random = random.Random(seed)
+        self.weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def words(self, count: int) -> str:
+        return ' '.join(self.random.choices(self.vocabulary, cum_weights=self.weights, k=count))
+
+
+def seed(db_path: str, rows: int, vocabulary: List[str], batch: int = 20000) -> float:
+    """Заполняет базу; возвращает время загрузки в секундах."""
+    text = TextGenerator(vocabulary)
+    rnd = text.random
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    started = time.perf_counter()
+
+    def chunks(count, make):
+        for start in range(0, count, batch):
+            yield [make(i) for i in range(start, min(count, start + batch))]
+
+    counts = {table: int(rows * share) for table, share in SHARES.items()}
+    for table in ('Clients', 'Suppliers'):
+        for chunk in chunks(counts[table], lambda i: (
+                f'ООО {text.words(2).title()}', text.words(2).title(), f'+7 9{rnd.randrange(10**9):09d}',
+                f'{text.words(1)}{i}@mail.ru', rnd.choice(CITIES), text.words(8))):
+            conn.executemany(f"INSERT INTO {table} (name, contact, phone, email, city, notes) "
+                             f"VALUES (?, ?, ?, ?, ?, ?)", chunk)
+            conn.commit()
+    for chunk in chunks(counts['orders'], lambda i: (
+            rnd.randrange(counts['Clients']) + 1, rnd.randrange(counts['Suppliers']) + 1,
+            text.words(rnd.randint(2, 5)), rnd.choice(('новый', 'в работе', 'доставлен')))):
+        conn.executemany("INSERT INTO orders (client_id, supplier_id, name, status) VALUES (?, ?, ?, ?)", chunk)
+        conn.commit()
+    for chunk in chunks(counts['Communications'], lambda i: (
+            'telegram', str(i % 5000), f'client{i % 5000}', text.words(rnd.randint(5, 25)),
+            '2026-01-01 00:00:00')):
+        conn.executemany("INSERT INTO Communications (channel, chat_id, sender, body, received_at) "
+                         "VALUES (?, ?, ?, ?, ?)", chunk)
+        conn.commit()
+    # После загрузки сегменты индексов сливаются, как после долгой работы
+    for index in ('OrdersFts', 'ClientsFts', 'SuppliersFts', 'CommunicationsFts'):
+        conn.execute(f"INSERT INTO {index} ({index}) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - started
+
+
+def _queries(vocabulary: List[str], per_class: int) -> Dict[str, List[str]]:
+    rnd = random.Random(7)
+    frequent = vocabulary[:10]
+    medium = vocabulary[50:1000]
+    rare = vocabulary[5000:]
+    return {
+        'частое слово': [rnd.choice(frequent) for _ in range(per_class)],
+        'среднее слово': [rnd.choice(medium) for _ in range(per_class)],
+        'редкое слово': [rnd.choice(rare) for _ in range(per_class)],
+        'начало слова (3 буквы)': [rnd.choice(medium)[:3] for _ in range(per_class)],
+        'два слова': [f'{rnd.choice(frequent)} {rnd.choice(medium)}' for _ in range(per_class)],
+        'город и начало': [f'{rnd.choice(CITIES)} {rnd.choice(medium)[:4]}' for _ in range(per_class)],
+    }
+
+
+def run(rows: int, vocabulary_size: int, per_class: int, db_path: Optional[str] = None) -> dict:
+    """
+    db_path — база, уже заполненная этим скриптом с теми же rows и словарем
+    (загрузка миллиона строк занимает минуты); по умолчанию база временная.
+    """
+    from backend.services import search_service
+
+    vocabulary = _vocabulary(vocabulary_size)
+    with tempfile.TemporaryDirectory() as tmp:
+        load_s = 0.0
+        if db_path is None or not os.path.exists(db_path):
+            db_path = db_path or os.path.join(tmp, 'cargo_manager.db')
+            bootstrap_database(db_path)
+            load_s = seed(db_path, rows, vocabulary)
+        configure_pool(db_path)
+        results = {'rows': rows, 'load_s': round(load_s, 1), 'db_mb': round(os.path.getsize(db_path) / 2 ** 20),
+                   'classes': {}}
+        try:
+            # Прогрев кеша страниц
+            for word in vocabulary[:20]:
+                search_service.search(word)
+            for name, queries in _queries(vocabulary, per_class).items():
+                timings = []
+                found = 0
+                for q in queries:
+                    started = time.perf_counter()
+                    found += len(search_service.search(q)['results'])
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                results['classes'][name] = {
+                    'p50': round(timings[len(timings) // 2], 2),
+                    'p95': round(timings[int(len(timings) * 0.95)], 2),
+                    'max': round(timings[-1], 2),
+                    'avg_results': round(found / len(queries), 1),
+                }
+        finally:
+            close_db()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--vocabulary', type=int, default=50_000)
+    parser.add_argument('--queries', type=int, default=200, help='Запросов на класс')
+    parser.add_argument('--db', help='Файл базы: создается при первом запуске и используется повторно')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.vocabulary, args.queries, args.db)
+    print(f"{results['rows']} строк, загрузка {results['load_s']} с, база {results['db_mb']} МБ")
+    for name, stats in results['classes'].items():
+        print(f"  {name:24s} p50 {stats['p50']:7.2f} мс  p95 {stats['p95']:7.2f} мс  "
+              f"max {stats['max']:7.2f} мс  результатов {stats['avg_results']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Время холодного запуска: импорт backend.main и create_app() в новом интерпретаторе.
+
+Замер идет через python -X importtime, поэтому видно, какие модули
+загружаются при запуске и сколько стоит каждый. Тот же замер использует
+tests/test_startup.py, чтобы тесты падали при регрессии.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.startup --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, NamedTuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Приложение без миграций и фоновых компонентов: замеряется только запуск кода
+STARTUP_STATEMENT = (
+    "from backend.main import create_app; "
+    "create_app({'DB_MIGRATE': False, 'CURRENCY_UPDATE_ENABLED': False, 'WS_ENABLED': False, "
+    "'TRACKING_POLL_ENABLED': False, 'DOCUMENT_JOBS_ENABLED': False, "
+    "'MESSAGES_INGEST_ENABLED': False, 'REVALUATION_ENABLED': False})"
+)
+
+
+class ImportTime(NamedTuple):
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> Dict[str, ImportTime]:
+    """Разбирает строки вида «import time: self | cumulative | module» из stderr."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = ImportTime(int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure(statement: str = STARTUP_STATEMENT) -> dict:
+    """
+    Выполняет statement в новом интерпретаторе с -X importtime.
+
+    Возвращает:
+        dict: {'wall_ms': время процесса, 'modules': {модуль: ImportTime},
+               'backend_ms': суммарное собственное время модулей backend.*}
+    """
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    modules = parse_importtime(result.stderr)
+    backend_us = sum(item.self_us for name, item in modules.items()
+                     if name == 'backend' or name.startswith('backend.'))
+    return {'wall_ms': wall_ms, 'modules': modules, 'backend_ms': backend_us / 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run['wall_ms'])
+    print(f"Запуск процесса: {best['wall_ms']:.0f} мс (лучший из {args.repeat})")
+    print(f"Собственный импорт модулей backend: {best['backend_ms']:.1f} мс")
+    print("Самые дорогие модули (собственное время):")
+    slowest = sorted(best['modules'].items(), key=lambda item: item[1].self_us, reverse=True)
+    for name, item in slowest[:args.top]:
+        print(f"  {item.self_us / 1000:7.1f} мс  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Нагрузочный тест push-сервера: тысячи одновременных WebSocket-клиентов.
+
+Сервер запускается в этом же процессе, события публикуются через event_bus
+пачками, как при массовом изменении заявок. Измеряется время от публикации
+последнего события пачки до его получения каждым клиентом.
+Отстающие клиенты получают склеенные пачки, поэтому deliveries может быть
+меньше clients * bursts.
+
+Запуск из корня проекта:
+    python -m backend.benchmarks.websocket_load --clients 2000 --bursts 20
+(может понадобиться ulimit -n выше, чем 2 * clients)
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import jwt
+from websockets.asyncio.client import connect
+
+from backend.services import event_bus
+from backend.websocket.server import PushServer
+
+SECRET = 'benchmark-secret-key-with-enough-length'
+
+
+async def _client(port: int, token: str, bursts: int, latencies: list, ready: asyncio.Event,
+                  connected: list, total: int):
+    async with connect(f'ws://localhost:{port}/?token={token}', max_queue=None) as ws:
+        await ws.send(json.dumps({'action': 'subscribe', 'topics': ['orders']}))
+        await ws.recv()
+        connected.append(1)
+        if len(connected) == total:
+            ready.set()
+        # Если клиент отстает, пачки склеиваются, и он видит только последнюю
+        done = False
+        while not done:
+            message = json.loads(await ws.recv())
+            for event in message['events']:
+                if event.get('last'):
+                    latencies.append(time.perf_counter() - event['sent'])
+                    done = event['burst'] == bursts - 1
+
+
+async def run(clients: int, bursts: int, burst_size: int) -> dict:
+    server = PushServer(SECRET, port=0, coalesce_window=0.05).start_in_thread()
+    token = jwt.encode({'sub': 'bench', 'type': 'access'}, SECRET, algorithm='HS256')
+    latencies: list = []
+    connected: list = []
+    ready = asyncio.Event()
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(_client(server.port, token, bursts, latencies, ready, connected, clients))
+             for _ in range(clients)]
+    await asyncio.wait_for(ready.wait(), 120)
+    connect_time = time.perf_counter() - started
+
+    for burst in range(bursts):
+        for i in range(burst_size):
+            last = i == burst_size - 1
+            event_bus.publish('orders', {'type': 'updated', 'id': i if not last else 'last',
+                                         'last': last, 'burst': burst, 'sent': time.perf_counter()})
+        await asyncio.sleep(0.2)
+
+    await asyncio.wait_for(asyncio.gather(*tasks), 120)
+    server.stop()
+
+    latencies.sort()
+    return {
+        'clients': clients,
+        'bursts': bursts,
+        'burst_size': burst_size,
+        'connect_seconds': connect_time,
+        'deliveries': len(latencies),
+        'latency_p50_ms': statistics.median(latencies) * 1000,
+        'latency_p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'latency_max_ms': latencies[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--bursts', type=int, default=20)
+    parser.add_argument('--burst-size', type=int, default=50)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.clients, args.bursts, args.burst_size))
+    for key, value in results.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Настройки приложения.
+
+Переменные окружения (и файл .env) читаются один раз в create_app и
+сохраняются в app.config; дальше код берет значения из current_app.config.
+"""
+import os
+from typing import Any, Dict
+
+from backend.database import DEFAULT_DB_PATH
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def load_config() -> Dict[str, Any]:
+    """
+    Загружает .env и разбирает переменные окружения.
+
+    Возвращает:
+        Dict: Значения для app.config
+    """
+    # python-dotenv нужен только при запуске приложения, поэтому импортируем его здесь
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    update_interval = float(os.getenv('CURRENCY_UPDATE_INTERVAL', '3600'))
+    host = os.getenv('HOST', 'localhost')
+    db_path = os.getenv('DATABASE_PATH') or DEFAULT_DB_PATH
+    return {
+        'HOST': host,
+        'PORT': int(os.getenv('PORT', '5000')),
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY', 'super-secret-key'),
+        # Проверка паролей в пуле процессов: число процессов (0 — в потоке запроса),
+        # наибольшее число одновременных проверок и ожидание результата, секунды
+        'AUTH_HASH_WORKERS': int(os.getenv('AUTH_HASH_WORKERS', '2')),
+        'AUTH_HASH_MAX_PENDING': int(os.getenv('AUTH_HASH_MAX_PENDING', '16')),
+        'AUTH_HASH_TIMEOUT': float(os.getenv('AUTH_HASH_TIMEOUT', '10')),
+        # Параметры scrypt для новых хешей паролей (память 128 * N * R байт)
+        'AUTH_SCRYPT_N': int(os.getenv('AUTH_SCRYPT_N', str(2 ** 14))),
+        'AUTH_SCRYPT_R': int(os.getenv('AUTH_SCRYPT_R', '8')),
+        'AUTH_SCRYPT_P': int(os.getenv('AUTH_SCRYPT_P', '1')),
+        # Кеш декодированных токенов и их отзыва в памяти воркера; 0 записей отключает кеш.
+        # При нескольких воркерах TTL — предел, на который отзыв токена может быть не виден
+        'AUTH_TOKEN_CACHE_SIZE': int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000')),
+        'AUTH_TOKEN_CACHE_TTL': float(os.getenv('AUTH_TOKEN_CACHE_TTL', '30')),
+        'CORS_ORIGINS': [origin.strip() for origin in
+                         os.getenv('CORS_ORIGINS', 'http://localhost:3000').split(',')
+                         if origin.strip()],
+        'DATABASE_PATH': db_path,
+        # Пул соединений с SQLite: наибольшее и начальное число соединений, ожидание свободного, секунды
+        'DB_POOL_SIZE': int(os.getenv('DB_POOL_SIZE', '8')),
+        'DB_POOL_MIN': int(os.getenv('DB_POOL_MIN', '2')),
+        'DB_POOL_TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '5')),
+        # Применять миграции схемы при запуске
+        'DB_MIGRATE': _env_bool('DB_MIGRATE', True),
+        'CURRENCY_UPDATE_ENABLED': _env_bool('CURRENCY_UPDATE_ENABLED', True),
+        # Источник курсов: cbr или file:<путь к JSON>
+        'CURRENCY_PROVIDER': os.getenv('CURRENCY_PROVIDER', 'cbr'),
+        'CURRENCY_UPDATE_INTERVAL': update_interval,
+        # По умолчанию курсы считаются устаревшими после двух пропущенных обновлений
+        'RATES_MAX_AGE': float(os.getenv('RATES_MAX_AGE', str(2 * update_interval))),
+        # Опрос перевозчиков: TRACKING_CARRIERS — JSON {"имя": {"url": ..., ...}}
+        'TRACKING_POLL_ENABLED': _env_bool('TRACKING_POLL_ENABLED', False),
+        'TRACKING_POLL_INTERVAL': float(os.getenv('TRACKING_POLL_INTERVAL', '900')),
+        'TRACKING_CARRIERS': os.getenv('TRACKING_CARRIERS', ''),
+        # Хранилище документов: по умолчанию папка documents рядом с базой
+        'DOCUMENTS_DIR': os.getenv('DOCUMENTS_DIR') or os.path.join(os.path.dirname(db_path), 'documents'),
+        'DOCUMENTS_MAX_SIZE': int(os.getenv('DOCUMENTS_MAX_SIZE', str(512 * 1024 * 1024))),
+        # Наибольшая часть файла в одном запросе загрузки
+        'DOCUMENTS_CHUNK_SIZE': int(os.getenv('DOCUMENTS_CHUNK_SIZE', str(8 * 1024 * 1024))),
+        # Фоновая обработка документов (текст для поиска, миниатюры) в пуле процессов
+        'DOCUMENT_JOBS_ENABLED': _env_bool('DOCUMENT_JOBS_ENABLED', True),
+        'DOCUMENT_WORKERS': int(os.getenv('DOCUMENT_WORKERS', str(max(1, (os.cpu_count() or 2) // 2)))),
+        'DOCUMENT_JOB_ATTEMPTS': int(os.getenv('DOCUMENT_JOB_ATTEMPTS', '3')),
+        # Файл блокировки фоновых компонентов, которые нужны в одном процессе на все
+        # развертывание (задается в gunicorn.conf.py при нескольких воркерах), и как
+        # часто воркер без блокировки пытается ее взять, секунды
+        'BACKGROUND_LOCK_FILE': os.getenv('BACKGROUND_LOCK_FILE', ''),
+        'BACKGROUND_LOCK_RETRY': float(os.getenv('BACKGROUND_LOCK_RETRY', '5')),
+        # Отдавать файлы через X-Sendfile обратного прокси вместо чтения в воркере
+        'USE_X_SENDFILE': _env_bool('USE_X_SENDFILE', False),
+        # Прием сообщений мессенджеров: буфер в памяти и запись пачками
+        'MESSAGES_INGEST_ENABLED': _env_bool('MESSAGES_INGEST_ENABLED', True),
+        'MESSAGES_WEBHOOK_SECRET': os.getenv('MESSAGES_WEBHOOK_SECRET', ''),
+        'MESSAGES_BUFFER_SIZE': int(os.getenv('MESSAGES_BUFFER_SIZE', '10000')),
+        'MESSAGES_BATCH_SIZE': int(os.getenv('MESSAGES_BATCH_SIZE', '500')),
+        'MESSAGES_FLUSH_INTERVAL': float(os.getenv('MESSAGES_FLUSH_INTERVAL', '0.2')),
+        # Отвечать на webhook только после записи пачки в базу
+        'MESSAGES_ACK_AFTER_FLUSH': _env_bool('MESSAGES_ACK_AFTER_FLUSH', False),
+        'MESSAGES_ACK_TIMEOUT': float(os.getenv('MESSAGES_ACK_TIMEOUT', '5')),
+        # Кеш заявок и страниц списка в памяти воркера; 0 записей отключает кеш.
+        # При нескольких воркерах TTL — предел, на который чужая запись может быть не видна
+        'ORDER_CACHE_SIZE': int(os.getenv('ORDER_CACHE_SIZE', '10000')),
+        'ORDER_CACHE_PAGES': int(os.getenv('ORDER_CACHE_PAGES', '1000')),
+        'ORDER_CACHE_TTL': float(os.getenv('ORDER_CACHE_TTL', '5')),
+        # Переоценка сумм открытых заявок после обновления курсов; заявки со статусами
+        # из REVALUATION_CLOSED_STATUSES (через запятую) не пересчитываются
+        'REVALUATION_ENABLED': _env_bool('REVALUATION_ENABLED', True),
+        'REVALUATION_CLOSED_STATUSES': tuple(
+            status.strip() for status in os.getenv('REVALUATION_CLOSED_STATUSES', 'доставлен,отменен,закрыт').split(',')
+            if status.strip()),
+        'REVALUATION_CHUNK_SIZE': int(os.getenv('REVALUATION_CHUNK_SIZE', '500')),
+        'REVALUATION_PAUSE': float(os.getenv('REVALUATION_PAUSE', '0.05')),
+        'REVALUATION_MAX_CHUNK_MS': float(os.getenv('REVALUATION_MAX_CHUNK_MS', '50')),
+        # Метрики Prometheus на /api/metrics; METRICS_TOKEN закрывает эндпоинт токеном
+        'METRICS_ENABLED': _env_bool('METRICS_ENABLED', True),
+        'METRICS_TOKEN': os.getenv('METRICS_TOKEN', ''),
+        # Общий каталог снимков метрик воркеров gunicorn (задается в gunicorn.conf.py)
+        'METRICS_DIR': os.getenv('METRICS_DIR', ''),
+        'METRICS_SNAPSHOT_INTERVAL': float(os.getenv('METRICS_SNAPSHOT_INTERVAL', '5')),
+        # Время SQL-запросов по нормализованному тексту; медленные пишутся в лог
+        'SQL_METRICS_ENABLED': _env_bool('SQL_METRICS_ENABLED', True),
+        'SQL_SLOW_MS': float(os.getenv('SQL_SLOW_MS', '100')),
+        # Выборочный профилировщик: стеки запросов дольше PROFILER_SLOW_MS для flamegraph
+        'PROFILER_ENABLED': _env_bool('PROFILER_ENABLED', False),
+        'PROFILER_INTERVAL': float(os.getenv('PROFILER_INTERVAL', '0.005')),
+        'PROFILER_SLOW_MS': float(os.getenv('PROFILER_SLOW_MS', '500')),
+        'PROFILER_DIR': os.getenv('PROFILER_DIR') or os.path.join(os.path.dirname(db_path), 'profiles'),
+        'WS_ENABLED': _env_bool('WS_ENABLED', True),
+        'WS_HOST': os.getenv('WS_HOST', host),
+        'WS_PORT': int(os.getenv('WS_PORT', '5001')),
+    }
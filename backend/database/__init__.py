@@ -1,74 +1,191 @@
-import sqlite3
+import logging
 import os
-from datetime import datetime
-from dotenv import load_dotenv
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+from flask import g, has_app_context
+
+from backend.database.pool import CONNECTION_PRAGMAS, ConnectionPool
+from backend.monitoring import sql as sql_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cargo_manager.db')
+
+
+class PoolSettings(NamedTuple):
+    db_path: str
+    max_size: int = 8
+    min_size: int = 2
+    timeout: float = 5.0
+
+
+_pool = None
+# Настройки, с которыми создан _pool
+_pool_created_with: Optional[PoolSettings] = None
+_pool_settings: Optional[PoolSettings] = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_db_path() -> str:
+    """
+    Возвращает путь к файлу базы данных.
+
+    Путь задает configure_pool() (create_app передает DATABASE_PATH из
+    app.config); до этого — переменная DATABASE_PATH или файл
+    cargo_manager.db в папке database проекта (скрипты без приложения).
+    """
+    if _pool_settings is not None:
+        return _pool_settings.db_path
+    return os.getenv('DATABASE_PATH') or DEFAULT_DB_PATH
+
+
+def configure_pool(db_path: Optional[str], max_size: int = 8, min_size: int = 2, timeout: float = 5.0) -> None:
+    """
+    Задает базу данных и размеры общего пула; открытый пул закрывается.
+
+    Аргументы:
+        db_path (str): Файл базы данных; None возвращает выбор базы по окружению
+        max_size, min_size (int): Наибольшее и начальное число соединений
+        timeout (float): Сколько секунд ждать свободного соединения
+    """
+    global _pool, _pool_settings
+    with _pool_lock:
+        _pool_settings = PoolSettings(db_path, max_size, min_size, timeout) if db_path else None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def _current_settings() -> PoolSettings:
+    if _pool_settings is not None:
+        return _pool_settings
+    return PoolSettings(
+        get_db_path(),
+        max_size=int(os.getenv('DB_POOL_SIZE', '8')),
+        min_size=int(os.getenv('DB_POOL_MIN', '2')),
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+    )
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Возвращает общий пул соединений, создавая его при первом обращении.
+    Базу и размеры пула задает configure_pool(); без нее они читаются из
+    переменных DATABASE_PATH, DB_POOL_SIZE, DB_POOL_MIN и DB_POOL_TIMEOUT.
+    """
+    global _pool, _pool_created_with
+    settings = _current_settings()
+    pool = _pool
+    if pool is not None and _pool_created_with == settings:
+        return pool
+
+    with _pool_lock:
+        if _pool is None or _pool_created_with != settings:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(settings.db_path, max_size=settings.max_size,
+                                   min_size=settings.min_size, timeout=settings.timeout)
+            _pool_created_with = settings
+        return _pool
+
+
+def close_pool() -> None:
+    """Закрывает общий пул соединений; следующий get_db() откроет его заново."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
 
-# Загружаем переменные окружения
-load_dotenv()
 
 def get_db():
     """
-    Создает и возвращает подключение к базе данных.
-    База данных ищется в папке database проекта.
+    Возвращает подключение к базе данных для текущего запроса.
+
+    Внутри контекста Flask соединение берется из пула один раз на контекст
+    и возвращается обратно в teardown_appcontext. Вне контекста (скрипты,
+    фоновые потоки) соединение закрепляется за потоком до вызова close_db().
+
+    Если включены метрики SQL, соединение обернуто в InstrumentedConnection
+    (backend.monitoring.sql), а время ожидания пула попадает в db_pool_wait_seconds.
     """
-    # Путь к файлу базы данных из переменной окружения
-    db_path = os.getenv('DATABASE_PATH')
-
-    # Если переменная не задана, используем путь по умолчанию рядом с этим файлом
-    if not db_path:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        db_path = os.path.join(current_dir, 'cargo_manager.db')
-    
-    # Проверяем, существует ли файл базы данных
-    if not os.path.exists(db_path):
-        raise FileNotFoundError(f"Файл базы данных не найден: {db_path}\n"
-                               "Пожалуйста, убедитесь, что вы создали базу данных "
-                               "в папке backend/database")
-    
-    # Создаем подключение к базе данных
-    conn = sqlite3.connect(db_path)
-    
-    # Настраиваем соединение
-    conn.row_factory = sqlite3.Row
-    
+    if has_app_context():
+        if 'db' not in g:
+            g.db_pool = get_pool()
+            g.db = _acquire(g.db_pool)
+        return g.db
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        _local.pool = get_pool()
+        conn = _local.conn = _acquire(_local.pool)
     return conn
 
-def init_db():
+
+def _acquire(pool: ConnectionPool):
+    if not sql_metrics.enabled():
+        return pool.acquire()
+    started = time.perf_counter()
+    conn = pool.acquire()
+    sql_metrics.observe_pool_wait(time.perf_counter() - started)
+    return sql_metrics.instrument(conn)
+
+
+def close_db(exc=None) -> None:
+    """Возвращает соединение текущего запроса или потока обратно в пул."""
+    if has_app_context():
+        conn = g.pop('db', None)
+        pool = g.pop('db_pool', None)
+    else:
+        conn = getattr(_local, 'conn', None)
+        pool = getattr(_local, 'pool', None)
+        _local.conn = _local.pool = None
+    if conn is not None:
+        pool.release(sql_metrics.unwrap(conn))
+
+
+def pool_stats() -> Optional[dict]:
+    """Метрики общего пула (ConnectionPool.stats) или None, если пул еще не создан."""
+    pool = _pool
+    return pool.stats() if pool is not None else None
+
+
+def init_app(app) -> None:
+    """Настраивает общий пул по app.config и подключает его к приложению Flask."""
+    configure_pool(app.config['DATABASE_PATH'], app.config['DB_POOL_SIZE'], app.config['DB_POOL_MIN'],
+                   app.config['DB_POOL_TIMEOUT'])
+    app.teardown_appcontext(close_db)
+
+
+def bootstrap_database(db_path: Optional[str] = None) -> List[int]:
     """
-    Инициализирует базу данных (проверяет подключение).
-    Полезно для проверки, что всё настроено правильно.
+    Создает файл базы данных при необходимости и применяет недостающие миграции.
+
+    Аргументы:
+        db_path (str): Путь к файлу базы данных; по умолчанию get_db_path()
+
+    Возвращает:
+        List[int]: Номера примененных миграций (пустой список, если схема актуальна)
     """
+    from backend.database.migrations import migrate
+
+    db_path = db_path or get_db_path()
+    directory = os.path.dirname(os.path.abspath(db_path))
+    os.makedirs(directory, exist_ok=True)
+
+    # Отдельное соединение: пул не открывает несуществующий файл
+    conn = sqlite3.connect(db_path)
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Проверяем, есть ли таблица Currencies (валюты)
-        cursor.execute("SELECT COUNT(*) FROM Currencies")
-        count = cursor.fetchone()[0]
-        
-        print(f"✅ Подключение к базе данных установлено. Найдено {count} валют.")
-        
-        # Проверяем последнее обновление курсов
-        cursor.execute("SELECT * FROM CurrencyUpdates ORDER BY last_update DESC LIMIT 1")
-        last_update = cursor.fetchone()
-        
-        if last_update:
-            status = "успешно" if last_update['status'] == 'success' else "с ошибкой"
-            print(f"Последнее обновление курсов: {last_update['last_update']} ({status})")
-        else:
-            print("Курс валют еще не обновлялся")
-            
-        return True
-    except Exception as e:
-        print(f"❌ Ошибка подключения к базе данных: {str(e)}")
-        return False
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        applied = migrate(conn)
     finally:
-        if 'conn' in locals():
-            conn.close()
-
-if __name__ == "__main__":
-    print("="*50)
-    print("Проверка подключения к базе данных")
-    print("="*50)
-    init_db()
-    print("="*50)
+        conn.close()
+    if applied:
+        logger.info(f"База данных {db_path}: применены миграции {applied}")
+    return applied
+
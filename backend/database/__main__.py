@@ -0,0 +1,20 @@
+"""
+Применяет миграции к базе данных из DATABASE_PATH.
+
+Запуск из корня проекта:
+    python -m backend.database
+"""
+import logging
+
+from backend.config import load_config
+from backend.database import bootstrap_database
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # .env и окружение разбираются так же, как в create_app
+    db_path = load_config()['DATABASE_PATH']
+    applied = bootstrap_database(db_path)
+    if applied:
+        print(f"{db_path}: применены миграции {applied}")
+    else:
+        print(f"{db_path}: схема базы данных актуальна")
@@ -0,0 +1,264 @@
+"""
+Версионные миграции схемы базы данных.
+
+Каждая миграция выполняется один раз в собственной транзакции и записывается
+в schema_migrations. Миграции идемпотентны (IF NOT EXISTS, проверка колонок),
+поэтому их можно применять как к пустому файлу, так и к базе, созданной
+до появления миграций. Новая миграция добавляется в конец MIGRATIONS
+со следующим номером версии; уже выпущенные миграции не меняются.
+"""
+import logging
+import sqlite3
+from typing import Callable, List, NamedTuple
+
+from backend.database.schema import (
+    CLIENTS_TABLE,
+    COMMUNICATION_INDEXES,
+    COMMUNICATION_TRIGGERS,
+    COMMUNICATIONS_TABLE,
+    CONVERSATIONS_TABLE,
+    CURRENCIES_TABLE,
+    CURRENCY_HISTORY_TABLE,
+    CURRENCY_RATES_TABLE,
+    CURRENCY_UPDATES_TABLE,
+    DOCUMENT_BLOBS_TABLE,
+    DOCUMENT_INDEXES,
+    DOCUMENT_JOB_INDEXES,
+    DOCUMENT_JOBS_TABLE,
+    DOCUMENT_PROCESSING_TRIGGERS,
+    DOCUMENT_SEARCH_TRIGGER,
+    DOCUMENT_TRIGGERS,
+    DOCUMENT_UPLOADS_TABLE,
+    DOCUMENTS_FTS_TABLE,
+    DOCUMENTS_TABLE,
+    ORDER_INDEXES,
+    ORDER_PRODUCTS_INDEX,
+    ORDER_PRODUCTS_TABLE,
+    ORDER_PRODUCTS_TRIGGERS,
+    ORDER_STATS_TABLE,
+    ORDER_STATS_TRIGGERS,
+    ORDERS_TABLE,
+    REVOKED_TOKENS_INDEX,
+    REVOKED_TOKENS_TABLE,
+    SEARCH_INDEXES,
+    SHIPMENT_INDEXES,
+    SHIPMENT_POLL_INDEX,
+    SHIPMENT_STAGES_TABLE,
+    SHIPMENT_TRIGGERS,
+    SHIPMENTS_TABLE,
+    SUPPLIERS_TABLE,
+    USERS_TABLE,
+    fill_order_stats,
+    fold_sql,
+    search_index_statements,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def _base_tables(conn: sqlite3.Connection) -> None:
+    for statement in (ORDERS_TABLE, CURRENCY_RATES_TABLE, CURRENCIES_TABLE, CURRENCY_UPDATES_TABLE):
+        conn.execute(statement)
+    conn.executemany(
+        "INSERT OR IGNORE INTO Currencies (code, name, symbol) VALUES (?, ?, ?)",
+        [('CNY', 'Китайский юань', '¥'), ('RUB', 'Российский рубль', '₽'), ('USD', 'Доллар США', '$')],
+    )
+    # Начальные курсы до первого обновления из внешнего источника
+    conn.executemany(
+        "INSERT OR IGNORE INTO currency_rates (currency_code, rate) VALUES (?, ?)",
+        [('RUB', 12.0), ('USD', 0.137)],
+    )
+
+
+def _order_columns(conn: sqlite3.Connection) -> None:
+    columns = _columns(conn, 'orders')
+    if 'created_date' not in columns:
+        # ALTER TABLE не допускает DEFAULT CURRENT_TIMESTAMP, поэтому заполняем отдельно
+        conn.execute("ALTER TABLE orders ADD COLUMN created_date TIMESTAMP")
+    conn.execute("UPDATE orders SET created_date = CURRENT_TIMESTAMP WHERE created_date IS NULL")
+    if 'version' not in columns:
+        # Версия строки для оптимистической блокировки (If-Match в PUT /api/orders/<id>)
+        conn.execute("ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    # Keyset-пагинация по сумме не работает с NULL, поэтому приводим их к 0
+    conn.execute("UPDATE orders SET total_cny = 0 WHERE total_cny IS NULL")
+
+
+def _order_indexes(conn: sqlite3.Connection) -> None:
+    for statement in ORDER_INDEXES:
+        conn.execute(statement)
+
+
+def _order_stats(conn: sqlite3.Connection) -> None:
+    conn.execute(ORDER_STATS_TABLE)
+    for statement in ORDER_STATS_TRIGGERS:
+        conn.execute(statement)
+    fill_order_stats(conn)
+
+
+def _shipments(conn: sqlite3.Connection) -> None:
+    conn.execute(SHIPMENTS_TABLE)
+    conn.execute(SHIPMENT_STAGES_TABLE)
+    for statement in SHIPMENT_INDEXES + SHIPMENT_TRIGGERS:
+        conn.execute(statement)
+
+
+def _shipment_polling(conn: sqlite3.Connection) -> None:
+    columns = _columns(conn, 'Shipments')
+    # Время последнего успешного опроса перевозчика и текст последней ошибки
+    if 'last_polled_at' not in columns:
+        conn.execute("ALTER TABLE Shipments ADD COLUMN last_polled_at TIMESTAMP")
+    if 'poll_error' not in columns:
+        conn.execute("ALTER TABLE Shipments ADD COLUMN poll_error TEXT")
+    conn.execute(SHIPMENT_POLL_INDEX)
+
+
+def _documents(conn: sqlite3.Connection) -> None:
+    for statement in (DOCUMENT_BLOBS_TABLE, DOCUMENTS_TABLE, DOCUMENT_UPLOADS_TABLE):
+        conn.execute(statement)
+    for statement in DOCUMENT_INDEXES + DOCUMENT_TRIGGERS:
+        conn.execute(statement)
+
+
+def _document_processing(conn: sqlite3.Connection) -> None:
+    columns = _columns(conn, 'Documents')
+    # Результат обработки: число страниц и наличие миниатюры
+    if 'pages' not in columns:
+        conn.execute("ALTER TABLE Documents ADD COLUMN pages INTEGER")
+    if 'thumbnail' not in columns:
+        conn.execute("ALTER TABLE Documents ADD COLUMN thumbnail INTEGER NOT NULL DEFAULT 0")
+    conn.execute(DOCUMENT_JOBS_TABLE)
+    conn.execute(DOCUMENTS_FTS_TABLE)
+    for statement in DOCUMENT_JOB_INDEXES + DOCUMENT_PROCESSING_TRIGGERS:
+        conn.execute(statement)
+
+
+def _communications(conn: sqlite3.Connection) -> None:
+    conn.execute(COMMUNICATIONS_TABLE)
+    conn.execute(CONVERSATIONS_TABLE)
+    for statement in COMMUNICATION_INDEXES + COMMUNICATION_TRIGGERS:
+        conn.execute(statement)
+
+
+def _search(conn: sqlite3.Connection) -> None:
+    conn.execute(CLIENTS_TABLE)
+    conn.execute(SUPPLIERS_TABLE)
+    for index in SEARCH_INDEXES:
+        for statement in search_index_statements(index):
+            conn.execute(statement)
+    # Текст уже обработанных документов переиндексируется с заменой ё
+    conn.execute(f"UPDATE DocumentsFts SET filename = {fold_sql('filename')}, content = {fold_sql('content')}")
+    conn.execute("DROP TRIGGER IF EXISTS trg_documents_renamed")
+    conn.execute(DOCUMENT_SEARCH_TRIGGER)
+
+
+def _order_products(conn: sqlite3.Connection) -> None:
+    if 'items_count' not in _columns(conn, 'orders'):
+        # Число позиций; пока оно 0, суммы заявки вводятся вручную
+        conn.execute("ALTER TABLE orders ADD COLUMN items_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute(ORDER_PRODUCTS_TABLE)
+    conn.execute(ORDER_PRODUCTS_INDEX)
+    for statement in ORDER_PRODUCTS_TRIGGERS:
+        conn.execute(statement)
+
+
+def _currency_history(conn: sqlite3.Connection) -> None:
+    conn.execute(CURRENCY_HISTORY_TABLE)
+    # Текущие курсы становятся первой точкой истории
+    conn.execute(
+        "INSERT OR IGNORE INTO CurrencyRates (currency_code, rate_date, rate, source) "
+        "SELECT currency_code, date('now'), rate, 'migration' FROM currency_rates "
+        "WHERE currency_code != 'CNY' AND rate > 0"
+    )
+
+
+def _users(conn: sqlite3.Connection) -> None:
+    conn.execute(USERS_TABLE)
+    conn.execute(REVOKED_TOKENS_TABLE)
+    conn.execute(REVOKED_TOKENS_INDEX)
+
+
+MIGRATIONS = (
+    Migration(1, 'base tables', _base_tables),
+    Migration(2, 'orders created_date and version', _order_columns),
+    Migration(3, 'orders pagination indexes', _order_indexes),
+    Migration(4, 'order_stats aggregates', _order_stats),
+    Migration(5, 'shipments and stage log', _shipments),
+    Migration(6, 'shipment carrier polling', _shipment_polling),
+    Migration(7, 'document store', _documents),
+    Migration(8, 'document processing jobs and full-text index', _document_processing),
+    Migration(9, 'messenger communications', _communications),
+    Migration(10, 'clients, suppliers and full-text search', _search),
+    Migration(11, 'order line items', _order_products),
+    Migration(12, 'currency rate history', _currency_history),
+    Migration(13, 'users and revoked tokens', _users),
+)
+
+
+def applied_versions(conn: sqlite3.Connection) -> List[int]:
+    """Возвращает номера уже примененных миграций."""
+    if not _table_exists(conn, 'schema_migrations'):
+        return []
+    return [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """
+    Применяет недостающие миграции по порядку.
+
+    Аргументы:
+        conn (sqlite3.Connection): Соединение с базой данных
+
+    Возвращает:
+        List[int]: Номера миграций, примененных этим вызовом
+    """
+    conn.execute(SCHEMA_MIGRATIONS_TABLE)
+    conn.commit()
+
+    existing = set(applied_versions(conn))
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version in existing:
+            continue
+        # IMMEDIATE сразу берет блокировку записи: несколько воркеров,
+        # стартующих одновременно, применяют миграцию по очереди
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            already = conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?",
+                                   (migration.version,)).fetchone()
+            if already:
+                conn.rollback()
+                continue
+            migration.apply(conn)
+            conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                         (migration.version, migration.name))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Ошибка миграции {migration.version} ({migration.name}): {e}")
+            raise
+        logger.info(f"Применена миграция {migration.version}: {migration.name}")
+        applied.append(migration.version)
+    return applied
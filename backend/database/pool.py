@@ -0,0 +1,182 @@
+import sqlite3
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+# PRAGMA, которые выставляются один раз при открытии соединения.
+# Подобраны под API, где чтений значительно больше, чем записей.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Не удалось дождаться свободного соединения в пуле."""
+
+
+class ConnectionPool:
+    """
+    Пул соединений SQLite.
+
+    Соединения открываются заранее (min_size) и переиспользуются между
+    запросами. Одновременно выдается не более max_size соединений; если все
+    заняты, вызывающий поток ждет не дольше timeout секунд.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 8, min_size: int = 2,
+                 timeout: float = 5.0):
+        self.db_path = db_path
+        self.max_size = max(1, max_size)
+        self.min_size = max(0, min(min_size, self.max_size))
+        self.timeout = timeout
+
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        # Метрики ожидания
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(self.min_size):
+            self._idle.append(self._connect())
+            self._size += 1
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает новое соединение и настраивает его."""
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"Файл базы данных не найден: {self.db_path}\n"
+                                    "Пожалуйста, убедитесь, что вы создали базу данных "
+                                    "в папке backend/database")
+
+        # Соединение может быть возвращено в пул одним потоком и выдано другому,
+        # но в каждый момент им пользуется только один поток.
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        """
+        Берет соединение из пула.
+
+        Аргументы:
+            timeout (float, опционально): Сколько секунд ждать свободное соединение
+
+        Возвращает:
+            sqlite3.Connection: Соединение с базой данных
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Пул соединений закрыт")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Резервируем место до открытия соединения, чтобы не
+                    # превысить лимит при параллельных вызовах.
+                    self._size += 1
+                    conn = None
+                    break
+
+                waited = True
+                remaining = timeout - (time.perf_counter() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Нет свободных соединений с базой данных ({self.max_size} заняты)")
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._acquired += 1
+            if waited:
+                self._waits += 1
+            self._wait_total += elapsed
+            self._wait_max = max(self._wait_max, elapsed)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Возвращает соединение в пул, откатывая незавершенную транзакцию."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Соединение испорчено — закрываем и освобождаем место в пуле
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Закрывает все свободные соединения; занятые закроются при возврате."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._size -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики пула.
+
+        Возвращает:
+            Dict: size/idle/in_use/max_size, количество выдач, ожиданий и таймаутов,
+                  суммарное, среднее и максимальное время ожидания в секундах
+        """
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'max_size': self.max_size,
+                'acquired': self._acquired,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'wait_time_total': self._wait_total,
+                'wait_time_avg': self._wait_total / self._acquired if self._acquired else 0.0,
+                'wait_time_max': self._wait_max,
+            }
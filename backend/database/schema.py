@@ -0,0 +1,568 @@
+import sqlite3
+from typing import List
+
+# Базовые таблицы. Колонки orders, появившиеся позже (created_date, version),
+# для старых баз добавляет отдельная миграция.
+ORDERS_TABLE = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id INTEGER NOT NULL,
+    supplier_id INTEGER,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total_cny REAL DEFAULT 0,
+    total_rub REAL DEFAULT 0,
+    total_usd REAL DEFAULT 0,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 1
+)
+"""
+
+# Курсы относительно CNY: сколько единиц валюты дают за 1 CNY
+CURRENCY_RATES_TABLE = """
+CREATE TABLE IF NOT EXISTS currency_rates (
+    currency_code TEXT PRIMARY KEY,
+    rate REAL NOT NULL
+)
+"""
+
+# История курсов: курс валюты на дату (сколько единиц валюты за 1 CNY).
+# Одна строка на валюту и день; повторное обновление за день заменяет курс.
+# WITHOUT ROWID хранит строки в порядке ключа, поэтому выборка ряда валюты
+# по возрастанию даты — последовательное чтение
+CURRENCY_HISTORY_TABLE = """
+CREATE TABLE IF NOT EXISTS CurrencyRates (
+    currency_code TEXT NOT NULL,
+    rate_date TEXT NOT NULL CHECK (rate_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'),
+    rate REAL NOT NULL CHECK (rate > 0),
+    source TEXT NOT NULL DEFAULT 'manual',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (currency_code, rate_date)
+) WITHOUT ROWID
+"""
+
+# Справочник валют
+CURRENCIES_TABLE = """
+CREATE TABLE IF NOT EXISTS Currencies (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    symbol TEXT
+)
+"""
+
+# Составные индексы под постраничную выборку заявок: каждый фильтр + сортировка
+# заканчиваются на id, чтобы курсор (значение сортировки, id) был диапазоном индекса.
+ORDER_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_amount ON orders(total_cny, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders(status, created_date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_status_amount ON orders(status, total_cny, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_client_created ON orders(client_id, created_date, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_supplier_created ON orders(supplier_id, created_date, id)",
+)
+
+
+# Журнал обновлений курсов; его пополняет currency_update_service
+CURRENCY_UPDATES_TABLE = """
+CREATE TABLE IF NOT EXISTS CurrencyUpdates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status TEXT NOT NULL,
+    error_message TEXT,
+    source TEXT NOT NULL
+)
+"""
+
+
+# Агрегаты заявок для дашборда: количество и суммы по статусу в разрезе
+# всей базы, клиента, поставщика и дня создания. Таблица поддерживается
+# триггерами на orders, поэтому чтение статистики не зависит от числа заявок.
+ORDER_STATS_TABLE = """
+CREATE TABLE IF NOT EXISTS order_stats (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    sum_cny REAL NOT NULL DEFAULT 0,
+    sum_rub REAL NOT NULL DEFAULT 0,
+    sum_usd REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, key, status)
+) WITHOUT ROWID
+"""
+
+# Выражение ключа для каждого разреза; {row} — NEW, OLD или имя таблицы
+STATS_DIMENSIONS = {
+    'all': "''",
+    'client': "COALESCE(CAST({row}.client_id AS TEXT), '')",
+    'supplier': "COALESCE(CAST({row}.supplier_id AS TEXT), '')",
+    'day': "COALESCE(date({row}.created_date), '')",
+}
+
+
+def _stats_upserts(row: str, sign: str) -> str:
+    statements = []
+    for dimension, key in STATS_DIMENSIONS.items():
+        statements.append(f"""
+    INSERT INTO order_stats (dimension, key, status, count, sum_cny, sum_rub, sum_usd)
+    VALUES ('{dimension}', {key.format(row=row)}, COALESCE({row}.status, ''), {sign}1,
+            {sign}COALESCE({row}.total_cny, 0), {sign}COALESCE({row}.total_rub, 0),
+            {sign}COALESCE({row}.total_usd, 0))
+    ON CONFLICT (dimension, key, status) DO UPDATE SET
+        count = count + excluded.count,
+        sum_cny = sum_cny + excluded.sum_cny,
+        sum_rub = sum_rub + excluded.sum_rub,
+        sum_usd = sum_usd + excluded.sum_usd;""")
+    return ''.join(statements)
+
+
+ORDER_STATS_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS trg_order_stats_insert AFTER INSERT ON orders
+BEGIN{_stats_upserts('NEW', '+')}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_order_stats_delete AFTER DELETE ON orders
+BEGIN{_stats_upserts('OLD', '-')}
+END""",
+    # Изменение только названия заявки не трогает агрегаты
+    f"""CREATE TRIGGER IF NOT EXISTS trg_order_stats_update
+AFTER UPDATE OF client_id, supplier_id, status, total_cny, total_rub, total_usd, created_date ON orders
+BEGIN{_stats_upserts('OLD', '-')}{_stats_upserts('NEW', '+')}
+END""",
+)
+
+
+def fill_order_stats(conn: sqlite3.Connection) -> None:
+    """Пересчитывает order_stats по таблице orders в текущей транзакции."""
+    conn.execute("DELETE FROM order_stats")
+    for dimension, key in STATS_DIMENSIONS.items():
+        key = key.format(row='orders')
+        conn.execute(f"""
+            INSERT INTO order_stats (dimension, key, status, count, sum_cny, sum_rub, sum_usd)
+            SELECT '{dimension}', {key}, COALESCE(status, ''), COUNT(*),
+                   TOTAL(total_cny), TOTAL(total_rub), TOTAL(total_usd)
+            FROM orders
+            GROUP BY {key}, COALESCE(status, '')
+        """)
+
+
+def rebuild_order_stats(conn: sqlite3.Connection) -> None:
+    """Пересчитывает order_stats с нуля по таблице orders."""
+    with conn:
+        fill_order_stats(conn)
+
+
+# Отгрузки. current_stage / current_stage_at / current_location — материализованный
+# последний этап из ShipmentStages; его поддерживает триггер при добавлении этапа,
+# поэтому «где груз» и «все отгрузки на этапе X» читаются без обхода истории.
+SHIPMENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS Shipments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER,
+    carrier TEXT,
+    tracking_number TEXT,
+    origin TEXT,
+    destination TEXT,
+    eta TIMESTAMP,
+    current_stage TEXT,
+    current_stage_at TIMESTAMP,
+    current_location TEXT,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Журнал этапов отгрузки: строки только добавляются
+SHIPMENT_STAGES_TABLE = """
+CREATE TABLE IF NOT EXISTS ShipmentStages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shipment_id INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    ts TIMESTAMP NOT NULL,
+    location TEXT,
+    note TEXT,
+    source TEXT NOT NULL DEFAULT 'manual'
+)
+"""
+
+SHIPMENT_INDEXES = (
+    # Покрывающий индекс хронологии: все колонки этапа лежат в индексе,
+    # поэтому история отгрузки читается одним диапазоном без обращения к таблице
+    "CREATE INDEX IF NOT EXISTS idx_shipment_stages_timeline "
+    "ON ShipmentStages(shipment_id, ts, id, stage, location, source, note)",
+    "CREATE INDEX IF NOT EXISTS idx_shipments_stage ON Shipments(current_stage, id)",
+    "CREATE INDEX IF NOT EXISTS idx_shipments_order ON Shipments(order_id, id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_shipments_tracking "
+    "ON Shipments(tracking_number, carrier) WHERE tracking_number IS NOT NULL",
+)
+
+SHIPMENT_TRIGGERS = (
+    # Текущим считается этап с самым поздним ts; запоздавшее событие перевозчика
+    # попадает в историю, но не откатывает текущий этап назад. Исключение —
+    # этап created: это момент заведения отгрузки в системе, и любое событие
+    # перевозчика его заменяет, даже если произошло раньше
+    """CREATE TRIGGER IF NOT EXISTS trg_shipment_stages_current AFTER INSERT ON ShipmentStages
+BEGIN
+    UPDATE Shipments
+    SET current_stage = NEW.stage, current_stage_at = NEW.ts, current_location = NEW.location
+    WHERE id = NEW.shipment_id
+      AND (current_stage_at IS NULL OR current_stage_at <= NEW.ts OR current_stage = 'created');
+END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_shipment_stages_no_update BEFORE UPDATE ON ShipmentStages
+BEGIN
+    SELECT RAISE(ABORT, 'ShipmentStages is append-only');
+END""",
+    # Удалять этапы можно только вместе с отгрузкой
+    """CREATE TRIGGER IF NOT EXISTS trg_shipment_stages_no_delete BEFORE DELETE ON ShipmentStages
+WHEN EXISTS (SELECT 1 FROM Shipments WHERE id = OLD.shipment_id)
+BEGIN
+    SELECT RAISE(ABORT, 'ShipmentStages is append-only');
+END""",
+)
+
+# Активные отгрузки для опроса перевозчиков: частичный индекс содержит только
+# отгрузки с трек-номером на незавершенных этапах, сгруппированные по перевозчику
+SHIPMENT_POLL_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_shipments_active ON Shipments(carrier, id) "
+    "WHERE tracking_number IS NOT NULL AND current_stage NOT IN ('delivered', 'cancelled')"
+)
+
+# Содержимое документов: файл хранится один раз под именем, равным SHA-256
+DOCUMENT_BLOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS DocumentBlobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+DOCUMENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS Documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    content_type TEXT,
+    size INTEGER NOT NULL,
+    doc_type TEXT NOT NULL DEFAULT 'other',
+    order_id INTEGER,
+    shipment_id INTEGER,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Незавершенные загрузки по частям: received — сколько байт уже записано на диск
+DOCUMENT_UPLOADS_TABLE = """
+CREATE TABLE IF NOT EXISTS DocumentUploads (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    content_type TEXT,
+    size INTEGER NOT NULL,
+    received INTEGER NOT NULL DEFAULT 0,
+    sha256 TEXT,
+    doc_type TEXT NOT NULL DEFAULT 'other',
+    order_id INTEGER,
+    shipment_id INTEGER,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+DOCUMENT_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_documents_order ON Documents(order_id, id) WHERE order_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_documents_shipment ON Documents(shipment_id, id) WHERE shipment_id IS NOT NULL",
+    # Подсчет ссылок на содержимое при удалении документа
+    "CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON Documents(sha256)",
+    "CREATE INDEX IF NOT EXISTS idx_document_uploads_updated ON DocumentUploads(updated_date)",
+)
+
+# При удалении заявки или отгрузки документы остаются, но теряют привязку
+DOCUMENT_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS trg_documents_order_deleted AFTER DELETE ON orders
+BEGIN
+    UPDATE Documents SET order_id = NULL WHERE order_id = OLD.id;
+END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_documents_shipment_deleted AFTER DELETE ON Shipments
+BEGIN
+    UPDATE Documents SET shipment_id = NULL WHERE shipment_id = OLD.id;
+END""",
+)
+
+# Очередь фоновой обработки документов. Задание берется воркером атомарным
+# UPDATE ... RETURNING; lease_until — до какого времени задание считается
+# занятым: после перезапуска или падения процесса оно снова становится queued
+DOCUMENT_JOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS DocumentJobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    lease_until TIMESTAMP,
+    error TEXT,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+)
+"""
+
+DOCUMENT_JOB_INDEXES = (
+    # Выборка следующего задания читает только ожидающие и занятые задания
+    "CREATE INDEX IF NOT EXISTS idx_document_jobs_pending ON DocumentJobs(state, available_at, id) "
+    "WHERE state IN ('queued', 'running')",
+    "CREATE INDEX IF NOT EXISTS idx_document_jobs_document ON DocumentJobs(document_id, id)",
+)
+
+# Полнотекстовый индекс документов: rowid совпадает с Documents.id.
+# unicode61 приводит кириллицу и латиницу к нижнему регистру без учета диакритики
+DOCUMENTS_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS DocumentsFts USING fts5(
+    filename, content, tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+DOCUMENT_PROCESSING_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS trg_documents_deleted AFTER DELETE ON Documents
+BEGIN
+    DELETE FROM DocumentsFts WHERE rowid = OLD.id;
+    DELETE FROM DocumentJobs WHERE document_id = OLD.id AND state IN ('queued', 'failed');
+END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_documents_renamed AFTER UPDATE OF filename ON Documents
+BEGIN
+    UPDATE DocumentsFts SET filename = NEW.filename WHERE rowid = NEW.id;
+END""",
+)
+
+# Переписка с клиентами и поставщиками из мессенджеров. Строки пишутся пачками
+# из буфера приема; порядок id внутри переписки совпадает с порядком приема.
+# Повторная доставка того же сообщения (webhook повторяется при ошибке)
+# отсекается уникальным индексом (channel, external_id)
+COMMUNICATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS Communications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    external_id TEXT,
+    direction TEXT NOT NULL DEFAULT 'in',
+    sender TEXT,
+    body TEXT NOT NULL DEFAULT '',
+    order_id INTEGER,
+    sent_at TIMESTAMP,
+    received_at TIMESTAMP NOT NULL,
+    is_read INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Сводка по перепискам для списка чатов: обновляется триггером при вставке сообщения
+CONVERSATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS Conversations (
+    channel TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    title TEXT,
+    order_id INTEGER,
+    last_message_id INTEGER NOT NULL,
+    last_message_at TIMESTAMP NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0,
+    unread INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (channel, chat_id)
+)
+"""
+
+COMMUNICATION_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_communications_chat ON Communications(channel, chat_id, id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_communications_external "
+    "ON Communications(channel, external_id) WHERE external_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_communications_order ON Communications(order_id, id) WHERE order_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_recent ON Conversations(last_message_id)",
+)
+
+COMMUNICATION_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS trg_communications_conversation AFTER INSERT ON Communications
+BEGIN
+    INSERT INTO Conversations (channel, chat_id, title, order_id, last_message_id, last_message_at,
+                               messages, unread)
+    VALUES (NEW.channel, NEW.chat_id, CASE WHEN NEW.direction = 'in' THEN NEW.sender END, NEW.order_id,
+            NEW.id, NEW.received_at, 1, CASE WHEN NEW.direction = 'in' THEN 1 ELSE 0 END)
+    ON CONFLICT (channel, chat_id) DO UPDATE SET
+        title = COALESCE(title, excluded.title),
+        order_id = COALESCE(excluded.order_id, order_id),
+        last_message_id = excluded.last_message_id,
+        last_message_at = excluded.last_message_at,
+        messages = messages + 1,
+        unread = unread + excluded.unread;
+END""",
+)
+
+# Справочники клиентов и поставщиков (orders.client_id, orders.supplier_id)
+CLIENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS Clients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    contact TEXT,
+    phone TEXT,
+    email TEXT,
+    city TEXT,
+    notes TEXT,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+SUPPLIERS_TABLE = """
+CREATE TABLE IF NOT EXISTS Suppliers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    contact TEXT,
+    phone TEXT,
+    email TEXT,
+    city TEXT,
+    notes TEXT,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Полнотекстовые индексы поиска: таблица FTS5 с внешним содержимым на каждую
+# исходную таблицу. Текст хранится только в исходной таблице, индекс содержит
+# токены, а snippet() читает колонки из исходной таблицы по rowid.
+# prefix — отдельные индексы префиксов из 2, 3 и 4 символов, чтобы запросы
+# «по началу слова» не перебирали весь словарь терминов
+SEARCH_FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4'"
+
+# Таблица индекса -> (исходная таблица, индексируемые колонки, веса колонок для bm25)
+SEARCH_INDEXES = {
+    'OrdersFts': ('orders', ('name', 'status'), (10.0, 1.0)),
+    'ClientsFts': ('Clients', ('name', 'contact', 'phone', 'email', 'city', 'notes'), (10.0, 5.0, 3.0, 3.0, 2.0, 1.0)),
+    'SuppliersFts': ('Suppliers', ('name', 'contact', 'phone', 'email', 'city', 'notes'),
+                     (10.0, 5.0, 3.0, 3.0, 2.0, 1.0)),
+    'CommunicationsFts': ('Communications', ('sender', 'body'), (2.0, 1.0)),
+}
+
+
+def fold_sql(expression: str) -> str:
+    """
+    SQL-выражение, заменяющее ё на е. unicode61 не считает ё буквой е
+    с диакритикой, поэтому текст приводится к е до индексации (и запрос —
+    в search_service.fold_text). Число токенов не меняется, так что snippet()
+    по позициям токенов выделяет слова в исходном тексте с ё.
+    """
+    return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def search_index_statements(index: str) -> List[str]:
+    """
+    Строит DDL индекса поиска: виртуальную таблицу, триггеры синхронизации с
+    исходной таблицей, веса bm25 и заполнение индекса уже существующими строками.
+    """
+    table, columns, weights = SEARCH_INDEXES[index]
+    names = ', '.join(columns)
+    new_values = ', '.join(fold_sql(f'NEW.{column}') for column in columns)
+    old_values = ', '.join(fold_sql(f'OLD.{column}') for column in columns)
+    # Внешнему содержимому 'delete' передает те же значения, что были проиндексированы
+    delete = f"INSERT INTO {index} ({index}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});"
+    insert = f"INSERT INTO {index} (rowid, {names}) VALUES (NEW.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+        f"{names}, content = '{table}', content_rowid = 'id', {SEARCH_FTS_OPTIONS})",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{index.lower()}_insert AFTER INSERT ON {table}\n"
+        f"BEGIN\n    {insert}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{index.lower()}_delete AFTER DELETE ON {table}\n"
+        f"BEGIN\n    {delete}\nEND",
+        # Индекс обновляется, только когда меняются индексируемые колонки
+        f"CREATE TRIGGER IF NOT EXISTS trg_{index.lower()}_update AFTER UPDATE OF {names} ON {table}\n"
+        f"BEGIN\n    {delete}\n    {insert}\nEND",
+        # Ранжирование по умолчанию (ORDER BY rank): bm25 с весами колонок
+        f"INSERT INTO {index} ({index}, rank) VALUES ('rank', 'bm25({', '.join(map(str, weights))})')",
+        # 'rebuild' индексировал бы текст без замены ё, поэтому строки переносятся явно
+        f"INSERT INTO {index} (rowid, {names}) "
+        f"SELECT id, {', '.join(fold_sql(column) for column in columns)} FROM {table}",
+    ]
+
+
+# Индекс документов хранит свой текст; имя файла при переименовании
+# индексируется с той же заменой ё, что и в остальных индексах поиска
+DOCUMENT_SEARCH_TRIGGER = f"""CREATE TRIGGER trg_documents_renamed AFTER UPDATE OF filename ON Documents
+BEGIN
+    UPDATE DocumentsFts SET filename = {fold_sql('NEW.filename')} WHERE rowid = NEW.id;
+END"""
+
+# Позиции заявки. Сумма позиции хранится сразу в трех валютах по курсу на момент
+# записи позиции, поэтому итоги заявки не зависят от последующих изменений курсов
+ORDER_PRODUCTS_TABLE = """
+CREATE TABLE IF NOT EXISTS Order_Products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    product TEXT NOT NULL,
+    quantity REAL NOT NULL CHECK (quantity > 0),
+    unit_price REAL NOT NULL CHECK (unit_price >= 0),
+    currency TEXT NOT NULL DEFAULT 'CNY',
+    amount_cny REAL NOT NULL,
+    amount_rub REAL NOT NULL,
+    amount_usd REAL NOT NULL,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+ORDER_PRODUCTS_INDEX = "CREATE INDEX IF NOT EXISTS idx_order_products_order ON Order_Products(order_id, id)"
+
+
+ORDER_TOTAL_AMOUNTS = (('total_cny', 'amount_cny'), ('total_rub', 'amount_rub'), ('total_usd', 'amount_usd'))
+
+
+def _order_totals_update(row: str, sign: str) -> str:
+    if sign == '+':
+        # Первая позиция заменяет суммы, введенные вручную
+        totals = [f"{total} = CASE WHEN items_count = 0 THEN 0 ELSE {total} END + {row}.{amount}"
+                  for total, amount in ORDER_TOTAL_AMOUNTS]
+        count = "items_count + 1"
+    else:
+        # Удаление последней позиции обнуляет суммы точно, без накопленной ошибки округления
+        totals = [f"{total} = CASE WHEN items_count <= 1 THEN 0 ELSE {total} - {row}.{amount} END"
+                  for total, amount in ORDER_TOTAL_AMOUNTS]
+        count = "MAX(items_count - 1, 0)"
+    return f"""
+    UPDATE orders SET {', '.join(totals)}, items_count = {count}
+    WHERE id = {row}.order_id;"""
+
+
+# Итоги заявки (orders.total_*) и число позиций (orders.items_count) меняются
+# на сумму позиции в той же транзакции, что и сама позиция, поэтому список
+# заявок не агрегирует позиции при чтении. Изменение итогов, в свою очередь,
+# обновляет order_stats триггером trg_order_stats_update
+ORDER_PRODUCTS_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS trg_order_products_insert AFTER INSERT ON Order_Products
+BEGIN{_order_totals_update('NEW', '+')}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_order_products_delete AFTER DELETE ON Order_Products
+BEGIN{_order_totals_update('OLD', '-')}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_order_products_update
+AFTER UPDATE OF order_id, amount_cny, amount_rub, amount_usd ON Order_Products
+BEGIN{_order_totals_update('OLD', '-')}{_order_totals_update('NEW', '+')}
+END""",
+    # Позиции удаляются вместе с заявкой
+    """CREATE TRIGGER IF NOT EXISTS trg_order_products_order_deleted AFTER DELETE ON orders
+BEGIN
+    DELETE FROM Order_Products WHERE order_id = OLD.id;
+END""",
+)
+
+
+# Пользователи API. password_hash — строка scrypt$n$r$p$соль$ключ (backend/services/auth_service.py);
+# токены, выданные раньше tokens_valid_after (unix-время), отклоняются — так
+# смена пароля и блокировка отзывают все токены пользователя
+USERS_TABLE = """
+CREATE TABLE IF NOT EXISTS Users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    password_hash TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    tokens_valid_after INTEGER NOT NULL DEFAULT 0,
+    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Отозванные токены (выход); строка нужна только до истечения токена
+REVOKED_TOKENS_TABLE = """
+CREATE TABLE IF NOT EXISTS RevokedTokens (
+    jti TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+REVOKED_TOKENS_INDEX = "CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON RevokedTokens(expires_at)"
@@ -0,0 +1,81 @@
+"""
+Настройки gunicorn для продакшен-запуска API.
+
+    gunicorn -c backend/gunicorn.conf.py
+
+Плавная перезагрузка кода без разрыва соединений: kill -HUP <pid мастера>
+(pid записывается в GUNICORN_PIDFILE, если он задан). Мастер запускает новых
+воркеров, а старые дообрабатывают текущие запросы в течение graceful_timeout.
+"""
+import multiprocessing
+import os
+import tempfile
+
+wsgi_app = 'backend.wsgi:app'
+bind = f"{os.getenv('HOST', 'localhost')}:{os.getenv('PORT', '5000')}"
+
+# Процессы обходят GIL, потоки внутри процесса обслуживают запросы,
+# которые ждут SQLite или внешние сервисы
+workers = int(os.getenv('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY',
+                                                      str(multiprocessing.cpu_count() * 2 + 1))))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+
+# Keep-alive: фронтенд и балансировщик переиспользуют соединения
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+
+# Периодический перезапуск воркеров ограничивает рост памяти; разброс
+# не дает всем воркерам перезапуститься одновременно
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+pidfile = os.getenv('GUNICORN_PIDFILE') or None
+accesslog = os.getenv('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+
+# Приложение создается в каждом воркере, а не в мастере: фоновые потоки
+# (обновление курсов, WebSocket-сервер) не переживают fork
+preload_app = False
+
+# Push-сервер и шина событий живут внутри процесса: при нескольких воркерах
+# события других воркеров до него не дойдут, поэтому по умолчанию он
+# включается только при одном воркере
+os.environ.setdefault('WS_ENABLED', '1' if workers == 1 else '0')
+
+# Метрики тоже считаются в каждом воркере: воркеры пишут снимки в общий
+# каталог, и /api/metrics на любом воркере отдает сумму по всем
+if workers > 1:
+    os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='cargo-metrics-'))
+
+# Обновление курсов по расписанию, опрос перевозчиков и конвейер документов
+# запускает только воркер, взявший блокировку файла (backend.background),
+# а не каждый из воркеров.
+# Пароли проверяются в потоке запроса: параллельность дают сами воркеры, а пул
+# из AUTH_HASH_WORKERS процессов в каждом воркере только умножал бы их число
+if workers > 1:
+    os.environ.setdefault('BACKGROUND_LOCK_FILE',
+                          os.path.join(tempfile.mkdtemp(prefix='cargo-background-'), 'leader.lock'))
+    os.environ.setdefault('AUTH_HASH_WORKERS', '0')
+
+
+def worker_exit(server, worker):
+    # Останавливаем фоновые компоненты и закрываем соединения с БД; задания
+    # обработки документов, которые не успели завершиться, возвращаются в очередь,
+    # принятые сообщения мессенджеров дописываются из буфера
+    from backend import background, monitoring
+    from backend.database import close_pool
+    from backend.services import (auth_service, currency_update_service, document_service, integration_service,
+                                  message_service, revaluation_service)
+
+    message_service.stop_ingestor()
+    currency_update_service.stop_scheduler()
+    revaluation_service.stop_worker()
+    integration_service.stop_poller()
+    document_service.stop_pipeline()
+    # Блокировка снимается после остановки компонентов: их сразу подхватит другой воркер
+    background.stop()
+    auth_service.stop_hasher()
+    monitoring.stop()
+    close_pool()
@@ -0,0 +1,162 @@
+"""
+Локальный мессенджер-заглушка: отправляет на webhook приема сообщений
+update в формате Telegram Bot API с заданной средней частотой.
+
+Как и Telegram, внутри одного чата сообщения доставляются по одному:
+следующее отправляется после ответа на предыдущее, а при ответе 503
+(буфер приема заполнен) доставка повторяется. Чаты работают параллельно.
+message_id в каждом чате растет на 1, поэтому после прогона можно проверить,
+что сообщения каждого чата записаны в порядке отправки (check_order).
+
+Запуск из корня проекта против работающего API:
+    python -m backend.integrations.fake_messenger --url http://127.0.0.1:5000/api/messages/webhook \\
+        --secret <MESSAGES_WEBHOOK_SECRET> --rate 500 --duration 10
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession, TCPConnector
+
+# Сколько раз повторять доставку сообщения, на которое сервер ответил 503
+MAX_RETRIES = 50
+
+
+class FakeMessenger:
+    """
+    Аргументы:
+        url (str): Адрес webhook
+        secret (str): MESSAGES_WEBHOOK_SECRET
+        chats (int): Число чатов
+        rate (float): Целевая частота сообщений в секунду по всем чатам
+        concurrency (int): Наибольшее число одновременных соединений
+    """
+
+    def __init__(self, url: str, secret: str, chats: int = 100, rate: float = 500.0, concurrency: int = 64):
+        self.url = url
+        self.secret = secret
+        self.chats = chats
+        self.rate = rate
+        self.concurrency = concurrency
+
+        self.sent = 0
+        self.retries = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+        self._update_id = 0
+
+    def _update(self, chat: int, message_id: int) -> Dict[str, Any]:
+        self._update_id += 1
+        chat_id = 100000 + chat
+        return {
+            'update_id': self._update_id,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'username': f'client{chat}'},
+                'text': f'Сообщение {message_id} из чата {chat}: когда будет готов груз?',
+            },
+        }
+
+    async def _deliver(self, session: ClientSession, payload: Dict[str, Any]) -> None:
+        headers = {'X-Telegram-Bot-Api-Secret-Token': self.secret}
+        for _ in range(MAX_RETRIES):
+            started = time.perf_counter()
+            async with session.post(self.url, json=payload, headers=headers) as response:
+                await response.read()
+                if response.status in (200, 202):
+                    self.latencies.append(time.perf_counter() - started)
+                    self.sent += 1
+                    return
+                if response.status != 503:
+                    self.errors += 1
+                    return
+            self.retries += 1
+            await asyncio.sleep(float(response.headers.get('Retry-After', '1')) / 10)
+        self.errors += 1
+
+    async def _chat(self, session: ClientSession, chat: int, started: float, deadline: float) -> None:
+        # Сообщения чатов сдвинуты друг относительно друга, чтобы поток был равномерным
+        interval = self.chats / self.rate
+        next_at = started + interval * chat / self.chats
+        message_id = 0
+        while True:
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if time.monotonic() >= deadline:
+                return
+            message_id += 1
+            await self._deliver(session, self._update(chat, message_id))
+            next_at += interval
+
+    async def run(self, duration: float) -> Dict[str, Any]:
+        """
+        Отправляет сообщения в течение duration секунд.
+
+        Возвращает:
+            Dict: sent, retries, errors, rate (фактическая частота) и задержки ответа webhook
+        """
+        connector = TCPConnector(limit=self.concurrency)
+        async with ClientSession(connector=connector) as session:
+            started = time.monotonic()
+            deadline = started + duration
+            await asyncio.gather(*(self._chat(session, chat, started, deadline) for chat in range(self.chats)))
+            elapsed = time.monotonic() - started
+
+        latencies = sorted(self.latencies)
+
+        def percentile(q: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 2) if latencies else 0
+
+        return {
+            'sent': self.sent,
+            'retries': self.retries,
+            'errors': self.errors,
+            'rate': round(self.sent / elapsed, 1),
+            'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+        }
+
+
+def check_order(db_path: str) -> int:
+    """
+    Проверяет, что в каждом чате сообщения записаны в порядке отправки.
+
+    Возвращает:
+        int: Число чатов, где порядок нарушен
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        broken = set()
+        last: Dict[str, int] = {}
+        for chat_id, external_id in conn.execute(
+                "SELECT chat_id, external_id FROM Communications WHERE channel = 'telegram' "
+                "ORDER BY chat_id, id"):
+            message_id = int(external_id.rsplit(':', 1)[1])
+            if message_id <= last.get(chat_id, 0):
+                broken.add(chat_id)
+            last[chat_id] = message_id
+        return len(broken)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Мессенджер-заглушка для webhook приема сообщений')
+    parser.add_argument('--url', default='http://127.0.0.1:5000/api/messages/webhook')
+    parser.add_argument('--secret', required=True)
+    parser.add_argument('--chats', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=500.0)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    messenger = FakeMessenger(args.url, args.secret, args.chats, args.rate, args.concurrency)
+    print(asyncio.run(messenger.run(args.duration)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Локальный перевозчик-заглушка с тем же пакетным API, что ожидает
+backend.services.integration_service:
+
+    POST /track  {"tracking_numbers": [...]}
+    <- {"results": [{"tracking_number", "stage", "ts", "location", "note"} | {"tracking_number", "error"}]}
+
+Используется в тестах поллера и для ручной проверки. Запуск из корня проекта:
+    python -m backend.integrations.stub_carrier --port 5055 --auto
+и TRACKING_CARRIERS='{"stub": {"url": "http://127.0.0.1:5055/track"}}'.
+"""
+import argparse
+import asyncio
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# Этапы, по которым проходит груз в режиме auto
+AUTO_PROGRESS = ('picked_up', 'in_transit', 'customs', 'arrived', 'delivered')
+
+
+class StubCarrier:
+    """
+    Аргументы:
+        latency (float): Задержка ответа, секунды
+        max_batch (int): Больше трек-номеров в запросе — ответ 413
+        rate_limit (int): Больше запросов за секунду — ответ 429
+        auto (bool): Неизвестные трек-номера сами проходят этапы AUTO_PROGRESS
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 max_batch: int = 100, rate_limit: Optional[int] = None, auto: bool = False):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.max_batch = max_batch
+        self.rate_limit = rate_limit
+        self.auto = auto
+
+        self.events: Dict[str, Dict[str, Any]] = {}
+        # (время запроса, число трек-номеров) — для проверки пакетов и частоты
+        self.requests: List[Tuple[float, int]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Future] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}/track'
+
+    def set_event(self, tracking_number: str, stage: str, ts: Optional[str] = None,
+                  location: Optional[str] = None, note: Optional[str] = None) -> None:
+        """Задает последний этап, который перевозчик вернет по трек-номеру."""
+        self.events[tracking_number] = {
+            'tracking_number': tracking_number,
+            'stage': stage,
+            'ts': ts or datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'location': location,
+            'note': note,
+        }
+
+    def _auto_event(self, tracking_number: str) -> Dict[str, Any]:
+        # Этап детерминированно сдвигается раз в минуту
+        step = (zlib.crc32(tracking_number.encode()) + int(time.time() // 60)) % len(AUTO_PROGRESS)
+        now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        return {'tracking_number': tracking_number, 'stage': AUTO_PROGRESS[step],
+                'ts': now.isoformat(), 'location': 'Stub'}
+
+    async def _track(self, request: web.Request) -> web.Response:
+        now = time.monotonic()
+        if self.rate_limit and sum(1 for ts, _ in self.requests if now - ts < 1.0) >= self.rate_limit:
+            return web.json_response({'error': 'rate limit'}, status=429)
+        data = await request.json()
+        numbers = data.get('tracking_numbers') or []
+        if len(numbers) > self.max_batch:
+            return web.json_response({'error': 'batch too large'}, status=413)
+        self.requests.append((now, len(numbers)))
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            results = []
+            for number in numbers:
+                if number in self.events:
+                    results.append(self.events[number])
+                elif self.auto:
+                    results.append(self._auto_event(number))
+                else:
+                    results.append({'tracking_number': number, 'error': 'not found'})
+            return web.json_response({'results': results})
+        finally:
+            self.in_flight -= 1
+
+    async def serve_forever(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = self._loop.create_future()
+        app = web.Application()
+        app.router.add_post('/track', self._track)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        self.port = runner.addresses[0][1]
+        self._ready.set()
+        try:
+            await self._stopped
+        finally:
+            await runner.cleanup()
+
+    def start_in_thread(self, timeout: float = 5.0) -> 'StubCarrier':
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.serve_forever()),
+                                        name='stub-carrier', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError('Заглушка перевозчика не запустилась')
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(
+                lambda: self._stopped.done() or self._stopped.set_result(None))
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный перевозчик-заглушка')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--rate-limit', type=int, default=None)
+    parser.add_argument('--auto', action='store_true', help='неизвестные трек-номера проходят этапы сами')
+    args = parser.parse_args()
+
+    carrier = StubCarrier(args.host, args.port, latency=args.latency,
+                          rate_limit=args.rate_limit, auto=args.auto)
+    print(f"Заглушка перевозчика: {carrier.url}")
+    asyncio.run(carrier.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,77 +1,171 @@
-import sys
-import os
-from dotenv import load_dotenv
-
-# Добавляем путь к проекту в sys.path для корректной работы импортов
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
+import logging
 
 from flask import Flask, jsonify, request
-from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token
 
-# Загружаем переменные окружения
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Импортируем компоненты приложения
-try:
-    from backend.api.orders import orders_bp
-    from backend.api.currency import currency_bp
-    from backend.database import init_db
-    print("Все импорты успешно загружены")
-except ImportError as e:
-    print(f"Ошибка импорта: {e}")
-    exit(1)
 
-def create_app():
+def create_app(config=None):
     """
     Создает и настраивает Flask-приложение.
-    
+
+    Настройки читаются из окружения один раз; Blueprint'ы, сервисы и фоновые
+    компоненты импортируются здесь, а не при импорте модуля, чтобы отключенные
+    компоненты (например, WebSocket-сервер) не замедляли запуск.
+
+    Аргументы:
+        config (dict): Значения, которые переопределяют настройки из окружения
+                       (например, в тестах)
+
     Возвращает:
         Flask: Настроенное приложение Flask
     """
+    from flask_cors import CORS
+    from flask_jwt_extended import create_access_token, get_jwt, jwt_required
+
+    from backend.config import load_config
+    from backend.database import bootstrap_database, init_app as init_db_pool
+
     # Создаем экземпляр Flask
     app = Flask(__name__)
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
 
     # Настройка CORS с ограничением по доменам
-    allowed_origins = ["http://localhost:3000"]
-    CORS(app, origins=allowed_origins)
-
-    # Настройка JWT
-    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'super-secret-key')
-    JWTManager(app)
-    
-    # Проверяем подключение к базе данных
-    try:
-        init_db()
-        print("Подключение к базе данных успешно установлено")
-    except Exception as e:
-        print(f"Ошибка подключения к базе данных: {e}")
-        raise
-    
+    CORS(app, origins=app.config['CORS_ORIGINS'])
+
+    # Настройка JWT: кеш проверенных токенов и проверка отзыва, пул проверки паролей
+    from backend.services import auth_service
+
+    auth_service.init_app(app)
+
+    # Соединения с БД берутся из пула и возвращаются в конце каждого запроса
+    init_db_pool(app)
+
+    # Время ответа по маршрутам, время SQL-запросов и ожидание пула (METRICS_ENABLED=0 отключает)
+    if app.config['METRICS_ENABLED']:
+        from backend import monitoring
+
+        monitoring.init_app(app)
+
+    # Создаем недостающие таблицы и индексы (DB_MIGRATE=0 отключает)
+    if app.config['DB_MIGRATE']:
+        try:
+            bootstrap_database(app.config['DATABASE_PATH'])
+        except Exception as e:
+            logger.error(f"Ошибка подготовки базы данных: {e}")
+            raise
+
+    # Обновление курсов по расписанию, опрос перевозчиков и обработка документов:
+    # при нескольких воркерах gunicorn — только в одном из них (см. backend.background)
+    from backend import background
+
+    background.init_app(app)
+
+    # Буфер приема сообщений мессенджеров (MESSAGES_INGEST_ENABLED=0 отключает)
+    if app.config['MESSAGES_INGEST_ENABLED']:
+        from backend.services import message_service
+
+        message_service.start_ingestor(app.config['MESSAGES_BUFFER_SIZE'], app.config['MESSAGES_BATCH_SIZE'],
+                                       app.config['MESSAGES_FLUSH_INTERVAL'])
+
+    # Переоценка открытых заявок по новым курсам (REVALUATION_ENABLED=0 отключает)
+    if app.config['REVALUATION_ENABLED']:
+        from backend.services import revaluation_service
+
+        revaluation_service.start_worker(app.config['REVALUATION_CLOSED_STATUSES'],
+                                         app.config['REVALUATION_CHUNK_SIZE'], app.config['REVALUATION_PAUSE'],
+                                         app.config['REVALUATION_MAX_CHUNK_MS'])
+
+    # Push-уведомления об изменениях заявок и курсов (WS_ENABLED=0 отключает)
+    if app.config['WS_ENABLED']:
+        from backend.websocket.server import start_server as start_push_server
+
+        try:
+            start_push_server(app.config['JWT_SECRET_KEY'],
+                              app.config['WS_HOST'], app.config['WS_PORT'])
+        except OSError as e:
+            # Например, порт уже занят процессом-наблюдателем перезагрузчика
+            logger.warning(f"WebSocket-сервер не запущен: {e}")
+
+    from backend.api.currency import currency_bp
+    from backend.api.documents import documents_bp
+    from backend.api.integrations import integrations_bp
+    from backend.api.messages import messages_bp
+    from backend.api.metrics import metrics_bp
+    from backend.api.orders import orders_bp
+    from backend.api.search import search_bp
+    from backend.api.shipments import shipments_bp
+    from backend.api.stats import stats_bp
+    from backend.services import health_service, order_service
+
+    order_service.configure_cache(app.config['ORDER_CACHE_SIZE'], app.config['ORDER_CACHE_PAGES'],
+                                  app.config['ORDER_CACHE_TTL'])
+
     # Регистрируем Blueprint для API заявок
     # ВАЖНО: УБРАЛ url_prefix='/api' чтобы НЕ ДУБЛИРОВАТЬ префикс
     # (префикс уже указан в самом orders.py)
     app.register_blueprint(orders_bp)
     app.register_blueprint(currency_bp)
+    app.register_blueprint(stats_bp)
+    app.register_blueprint(shipments_bp)
+    app.register_blueprint(integrations_bp)
+    app.register_blueprint(documents_bp)
+    app.register_blueprint(messages_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(metrics_bp)
 
     # Маршрут для получения токена доступа
     @app.route('/api/login', methods=['POST'])
     def login():
-        data = request.get_json() or {}
+        """
+        Выдает токен доступа по имени и паролю пользователя.
+
+        Тело запроса:
+            JSON {'username', 'password'}
+
+        Возвращает:
+            JSON {'access_token'}.
+            Код состояния: 200 OK, 400 Bad Request, 401 Unauthorized или
+            503 Service Unavailable (проверка паролей перегружена — повторить позже)
+        """
+        data = request.get_json(silent=True) or {}
         username = data.get('username')
-        if not username:
-            return jsonify({'msg': 'Missing username'}), 400
-        access_token = create_access_token(identity=username)
+        password = data.get('password')
+        if not username or not password:
+            return jsonify({'msg': 'Missing username or password'}), 400
+        try:
+            user = auth_service.authenticate(username, password)
+        except auth_service.AuthBusyError as e:
+            response = jsonify({'msg': str(e)})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        if user is None:
+            return jsonify({'msg': 'Bad username or password'}), 401
+        access_token = create_access_token(identity=user['username'],
+                                           additional_claims=auth_service.token_claims(user))
         return jsonify({'access_token': access_token}), 200
-    
+
+    @app.route('/api/logout', methods=['POST'])
+    @jwt_required()
+    def logout():
+        """
+        Отзывает токен запроса.
+
+        Возвращает:
+            Код состояния: 200 OK или 400 Bad Request (токен выдан не пользователю)
+        """
+        if not auth_service.revoke_token(get_jwt()):
+            return jsonify({'msg': 'Token is not issued to a user'}), 400
+        return jsonify({'msg': 'Logged out'}), 200
+
     # Добавляем маршрут для проверки работоспособности
     @app.route('/api/health', methods=['GET'])
     def health_check():
         """
         Проверяет работоспособность API.
-        
+
         Возвращает:
             JSON-ответ с состоянием системы.
         """
@@ -79,21 +173,36 @@ def create_app():
             'status': 'ok',
             'message': 'Cargo Manager Лисёнок API работает нормально'
         }), 200
-    
+
+    @app.route('/api/ready', methods=['GET'])
+    def readiness_check():
+        """
+        Проверяет готовность экземпляра принимать трафик: доступность пула
+        соединений с БД и свежесть снимка курсов валют.
+
+        Возвращает:
+            JSON-ответ с результатами проверок; 503, если хотя бы одна не прошла.
+        """
+        result = health_service.check_readiness()
+        result['status'] = 'ready' if result['ready'] else 'not_ready'
+        return jsonify(result), 200 if result['ready'] else 503
+
     return app
 
+
 if __name__ == '__main__':
+    # Запуск из корня проекта: python -m backend.main
+    logging.basicConfig(level=logging.INFO)
+
     # Создаем приложение
     app = create_app()
-
-    # Читаем параметры запуска из переменных окружения
-    host = os.getenv('HOST', 'localhost')
-    port = int(os.getenv('PORT', '5000'))
+    host = app.config['HOST']
+    port = app.config['PORT']
 
     # Запускаем сервер
-    print("Запуск Cargo Manager Лисёнок API сервера...")
-    print(f"Сервер доступен по адресу: http://{host}:{port}")
-    print(f"Документация API: http://{host}:{port}/api/health")
+    logger.info("Запуск Cargo Manager Лисёнок API сервера...")
+    logger.info(f"Сервер доступен по адресу: http://{host}:{port}")
+    logger.info(f"Документация API: http://{host}:{port}/api/health")
 
     app.run(
         host=host,
@@ -0,0 +1,186 @@
+"""
+Метрики производительности API.
+
+init_app(app) подключает к приложению:
+- гистограмму времени ответа по маршрутам (http_request_duration_seconds)
+  и счетчик ответов по кодам состояния (http_requests_total);
+- замеры SQL-запросов и ожидания пула соединений (backend.monitoring.sql);
+- показатели пула соединений (db_pool_*);
+- при PROFILER_ENABLED — выборочный профилировщик медленных запросов
+  (backend.monitoring.profiler).
+
+Метрики отдаются в формате Prometheus на /api/metrics (backend.api.metrics).
+При нескольких воркерах gunicorn каждый воркер периодически пишет снимок
+в METRICS_DIR, и /api/metrics объединяет снимки всех воркеров.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from flask import g, request
+
+from backend.monitoring import sql
+from backend.monitoring.metrics import REGISTRY, SnapshotStore
+from backend.monitoring.profiler import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = REGISTRY.histogram('http_request_duration_seconds', 'Время обработки HTTP-запроса',
+                                      ('method', 'route'))
+REQUESTS = REGISTRY.counter('http_requests_total', 'HTTP-запросы по кодам состояния',
+                            ('method', 'route', 'status'))
+
+POOL_FIELDS = ('size', 'in_use', 'idle', 'max_size')
+POOL_COUNTERS = ('acquired', 'waits', 'timeouts')
+
+
+def _pool_values() -> Dict[tuple, float]:
+    # Импорт здесь: backend.database сам импортирует backend.monitoring.sql
+    from backend.database import pool_stats
+
+    stats = pool_stats()
+    if stats is None:
+        return {}
+    return {(field,): stats[field] for field in POOL_FIELDS + POOL_COUNTERS}
+
+
+REGISTRY.gauge('db_pool_connections', 'Состояние пула соединений SQLite (size, in_use, idle, max_size) '
+               'и накопленные выдачи, ожидания и таймауты', ('state',), collect=_pool_values)
+
+_store: Optional[SnapshotStore] = None
+_profiler: Optional[SamplingProfiler] = None
+_writer: Optional['SnapshotWriter'] = None
+_lock = threading.Lock()
+
+
+class SnapshotWriter:
+    """Периодически сохраняет снимок метрик процесса в SnapshotStore."""
+
+    def __init__(self, store: SnapshotStore, interval: float):
+        self.store = store
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.store.save(REGISTRY.snapshot())
+            except OSError as e:
+                logger.error(f"Не удалось сохранить снимок метрик: {e}")
+
+
+def _route() -> str:
+    # Шаблон маршрута, а не путь: /api/orders/<int:order_id> — одна серия на все заявки
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _before_request() -> None:
+    g.metrics_started = time.perf_counter()
+    if _profiler is not None:
+        _profiler.begin()
+
+
+def _after_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = _route()
+        REQUEST_DURATION.observe(elapsed, request.method, route)
+        REQUESTS.inc(request.method, route, response.status_code)
+        if _profiler is not None:
+            _profiler.end(f'{request.method} {route}', elapsed)
+    return response
+
+
+def _teardown_request(exc=None) -> None:
+    # Необработанное исключение: after_request не вызывался
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = _route()
+        REQUEST_DURATION.observe(elapsed, request.method, route)
+        REQUESTS.inc(request.method, route, 500)
+        if _profiler is not None:
+            _profiler.end(f'{request.method} {route}', elapsed)
+
+
+def init_app(app) -> None:
+    """
+    Подключает сбор метрик к приложению Flask.
+
+    Аргументы:
+        app (Flask): Приложение; настройки берутся из app.config
+            (SQL_METRICS_ENABLED, SQL_SLOW_MS, METRICS_DIR, METRICS_SNAPSHOT_INTERVAL,
+            PROFILER_ENABLED, PROFILER_DIR, PROFILER_INTERVAL, PROFILER_SLOW_MS)
+    """
+    global _store, _profiler, _writer
+    config = app.config
+    sql.configure(config['SQL_METRICS_ENABLED'], config['SQL_SLOW_MS'])
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    with _lock:
+        if config['METRICS_DIR'] and _store is None:
+            _store = SnapshotStore(config['METRICS_DIR'])
+            _writer = SnapshotWriter(_store, config['METRICS_SNAPSHOT_INTERVAL'])
+            _writer.start()
+            logger.info(f"Снимки метрик воркера {os.getpid()} пишутся в {config['METRICS_DIR']}")
+        if config['PROFILER_ENABLED'] and _profiler is None:
+            _profiler = SamplingProfiler(config['PROFILER_DIR'], config['PROFILER_INTERVAL'],
+                                         config['PROFILER_SLOW_MS'])
+            _profiler.start()
+            logger.info(f"Профилировщик включен: запросы дольше {config['PROFILER_SLOW_MS']} мс "
+                        f"сохраняются в {config['PROFILER_DIR']}")
+
+
+def collect_snapshot() -> Dict[str, Dict[str, Any]]:
+    """
+    Текущие метрики: только этого процесса или, если задан METRICS_DIR,
+    всех воркеров (свежий снимок процесса сохраняется перед объединением).
+    """
+    snapshot = REGISTRY.snapshot()
+    store = _store
+    if store is None:
+        return snapshot
+    try:
+        store.save(snapshot)
+        return store.collect()
+    except OSError as e:
+        logger.error(f"Не удалось объединить снимки метрик: {e}")
+        return snapshot
+
+
+def get_profiler() -> Optional[SamplingProfiler]:
+    return _profiler
+
+
+def stop() -> None:
+    """Останавливает профилировщик и переносит метрики завершающегося воркера в общий снимок."""
+    global _store, _profiler, _writer
+    with _lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+        if _store is not None:
+            try:
+                _store.retire(REGISTRY.snapshot())
+            except OSError as e:
+                logger.error(f"Не удалось сохранить метрики завершающегося воркера: {e}")
+            _store = None
+        if _profiler is not None:
+            _profiler.stop()
+            _profiler = None
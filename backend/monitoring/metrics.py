@@ -0,0 +1,314 @@
+"""
+Счетчики, показатели и гистограммы в формате Prometheus.
+
+Метрики живут в памяти процесса и регистрируются в REGISTRY при импорте
+модуля, который их пишет. snapshot() снимает значения в словарь, пригодный
+для JSON: так снимки воркеров gunicorn складываются в каталог METRICS_DIR
+(SnapshotStore) и объединяются при выдаче /api/metrics.
+"""
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм времени, в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._series: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Iterable[Any]) -> Labels:
+        key = tuple(str(value) for value in labels)
+        if len(key) != len(self.labels):
+            raise ValueError(f"Метрике {self.name} нужны метки {self.labels}")
+        return key
+
+    def series(self) -> List[Tuple[Labels, Any]]:
+        with self._lock:
+            return [(labels, self._copy(value)) for labels, value in self._series.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def describe(self) -> Dict[str, Any]:
+        return {'type': self.kind, 'help': self.documentation, 'labels': list(self.labels)}
+
+
+class Counter(_Metric):
+    """Монотонно растущее значение (число запросов, суммарное время)."""
+    kind = 'counter'
+
+    def inc(self, *labels: Any, value: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + value
+
+
+class Gauge(_Metric):
+    """
+    Текущее значение. collect — функция, которая возвращает {метки: значение}
+    в момент снятия метрик (например, состояние пула соединений).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[Labels, float]]] = None):
+        super().__init__(name, documentation, labels)
+        self._collect = collect
+
+    def set(self, *labels: Any, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def series(self) -> List[Tuple[Labels, Any]]:
+        if self._collect is None:
+            return super().series()
+        try:
+            return [(self._key(labels), value) for labels, value in self._collect().items()]
+        except Exception as e:
+            logger.error(f"Ошибка снятия метрики {self.name}: {e}")
+            return []
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам; значение серии — [корзины, сумма, число]."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._series.get(key)
+            if state is None:
+                # Последняя корзина — значения больше всех границ (+Inf)
+                state = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+    def describe(self) -> Dict[str, Any]:
+        result = super().describe()
+        result['buckets'] = list(self.buckets)
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (),
+              collect: Optional[Callable[[], Dict[Labels, float]]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, collect))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Снимает значения всех метрик.
+
+        Возвращает:
+            Dict: {имя: {'type', 'help', 'labels', ['buckets'], 'series': [[метки, значение], ...]}}
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {}
+        for metric in metrics:
+            entry = metric.describe()
+            entry['series'] = [[list(labels), value] for labels, value in metric.series()]
+            result[metric.name] = entry
+        return result
+
+
+REGISTRY = Registry()
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Dict[str, Any]]],
+                    kinds: Sequence[str] = ('counter', 'gauge', 'histogram')) -> Dict[str, Dict[str, Any]]:
+    """
+    Складывает снимки нескольких процессов: серии с одинаковыми метками
+    суммируются (у гистограмм — по корзинам). Метрики с другим набором
+    корзин, чем у первого снимка, пропускаются.
+
+    Аргументы:
+        kinds: Какие типы метрик брать (у завершенных воркеров — без gauge)
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    values: Dict[str, Dict[Labels, Any]] = {}
+    for snapshot in snapshots:
+        for name, entry in snapshot.items():
+            if entry['type'] not in kinds:
+                continue
+            target = merged.setdefault(name, {key: value for key, value in entry.items() if key != 'series'})
+            if target['type'] != entry['type'] or target.get('buckets') != entry.get('buckets'):
+                continue
+            series = values.setdefault(name, {})
+            for labels, value in entry['series']:
+                key = tuple(labels)
+                current = series.get(key)
+                if current is None:
+                    series[key] = Histogram._copy(value) if entry['type'] == 'histogram' else value
+                elif entry['type'] == 'histogram':
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                    current[2] += value[2]
+                else:
+                    series[key] = current + value
+    for name, entry in merged.items():
+        entry['series'] = [[list(labels), value] for labels, value in values.get(name, {}).items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render(snapshot: Dict[str, Dict[str, Any]]) -> str:
+    """Текстовый формат экспозиции Prometheus (version 0.0.4)."""
+    lines: List[str] = []
+    for name in sorted(snapshot):
+        entry = snapshot[name]
+        lines.append(f"# HELP {name} {_escape(entry['help'])}")
+        lines.append(f"# TYPE {name} {entry['type']}")
+        for labels, value in sorted(entry['series'], key=lambda item: item[0]):
+            if entry['type'] != 'histogram':
+                lines.append(f"{name}{_labels(entry['labels'], labels)} {_number(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket in zip(list(entry['buckets']) + [math.inf], counts):
+                cumulative += bucket
+                le = ('le', _number(bound))
+                lines.append(f"{name}_bucket{_labels(entry['labels'], labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(entry['labels'], labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(entry['labels'], labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def quantile(buckets: Sequence[float], counts: Sequence[int], q: float) -> Optional[float]:
+    """Верхняя граница корзины, в которую попадает квантиль q (None для +Inf)."""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    threshold = q * total
+    cumulative = 0
+    for bound, count in zip(list(buckets) + [None], counts):
+        cumulative += count
+        if cumulative >= threshold:
+            return bound
+    return None
+
+
+class SnapshotStore:
+    """
+    Снимки метрик воркеров gunicorn в общем каталоге.
+
+    Каждый воркер пишет свой снимок в <pid>.json (периодически и перед
+    выдачей /api/metrics), поэтому ответ на любой воркер содержит метрики
+    всех. Завершающийся воркер переносит счетчики и гистограммы в
+    retired.json, чтобы суммы не уменьшались после перезапуска воркеров.
+    """
+
+    RETIRED = 'retired.json'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f'{pid}.json')
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(path: str, snapshot: Dict[str, Any]) -> None:
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def save(self, snapshot: Dict[str, Any], pid: Optional[int] = None) -> None:
+        self._write(self._path(pid or os.getpid()), snapshot)
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Объединенный снимок всех воркеров, включая завершенных."""
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                snapshot = self._read(os.path.join(self.directory, name))
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        return merge_snapshots(snapshots)
+
+    def retire(self, snapshot: Dict[str, Any], pid: Optional[int] = None) -> None:
+        """Переносит счетчики завершающегося воркера в retired.json."""
+        import fcntl
+
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired_path = os.path.join(self.directory, self.RETIRED)
+            retired = self._read(retired_path) or {}
+            self._write(retired_path, merge_snapshots([retired, snapshot], kinds=('counter', 'histogram')))
+            try:
+                os.remove(self._path(pid or os.getpid()))
+            except FileNotFoundError:
+                pass
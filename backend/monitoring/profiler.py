@@ -0,0 +1,130 @@
+"""
+Выборочный профилировщик медленных запросов.
+
+Фоновый поток раз в interval секунд снимает стеки потоков, которые сейчас
+обрабатывают запросы (sys._current_frames), и копит их для каждого запроса.
+Если запрос шел дольше slow_ms, накопленные стеки записываются в каталог
+профилей в свернутом формате («кадр;кадр;кадр число» на строку), который
+понимают flamegraph.pl, speedscope и inferno. Быстрые запросы ничего не пишут,
+а между снимками потоки запросов не замедляются.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сколько файлов профилей хранить; старые удаляются
+MAX_PROFILES = 200
+MAX_DEPTH = 128
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__') or os.path.basename(code.co_filename)
+    return f'{module}:{code.co_name}'
+
+
+def fold_stack(frame) -> str:
+    """Стек кадра от корня к листу через ';'."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Аргументы:
+        output_dir (str): Каталог для файлов .folded
+        interval (float): Период снятия стеков, секунды
+        slow_ms (float): Запросы не короче этого сохраняются
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.005, slow_ms: float = 500.0):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.slow_ms = slow_ms
+        self._active: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.saved = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def begin(self) -> None:
+        """Начинает копить стеки текущего потока (вызывается в начале запроса)."""
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def end(self, label: str, duration: float) -> Optional[str]:
+        """
+        Заканчивает запрос текущего потока.
+
+        Аргументы:
+            label (str): Метод и маршрут запроса (попадает в имя файла)
+            duration (float): Длительность запроса, секунды
+
+        Возвращает:
+            Optional[str]: Путь к файлу профиля, если запрос медленный
+        """
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks or duration * 1000 < self.slow_ms:
+            return None
+        return self._save(label, duration, stacks)
+
+    def _save(self, label: str, duration: float, stacks: Counter) -> Optional[str]:
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')[:80]
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(duration * 1000)}ms-{slug}-{os.getpid()}.folded"
+        path = os.path.join(self.output_dir, name)
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            self._prune()
+        except OSError as e:
+            logger.error(f"Не удалось сохранить профиль {path}: {e}")
+            return None
+        self.saved += 1
+        logger.info(f"Медленный запрос {label} ({duration * 1000:.0f} мс), профиль: {path}")
+        return path
+
+    def _prune(self) -> None:
+        files = sorted(name for name in os.listdir(self.output_dir) if name.endswith('.folded'))
+        for name in files[:-MAX_PROFILES]:
+            try:
+                os.remove(os.path.join(self.output_dir, name))
+            except OSError:
+                pass
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, stacks in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        stacks[fold_stack(frame)] += 1
+            del frames
@@ -0,0 +1,202 @@
+"""
+Время SQL-запросов по нормализованному тексту и ожидание соединения из пула.
+
+get_db() оборачивает соединение в InstrumentedConnection: execute и
+executemany (в том числе через cursor()) замеряются, а текст запроса
+нормализуется — литералы заменяются на ?, списки IN (?, ?, ...) сворачиваются,
+пробелы схлопываются, — чтобы один и тот же запрос с разными значениями
+попадал в одну серию метрик. Время чтения строк (fetch*, обход курсора)
+учитывается отдельным счетчиком: в SQLite сортировка и агрегаты выполняются
+при execute, а построчный обход — при чтении.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+from backend.monitoring.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Наибольшее число разных запросов в метриках; остальные попадают в серию 'other'
+MAX_STATEMENTS = 300
+MAX_STATEMENT_LENGTH = 200
+
+SQL_DURATION = REGISTRY.histogram('sql_query_duration_seconds', 'Время выполнения SQL-запроса (execute)',
+                                  ('statement',))
+SQL_FETCH = REGISTRY.counter('sql_fetch_seconds_total', 'Время чтения строк результата SQL-запроса',
+                             ('statement',))
+SQL_ERRORS = REGISTRY.counter('sql_query_errors_total', 'Ошибки SQL-запросов', ('statement',))
+POOL_WAIT = REGISTRY.histogram('db_pool_wait_seconds', 'Ожидание соединения из пула', ())
+
+_enabled = False
+_slow_seconds = 0.1
+_statements = set()
+_statements_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\b(IN)\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def configure(enabled: bool, slow_ms: float = 100.0) -> None:
+    """
+    Включает замеры SQL.
+
+    Аргументы:
+        enabled (bool): Оборачивать ли соединения из get_db()
+        slow_ms (float): Запросы дольше этого пишутся в лог с предупреждением
+    """
+    global _enabled, _slow_seconds
+    _enabled = enabled
+    _slow_seconds = slow_ms / 1000
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql: str) -> str:
+    """
+    Приводит текст запроса к виду без значений.
+
+    Пример:
+        "SELECT * FROM orders WHERE id IN (1, 2, 3) AND name = 'x'"
+        -> "SELECT * FROM orders WHERE id IN (?, ...) AND name = ?"
+    """
+    text = _STRING.sub('?', sql)
+    text = _NUMBER.sub('?', text)
+    text = _IN_LIST.sub(r'\1 (?, ...)', text)
+    text = _SPACE.sub(' ', text).strip()
+    if len(text) > MAX_STATEMENT_LENGTH:
+        text = text[:MAX_STATEMENT_LENGTH - 1] + '…'
+    return text
+
+
+def _label(sql: str) -> str:
+    statement = normalize_sql(sql)
+    if statement in _statements:
+        return statement
+    with _statements_lock:
+        if len(_statements) >= MAX_STATEMENTS:
+            return 'other'
+        _statements.add(statement)
+    return statement
+
+
+def _record(sql: str, elapsed: float, failed: bool = False) -> str:
+    statement = _label(sql)
+    SQL_DURATION.observe(elapsed, statement)
+    if failed:
+        SQL_ERRORS.inc(statement)
+    if elapsed >= _slow_seconds:
+        logger.warning(f"Медленный SQL-запрос ({elapsed * 1000:.1f} мс): {normalize_sql(sql)}")
+    return statement
+
+
+def observe_pool_wait(seconds: float) -> None:
+    POOL_WAIT.observe(seconds)
+
+
+class InstrumentedCursor:
+    """Курсор, который замеряет execute/executemany и чтение строк."""
+
+    __slots__ = ('_cursor', '_statement')
+
+    def __init__(self, cursor: sqlite3.Cursor, statement: Optional[str] = None):
+        self._cursor = cursor
+        self._statement = statement
+
+    def _run(self, method, sql: str, parameters):
+        started = time.perf_counter()
+        try:
+            method(sql, parameters)
+        except sqlite3.Error:
+            _record(sql, time.perf_counter() - started, failed=True)
+            raise
+        self._statement = _record(sql, time.perf_counter() - started)
+        return self
+
+    def execute(self, sql: str, parameters: Any = ()) -> 'InstrumentedCursor':
+        return self._run(self._cursor.execute, sql, parameters)
+
+    def executemany(self, sql: str, parameters: Iterable[Any]) -> 'InstrumentedCursor':
+        return self._run(self._cursor.executemany, sql, parameters)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._statement is not None:
+                SQL_FETCH.inc(self._statement, value=time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size: Optional[int] = None):
+        if size is None:
+            return self._fetch(self._cursor.fetchmany)
+        return self._fetch(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._fetch(self._cursor.__next__)
+
+    def __getattr__(self, name: str):
+        # rowcount, lastrowid, description, close и прочее — как у исходного курсора
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Соединение SQLite с замером запросов; остальное делегируется исходному соединению."""
+
+    __slots__ = ('connection',)
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def cursor(self) -> InstrumentedCursor:
+        return InstrumentedCursor(self.connection.cursor())
+
+    def execute(self, sql: str, parameters: Any = ()) -> InstrumentedCursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters: Iterable[Any]) -> InstrumentedCursor:
+        return self.cursor().executemany(sql, parameters)
+
+    def __enter__(self) -> 'InstrumentedConnection':
+        self.connection.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.connection.__exit__(*exc_info)
+
+    def __getattr__(self, name: str):
+        return getattr(self.connection, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # row_factory, isolation_level и т. п. задаются исходному соединению
+        if name == 'connection':
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.connection, name, value)
+
+
+def instrument(connection: sqlite3.Connection):
+    """Оборачивает соединение, если замеры включены."""
+    return InstrumentedConnection(connection) if _enabled else connection
+
+
+def unwrap(connection) -> sqlite3.Connection:
+    return connection.connection if isinstance(connection, InstrumentedConnection) else connection
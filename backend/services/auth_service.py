@@ -0,0 +1,451 @@
+# backend/services/auth_service.py
+"""
+Пользователи API, проверка паролей и отзыв токенов.
+
+Пароли хранятся хешами scrypt: на одну проверку нужно 128 * n * r байт
+памяти (16 МБ при n = 2**14, r = 8) и десятки миллисекунд процессора.
+Такой расчет в потоке запроса занял бы GIL и замедлил остальные запросы
+воркера, поэтому хеши считает PasswordHasher в отдельном пуле процессов.
+Число проверок в пуле и очереди ограничено: лишний вход сразу получает
+AuthBusyError (503 с Retry-After), а не ждет в растущей очереди.
+
+Каждый запрос к маршруту с @jwt_required() декодирует токен и проверяет,
+не отозван ли он. Оба результата кешируются на token_cache_ttl секунд:
+- claims по строке токена (CachingJWTManager); срок действия токена
+  проверяется и при попадании в кеш;
+- состояние отзыва по jti токена (is_token_revoked) — одна строка
+  RevokedTokens и Users на токен вместо запроса к базе на каждый вызов.
+
+Выход и изменения пользователя сбрасывают кеш своего воркера сразу; другие
+воркеры gunicorn увидят отзыв не позже чем через token_cache_ttl секунд.
+Об отзыве публикуется событие 'auth' шины событий: push-сервер закрывает
+соединения, открытые отозванными токенами.
+
+Отзыв проверяется только у токенов пользователей (claim uid, их выдает
+/api/login). Токены без uid выпускаются кодом с ключом JWT_SECRET_KEY
+(тесты, бенчмарки) и проверяются только подписью и сроком действия.
+
+Управление пользователями из корня проекта:
+    python -m backend.services.auth_service create <имя>
+    python -m backend.services.auth_service password <имя>
+    python -m backend.services.auth_service disable <имя>
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from flask_jwt_extended import JWTManager
+
+from backend.database import close_db, get_db
+from backend.services import cache_service, event_bus
+
+logger = logging.getLogger(__name__)
+
+# Параметры scrypt для новых хешей; хеши со старыми параметрами
+# пересчитываются при следующем успешном входе
+DEFAULT_SCRYPT_N = 2 ** 14
+DEFAULT_SCRYPT_R = 8
+DEFAULT_SCRYPT_P = 1
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+MIN_PASSWORD_LENGTH = 8
+MAX_PASSWORD_LENGTH = 1024
+MAX_USERNAME_LENGTH = 64
+
+USER_COLUMNS = ('id', 'username', 'is_active', 'created_date')
+_SELECT_USER = f"SELECT {', '.join(USER_COLUMNS)} FROM Users"
+
+# Кеши токенов. Claims не зависят от базы ('jwt' не меняет поколение), состояние
+# отзыва сбрасывают выход и изменения пользователей (поколение RevokedTokens)
+_claims_cache = cache_service.TTLCache('jwt_claims', 'jwt', max_entries=10000, ttl=30.0)
+_revocation_cache = cache_service.TTLCache('jwt_revocation', 'RevokedTokens', max_entries=10000, ttl=30.0)
+
+
+class AuthBusyError(Exception):
+    """Пул проверки паролей занят: вход нужно повторить позже."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem — память, которую займет OpenSSL (128 * r * (n + p + 2)), с запасом
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2) + 2 ** 20, dklen=KEY_SIZE)
+
+
+def hash_password(password: str, n: int = DEFAULT_SCRYPT_N, r: int = DEFAULT_SCRYPT_R,
+                  p: int = DEFAULT_SCRYPT_P) -> str:
+    """
+    Считает хеш пароля со случайной солью. Выполняется в процессе пула.
+
+    Возвращает:
+        str: Строка scrypt$n$r$p$соль$ключ для Users.password_hash
+    """
+    salt = os.urandom(SALT_SIZE)
+    return f"scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(_scrypt(password, salt, n, r, p))}"
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Проверяет пароль по строке hash_password(). Выполняется в процессе пула."""
+    try:
+        algorithm, n, r, p, salt, key = encoded.split('$')
+        if algorithm != 'scrypt':
+            return False
+        expected = _b64decode(key)
+        actual = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def _hash_params(encoded: str) -> Optional[tuple]:
+    parts = encoded.split('$')
+    if len(parts) != 6 or parts[0] != 'scrypt':
+        return None
+    try:
+        return int(parts[1]), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+
+class PasswordHasher:
+    """
+    Аргументы:
+        workers (int): Процессов пула; 0 — считать в потоке запроса (тесты, отладка)
+        max_pending (int): Наибольшее число проверок в пуле и очереди
+        timeout (float): Сколько секунд ждать результата проверки
+        n, r, p (int): Параметры scrypt для новых хешей
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, timeout: float = 10.0,
+                 n: int = DEFAULT_SCRYPT_N, r: int = DEFAULT_SCRYPT_R, p: int = DEFAULT_SCRYPT_P):
+        self.workers = max(0, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.timeout = timeout
+        self.n, self.r, self.p = n, r, p
+        # Хеш для проверки пароля несуществующего пользователя: ответ занимает
+        # столько же времени, сколько и для существующего
+        self.dummy_hash = f"scrypt${n}${r}${p}${_b64encode(bytes(SALT_SIZE))}${_b64encode(bytes(KEY_SIZE))}"
+
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn, а не fork: процесс API многопоточный (см. DocumentPipeline)
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _call(self, fn: Callable[..., Any], *args) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise AuthBusyError("Слишком много одновременных входов, повторите позже")
+        try:
+            if self.workers == 0:
+                return fn(*args)
+            from concurrent.futures import TimeoutError as FutureTimeoutError
+            from concurrent.futures.process import BrokenProcessPool
+
+            executor = self._get_executor()
+            future = executor.submit(fn, *args)
+            try:
+                return future.result(self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                raise AuthBusyError("Проверка пароля не уложилась во время ожидания")
+            except BrokenProcessPool:
+                # Процесс пула упал: следующий вызов создаст пул заново
+                with self._executor_lock:
+                    if self._executor is executor:
+                        self._executor = None
+                raise AuthBusyError("Пул проверки паролей перезапускается")
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._call(hash_password, password, self.n, self.r, self.p)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return self._call(verify_password, password, encoded)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return _hash_params(encoded) != (self.n, self.r, self.p)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_hasher = PasswordHasher()
+_hasher_lock = threading.Lock()
+
+
+def configure(workers: int, max_pending: int, timeout: float, scrypt_n: int, scrypt_r: int, scrypt_p: int,
+              token_cache_size: int, token_cache_ttl: float) -> None:
+    """
+    Задает пул проверки паролей и кеши токенов; пул процессов создается при первом входе.
+
+    Аргументы:
+        workers (int): Процессов пула; 0 — считать хеш в потоке запроса
+        max_pending (int): Наибольшее число одновременных проверок паролей
+        timeout (float): Сколько секунд ждать проверки
+        scrypt_n, scrypt_r, scrypt_p (int): Параметры scrypt для новых хешей
+        token_cache_size (int): Сколько токенов держать в каждом кеше; 0 отключает кеши
+        token_cache_ttl (float): Срок жизни записи кеша токенов, секунды
+    """
+    global _hasher
+    with _hasher_lock:
+        _hasher.shutdown()
+        _hasher = PasswordHasher(workers, max_pending, timeout, scrypt_n, scrypt_r, scrypt_p)
+    _claims_cache.configure(token_cache_size, token_cache_ttl)
+    _revocation_cache.configure(token_cache_size, token_cache_ttl)
+
+
+def stop_hasher() -> None:
+    """Останавливает процессы пула проверки паролей."""
+    with _hasher_lock:
+        _hasher.shutdown()
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager, который не декодирует повторно уже проверенный токен."""
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        decode = super()._decode_jwt_from_config
+        claims = _claims_cache.get_or_load(encoded_token, lambda: decode(encoded_token))
+        # Запись кеша может пережить токен: истекший токен декодируется заново,
+        # и flask_jwt_extended отвечает на него как обычно
+        leeway = self._get_leeway()
+        if 'exp' in claims and claims['exp'] + leeway <= time.time():
+            _claims_cache.invalidate(encoded_token)
+            return decode(encoded_token)
+        # Словарь из кеша общий для всех запросов, запросу отдается копия
+        return dict(claims)
+
+    @staticmethod
+    def _get_leeway() -> float:
+        from flask_jwt_extended.config import config
+
+        return config.leeway
+
+
+def init_app(app) -> JWTManager:
+    """Подключает JWT к приложению: кеш claims и проверку отзыва токенов."""
+    configure(app.config['AUTH_HASH_WORKERS'], app.config['AUTH_HASH_MAX_PENDING'],
+              app.config['AUTH_HASH_TIMEOUT'], app.config['AUTH_SCRYPT_N'], app.config['AUTH_SCRYPT_R'],
+              app.config['AUTH_SCRYPT_P'], app.config['AUTH_TOKEN_CACHE_SIZE'],
+              app.config['AUTH_TOKEN_CACHE_TTL'])
+    jwt = CachingJWTManager(app)
+    jwt.token_in_blocklist_loader(lambda jwt_header, jwt_payload: is_token_revoked(jwt_payload))
+    return jwt
+
+
+def _row_to_user(row) -> Dict[str, Any]:
+    user = dict(zip(USER_COLUMNS, row))
+    user['is_active'] = bool(user['is_active'])
+    return user
+
+
+def _validate_password(password: Any) -> str:
+    if not isinstance(password, str) or not MIN_PASSWORD_LENGTH <= len(password) <= MAX_PASSWORD_LENGTH:
+        raise ValueError(f"Пароль должен содержать от {MIN_PASSWORD_LENGTH} до {MAX_PASSWORD_LENGTH} символов")
+    return password
+
+
+def _users_changed(user_id: Optional[int]) -> None:
+    # Блокировка и смена пароля отзывают все токены пользователя, а кеш отзыва
+    # хранится по jti, поэтому сбрасывается целиком; такие изменения редки
+    cache_service.bump_generation('RevokedTokens')
+    _revocation_cache.clear()
+    if user_id is not None:
+        event_bus.publish('auth', {'type': 'revoked', 'user_id': user_id})
+
+
+def get_user(username: str) -> Optional[Dict[str, Any]]:
+    row = get_db().execute(f"{_SELECT_USER} WHERE username = ?", (username,)).fetchone()
+    return _row_to_user(row) if row else None
+
+
+def get_user_by_id(user_id: int) -> Optional[Dict[str, Any]]:
+    row = get_db().execute(f"{_SELECT_USER} WHERE id = ?", (user_id,)).fetchone()
+    return _row_to_user(row) if row else None
+
+
+def create_user(username: str, password: str) -> Dict[str, Any]:
+    """
+    Создает пользователя.
+
+    Исключения:
+        ValueError: Некорректное имя или пароль, имя уже занято
+        AuthBusyError: Пул проверки паролей занят
+    """
+    username = (username or '').strip()
+    if not username or len(username) > MAX_USERNAME_LENGTH:
+        raise ValueError(f"Имя пользователя должно содержать от 1 до {MAX_USERNAME_LENGTH} символов")
+    password_hash = _hasher.hash(_validate_password(password))
+    db = get_db()
+    try:
+        with db:
+            cursor = db.execute("INSERT INTO Users (username, password_hash) VALUES (?, ?)",
+                                (username, password_hash))
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Пользователь {username} уже существует")
+    logger.info(f"Создан пользователь {username}")
+    return get_user_by_id(cursor.lastrowid)
+
+
+def set_password(username: str, password: str) -> bool:
+    """Меняет пароль и отзывает выданные пользователю токены. Возвращает False, если пользователя нет."""
+    password_hash = _hasher.hash(_validate_password(password))
+    db = get_db()
+    with db:
+        rows = db.execute("UPDATE Users SET password_hash = ?, tokens_valid_after = ? WHERE username = ? "
+                         "RETURNING id", (password_hash, int(time.time()), username)).fetchall()
+    _users_changed(rows[0][0] if rows else None)
+    return bool(rows)
+
+
+def set_active(username: str, active: bool) -> bool:
+    """Включает или блокирует пользователя; блокировка отзывает его токены."""
+    db = get_db()
+    with db:
+        rows = db.execute("UPDATE Users SET is_active = ?, tokens_valid_after = ? WHERE username = ? "
+                         "RETURNING id", (int(active), int(time.time()), username)).fetchall()
+    _users_changed(rows[0][0] if rows else None)
+    return bool(rows)
+
+
+def authenticate(username: str, password: str) -> Optional[Dict[str, Any]]:
+    """
+    Проверяет имя и пароль.
+
+    Возвращает:
+        Dict или None: Пользователь; None, если имя или пароль неверны
+        или пользователь заблокирован
+
+    Исключения:
+        AuthBusyError: Пул проверки паролей занят
+    """
+    if not isinstance(password, str) or len(password) > MAX_PASSWORD_LENGTH:
+        return None
+    hasher = _hasher
+    row = get_db().execute(
+        f"SELECT {', '.join(USER_COLUMNS)}, password_hash FROM Users WHERE username = ?", (username,)).fetchone()
+    # Соединение не держится, пока считается хеш
+    close_db()
+    if row is None or not row['is_active']:
+        hasher.verify(password, hasher.dummy_hash)
+        return None
+    if not hasher.verify(password, row['password_hash']):
+        return None
+
+    user = _row_to_user(tuple(row)[:len(USER_COLUMNS)])
+    if hasher.needs_rehash(row['password_hash']):
+        try:
+            db = get_db()
+            with db:
+                db.execute("UPDATE Users SET password_hash = ? WHERE id = ?", (hasher.hash(password), user['id']))
+        except AuthBusyError:
+            pass
+    return user
+
+
+def token_claims(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Дополнительные claims токена пользователя: по uid проверяется отзыв."""
+    return {'uid': user['id']}
+
+
+def revoke_token(claims: Dict[str, Any]) -> bool:
+    """
+    Отзывает токен пользователя (выход). Возвращает False для токенов без uid:
+    их отзыв не проверяется.
+    """
+    if 'uid' not in claims:
+        return False
+    now = int(time.time())
+    db = get_db()
+    with db:
+        db.execute("INSERT OR IGNORE INTO RevokedTokens (jti, user_id, expires_at) VALUES (?, ?, ?)",
+                   (claims['jti'], claims['uid'], int(claims.get('exp', now))))
+        # Истекшие токены отклоняются и без этой таблицы
+        db.execute("DELETE FROM RevokedTokens WHERE expires_at < ?", (now,))
+    cache_service.bump_generation('RevokedTokens')
+    _revocation_cache.invalidate(claims['jti'])
+    event_bus.publish('auth', {'type': 'revoked', 'jti': claims['jti']})
+    return True
+
+
+def _load_revoked(claims: Dict[str, Any]) -> bool:
+    row = get_db().execute(
+        "SELECT EXISTS (SELECT 1 FROM RevokedTokens WHERE jti = ?), is_active, tokens_valid_after "
+        "FROM Users WHERE id = ?", (claims['jti'], claims['uid'])).fetchone()
+    if row is None:
+        # Пользователь удален
+        return True
+    revoked, is_active, valid_after = row
+    return bool(revoked) or not is_active or claims.get('iat', 0) < valid_after
+
+
+def is_token_revoked(claims: Dict[str, Any]) -> bool:
+    """Отозван ли токен: выход, блокировка или смена пароля пользователя."""
+    if 'uid' not in claims:
+        return False
+    return _revocation_cache.get_or_load(claims['jti'], lambda: _load_revoked(claims))
+
+
+def main():
+    import argparse
+    import getpass
+
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description='Управление пользователями API')
+    parser.add_argument('command', choices=('create', 'password', 'disable', 'enable'))
+    parser.add_argument('username')
+    args = parser.parse_args()
+
+    load_dotenv()
+    configure(0, 1, 60.0, DEFAULT_SCRYPT_N, DEFAULT_SCRYPT_R, DEFAULT_SCRYPT_P, 0, 0)
+    try:
+        if args.command in ('create', 'password'):
+            password = getpass.getpass('Пароль: ')
+            if password != getpass.getpass('Повторите пароль: '):
+                raise SystemExit("Пароли не совпадают")
+            if args.command == 'create':
+                create_user(args.username, password)
+            elif not set_password(args.username, password):
+                raise SystemExit(f"Пользователь {args.username} не найден")
+        elif not set_active(args.username, args.command == 'enable'):
+            raise SystemExit(f"Пользователь {args.username} не найден")
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        close_db()
+    print(f"{args.username}: готово")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# backend/services/cache_service.py
+"""
+Кеш результатов чтения в памяти процесса.
+
+TTLCache — ограниченный по числу записей LRU-кеш, у записи есть срок жизни.
+Для каждой таблицы ведется счетчик поколений: сервис увеличивает его после
+записи в таблицу (bump_generation). Ключи списков включают поколение, поэтому
+после записи старые списки становятся недоступны и вытесняются по LRU, а
+отдельные записи (например, заявка по id) сервис удаляет точно по ключу.
+
+Результат загрузки сохраняется, только если за время загрузки поколение
+таблицы не изменилось: иначе чтение, начатое до записи, могло бы положить
+в кеш устаревшие данные уже после инвалидации.
+
+Кеш живет в одном процессе. Записи других воркеров gunicorn он не видит,
+поэтому срок жизни записи — наибольшее время, в течение которого другой
+воркер может отдавать устаревшие данные.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable
+
+from backend.monitoring.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = REGISTRY.counter('cache_requests_total', 'Обращения к кешу результатов', ('cache', 'result'))
+CACHE_EVICTIONS = REGISTRY.counter('cache_evictions_total', 'Удаленные записи кеша по причинам',
+                                   ('cache', 'reason'))
+
+_caches: Dict[str, 'TTLCache'] = {}
+_generations: Dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+
+def _entry_counts() -> Dict[tuple, float]:
+    return {(name,): len(cache) for name, cache in list(_caches.items())}
+
+
+REGISTRY.gauge('cache_entries', 'Число записей в кеше результатов', ('cache',), collect=_entry_counts)
+
+
+def generation(table: str) -> int:
+    """Текущее поколение таблицы."""
+    return _generations.get(table, 0)
+
+
+def bump_generation(table: str) -> int:
+    """Отмечает запись в таблицу: кешированные списки прежнего поколения больше не отдаются."""
+    with _generations_lock:
+        _generations[table] = _generations.get(table, 0) + 1
+        return _generations[table]
+
+
+class TTLCache:
+    """
+    Аргументы:
+        name (str): Имя кеша в метриках
+        table (str): Таблица, поколение которой проверяется при сохранении
+        max_entries (int): Наибольшее число записей; 0 отключает кеш
+        ttl (float): Срок жизни записи, секунды
+    """
+
+    def __init__(self, name: str, table: str, max_entries: int = 1000, ttl: float = 5.0):
+        self.name = name
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def configure(self, max_entries: int, ttl: float) -> None:
+        """Меняет размер и срок жизни записей; кеш очищается."""
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl = ttl
+            self._entries.clear()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Возвращает значение из кеша или результат loader(). None не кешируется
+        (отсутствующая заявка может появиться без инвалидации по ее ключу).
+        """
+        if self.max_entries <= 0:
+            return loader()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    CACHE_REQUESTS.inc(self.name, 'hit')
+                    return entry[1]
+                del self._entries[key]
+                CACHE_EVICTIONS.inc(self.name, 'expired')
+        CACHE_REQUESTS.inc(self.name, 'miss')
+
+        started_generation = generation(self.table)
+        value = loader()
+        if value is None:
+            return value
+        with self._lock:
+            if generation(self.table) != started_generation:
+                return value
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.inc(self.name, 'size')
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                CACHE_EVICTIONS.inc(self.name, 'invalidated')
+
+    def invalidate_many(self, keys: Iterable[Hashable]) -> None:
+        """Удаляет несколько записей за одно взятие блокировки."""
+        with self._lock:
+            removed = sum(1 for key in keys if self._entries.pop(key, None) is not None)
+        if removed:
+            CACHE_EVICTIONS.inc(self.name, 'invalidated', value=removed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
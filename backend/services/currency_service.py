@@ -1,29 +1,351 @@
-from datetime import datetime
-from typing import Dict, Tuple
+import bisect
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import cached_property
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
-# Simple in-memory currency rates with CNY as base currency
+from backend.database import get_db
+from backend.services import event_bus
+
+logger = logging.getLogger(__name__)
+
+# Rates are stored with CNY as base currency
 # Example: 1 CNY = 12.00 RUB, 0.1370 USD
-_state = {
-    'rates': {
-        'RUB': 12.00,
-        'USD': 0.1370,
-    },
-    'last_update': datetime.utcnow().isoformat()
+BASE_CURRENCY = 'CNY'
+DEFAULT_RATES = {
+    'RUB': 12.00,
+    'USD': 0.1370,
 }
 
 
+@dataclass(frozen=True)
+class RateSnapshot:
+    """Immutable set of rates; a refresh publishes a new snapshot with a higher version."""
+    version: int
+    rates: Mapping[str, float]
+    last_update: str
+
+    @cached_property
+    def etag(self) -> str:
+        # Versions restart with the process, so the tag also covers the content
+        payload = json.dumps([sorted(self.rates.items()), self.last_update])
+        return f'rates-{self.version}-' + hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+    @cached_property
+    def codes(self) -> Tuple[str, ...]:
+        """Sorted currency codes including the base currency."""
+        return tuple(sorted({BASE_CURRENCY, *self.rates}))
+
+    @cached_property
+    def cross_rates(self):
+        """
+        NumPy matrix M where M[i, j] is how many units of codes[j] one unit of
+        codes[i] buys. Built once per snapshot.
+        """
+        import numpy as np
+
+        per_cny = self.per_cny
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return per_cny[np.newaxis, :] / per_cny[:, np.newaxis]
+
+    @cached_property
+    def per_cny(self):
+        """NumPy vector of rates (units per 1 CNY) in the order of codes."""
+        import numpy as np
+
+        return np.array([1.0 if code == BASE_CURRENCY else self.rates[code]
+                         for code in self.codes])
+
+    @cached_property
+    def code_positions(self) -> Dict[str, int]:
+        return {code: i for i, code in enumerate(self.codes)}
+
+    def code_indexes(self, codes) -> 'np.ndarray':
+        """Maps currency codes to row/column indexes of cross_rates."""
+        import numpy as np
+
+        positions = self.code_positions
+        idx = np.fromiter((positions.get(str(code).upper(), -1) for code in codes),
+                          dtype=np.intp, count=len(codes))
+        if (idx < 0).any():
+            unknown = sorted({str(code).upper() for code in codes} - positions.keys())
+            raise ValueError(f"Неизвестные валюты: {', '.join(unknown)}")
+        return idx
+
+
+# The current snapshot. Readers just take the reference (an atomic operation),
+# writers build a new snapshot and swap it in under _refresh_lock.
+_snapshot: Optional[RateSnapshot] = None
+_refresh_lock = threading.Lock()
+
+
+def _load_rates_from_db() -> Dict[str, float]:
+    db = get_db()
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT currency_code, rate FROM currency_rates")
+        return {row[0]: row[1] for row in cursor.fetchall() if row[0] != BASE_CURRENCY}
+    finally:
+        cursor.close()
+
+
+def _publish(rates: Mapping[str, float], last_update: Optional[str] = None,
+             reloaded: bool = False) -> RateSnapshot:
+    # Must be called with _refresh_lock held. reloaded marks a snapshot re-read
+    # from currency_rates rather than new rates (see revaluation_service)
+    global _snapshot
+    version = _snapshot.version + 1 if _snapshot is not None else 1
+    _snapshot = RateSnapshot(
+        version=version,
+        rates=MappingProxyType(dict(rates)),
+        last_update=last_update or datetime.utcnow().isoformat(),
+    )
+    event_bus.publish('rates', {
+        'type': 'updated',
+        'version': _snapshot.version,
+        'rates': dict(_snapshot.rates),
+        'last_update': _snapshot.last_update,
+        'reloaded': reloaded,
+    })
+    return _snapshot
+
+
+def _reload() -> RateSnapshot:
+    # Must be called with _refresh_lock held
+    try:
+        rates = _load_rates_from_db() or DEFAULT_RATES
+    except (sqlite3.Error, FileNotFoundError) as e:
+        logger.error(f"Не удалось загрузить курсы валют из базы данных: {e}")
+        rates = dict(_snapshot.rates) if _snapshot is not None else DEFAULT_RATES
+    return _publish(rates, reloaded=True)
+
+
+def get_snapshot() -> RateSnapshot:
+    """Returns the current rate snapshot, loading it from the DB on first use."""
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+    with _refresh_lock:
+        return _snapshot if _snapshot is not None else _reload()
+
+
+# ---------------------------------------------------------------------------
+# Rate history
+# ---------------------------------------------------------------------------
+
+_UPSERT_HISTORY = (
+    "INSERT INTO CurrencyRates (currency_code, rate_date, rate, source) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (currency_code, rate_date) DO UPDATE SET "
+    "rate = excluded.rate, source = excluded.source, updated_at = CURRENT_TIMESTAMP"
+)
+
+# julianday() of 0001-01-01 minus date.toordinal() of the same day: SQLite
+# returns the proleptic ordinal directly, so loading parses no dates in Python
+_JULIAN_TO_ORDINAL = 1721424.5
+
+# Other workers write history too; an index older than this is re-read
+HISTORY_MAX_AGE = 300.0
+
+
+def _to_day(value) -> int:
+    """Date ordinal of a date, datetime or ISO string ('2024-05-01' or '2024-05-01 10:00:00')."""
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        raise ValueError(f"Некорректная дата: {value!r}, ожидается ГГГГ-ММ-ДД") from None
+
+
+class RateHistory:
+    """
+    Immutable index of the rate history: for every currency a date-sorted
+    array of day ordinals and a parallel array of rates (units per 1 CNY).
+
+    The rate as of a day is the last point on or before that day, so a lookup
+    is a binary search: bisect for a single day, numpy.searchsorted for a
+    whole column of days. Years of daily rates for dozens of currencies take
+    a few megabytes and are loaded with one ordered scan of the primary key.
+    """
+
+    def __init__(self, series: Mapping[str, Tuple[array, array]]):
+        self.series = series
+        self.loaded_at = time.monotonic()
+        self._columns: Dict[str, tuple] = {}
+
+    @cached_property
+    def codes(self) -> Tuple[str, ...]:
+        return tuple(sorted({BASE_CURRENCY, *self.series}))
+
+    def _series(self, code: str) -> Tuple[array, array]:
+        try:
+            return self.series[code]
+        except KeyError:
+            raise ValueError(f"Нет истории курсов валюты {code}") from None
+
+    def _missing(self, code: str, day: int) -> ValueError:
+        first = date.fromordinal(self.series[code][0][0]).isoformat()
+        return ValueError(f"Нет курса {code} на {date.fromordinal(day).isoformat()}: "
+                          f"история начинается с {first}")
+
+    def rate_on(self, code: str, day) -> float:
+        """Rate of code as of the given day."""
+        code = code.upper()
+        if code == BASE_CURRENCY:
+            return 1.0
+        days, rates = self._series(code)
+        ordinal = _to_day(day)
+        pos = bisect.bisect_right(days, ordinal) - 1
+        if pos < 0:
+            raise self._missing(code, ordinal)
+        return rates[pos]
+
+    def rates_on(self, code: str, days: 'np.ndarray') -> 'np.ndarray':
+        """Rates of code as of each day ordinal in days (vectorised binary search)."""
+        import numpy as np
+
+        code = code.upper()
+        if code == BASE_CURRENCY:
+            return np.ones(len(days))
+        columns = self._columns.get(code)
+        if columns is None:
+            # Zero-copy views of the arrays; a racing thread builds the same ones
+            series_days, series_rates = self._series(code)
+            columns = (np.frombuffer(series_days, dtype=np.int64), np.frombuffer(series_rates, dtype=float))
+            self._columns[code] = columns
+        pos = np.searchsorted(columns[0], days, side='right') - 1
+        if len(pos) and pos.min() < 0:
+            raise self._missing(code, int(days[pos < 0].min()))
+        return columns[1][pos]
+
+    def points(self, code: str, start=None, end=None) -> List[Tuple[str, float]]:
+        """History points of code within [start, end] as (ISO date, rate)."""
+        days, rates = self._series(code.upper())
+        lo = bisect.bisect_left(days, _to_day(start)) if start is not None else 0
+        hi = bisect.bisect_right(days, _to_day(end)) if end is not None else len(days)
+        return [(date.fromordinal(days[i]).isoformat(), rates[i]) for i in range(lo, hi)]
+
+
+_history: Optional[RateHistory] = None
+_history_lock = threading.Lock()
+
+
+def _load_history() -> RateHistory:
+    series: Dict[str, Tuple[array, array]] = {}
+    cursor = get_db().execute(
+        "SELECT currency_code, CAST(julianday(rate_date) - ? AS INTEGER), rate "
+        "FROM CurrencyRates ORDER BY currency_code, rate_date",
+        (_JULIAN_TO_ORDINAL,),
+    )
+    try:
+        current, days, rates = None, None, None
+        for code, day, rate in cursor:
+            if code != current:
+                current, days, rates = code, array('q'), array('d')
+                series[code] = (days, rates)
+            days.append(day)
+            rates.append(rate)
+    finally:
+        cursor.close()
+    return RateHistory(series)
+
+
+def get_history() -> RateHistory:
+    """Returns the rate history index, (re)loading it on first use or when it is stale."""
+    global _history
+    history = _history
+    if history is not None and time.monotonic() - history.loaded_at < HISTORY_MAX_AGE:
+        return history
+    with _history_lock:
+        if _history is None or _history is history:
+            _history = _load_history()
+        return _history
+
+
+def invalidate_history() -> None:
+    """Drops the index after a write to CurrencyRates; the next lookup reloads it."""
+    global _history
+    _history = None
+
+
+def import_history(points: Iterable[Tuple[str, object, float]], source: str = 'import') -> int:
+    """
+    Stores historical rates (code, date, units per 1 CNY); an existing
+    point for the same currency and day is replaced.
+
+    Returns the number of stored points.
+    """
+    rows = []
+    for code, day, rate in points:
+        if not code:
+            raise ValueError('Не указан код валюты')
+        code = str(code).upper()
+        rate = float(rate)
+        if code == BASE_CURRENCY:
+            continue
+        if not rate > 0:
+            raise ValueError(f"Курс {code} должен быть положительным")
+        rows.append((code, date.fromordinal(_to_day(day)).isoformat(), rate, source))
+    db = get_db()
+    with db:
+        db.executemany(_UPSERT_HISTORY, rows)
+    invalidate_history()
+    return len(rows)
+
+
+def rates_as_of(day) -> Dict[str, float]:
+    """Rates of every currency that has a history point on or before day."""
+    history = get_history()
+    ordinal = _to_day(day)
+    result = {}
+    for code, (days, rates) in history.series.items():
+        pos = bisect.bisect_right(days, ordinal) - 1
+        if pos >= 0:
+            result[code] = rates[pos]
+    return result
+
+
+def publish_rates(rates: Mapping[str, float], last_update: Optional[str] = None,
+                  source: str = 'manual') -> RateSnapshot:
+    """
+    Stores new rates in currency_rates and as today's point of the rate
+    history (CurrencyRates), then atomically publishes them as a new snapshot.
+    """
+    with _refresh_lock:
+        db = get_db()
+        values = [(code, rate) for code, rate in rates.items() if code != BASE_CURRENCY]
+        db.executemany("INSERT OR REPLACE INTO currency_rates (currency_code, rate) VALUES (?, ?)", values)
+        today = datetime.utcnow().date().isoformat()
+        db.executemany(_UPSERT_HISTORY, [(code, today, rate, source) for code, rate in values])
+        db.commit()
+        invalidate_history()
+        return _publish(rates, last_update)
+
+
 def get_rates() -> Tuple[Dict[str, float], str]:
-    return _state['rates'], _state['last_update']
+    snapshot = get_snapshot()
+    return dict(snapshot.rates), snapshot.last_update
 
 
 def update_rates_now() -> Tuple[Dict[str, float], str]:
-    # Here you would fetch and update rates; we just refresh the timestamp
-    _state['last_update'] = datetime.utcnow().isoformat()
-    return get_rates()
+    # Re-reads currency_rates and publishes the result as a new snapshot version
+    with _refresh_lock:
+        snapshot = _reload()
+    return dict(snapshot.rates), snapshot.last_update
 
 
 def convert_amounts(amount: float, from_code: str) -> Dict[str, float]:
-    rates, _ = get_rates()
+    rates = get_snapshot().rates
     from_code = (from_code or 'CNY').upper()
 
     # Convert arbitrary currency amount to CNY using current rates
@@ -43,3 +365,129 @@ def convert_amounts(amount: float, from_code: str) -> Dict[str, float]:
         'RUB': cny * rates['RUB'],
         'USD': cny * rates['USD'],
     }
+
+
+def _check_rates(codes: Union[str, Sequence[str]], rates) -> None:
+    # A zero or non-finite rate would turn into inf/nan in the response.
+    # codes is one code for the whole column or one code per rate.
+    import numpy as np
+
+    bad = ~np.isfinite(rates) | (rates <= 0)
+    if bad.any():
+        if isinstance(codes, str):
+            invalid = [codes.upper()]
+        else:
+            invalid = sorted({str(code).upper() for code, flag in zip(codes, bad) if flag})
+        raise ValueError(f"Некорректный курс валют: {', '.join(invalid)}")
+
+
+def _check_values(values, message: str) -> None:
+    import numpy as np
+
+    if not np.isfinite(values).all():
+        raise ValueError(message)
+
+
+def convert_batch(amounts: Sequence[float], from_codes: Union[str, Sequence[str]],
+                  to_codes: Optional[Sequence[str]] = None) -> Dict[str, List[float]]:
+    """
+    Converts many amounts at once with the cross-rate matrix of the current snapshot.
+
+    from_codes is either one code for all amounts or one code per amount.
+    Returns columns {target code: [converted amounts]}; every known currency
+    is returned when to_codes is omitted.
+    """
+    import numpy as np
+
+    snapshot = get_snapshot()
+    values = np.asarray(amounts, dtype=float)
+    if values.ndim != 1:
+        raise ValueError('amounts должен быть плоским списком чисел')
+    _check_values(values, 'amounts должен содержать конечные числа')
+
+    if isinstance(from_codes, str):
+        from_idx = np.full(len(values), snapshot.code_indexes([from_codes])[0])
+    else:
+        if len(from_codes) != len(values):
+            raise ValueError('Длины amounts и from должны совпадать')
+        from_idx = snapshot.code_indexes(from_codes)
+
+    if isinstance(to_codes, str):
+        to_codes = [to_codes]
+    targets = list(to_codes) if to_codes else list(snapshot.codes)
+    to_idx = snapshot.code_indexes(targets)
+    used = np.union1d(from_idx, to_idx)
+    _check_rates([snapshot.codes[i] for i in used], snapshot.per_cny[used])
+
+    # One gather + one broadcast multiply for the whole batch
+    factors = snapshot.cross_rates[np.ix_(from_idx, to_idx)]
+    with np.errstate(over='ignore'):
+        converted = values[:, np.newaxis] * factors
+    _check_values(converted, 'Результат конвертации вне допустимого диапазона')
+    return {code.upper(): converted[:, i].tolist() for i, code in enumerate(targets)}
+
+
+def convert_amounts_as_of(amount: float, from_code: str, day) -> Dict[str, float]:
+    """Same as convert_amounts, but at the historical rates as of day."""
+    history = get_history()
+    cny = amount / history.rate_on(from_code or BASE_CURRENCY, day)
+    return {code: cny * history.rate_on(code, day) for code in ('CNY', 'RUB', 'USD')}
+
+
+def convert_batch_as_of(amounts: Sequence[float], from_codes: Union[str, Sequence[str]],
+                        days, to_codes: Optional[Sequence[str]] = None) -> Dict[str, List[float]]:
+    """
+    Converts many amounts at the historical rates as of their dates.
+
+    days is either one date for all amounts or one date per amount (for
+    example, order creation dates). Each (currency, days) column is resolved
+    with one vectorised binary search over the history index.
+    Returns columns like convert_batch; every currency with history is
+    returned when to_codes is omitted.
+    """
+    import numpy as np
+
+    history = get_history()
+    values = np.asarray(amounts, dtype=float)
+    if values.ndim != 1:
+        raise ValueError('amounts должен быть плоским списком чисел')
+    _check_values(values, 'amounts должен содержать конечные числа')
+
+    if isinstance(days, (str, date)):
+        day_idx = np.full(len(values), _to_day(days), dtype=np.int64)
+    else:
+        if len(days) != len(values):
+            raise ValueError('Длины amounts и dates должны совпадать')
+        # Thousands of orders share far fewer distinct dates: each is parsed once
+        parsed: Dict[object, int] = {}
+        for day in days:
+            if day not in parsed:
+                parsed[day] = _to_day(day)
+        day_idx = np.fromiter((parsed[day] for day in days), dtype=np.int64, count=len(days))
+
+    if isinstance(from_codes, str):
+        from_rates = history.rates_on(from_codes, day_idx)
+        _check_rates(from_codes, from_rates)
+    else:
+        if len(from_codes) != len(values):
+            raise ValueError('Длины amounts и from должны совпадать')
+        codes = np.array([str(code).upper() for code in from_codes])
+        from_rates = np.empty(len(values))
+        for code in np.unique(codes):
+            mask = codes == code
+            from_rates[mask] = history.rates_on(str(code), day_idx[mask])
+            _check_rates(str(code), from_rates[mask])
+
+    if isinstance(to_codes, str):
+        to_codes = [to_codes]
+    targets = list(to_codes) if to_codes else list(history.codes)
+    cny = values / from_rates
+    result = {}
+    for code in targets:
+        to_rates = history.rates_on(code, day_idx)
+        _check_rates(code, to_rates)
+        with np.errstate(over='ignore'):
+            converted = cny * to_rates
+        _check_values(converted, 'Результат конвертации вне допустимого диапазона')
+        result[code.upper()] = converted.tolist()
+    return result
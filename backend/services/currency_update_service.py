@@ -0,0 +1,279 @@
+import abc
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from backend.database import get_db, close_db
+from backend.services import currency_service
+
+logger = logging.getLogger(__name__)
+
+CBR_DAILY_URL = 'https://www.cbr-xml-daily.ru/daily_json.js'
+
+# How many finished jobs to remember for GET /api/currency/update-jobs/<id>
+MAX_TRACKED_JOBS = 100
+
+
+class RateProvider(abc.ABC):
+    """Source of rates. fetch() returns {code: units per 1 CNY}."""
+    name = 'base'
+
+    @abc.abstractmethod
+    def fetch(self) -> Dict[str, float]:
+        """Return the current rates; raise on any transport or format error."""
+
+
+class FileRateProvider(RateProvider):
+    """Reads rates from a local JSON file: {"RUB": 12.0, ...} or {"rates": {...}}."""
+    name = 'file'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self) -> Dict[str, float]:
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        rates = data.get('rates', data)
+        return {code.upper(): float(rate) for code, rate in rates.items()}
+
+
+class CbrRateProvider(RateProvider):
+    """Daily rates of the Central Bank of Russia, recalculated to the CNY base."""
+    name = 'cbr'
+
+    def __init__(self, url: str = CBR_DAILY_URL, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self) -> Dict[str, float]:
+        # urllib.request is slow to import and only needed for this provider
+        import urllib.request
+
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as resp:
+            data = json.load(resp)
+        valutes = data['Valute']
+
+        # CBR quotes everything in RUB per `Nominal` units
+        def rub_per_unit(code: str) -> float:
+            return valutes[code]['Value'] / valutes[code]['Nominal']
+
+        rub_per_cny = rub_per_unit('CNY')
+        rates = {'RUB': rub_per_cny}
+        for code in valutes:
+            if code != 'CNY':
+                rates[code] = rub_per_cny / rub_per_unit(code)
+        return rates
+
+
+def provider_from_spec(spec: str = 'cbr') -> RateProvider:
+    """
+    Builds the provider from a CURRENCY_PROVIDER value: "cbr" (default) or "file:<path>".
+    """
+    if spec.startswith('file:'):
+        return FileRateProvider(spec[len('file:'):])
+    if spec == 'cbr':
+        return CbrRateProvider()
+    raise ValueError(f"Неизвестный источник курсов: {spec}")
+
+
+class CurrencyUpdateScheduler:
+    """
+    Refreshes rates in a background thread.
+
+    Runs every `interval` seconds (plus random jitter), retries failures with
+    exponential backoff and stops calling the provider for `reset_timeout`
+    seconds after `failure_threshold` consecutive failures (circuit breaker).
+    Manual refreshes are queued with enqueue() and run on the same thread.
+    With periodic=False only manual refreshes run (gunicorn workers that do
+    not hold the background lock, see backend.background).
+    """
+
+    def __init__(self, provider: RateProvider, interval: float = 3600.0,
+                 jitter: float = 0.1, backoff_base: float = 5.0,
+                 failure_threshold: int = 5, reset_timeout: float = 600.0,
+                 periodic: bool = True):
+        self.provider = provider
+        self.interval = interval
+        self.periodic = periodic
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.circuit_open_until = 0.0
+        self.next_run = time.monotonic()
+
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='currency-updater', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def set_periodic(self, periodic: bool) -> None:
+        """Turns scheduled refreshes on or off; turning them on refreshes right away."""
+        self.periodic = periodic
+        if periodic:
+            self.next_run = time.monotonic()
+        self._wakeup.set()
+
+    def enqueue(self) -> str:
+        """Queues an immediate refresh and returns its job id."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'created_at': datetime.utcnow().isoformat(),
+                'finished_at': None,
+                'error': None,
+            }
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+            self._pending.append(job_id)
+        self._wakeup.set()
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _set_jobs(self, job_ids, **fields) -> None:
+        with self._lock:
+            for job_id in job_ids:
+                if job_id in self._jobs:
+                    self._jobs[job_id].update(fields)
+
+    def _delay(self) -> float:
+        if self.failures:
+            delay = min(self.interval, self.backoff_base * 2 ** (self.failures - 1))
+        else:
+            delay = self.interval
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            timeout = max(0.0, self.next_run - time.monotonic()) if self.periodic else None
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+
+            with self._lock:
+                job_ids, self._pending = self._pending, []
+            if not job_ids and (not self.periodic or time.monotonic() < self.next_run):
+                continue
+            self.run_once(job_ids)
+
+    def run_once(self, job_ids=()) -> bool:
+        """Fetches and publishes rates once. Returns True on success."""
+        now = time.monotonic()
+        if now < self.circuit_open_until:
+            error = 'Источник курсов временно отключен после серии ошибок'
+            self._set_jobs(job_ids, status='error', error=error,
+                           finished_at=datetime.utcnow().isoformat())
+            self.next_run = self.circuit_open_until
+            return False
+
+        self._set_jobs(job_ids, status='running')
+        try:
+            rates = self.provider.fetch()
+            currency_service.publish_rates(rates, source=self.provider.name)
+            _record_update('success', None, self.provider.name)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Ошибка обновления курсов валют ({self.provider.name}): {e}")
+            if self.failures >= self.failure_threshold:
+                self.circuit_open_until = now + self.reset_timeout
+            _record_update('error', str(e), self.provider.name)
+            self._set_jobs(job_ids, status='error', error=str(e),
+                           finished_at=datetime.utcnow().isoformat())
+            self.next_run = time.monotonic() + self._delay()
+            return False
+        finally:
+            # The thread keeps no connection between runs
+            close_db()
+
+        self.failures = 0
+        self.circuit_open_until = 0.0
+        self._set_jobs(job_ids, status='success', finished_at=datetime.utcnow().isoformat())
+        self.next_run = time.monotonic() + self._delay()
+        return True
+
+
+def _record_update(status: str, error_message: Optional[str], source: str) -> None:
+    try:
+        db = get_db()
+        # After a failed publish_rates the connection may still hold its partial
+        # writes; they must not be committed together with the error row
+        db.rollback()
+        with db:
+            db.execute(
+                "INSERT INTO CurrencyUpdates (last_update, status, error_message, source) "
+                "VALUES (?, ?, ?, ?)",
+                (datetime.utcnow().isoformat(sep=' ', timespec='seconds'), status, error_message, source),
+            )
+    except Exception as e:
+        logger.error(f"Не удалось записать результат обновления курсов: {e}")
+
+
+_scheduler: Optional[CurrencyUpdateScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler(provider: RateProvider, interval: float = 3600.0,
+                    periodic: bool = True) -> CurrencyUpdateScheduler:
+    """Starts the process-wide scheduler (create_app does it when CURRENCY_UPDATE_ENABLED)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CurrencyUpdateScheduler(provider, interval=interval, periodic=periodic)
+            _scheduler.start()
+        return _scheduler
+
+
+def get_scheduler() -> Optional[CurrencyUpdateScheduler]:
+    return _scheduler
+
+
+def stop_scheduler() -> None:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler = None
+
+
+def request_rates_update() -> Optional[str]:
+    """
+    Queues a background refresh and returns the job id, or None when the
+    scheduler is not running (CURRENCY_UPDATE_ENABLED is off).
+    """
+    scheduler = _scheduler
+    return scheduler.enqueue() if scheduler is not None else None
+
+
+def get_update_job(job_id: str) -> Optional[Dict[str, Any]]:
+    scheduler = _scheduler
+    return scheduler.get_job(job_id) if scheduler is not None else None
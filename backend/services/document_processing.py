@@ -0,0 +1,201 @@
+# backend/services/document_processing.py
+"""
+Обработка содержимого документов: извлечение текста и миниатюры.
+
+Функции выполняются в дочерних процессах ProcessPoolExecutor (см. конвейер
+в document_service), поэтому модуль не импортирует Flask и базу данных и
+возвращает только небольшой словарь, а миниатюру сам записывает на диск.
+
+Необязательные зависимости импортируются при первом использовании:
+    pypdf    — текст PDF (без него работает простой встроенный разбор)
+    Pillow   — миниатюры изображений
+    PyMuPDF  — миниатюра первой страницы PDF
+Без них соответствующий шаг пропускается, а не завершается ошибкой.
+"""
+import codecs
+import logging
+import mimetypes
+import os
+import re
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Длинная сторона миниатюры, пиксели
+THUMBNAIL_SIZE = 256
+# Сколько символов текста документа попадает в поисковый индекс
+MAX_TEXT_CHARS = 1_000_000
+
+_TEXT_TYPES = ('text/plain', 'text/csv', 'application/json', 'application/xml', 'text/xml')
+
+_STREAM_RE = re.compile(rb'<<(.*?)>>\s*stream\r?\n(.*?)\r?\nendstream', re.S)
+_PAGE_RE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+# Строки в операторах Tj, ' и " и массивы TJ
+_TEXT_OP_RE = re.compile(rb'\((?:\\.|[^\\)])*\)\s*(?:Tj|\'|")|\[(?:\\.|[^\]\\])*\]\s*TJ|T\*|Td|TD|ET', re.S)
+_PDF_STRING_RE = re.compile(rb'\(((?:\\.|[^\\)])*)\)', re.S)
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                b'(': b'(', b')': b')', b'\\': b'\\'}
+
+
+def guess_type(filename: str, content_type: Optional[str]) -> str:
+    """Тип содержимого: указанный при загрузке или по расширению файла."""
+    if content_type and content_type != 'application/octet-stream':
+        return content_type.split(';')[0].strip().lower()
+    return mimetypes.guess_type(filename or '')[0] or 'application/octet-stream'
+
+
+def _unescape_pdf_string(raw: bytes) -> bytes:
+    result = bytearray()
+    i = 0
+    while i < len(raw):
+        char = raw[i:i + 1]
+        if char != b'\\':
+            result += char
+            i += 1
+            continue
+        following = raw[i + 1:i + 2]
+        if following in _PDF_ESCAPES:
+            result += _PDF_ESCAPES[following]
+            i += 2
+        elif following and following in b'01234567':
+            octal = re.match(rb'[0-7]{1,3}', raw[i + 1:i + 4]).group()
+            result.append(int(octal, 8) & 0xFF)
+            i += 1 + len(octal)
+        elif following in (b'\r', b'\n'):
+            # Перенос строки после обратной косой черты — продолжение строки;
+            # \r\n считается одним переносом
+            i += 2
+            if following == b'\r' and raw[i:i + 1] == b'\n':
+                i += 1
+        else:
+            # Неизвестная escape-последовательность: по спецификации PDF
+            # отбрасывается только обратная косая черта
+            i += 1
+    return bytes(result)
+
+
+def _pdf_text_builtin(data: bytes) -> Tuple[str, int]:
+    """
+    Простой разбор PDF без зависимостей: распаковывает потоки FlateDecode и
+    собирает строки из текстовых операторов. Подходит для PDF со стандартными
+    шрифтами; текст во встроенных шрифтах с CID-кодировкой не извлекается.
+    """
+    parts = []
+    for header, stream in _STREAM_RE.findall(data):
+        if b'/FlateDecode' in header:
+            try:
+                stream = zlib.decompress(stream)
+            except zlib.error:
+                continue
+        elif b'/Filter' in header:
+            continue
+        if b'BT' not in stream:
+            continue
+        line = []
+        for match in _TEXT_OP_RE.finditer(stream):
+            token = match.group()
+            if token in (b'T*', b'Td', b'TD', b'ET'):
+                if line:
+                    parts.append(b''.join(line))
+                    line = []
+                continue
+            line.extend(_unescape_pdf_string(s) for s in _PDF_STRING_RE.findall(token))
+        if line:
+            parts.append(b''.join(line))
+    text = '\n'.join(part.decode('cp1252', errors='replace') for part in parts)
+    return text, len(_PAGE_RE.findall(data))
+
+
+def _pdf_text(path: str) -> Tuple[str, int]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        with open(path, 'rb') as f:
+            return _pdf_text_builtin(f.read())
+    reader = PdfReader(path)
+    text = '\n'.join(page.extract_text() or '' for page in reader.pages)
+    return text, len(reader.pages)
+
+
+def _plain_text(path: str) -> str:
+    limit = MAX_TEXT_CHARS * 2
+    with open(path, 'rb') as f:
+        data = f.read(limit)
+    try:
+        # Обрезка по limit байт может разрезать многобайтовый символ UTF-8:
+        # незавершенный хвост отбрасывается, а не считается признаком cp1251
+        return codecs.getincrementaldecoder('utf-8')().decode(data, final=len(data) < limit)
+    except UnicodeDecodeError:
+        # Выгрузки из 1С и старых систем приходят в cp1251
+        return data.decode('cp1251', errors='replace')
+
+
+def _image_thumbnail(path: str, thumbnail_path: str) -> bool:
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    with Image.open(path) as image:
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        _save_jpeg(image, thumbnail_path)
+    return True
+
+
+def _pdf_thumbnail(path: str, thumbnail_path: str) -> bool:
+    try:
+        import fitz
+    except ImportError:
+        return False
+    with fitz.open(path) as pdf:
+        if not pdf.page_count:
+            return False
+        page = pdf[0]
+        zoom = THUMBNAIL_SIZE / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        tmp_path = thumbnail_path + '.tmp'
+        pixmap.save(tmp_path, output='jpeg')
+    os.replace(tmp_path, thumbnail_path)
+    return True
+
+
+def _save_jpeg(image, thumbnail_path: str) -> None:
+    tmp_path = thumbnail_path + '.tmp'
+    image.convert('RGB').save(tmp_path, 'JPEG', quality=80)
+    os.replace(tmp_path, thumbnail_path)
+
+
+def process_file(path: str, filename: str, content_type: Optional[str],
+                 thumbnail_path: str) -> Dict[str, Any]:
+    """
+    Извлекает текст и строит миниатюру документа.
+
+    Аргументы:
+        path (str): Файл содержимого
+        filename (str): Имя документа (для определения типа по расширению)
+        content_type (str, опционально): Тип содержимого, указанный при загрузке
+        thumbnail_path (str): Куда записать миниатюру JPEG
+
+    Возвращает:
+        Dict: {'text': извлеченный текст, 'pages': число страниц или None,
+               'thumbnail': True, если миниатюра записана}
+    """
+    kind = guess_type(filename, content_type)
+    text, pages = '', None
+    if kind == 'application/pdf':
+        text, pages = _pdf_text(path)
+    elif kind.startswith('text/') or kind in _TEXT_TYPES:
+        text = _plain_text(path)
+
+    thumbnail = False
+    if kind.startswith('image/') or kind == 'application/pdf':
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        try:
+            if kind == 'application/pdf':
+                thumbnail = _pdf_thumbnail(path, thumbnail_path)
+            else:
+                thumbnail = _image_thumbnail(path, thumbnail_path)
+        except Exception as e:
+            # Без миниатюры документ все равно попадает в поиск
+            logger.warning(f"Не удалось построить миниатюру {filename}: {e}")
+    return {'text': text[:MAX_TEXT_CHARS], 'pages': pages, 'thumbnail': thumbnail}
@@ -0,0 +1,890 @@
+# backend/services/document_service.py
+"""
+Хранилище документов (инвойсы, упаковочные листы, декларации, сканы).
+
+Файл загружается частями: клиент создает загрузку (create_upload), затем
+отправляет части по порядку (write_chunk), и каждая часть сразу пишется
+во временный файл на диске, не собираясь в памяти воркера. Прерванную
+загрузку можно продолжить с байта received. Когда получен последний байт,
+файл переносится в хранилище под именем, равным его SHA-256; повторно
+загруженный файл с тем же содержимым хранится один раз.
+
+После загрузки документ ставится в очередь обработки (таблица DocumentJobs):
+DocumentPipeline в фоновом потоке берет задания и выполняет извлечение
+текста и построение миниатюр в пуле процессов, поэтому запрос загрузки
+отвечает сразу, а тяжелая работа идет на всех ядрах вне воркеров API.
+Очередь хранится в базе и переживает перезапуск; неудачные задания
+повторяются с нарастающей задержкой.
+
+Структура каталога DOCUMENTS_DIR:
+    blobs/ab/abcdef...   содержимое документов
+    thumbs/ab/abcdef...  миниатюры (JPEG)
+    uploads/<id>.part    незавершенные загрузки
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from backend.database import close_db, get_db
+from backend.database.schema import fold_sql
+from backend.services.document_processing import process_file
+from backend.services.search_service import fold_text, fts_query
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TYPES = ('invoice', 'packing_list', 'customs_declaration', 'contract', 'photo', 'other')
+
+DOCUMENT_COLUMNS = ('id', 'sha256', 'filename', 'content_type', 'size', 'doc_type',
+                    'order_id', 'shipment_id', 'created_date', 'pages', 'thumbnail')
+_SELECT_DOCUMENT = f"SELECT {', '.join(DOCUMENT_COLUMNS)} FROM Documents"
+
+UPLOAD_COLUMNS = ('id', 'filename', 'content_type', 'size', 'received', 'sha256', 'doc_type',
+                  'order_id', 'shipment_id', 'created_date', 'updated_date')
+_SELECT_UPLOAD = f"SELECT {', '.join(UPLOAD_COLUMNS)} FROM DocumentUploads"
+
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+JOB_COLUMNS = ('id', 'document_id', 'state', 'attempts', 'available_at', 'lease_until', 'error',
+               'created_date', 'started_at', 'finished_at')
+_SELECT_JOB = f"SELECT {', '.join(JOB_COLUMNS)} FROM DocumentJobs"
+
+_EDITABLE_FIELDS = ('filename', 'doc_type', 'order_id', 'shipment_id')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Буфер копирования из тела запроса в файл
+COPY_BUFFER_SIZE = 256 * 1024
+
+# Незавершенные загрузки старше суток удаляются
+STALE_UPLOAD_AGE = 24 * 3600
+_PURGE_INTERVAL = 3600
+_last_purge = 0.0
+
+# SHA-256 считается по ходу загрузки: upload_id -> (сколько байт учтено, хеш).
+# Если части пришли не по порядку или загрузку продолжает другой процесс,
+# хеш пересчитывается по файлу при завершении.
+_hashers: Dict[str, Tuple[int, Any]] = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadOffsetError(ValueError):
+    """Часть файла начинается не с того байта, который ожидает сервер."""
+
+    def __init__(self, received: int):
+        super().__init__(f"Ожидается часть, начинающаяся с байта {received}")
+        self.received = received
+
+
+def _row_to_document(row) -> Dict[str, Any]:
+    return dict(zip(DOCUMENT_COLUMNS, row))
+
+
+def _row_to_job(row) -> Dict[str, Any]:
+    return dict(zip(JOB_COLUMNS, row))
+
+
+def _row_to_upload(row) -> Dict[str, Any]:
+    return dict(zip(UPLOAD_COLUMNS, row))
+
+
+def get_storage_dir() -> str:
+    """Возвращает каталог хранилища документов (DOCUMENTS_DIR)."""
+    return current_app.config['DOCUMENTS_DIR']
+
+
+def blob_path(sha256: str, storage_dir: Optional[str] = None) -> str:
+    """
+    Путь к содержимому документа в хранилище.
+
+    Аргументы:
+        sha256 (str): Хеш содержимого
+        storage_dir (str, опционально): Каталог хранилища; по умолчанию DOCUMENTS_DIR
+
+    Возвращает:
+        str: Путь к файлу
+    """
+    return os.path.join(storage_dir or get_storage_dir(), 'blobs', sha256[:2], sha256)
+
+
+def thumbnail_path(sha256: str, storage_dir: Optional[str] = None) -> str:
+    """Путь к миниатюре документа; миниатюра, как и содержимое, адресуется SHA-256."""
+    return os.path.join(storage_dir or get_storage_dir(), 'thumbs', sha256[:2], f'{sha256}.jpg')
+
+
+def _upload_path(upload_id: str) -> str:
+    return os.path.join(get_storage_dir(), 'uploads', f'{upload_id}.part')
+
+
+def _link_fields(data: Dict[str, Any], fields) -> Tuple[List[str], List[Any]]:
+    """Проверяет поля документа и возвращает их имена и значения для SQL."""
+    names = [field for field in fields if field in data]
+    values = []
+    db = get_db()
+    for field in names:
+        value = data[field]
+        if field == 'filename':
+            # От пути, присланного браузером, оставляем только имя файла
+            value = os.path.basename(str(value or '').replace('\\', '/')).strip()
+            if not value:
+                raise ValueError("Не указано имя файла")
+        elif field == 'doc_type':
+            value = value or 'other'
+            if value not in DOCUMENT_TYPES:
+                raise ValueError(f"Неизвестный тип документа: {value}. Допустимые: {', '.join(DOCUMENT_TYPES)}")
+        elif field in ('order_id', 'shipment_id') and value not in (None, ''):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} должен быть целым числом")
+            table, name = ('orders', 'Заявка') if field == 'order_id' else ('Shipments', 'Отгрузка')
+            if db.execute(f"SELECT 1 FROM {table} WHERE id = ?", (value,)).fetchone() is None:
+                raise ValueError(f"{name} {value} не найдена")
+        elif field in ('order_id', 'shipment_id'):
+            value = None
+        values.append(value)
+    return names, values
+
+
+def get_document(document_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Получает метаданные документа.
+
+    Аргументы:
+        document_id (int): Идентификатор документа
+
+    Возвращает:
+        Optional[Dict]: Документ или None, если он не найден
+    """
+    row = get_db().execute(f"{_SELECT_DOCUMENT} WHERE id = ?", (document_id,)).fetchone()
+    return _row_to_document(row) if row else None
+
+
+def list_documents(order_id: Optional[int] = None,
+                   shipment_id: Optional[int] = None,
+                   doc_type: Optional[str] = None,
+                   limit: int = DEFAULT_PAGE_SIZE,
+                   cursor: Optional[int] = None,
+                   q: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Получает страницу документов, новые первыми.
+
+    Аргументы:
+        order_id (int, опционально): Заявка
+        shipment_id (int, опционально): Отгрузка
+        doc_type (str, опционально): Тип документа
+        q (str, опционально): Слова (или их начала) из имени или текста документа;
+                              ищутся по индексу DocumentsFts среди обработанных документов
+        limit (int): Размер страницы (не больше MAX_PAGE_SIZE)
+        cursor (int, опционально): next_cursor предыдущей страницы
+
+    Возвращает:
+        Dict: {'documents': список документов, 'next_cursor': курсор следующей страницы или None}
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    conditions: List[str] = []
+    params: List[Any] = []
+    if order_id is not None:
+        conditions.append("order_id = ?")
+        params.append(order_id)
+    if shipment_id is not None:
+        conditions.append("shipment_id = ?")
+        params.append(shipment_id)
+    if doc_type:
+        if doc_type not in DOCUMENT_TYPES:
+            raise ValueError(f"Неизвестный тип документа: {doc_type}")
+        conditions.append("doc_type = ?")
+        params.append(doc_type)
+    if q:
+        match = fts_query(q)
+        if match is None:
+            return {'documents': [], 'next_cursor': None}
+        conditions.append("id IN (SELECT rowid FROM DocumentsFts WHERE DocumentsFts MATCH ?)")
+        params.append(match)
+    if cursor is not None:
+        conditions.append("id < ?")
+        params.append(int(cursor))
+
+    query = _SELECT_DOCUMENT
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    documents = [_row_to_document(row) for row in get_db().execute(query, params).fetchall()]
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = documents[-1]['id']
+    return {'documents': documents, 'next_cursor': next_cursor}
+
+
+def update_document(document_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Изменяет имя, тип или привязку документа к заявке и отгрузке.
+    Содержимое документа не меняется.
+
+    Возвращает:
+        Optional[Dict]: Обновленный документ или None, если он не найден
+
+    Исключения:
+        ValueError: Нет полей для обновления или поля некорректны
+    """
+    fields, values = _link_fields(data, _EDITABLE_FIELDS)
+    if not fields:
+        raise ValueError("Нет полей для обновления")
+    db = get_db()
+    try:
+        with db:
+            row = db.execute(
+                f"UPDATE Documents SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ? "
+                f"RETURNING {', '.join(DOCUMENT_COLUMNS)}",
+                values + [document_id],
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при обновлении документа {document_id}: {e}")
+        raise
+    return _row_to_document(row) if row else None
+
+
+def delete_document(document_id: int) -> int:
+    """
+    Удаляет документ. Содержимое и миниатюра удаляются с диска, когда на
+    них не ссылается ни один документ.
+
+    Возвращает:
+        int: Количество удаленных документов (0 или 1)
+
+    Исключения:
+        sqlite3.Error, OSError: Ошибка базы данных или удаления файла;
+            транзакция откатывается
+    """
+    db = get_db()
+    try:
+        with db:
+            row = db.execute("DELETE FROM Documents WHERE id = ? RETURNING sha256", (document_id,)).fetchone()
+            if row is None:
+                return 0
+            sha256 = row[0]
+            orphan = db.execute(
+                "DELETE FROM DocumentBlobs WHERE sha256 = ? "
+                "AND NOT EXISTS (SELECT 1 FROM Documents WHERE sha256 = ?)",
+                (sha256, sha256),
+            ).rowcount
+            # Файл удаляется, пока транзакция держит блокировку записи: параллельное
+            # завершение загрузки с тем же содержимым не увидит запись без файла
+            if orphan:
+                for path in (blob_path(sha256), thumbnail_path(sha256)):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Ошибка при удалении документа {document_id}: {e}")
+        raise
+    return 1
+
+
+def create_upload(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Начинает загрузку документа по частям.
+
+    Аргументы:
+        data (Dict): filename и size (обязательно), content_type, doc_type,
+                     order_id, shipment_id, sha256 (ожидаемый хеш для проверки)
+
+    Возвращает:
+        Dict: Загрузка с идентификатором id и received = 0
+
+    Исключения:
+        ValueError: Некорректные поля, пустой или слишком большой файл
+    """
+    _purge_if_due()
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        raise ValueError("Не указан размер файла (size)")
+    if size <= 0:
+        raise ValueError("Файл пустой")
+    max_size = current_app.config['DOCUMENTS_MAX_SIZE']
+    if size > max_size:
+        raise ValueError(f"Файл больше {max_size} байт")
+    sha256 = data.get('sha256')
+    if sha256 is not None:
+        sha256 = str(sha256).lower()
+        if len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256):
+            raise ValueError("sha256 должен быть шестнадцатеричной строкой из 64 символов")
+
+    fields, values = _link_fields({'filename': data.get('filename'), **data}, _EDITABLE_FIELDS)
+    upload_id = uuid.uuid4().hex
+    path = _upload_path(upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Файл создается сразу нужного размера, части дописываются на свои места
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+    fields += ['id', 'size', 'content_type', 'sha256']
+    values += [upload_id, size, data.get('content_type') or None, sha256]
+    db = get_db()
+    try:
+        with db:
+            db.execute(
+                f"INSERT INTO DocumentUploads ({', '.join(fields)}) VALUES ({', '.join('?' for _ in fields)})",
+                values,
+            )
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при создании загрузки документа: {e}")
+        os.remove(path)
+        raise
+    return get_upload(upload_id)
+
+
+def get_upload(upload_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Получает состояние загрузки: сколько байт уже принято (received).
+
+    Возвращает:
+        Optional[Dict]: Загрузка или None, если она не найдена или уже завершена
+    """
+    row = get_db().execute(f"{_SELECT_UPLOAD} WHERE id = ?", (upload_id,)).fetchone()
+    return _row_to_upload(row) if row else None
+
+
+def abort_upload(upload_id: str) -> int:
+    """
+    Отменяет загрузку и удаляет принятые части.
+
+    Возвращает:
+        int: Количество отмененных загрузок (0 или 1)
+    """
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    db = get_db()
+    try:
+        with db:
+            deleted = db.execute("DELETE FROM DocumentUploads WHERE id = ?", (upload_id,)).rowcount
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при отмене загрузки {upload_id}: {e}")
+        return 0
+    try:
+        os.remove(_upload_path(upload_id))
+    except FileNotFoundError:
+        pass
+    return deleted
+
+
+def write_chunk(upload_id: str, offset: int, stream: BinaryIO,
+                length: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Записывает часть файла, читая тело запроса потоком в буфер COPY_BUFFER_SIZE.
+
+    Часть может начинаться с любого байта до received включительно: повторная
+    отправка уже принятой части безопасна. Когда принят последний байт,
+    загрузка завершается и создается документ.
+
+    Аргументы:
+        upload_id (str): Идентификатор загрузки
+        offset (int): С какого байта файла начинается часть
+        stream: Поток с телом части
+        length (int, опционально): Длина части, если известна
+
+    Возвращает:
+        Optional[Dict]: {'upload': состояние загрузки, 'document': документ или None,
+                         'job': задание обработки документа или None}
+                        или None, если загрузка не найдена
+
+    Исключения:
+        UploadOffsetError: offset больше received
+        ValueError: Часть выходит за размер файла
+    """
+    upload = get_upload(upload_id)
+    if upload is None:
+        return None
+    if offset < 0 or offset > upload['received']:
+        raise UploadOffsetError(upload['received'])
+    remaining = upload['size'] - offset
+    if length is not None and length > remaining:
+        raise ValueError(f"Часть выходит за размер файла ({upload['size']} байт)")
+
+    with _hashers_lock:
+        position, hasher = _hashers.pop(upload_id, (0, None))
+    if offset == 0:
+        hasher = hashlib.sha256()
+    elif position != offset:
+        hasher = None
+
+    written = 0
+    try:
+        with open(_upload_path(upload_id), 'r+b') as f:
+            f.seek(offset)
+            while True:
+                buffer = stream.read(COPY_BUFFER_SIZE)
+                if not buffer:
+                    break
+                written += len(buffer)
+                if written > remaining:
+                    raise ValueError(f"Часть выходит за размер файла ({upload['size']} байт)")
+                f.write(buffer)
+                if hasher is not None:
+                    hasher.update(buffer)
+            f.flush()
+            # received в базе не должен опережать данные на диске
+            os.fsync(f.fileno())
+    except FileNotFoundError:
+        logger.error(f"Файл загрузки {upload_id} не найден")
+        abort_upload(upload_id)
+        return None
+
+    db = get_db()
+    try:
+        with db:
+            row = db.execute(
+                "UPDATE DocumentUploads SET received = MAX(received, ?), updated_date = CURRENT_TIMESTAMP "
+                f"WHERE id = ? RETURNING {', '.join(UPLOAD_COLUMNS)}",
+                (offset + written, upload_id),
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при сохранении части загрузки {upload_id}: {e}")
+        raise
+    if row is None:
+        return None
+    upload = _row_to_upload(row)
+
+    if hasher is not None:
+        with _hashers_lock:
+            _hashers[upload_id] = (offset + written, hasher)
+    if upload['received'] < upload['size']:
+        return {'upload': upload, 'document': None, 'job': None}
+    document, job = _complete_upload(upload)
+    return {'upload': upload, 'document': document, 'job': job}
+
+
+def _file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buffer in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            hasher.update(buffer)
+    return hasher.hexdigest()
+
+
+def _complete_upload(upload: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Переносит принятый файл в хранилище, создает документ и задание его обработки."""
+    upload_id = upload['id']
+    part = _upload_path(upload_id)
+    with _hashers_lock:
+        position, hasher = _hashers.pop(upload_id, (0, None))
+    sha256 = hasher.hexdigest() if hasher is not None and position == upload['size'] else _file_sha256(part)
+    if upload['sha256'] and upload['sha256'] != sha256:
+        abort_upload(upload_id)
+        raise ValueError("Контрольная сумма файла не совпадает с указанной (sha256), загрузка отменена")
+
+    path = blob_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = get_db()
+    try:
+        with db:
+            # INSERT берет блокировку записи, поэтому проверка «такое содержимое уже
+            # есть» и перенос файла не пересекаются с delete_document
+            created = db.execute("INSERT OR IGNORE INTO DocumentBlobs (sha256, size) VALUES (?, ?)",
+                                 (sha256, upload['size'])).rowcount
+            if created or not os.path.exists(path):
+                os.replace(part, path)
+            else:
+                os.remove(part)
+            row = db.execute(
+                "INSERT INTO Documents (sha256, filename, content_type, size, doc_type, order_id, shipment_id) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING {', '.join(DOCUMENT_COLUMNS)}",
+                (sha256, upload['filename'], upload['content_type'], upload['size'],
+                 upload['doc_type'], upload['order_id'], upload['shipment_id']),
+            ).fetchone()
+            db.execute("DELETE FROM DocumentUploads WHERE id = ?", (upload_id,))
+            # Обработка ставится в очередь в той же транзакции: документ не
+            # может остаться без задания, даже если процесс упадет сразу после
+            job = db.execute(f"INSERT INTO DocumentJobs (document_id) VALUES (?) RETURNING {', '.join(JOB_COLUMNS)}",
+                             (row[0],)).fetchone()
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Ошибка при завершении загрузки {upload_id}: {e}")
+        raise
+    document = _row_to_document(row)
+    logger.info(f"Загружен документ {document['id']} ({document['filename']}, "
+                f"{'новое содержимое' if created else 'содержимое уже было в хранилище'})")
+    _notify_pipeline()
+    return document, _row_to_job(job)
+
+
+def purge_stale_uploads(max_age: float = STALE_UPLOAD_AGE) -> int:
+    """
+    Удаляет загрузки, в которые не приходили части дольше max_age секунд.
+
+    Возвращает:
+        int: Количество удаленных загрузок
+    """
+    threshold = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - max_age))
+    rows = get_db().execute("SELECT id FROM DocumentUploads WHERE updated_date < ?", (threshold,)).fetchall()
+    return sum(abort_upload(row[0]) for row in rows)
+
+
+def _purge_if_due() -> None:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < _PURGE_INTERVAL:
+        return
+    _last_purge = now
+    try:
+        purged = purge_stale_uploads()
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при очистке незавершенных загрузок: {e}")
+        return
+    if purged:
+        logger.info(f"Удалено незавершенных загрузок: {purged}")
+
+
+def _utc(offset: float = 0.0) -> str:
+    """Время в формате CURRENT_TIMESTAMP со сдвигом offset секунд от текущего."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() + offset))
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Получает задание обработки документа.
+
+    Возвращает:
+        Optional[Dict]: Задание (state — один из JOB_STATES) или None, если оно не найдено
+    """
+    row = get_db().execute(f"{_SELECT_JOB} WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def get_document_jobs(document_id: int) -> List[Dict[str, Any]]:
+    """Задания обработки документа, последние первыми."""
+    rows = get_db().execute(f"{_SELECT_JOB} WHERE document_id = ? ORDER BY id DESC",
+                            (document_id,)).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def enqueue_processing(document_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Ставит документ в очередь обработки повторно (например, после ошибки).
+    Если задание уже ждет или выполняется, возвращается оно.
+
+    Возвращает:
+        Optional[Dict]: Задание или None, если документ не найден
+    """
+    db = get_db()
+    try:
+        with db:
+            row = db.execute(
+                f"{_SELECT_JOB} WHERE document_id = ? AND state IN ('queued', 'running') ORDER BY id DESC LIMIT 1",
+                (document_id,),
+            ).fetchone()
+            if row is None:
+                row = db.execute(
+                    f"INSERT INTO DocumentJobs (document_id) SELECT id FROM Documents WHERE id = ? "
+                    f"RETURNING {', '.join(JOB_COLUMNS)}",
+                    (document_id,),
+                ).fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при постановке документа {document_id} в очередь обработки: {e}")
+        raise
+    if row is None:
+        return None
+    _notify_pipeline()
+    return _row_to_job(row)
+
+
+def claim_job(lease: float) -> Optional[Dict[str, Any]]:
+    """
+    Берет следующее задание из очереди одним UPDATE ... RETURNING, поэтому
+    несколько процессов могут разбирать одну очередь, не получая одно задание
+    дважды. Задание, чья аренда истекла (процесс упал или перезапущен),
+    считается снова свободным.
+
+    Аргументы:
+        lease (float): На сколько секунд задание закрепляется за вызывающим
+
+    Возвращает:
+        Optional[Dict]: Задание в состоянии running или None, если очередь пуста
+    """
+    now = _utc()
+    db = get_db()
+    try:
+        with db:
+            row = db.execute(
+                f"""
+                UPDATE DocumentJobs
+                SET state = 'running', attempts = attempts + 1, started_at = ?, lease_until = ?
+                WHERE id = (
+                    SELECT id FROM DocumentJobs
+                    WHERE (state = 'queued' AND available_at <= ?) OR (state = 'running' AND lease_until < ?)
+                    ORDER BY id LIMIT 1
+                )
+                RETURNING {', '.join(JOB_COLUMNS)}
+                """,
+                (now, _utc(lease), now, now),
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при получении задания обработки документов: {e}")
+        return None
+    return _row_to_job(row) if row else None
+
+
+def _finish_job(job_id: int, state: str, error: Optional[str] = None,
+                retry_at: Optional[str] = None) -> None:
+    db = get_db()
+    with db:
+        if retry_at is not None:
+            db.execute("UPDATE DocumentJobs SET state = 'queued', available_at = ?, lease_until = NULL, "
+                       "error = ? WHERE id = ?", (retry_at, error, job_id))
+        else:
+            db.execute("UPDATE DocumentJobs SET state = ?, error = ?, lease_until = NULL, finished_at = ? "
+                       "WHERE id = ?", (state, error, _utc(), job_id))
+
+
+def save_processing_result(job_id: int, document_id: int, result: Dict[str, Any]) -> None:
+    """
+    Сохраняет текст документа в индекс DocumentsFts, число страниц и признак
+    миниатюры и завершает задание — одной транзакцией.
+    """
+    db = get_db()
+    with db:
+        db.execute("DELETE FROM DocumentsFts WHERE rowid = ?", (document_id,))
+        # Документ могли удалить, пока он обрабатывался: тогда индекс не пополняется
+        db.execute(f"INSERT INTO DocumentsFts (rowid, filename, content) SELECT id, {fold_sql('filename')}, ? "
+                   "FROM Documents WHERE id = ?", (fold_text(result.get('text') or ''), document_id))
+        db.execute("UPDATE Documents SET pages = ?, thumbnail = ? WHERE id = ?",
+                   (result.get('pages'), 1 if result.get('thumbnail') else 0, document_id))
+        db.execute("UPDATE DocumentJobs SET state = 'done', error = NULL, lease_until = NULL, finished_at = ? "
+                   "WHERE id = ?", (_utc(), job_id))
+
+
+def _reuse_processed(job: Dict[str, Any], document: Dict[str, Any]) -> bool:
+    """
+    Содержимое уже обрабатывалось для другого документа с тем же SHA-256:
+    текст и миниатюра копируются без повторной обработки.
+    """
+    db = get_db()
+    row = db.execute(
+        "SELECT d.id, d.pages, d.thumbnail, f.content FROM Documents d "
+        "JOIN DocumentsFts f ON f.rowid = d.id WHERE d.sha256 = ? AND d.id != ? LIMIT 1",
+        (document['sha256'], document['id']),
+    ).fetchone()
+    if row is None:
+        return False
+    save_processing_result(job['id'], document['id'],
+                           {'text': row['content'], 'pages': row['pages'], 'thumbnail': row['thumbnail']})
+    return True
+
+
+class DocumentPipeline:
+    """
+    Конвейер обработки документов: фоновый поток берет задания из очереди
+    DocumentJobs и отправляет извлечение текста и миниатюры в пул процессов.
+    Результаты записываются в базу тем же потоком.
+
+    Аргументы:
+        storage_dir (str): Каталог хранилища (DOCUMENTS_DIR)
+        workers (int): Число процессов обработки
+        max_attempts (int): Сколько раз пробовать задание, прежде чем пометить его failed
+        retry_delay (float): Задержка перед первым повтором, секунды; дальше удваивается
+        lease (float): Сколько секунд задание считается занятым этим процессом
+        poll_interval (float): Как часто проверять очередь без уведомлений
+    """
+
+    def __init__(self, storage_dir: str, workers: int = 2, max_attempts: int = 3,
+                 retry_delay: float = 30.0, lease: float = 600.0, poll_interval: float = 5.0):
+        self.storage_dir = storage_dir
+        self.workers = max(1, int(workers))
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+        self.processed = 0
+        self.failed = 0
+
+        self._executor = None
+        self._running: Dict[Future, Dict[str, Any]] = {}
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Пул импортируется и создается при первом задании; spawn, а не fork:
+            # процесс API многопоточный, и копировать его состояние в дочерние
+            # процессы небезопасно
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='document-pipeline', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        # Незавершенные задания сразу возвращаются в очередь, не дожидаясь
+        # окончания аренды; попытка не засчитывается
+        job_ids = [job['id'] for job in self._running.values()]
+        self._running.clear()
+        if job_ids:
+            try:
+                db = get_db()
+                with db:
+                    db.executemany("UPDATE DocumentJobs SET state = 'queued', attempts = attempts - 1, "
+                                   "lease_until = NULL WHERE id = ? AND state = 'running'",
+                                   [(job_id,) for job_id in job_ids])
+            except sqlite3.Error as e:
+                logger.error(f"Не удалось вернуть задания обработки документов в очередь: {e}")
+            finally:
+                close_db()
+
+    def notify(self) -> None:
+        """Будит конвейер: в очереди появилось задание."""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.error(f"Ошибка конвейера обработки документов: {e}")
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        finally:
+            close_db()
+
+    def run_once(self) -> int:
+        """
+        Сохраняет результаты завершенных заданий и берет новые, пока в пуле
+        есть свободные процессы.
+
+        Возвращает:
+            int: Сколько заданий взято из очереди
+        """
+        for future in [future for future in self._running if future.done()]:
+            self._complete(self._running.pop(future), future)
+
+        claimed = 0
+        while len(self._running) < self.workers and not self._stop.is_set():
+            job = claim_job(self.lease)
+            if job is None:
+                break
+            claimed += 1
+            self._dispatch(job)
+        return claimed
+
+    def _dispatch(self, job: Dict[str, Any]) -> None:
+        if job['attempts'] > self.max_attempts:
+            # Задание возвращалось по истечении аренды слишком много раз —
+            # вероятно, документ роняет процесс обработки
+            self._fail(job, 'Превышено число попыток обработки')
+            return
+        document = get_document(job['document_id'])
+        if document is None:
+            _finish_job(job['id'], 'failed', 'Документ удален')
+            return
+        try:
+            if _reuse_processed(job, document):
+                self.processed += 1
+                return
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось скопировать результат обработки документа {document['id']}: {e}")
+
+        future = self._get_executor().submit(
+            process_file,
+            blob_path(document['sha256'], self.storage_dir),
+            document['filename'],
+            document['content_type'],
+            thumbnail_path(document['sha256'], self.storage_dir),
+        )
+        job['document'] = document
+        self._running[future] = job
+        future.add_done_callback(lambda _: self._wakeup.set())
+
+    def _complete(self, job: Dict[str, Any], future: Future) -> None:
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            # Дочерний процесс упал (например, на испорченном файле): пул
+            # пересоздается, задание повторяется как обычная ошибка
+            self._executor = None
+            self._fail(job, f'Процесс обработки завершился аварийно: {e}')
+            return
+        except Exception as e:
+            self._fail(job, str(e) or e.__class__.__name__)
+            return
+        try:
+            save_processing_result(job['id'], job['document_id'], result)
+        except sqlite3.Error as e:
+            self._fail(job, f'Ошибка сохранения результата: {e}')
+            return
+        self.processed += 1
+
+    def _fail(self, job: Dict[str, Any], error: str) -> None:
+        logger.warning(f"Обработка документа {job['document_id']} (задание {job['id']}, "
+                       f"попытка {job['attempts']}): {error}")
+        try:
+            if job['attempts'] >= self.max_attempts:
+                self.failed += 1
+                _finish_job(job['id'], 'failed', error)
+            else:
+                delay = self.retry_delay * 2 ** (job['attempts'] - 1)
+                _finish_job(job['id'], 'queued', error, retry_at=_utc(delay))
+        except sqlite3.Error as e:
+            # Задание останется running и вернется в очередь по истечении аренды
+            logger.error(f"Не удалось записать ошибку задания {job['id']}: {e}")
+
+
+_pipeline: Optional[DocumentPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def start_pipeline(storage_dir: str, workers: int = 2, max_attempts: int = 3) -> DocumentPipeline:
+    """Запускает общий для процесса конвейер обработки документов."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = DocumentPipeline(storage_dir, workers=workers, max_attempts=max_attempts)
+            _pipeline.start()
+        return _pipeline
+
+
+def stop_pipeline() -> None:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.stop()
+            _pipeline = None
+
+
+def get_pipeline() -> Optional[DocumentPipeline]:
+    return _pipeline
+
+
+def _notify_pipeline() -> None:
+    pipeline = _pipeline
+    if pipeline is not None:
+        pipeline.notify()
@@ -0,0 +1,42 @@
+# backend/services/event_bus.py
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Подписчик получает (topic, event); вызывается синхронно в потоке издателя,
+# поэтому должен только передать событие дальше (например, в очередь asyncio).
+Subscriber = Callable[[str, Dict[str, Any]], None]
+
+_subscribers: List[Subscriber] = []
+_lock = threading.Lock()
+
+
+def subscribe(callback: Subscriber) -> None:
+    """Регистрирует подписчика на все события."""
+    with _lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+
+
+def unsubscribe(callback: Subscriber) -> None:
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def publish(topic: str, event: Dict[str, Any]) -> None:
+    """
+    Передает событие всем подписчикам.
+    Вызывается сервисами после фиксации транзакции; ошибка подписчика
+    не должна влиять на уже выполненную запись, поэтому только логируется.
+    """
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback in subscribers:
+        try:
+            callback(topic, event)
+        except Exception as e:
+            logger.error(f"Ошибка обработчика события {topic}: {e}")
@@ -0,0 +1,69 @@
+# backend/services/health_service.py
+
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from flask import current_app
+
+from backend.database import get_db, get_pool
+from backend.services import currency_service
+
+logger = logging.getLogger(__name__)
+
+
+def _age_seconds(timestamp: str) -> Optional[float]:
+    try:
+        updated = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    return (datetime.utcnow() - updated.replace(tzinfo=None)).total_seconds()
+
+
+def check_database() -> Dict[str, Any]:
+    """
+    Проверяет, что из пула можно получить соединение и выполнить запрос.
+
+    Возвращает:
+        Dict: {'ok': bool, 'pool': статистика пула, 'error': текст ошибки}
+    """
+    try:
+        get_db().execute("SELECT 1").fetchone()
+        return {'ok': True, 'pool': get_pool().stats()}
+    except (sqlite3.Error, FileNotFoundError) as e:
+        logger.error(f"Проверка готовности: база данных недоступна: {e}")
+        return {'ok': False, 'error': str(e)}
+
+
+def check_rates() -> Dict[str, Any]:
+    """
+    Проверяет, что текущий снимок курсов обновлялся не раньше RATES_MAX_AGE секунд назад.
+
+    Возвращает:
+        Dict: {'ok': bool, 'version', 'last_update', 'age_seconds', 'max_age_seconds'}
+    """
+    snapshot = currency_service.get_snapshot()
+    age = _age_seconds(snapshot.last_update)
+    max_age = current_app.config['RATES_MAX_AGE']
+    return {
+        'ok': age is not None and age <= max_age,
+        'version': snapshot.version,
+        'last_update': snapshot.last_update,
+        'age_seconds': round(age, 1) if age is not None else None,
+        'max_age_seconds': max_age,
+    }
+
+
+def check_readiness() -> Dict[str, Any]:
+    """
+    Собирает все проверки готовности экземпляра принимать трафик.
+
+    Возвращает:
+        Dict: {'ready': bool, 'checks': {имя проверки: результат}}
+    """
+    checks = {
+        'database': check_database(),
+        'rates': check_rates(),
+    }
+    return {'ready': all(check['ok'] for check in checks.values()), 'checks': checks}
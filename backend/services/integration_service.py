@@ -0,0 +1,436 @@
+# backend/services/integration_service.py
+"""
+Опрос перевозчиков о статусе отгрузок.
+
+Поллер работает в отдельном потоке со своим циклом asyncio. На каждом такте
+он берет активные отгрузки (частичный индекс idx_shipments_active),
+группирует их по перевозчику и отправляет пакетные запросы:
+
+    POST <url>  {"tracking_numbers": ["...", ...]}
+    <- {"results": [{"tracking_number", "stage", "ts", "location", "note"}
+                    | {"tracking_number", "error"}]}
+
+У каждого перевозчика свой пул HTTP-соединений (aiohttp.ClientSession с
+keep-alive), ограничение одновременных запросов и ограничение частоты.
+Отгрузки, до ETA которых еще далеко, опрашиваются реже: пока груз в пути,
+этап вряд ли изменится.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.database import close_db
+from backend.services import shipment_service
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних задержек запросов хранить на перевозчика
+LATENCY_SAMPLES = 1000
+
+
+@dataclass
+class CarrierConfig:
+    """
+    Настройки перевозчика.
+
+    Аргументы:
+        name (str): Имя перевозчика, как в Shipments.carrier
+        url (str): Адрес пакетного запроса статусов
+        batch_size (int): Сколько трек-номеров отправлять в одном запросе
+        concurrency (int): Сколько запросов к перевозчику выполнять одновременно
+        rate_limit (float): Не больше стольких запросов в секунду
+        timeout (float): Таймаут запроса, секунды
+    """
+    name: str
+    url: str
+    batch_size: int = 50
+    concurrency: int = 4
+    rate_limit: float = 5.0
+    timeout: float = 10.0
+
+
+def carriers_from_config(spec: Any) -> List[CarrierConfig]:
+    """
+    Разбирает настройки перевозчиков: {"имя": {"url": ..., "batch_size": ...}, ...}
+    (словарь или JSON-строка, например из TRACKING_CARRIERS).
+    """
+    if isinstance(spec, str):
+        spec = json.loads(spec) if spec.strip() else {}
+    return [CarrierConfig(name=name, **options) for name, options in (spec or {}).items()]
+
+
+class RateLimiter:
+    """Ограничение частоты запросов (token bucket) для одного цикла asyncio."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PollMetrics:
+    """Счетчики и задержки опроса по перевозчикам; читаются из потоков Flask."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carriers: Dict[str, Dict[str, Any]] = {}
+
+    def _carrier(self, name: str) -> Dict[str, Any]:
+        return self._carriers.setdefault(name, {
+            'requests': 0,
+            'errors': 0,
+            'polled': 0,
+            'skipped': 0,
+            'stages_added': 0,
+            'last_poll_at': None,
+            'latencies': deque(maxlen=LATENCY_SAMPLES),
+        })
+
+    def observe_request(self, carrier: str, latency: float, size: int, error: bool) -> None:
+        with self._lock:
+            item = self._carrier(carrier)
+            item['requests'] += 1
+            item['latencies'].append(latency)
+            if error:
+                item['errors'] += 1
+            else:
+                item['polled'] += size
+            item['last_poll_at'] = datetime.utcnow().isoformat(timespec='seconds')
+
+    def add(self, carrier: str, field: str, value: int) -> None:
+        with self._lock:
+            self._carrier(carrier)[field] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for name, item in self._carriers.items():
+                latencies = sorted(item['latencies'])
+                data = {key: value for key, value in item.items() if key != 'latencies'}
+                if latencies:
+                    data['latency_ms'] = {
+                        'avg': round(sum(latencies) / len(latencies) * 1000, 1),
+                        'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                        'p95': round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+                        'max': round(latencies[-1] * 1000, 1),
+                    }
+                result[name] = data
+            return result
+
+
+def _parse_ts(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    # Время в базе хранится в UTC без указания пояса (см. shipment_service.normalize_ts)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class TrackingPoller:
+    """
+    Периодически опрашивает перевозчиков по активным отгрузкам.
+
+    Аргументы:
+        carriers (List[CarrierConfig]): Перевозчики
+        interval (float): Как часто опрашивать отгрузку, секунды
+        eta_window (float): За сколько секунд до ETA возвращаться к обычному интервалу
+        slow_interval (float): Интервал опроса, пока до ETA дальше eta_window
+        tick (float): Как часто проверять, каким отгрузкам пора обновиться
+    """
+
+    def __init__(self, carriers: List[CarrierConfig], interval: float = 900.0,
+                 eta_window: float = 12 * 3600.0, slow_interval: float = 6 * 3600.0,
+                 tick: float = 60.0):
+        self.carriers = {carrier.name: carrier for carrier in carriers}
+        self.interval = interval
+        self.eta_window = eta_window
+        self.slow_interval = slow_interval
+        self.tick = tick
+        self.metrics = PollMetrics()
+
+        self._sessions: Dict[str, 'aiohttp.ClientSession'] = {}
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Выбор отгрузок ----------------------------------------------------
+
+    def is_due(self, shipment: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Пора ли опрашивать отгрузку с учетом последнего опроса и ETA."""
+        now = time.time() if now is None else now
+        last = _parse_ts(shipment.get('last_polled_at'))
+        if last is None:
+            return True
+        eta = _parse_ts(shipment.get('eta'))
+        if eta is not None and now < eta - self.eta_window:
+            return now - last >= self.slow_interval
+        return now - last >= self.interval
+
+    @staticmethod
+    def _new_stage(shipment: Dict[str, Any], result: Dict[str, Any], carrier: str) -> Optional[Dict[str, Any]]:
+        """Этап из ответа перевозчика, если он новее текущего; иначе None."""
+        ts = shipment_service.normalize_ts(result.get('ts'))
+        current_at = shipment.get('current_stage_at') or ''
+        if shipment.get('current_stage') != 'created' and ts <= current_at:
+            return None
+        return {
+            'shipment_id': shipment['id'],
+            'stage': result['stage'],
+            'ts': ts,
+            'location': result.get('location'),
+            'note': result.get('note'),
+            'source': carrier,
+        }
+
+    # --- HTTP ---------------------------------------------------------------
+
+    def _session(self, carrier: CarrierConfig) -> 'aiohttp.ClientSession':
+        # aiohttp нужен только включенному поллеру, поэтому импортируется здесь
+        import aiohttp
+
+        session = self._sessions.get(carrier.name)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=carrier.concurrency, keepalive_timeout=60)
+            session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=carrier.timeout))
+            self._sessions[carrier.name] = session
+            self._limiters[carrier.name] = RateLimiter(carrier.rate_limit)
+        return session
+
+    async def _fetch(self, carrier: CarrierConfig, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        import aiohttp
+
+        session = self._session(carrier)
+        await self._limiters[carrier.name].acquire()
+        started = time.perf_counter()
+        try:
+            async with session.post(carrier.url, json={
+                'tracking_numbers': [shipment['tracking_number'] for shipment in batch]
+            }) as resp:
+                resp.raise_for_status()
+                data = await resp.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            self.metrics.observe_request(carrier.name, time.perf_counter() - started, len(batch), True)
+            raise
+        self.metrics.observe_request(carrier.name, time.perf_counter() - started, len(batch), False)
+        return {item.get('tracking_number'): item for item in data.get('results', [])}
+
+    async def _poll_carrier(self, carrier: CarrierConfig,
+                            shipments: List[Dict[str, Any]]) -> Tuple[list, list, dict]:
+        stages, polled, errors = [], [], {}
+        semaphore = asyncio.Semaphore(carrier.concurrency)
+
+        async def run(batch):
+            async with semaphore:
+                try:
+                    results = await self._fetch(carrier, batch)
+                except Exception as e:
+                    # Отгрузки пакета останутся неопрошенными и попадут в следующий такт
+                    logger.warning(f"Ошибка опроса перевозчика {carrier.name}: {e}")
+                    return
+            for shipment in batch:
+                result = results.get(shipment['tracking_number'])
+                if result is None:
+                    errors[shipment['id']] = 'Нет в ответе перевозчика'
+                elif result.get('error'):
+                    errors[shipment['id']] = str(result['error'])
+                elif result.get('stage') not in shipment_service.SHIPMENT_STAGES:
+                    errors[shipment['id']] = f"Неизвестный этап: {result.get('stage')}"
+                else:
+                    try:
+                        stage = self._new_stage(shipment, result, carrier.name)
+                    except ValueError as e:
+                        errors[shipment['id']] = str(e)
+                        continue
+                    polled.append(shipment['id'])
+                    if stage is not None:
+                        stages.append(stage)
+
+        size = max(1, carrier.batch_size)
+        await asyncio.gather(*(run(shipments[i:i + size]) for i in range(0, len(shipments), size)))
+        return stages, polled, errors
+
+    # --- Такт опроса --------------------------------------------------------
+
+    @staticmethod
+    def _load() -> List[Dict[str, Any]]:
+        try:
+            return shipment_service.get_active_shipments()
+        finally:
+            close_db()
+
+    @staticmethod
+    def _save(stages, polled, errors) -> int:
+        try:
+            return shipment_service.record_poll(stages, polled, errors)
+        finally:
+            close_db()
+
+    async def poll_once(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Опрашивает всех перевозчиков по отгрузкам, которым пора обновиться.
+
+        Возвращает:
+            Dict: {'polled', 'skipped', 'stages', 'errors'}
+        """
+        shipments = await asyncio.to_thread(self._load)
+        by_carrier: Dict[str, List[Dict[str, Any]]] = {}
+        skipped = 0
+        for shipment in shipments:
+            if shipment['carrier'] not in self.carriers:
+                continue
+            if self.is_due(shipment, now):
+                by_carrier.setdefault(shipment['carrier'], []).append(shipment)
+            else:
+                skipped += 1
+                self.metrics.add(shipment['carrier'], 'skipped', 1)
+
+        results = await asyncio.gather(*(
+            self._poll_carrier(self.carriers[name], items) for name, items in by_carrier.items()))
+
+        stages, polled, errors = [], [], {}
+        for name, (carrier_stages, carrier_polled, carrier_errors) in zip(by_carrier, results):
+            stages.extend(carrier_stages)
+            polled.extend(carrier_polled)
+            errors.update(carrier_errors)
+            self.metrics.add(name, 'stages_added', len(carrier_stages))
+        if polled or errors:
+            await asyncio.to_thread(self._save, stages, polled, errors)
+        return {'polled': len(polled), 'skipped': skipped, 'stages': len(stages), 'errors': len(errors)}
+
+    async def close(self) -> None:
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    # --- Фоновый поток ------------------------------------------------------
+
+    async def _run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        try:
+            while not self._stopping:
+                try:
+                    await self.poll_once()
+                except Exception as e:
+                    logger.error(f"Ошибка такта опроса перевозчиков: {e}")
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.tick)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            await self.close()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()),
+                                        name='tracking-poller', daemon=True)
+        self._thread.start()
+
+    def trigger(self) -> None:
+        """Запускает внеочередной такт опроса."""
+        if self._loop is not None and self._wakeup is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping = True
+        self.trigger()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+_poller: Optional[TrackingPoller] = None
+_poller_lock = threading.Lock()
+
+
+def start_poller(carriers: List[CarrierConfig], interval: float = 900.0) -> TrackingPoller:
+    """Запускает общий для процесса поллер перевозчиков."""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = TrackingPoller(carriers, interval=interval)
+            _poller.start()
+        return _poller
+
+
+def stop_poller() -> None:
+    global _poller
+    with _poller_lock:
+        if _poller is not None:
+            _poller.stop()
+            _poller = None
+
+
+def get_poller() -> Optional[TrackingPoller]:
+    return _poller
+
+
+def get_tracking_metrics(stalest: int = 10) -> Dict[str, Any]:
+    """
+    Метрики отслеживания: задержки и счетчики запросов по перевозчикам и
+    устаревание данных по отгрузкам (сколько секунд назад отгрузку успешно
+    опрашивали; для неопрошенных — с момента создания).
+
+    Возвращает:
+        Dict: {'enabled', 'carriers', 'staleness': {'active', 'never_polled',
+               'avg_seconds', 'max_seconds', 'stalest': [...]}}
+    """
+    now = time.time()
+    shipments = shipment_service.get_active_shipments()
+    items = []
+    for shipment in shipments:
+        since = _parse_ts(shipment['last_polled_at']) or _parse_ts(shipment['created_date']) or now
+        items.append({
+            'id': shipment['id'],
+            'carrier': shipment['carrier'],
+            'tracking_number': shipment['tracking_number'],
+            'last_polled_at': shipment['last_polled_at'],
+            'staleness_seconds': round(now - since, 1),
+            'poll_error': shipment['poll_error'],
+        })
+    items.sort(key=lambda item: item['staleness_seconds'], reverse=True)
+    ages = [item['staleness_seconds'] for item in items]
+
+    poller = _poller
+    return {
+        'enabled': poller is not None,
+        'carriers': poller.metrics.snapshot() if poller is not None else {},
+        'staleness': {
+            'active': len(items),
+            'never_polled': sum(1 for item in items if item['last_polled_at'] is None),
+            'avg_seconds': round(sum(ages) / len(ages), 1) if ages else 0,
+            'max_seconds': ages[0] if ages else 0,
+            'stalest': items[:stalest],
+        },
+    }
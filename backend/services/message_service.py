@@ -0,0 +1,514 @@
+# backend/services/message_service.py
+"""
+Прием и хранение сообщений из мессенджеров (Telegram, WeChat и др.).
+
+Входящие сообщения приходят на webhook и сразу кладутся в кольцевой буфер
+в памяти; запрос не ждет записи в базу. Отдельный поток забирает сообщения
+пачками — когда набралось batch_size штук или самое старое сообщение ждет
+дольше flush_interval — и пишет каждую пачку одним executemany в одной
+транзакции.
+
+Порядок внутри переписки: буфер — очередь FIFO, его разбирает один поток,
+а пачка вставляется в порядке буфера, поэтому id сообщений переписки растут
+в том порядке, в каком процесс их принял (сообщения одного запроса — подряд).
+Переписку читают в порядке id.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from backend.database import close_db, get_db
+from backend.services import event_bus
+from backend.services.shipment_service import normalize_ts
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_CHANNELS = ('telegram', 'wechat', 'whatsapp', 'email', 'other')
+DIRECTIONS = ('in', 'out')
+
+MESSAGE_COLUMNS = ('id', 'channel', 'chat_id', 'external_id', 'direction', 'sender', 'body',
+                   'order_id', 'sent_at', 'received_at', 'is_read')
+_SELECT_MESSAGE = f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM Communications"
+
+CONVERSATION_COLUMNS = ('channel', 'chat_id', 'title', 'order_id', 'last_message_id', 'last_message_at',
+                        'messages', 'unread')
+
+# Колонки, которые заполняются при приеме (id, is_read — значения по умолчанию)
+_INSERT_COLUMNS = ('channel', 'chat_id', 'external_id', 'direction', 'sender', 'body',
+                   'order_id', 'sent_at', 'received_at')
+_INSERT_MESSAGE = (f"INSERT OR IGNORE INTO Communications ({', '.join(_INSERT_COLUMNS)}) "
+                   f"VALUES ({', '.join('?' for _ in _INSERT_COLUMNS)})")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+MAX_BODY_LENGTH = 65536
+MAX_WEBHOOK_MESSAGES = 1000
+
+# Сколько раз повторять запись пачки, если база временно занята
+WRITE_ATTEMPTS = 3
+
+
+class BufferFullError(Exception):
+    """Буфер приема заполнен: база не успевает за входящим потоком."""
+
+
+def _row_to_message(row) -> Dict[str, Any]:
+    return dict(zip(MESSAGE_COLUMNS, row))
+
+
+def _row_to_conversation(row) -> Dict[str, Any]:
+    return dict(zip(CONVERSATION_COLUMNS, row))
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    """Время мессенджера: Unix-время (Telegram) или строка ISO 8601."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return normalize_ts(value)
+
+
+def _from_telegram(update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Преобразует update Telegram Bot API в сообщение; служебные update пропускаются."""
+    message = update.get('message') or update.get('channel_post')
+    if not isinstance(message, dict) or not isinstance(message.get('chat'), dict):
+        return None
+    chat = message['chat']
+    author = message.get('from') or {}
+    chat_id = str(chat.get('id'))
+    return {
+        'channel': 'telegram',
+        'chat_id': chat_id,
+        # message_id уникален только внутри чата
+        'external_id': f"{chat_id}:{message.get('message_id')}",
+        'sender': author.get('username') or author.get('first_name') or chat.get('title'),
+        'body': message.get('text') or message.get('caption') or '',
+        'sent_at': message.get('date'),
+        'direction': 'in',
+    }
+
+
+def normalize_message(data: Dict[str, Any], received_at: str) -> Tuple[Any, ...]:
+    """
+    Проверяет сообщение и возвращает строку для вставки в Communications.
+
+    Аргументы:
+        data (Dict): channel, chat_id (обязательно), external_id, direction,
+                     sender, body, order_id, sent_at
+        received_at (str): Время приема
+
+    Возвращает:
+        Tuple: Значения колонок _INSERT_COLUMNS
+
+    Исключения:
+        ValueError: Некорректное сообщение
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Сообщение должно быть JSON-объектом")
+    channel = data.get('channel') or 'other'
+    if channel not in MESSAGE_CHANNELS:
+        raise ValueError(f"Неизвестный канал: {channel}. Допустимые: {', '.join(MESSAGE_CHANNELS)}")
+    chat_id = data.get('chat_id')
+    if chat_id in (None, ''):
+        raise ValueError("Не указан chat_id")
+    direction = data.get('direction') or 'in'
+    if direction not in DIRECTIONS:
+        raise ValueError("direction должен быть 'in' или 'out'")
+    body = data.get('body')
+    if body is None:
+        body = data.get('text') or ''
+    body = str(body)
+    if len(body) > MAX_BODY_LENGTH:
+        raise ValueError(f"Сообщение длиннее {MAX_BODY_LENGTH} символов")
+    order_id = data.get('order_id')
+    if order_id not in (None, ''):
+        try:
+            order_id = int(order_id)
+        except (TypeError, ValueError):
+            raise ValueError("order_id должен быть целым числом")
+    else:
+        order_id = None
+    external_id = data.get('external_id')
+    return (
+        channel,
+        str(chat_id),
+        None if external_id in (None, '') else str(external_id),
+        direction,
+        None if data.get('sender') is None else str(data['sender']),
+        body,
+        order_id,
+        _timestamp(data.get('sent_at')),
+        received_at,
+    )
+
+
+def parse_webhook(payload: Any) -> List[Tuple[Any, ...]]:
+    """
+    Разбирает тело webhook: одно сообщение, {'messages': [...]} или update
+    Telegram Bot API.
+
+    Возвращает:
+        List[Tuple]: Строки для вставки (пустой список для служебных update Telegram)
+
+    Исключения:
+        ValueError: Некорректное тело запроса
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Тело запроса должно содержать JSON-объект")
+    if 'update_id' in payload:
+        message = _from_telegram(payload)
+        items = [message] if message else []
+    elif 'messages' in payload:
+        items = payload['messages']
+        if not isinstance(items, list):
+            raise ValueError("messages должен быть списком")
+    else:
+        items = [payload]
+    if len(items) > MAX_WEBHOOK_MESSAGES:
+        raise ValueError(f"Больше {MAX_WEBHOOK_MESSAGES} сообщений в одном запросе")
+    received_at = normalize_ts()
+    return [normalize_message(item, received_at) for item in items]
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер фиксированной емкости: память выделяется один раз,
+    запись и чтение сдвигают индексы. Не потокобезопасен — доступ
+    синхронизирует MessageIngestor.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._items: List[Any] = [None] * capacity
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def push_many(self, items: List[Any]) -> bool:
+        """Добавляет все элементы или ни одного, если не хватает места."""
+        if len(items) > self.capacity - self._size:
+            return False
+        tail = (self._head + self._size) % self.capacity
+        for item in items:
+            self._items[tail] = item
+            tail = (tail + 1) % self.capacity
+        self._size += len(items)
+        return True
+
+    def peek(self) -> Any:
+        return self._items[self._head] if self._size else None
+
+    def pop_many(self, limit: int) -> List[Any]:
+        count = min(limit, self._size)
+        result = []
+        for _ in range(count):
+            result.append(self._items[self._head])
+            self._items[self._head] = None
+            self._head = (self._head + 1) % self.capacity
+        self._size -= count
+        return result
+
+
+class MessageIngestor:
+    """
+    Буфер приема сообщений с фоновой записью пачками.
+
+    Каждое принятое сообщение получает порядковый номер; submit возвращает
+    номер последнего сообщения запроса, и по нему можно дождаться записи
+    (wait_flushed) — так webhook может подтверждать прием только после
+    фиксации пачки, сохраняя запись пачками.
+
+    Аргументы:
+        capacity (int): Емкость буфера; при переполнении submit отказывает
+        batch_size (int): Наибольшая пачка одной транзакции
+        flush_interval (float): Сколько секунд сообщение может ждать в буфере
+    """
+
+    def __init__(self, capacity: int = 10000, batch_size: int = 500, flush_interval: float = 0.2):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._buffer = RingBuffer(capacity)
+        self._cond = threading.Condition()
+        self._accepted = 0
+        self._flushed = 0
+        self._flush_upto = 0
+        # Диапазоны номеров сообщений, которые не удалось записать
+        self._failed: Deque[Tuple[int, int]] = deque(maxlen=100)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.metrics: Dict[str, Any] = {
+            'accepted': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0, 'lost': 0,
+            'batches': 0, 'max_batch': 0,
+        }
+        self._flush_ms: Deque[float] = deque(maxlen=1000)
+        self._wait_ms: Deque[float] = deque(maxlen=1000)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='message-ingestor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Останавливает поток, предварительно записав все принятые сообщения."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, rows: List[Tuple[Any, ...]]) -> int:
+        """
+        Кладет сообщения в буфер.
+
+        Возвращает:
+            int: Номер последнего принятого сообщения (для wait_flushed)
+
+        Исключения:
+            BufferFullError: В буфере нет места для всех сообщений запроса
+        """
+        now = time.monotonic()
+        with self._cond:
+            was_empty = not len(self._buffer)
+            if not self._buffer.push_many([(now, row) for row in rows]):
+                self.metrics['rejected'] += len(rows)
+                raise BufferFullError("Буфер приема сообщений заполнен")
+            self._accepted += len(rows)
+            self.metrics['accepted'] += len(rows)
+            # Поток записи будится, когда пора писать пачку, и когда буфер был
+            # пуст: тогда он ждет без тайм-аута и должен начать отсчет flush_interval
+            if was_empty or len(self._buffer) >= self.batch_size or self.flush_interval <= 0:
+                self._cond.notify_all()
+            return self._accepted
+
+    def wait_flushed(self, ticket: int, timeout: Optional[float] = None) -> bool:
+        """
+        Ждет, пока сообщения с номерами до ticket включительно будут записаны.
+
+        Возвращает:
+            bool: True, если записаны; False при тайм-ауте или ошибке записи
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._flushed < ticket:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not any(start <= ticket <= end for start, end in self._failed)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Просит записать буфер немедленно и ждет записи всего принятого."""
+        with self._cond:
+            ticket = self._accepted
+            self._flush_upto = max(self._flush_upto, ticket)
+            self._cond.notify_all()
+        return self.wait_flushed(ticket, timeout)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            result = dict(self.metrics)
+            result['buffered'] = len(self._buffer)
+            result['capacity'] = self._buffer.capacity
+            flush_ms = sorted(self._flush_ms)
+            wait_ms = sorted(self._wait_ms)
+        result['avg_batch'] = round(result['inserted'] / result['batches'], 1) if result['batches'] else 0
+        result['flush_ms'] = _percentiles(flush_ms)
+        # Сколько сообщение ждало в буфере до начала записи
+        result['buffer_wait_ms'] = _percentiles(wait_ms)
+        return result
+
+    def _take_batch(self) -> Tuple[List[Tuple[float, Tuple[Any, ...]]], int]:
+        """Ждет, пока пачка наберется или самое старое сообщение прождет flush_interval."""
+        with self._cond:
+            while True:
+                size = len(self._buffer)
+                if size >= self.batch_size or (size and self._stop.is_set()):
+                    break
+                # flush() просит записать все, что принято до его вызова
+                if size and self._flush_upto > self._flushed:
+                    break
+                if size:
+                    waited = time.monotonic() - self._buffer.peek()[0]
+                    if waited >= self.flush_interval:
+                        break
+                    timeout = self.flush_interval - waited
+                elif self._stop.is_set():
+                    return [], self._flushed
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+            batch = self._buffer.pop_many(self.batch_size)
+            return batch, self._flushed + len(batch)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                batch, upto = self._take_batch()
+                if not batch:
+                    break
+                started = time.monotonic()
+                ok = self._write([row for _, row in batch])
+                with self._cond:
+                    for arrived, _ in batch:
+                        self._wait_ms.append((started - arrived) * 1000)
+                    if not ok:
+                        self._failed.append((upto - len(batch) + 1, upto))
+                        self.metrics['lost'] += len(batch)
+                    self._flushed = upto
+                    self._cond.notify_all()
+        finally:
+            close_db()
+
+    def _write(self, rows: List[Tuple[Any, ...]]) -> bool:
+        started = time.perf_counter()
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                db = get_db()
+                with db:
+                    inserted = db.executemany(_INSERT_MESSAGE, rows).rowcount
+                break
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка записи пачки сообщений ({len(rows)} шт., попытка {attempt}): {e}")
+                if attempt == WRITE_ATTEMPTS:
+                    return False
+                time.sleep(0.1 * 2 ** (attempt - 1))
+
+        with self._cond:
+            self.metrics['batches'] += 1
+            self.metrics['inserted'] += inserted
+            self.metrics['duplicates'] += len(rows) - inserted
+            self.metrics['max_batch'] = max(self.metrics['max_batch'], len(rows))
+            self._flush_ms.append((time.perf_counter() - started) * 1000)
+
+        # Одно событие на переписку: клиенты дочитывают ее после своего последнего id
+        for channel, chat_id in dict.fromkeys((row[0], row[1]) for row in rows):
+            event_bus.publish('messages', {'type': 'messages', 'id': f'{channel}:{chat_id}',
+                                           'channel': channel, 'chat_id': chat_id})
+        return True
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {'p50': 0, 'p95': 0, 'max': 0}
+    return {
+        'p50': round(values[len(values) // 2], 2),
+        'p95': round(values[int(len(values) * 0.95)], 2),
+        'max': round(values[-1], 2),
+    }
+
+
+_ingestor: Optional[MessageIngestor] = None
+_ingestor_lock = threading.Lock()
+
+
+def start_ingestor(capacity: int = 10000, batch_size: int = 500, flush_interval: float = 0.2) -> MessageIngestor:
+    """Запускает общий для процесса буфер приема сообщений."""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = MessageIngestor(capacity, batch_size, flush_interval)
+            _ingestor.start()
+        return _ingestor
+
+
+def stop_ingestor() -> None:
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is not None:
+            _ingestor.stop()
+            _ingestor = None
+
+
+def get_ingestor() -> Optional[MessageIngestor]:
+    return _ingestor
+
+
+def list_conversations(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Получает страницу переписок, самые свежие первыми.
+
+    Аргументы:
+        limit (int): Размер страницы (не больше MAX_PAGE_SIZE)
+        cursor (int, опционально): next_cursor предыдущей страницы
+
+    Возвращает:
+        Dict: {'conversations': список переписок, 'next_cursor': курсор следующей страницы или None}
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    query = f"SELECT {', '.join(CONVERSATION_COLUMNS)} FROM Conversations"
+    params: List[Any] = []
+    if cursor is not None:
+        query += " WHERE last_message_id < ?"
+        params.append(int(cursor))
+    query += " ORDER BY last_message_id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    conversations = [_row_to_conversation(row) for row in get_db().execute(query, params).fetchall()]
+    next_cursor = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        next_cursor = conversations[-1]['last_message_id']
+    return {'conversations': conversations, 'next_cursor': next_cursor}
+
+
+def get_messages(channel: str, chat_id: str, after_id: Optional[int] = None,
+                 before_id: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """
+    Сообщения переписки в порядке приема.
+
+    Без after_id возвращаются последние limit сообщений (before_id — листать
+    историю назад); с after_id — следующие limit сообщений после него
+    (дочитать новые после события в WebSocket).
+
+    Возвращает:
+        List[Dict]: Сообщения по возрастанию id
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    query = f"{_SELECT_MESSAGE} WHERE channel = ? AND chat_id = ?"
+    params: List[Any] = [channel, chat_id]
+    if after_id is not None:
+        rows = get_db().execute(f"{query} AND id > ? ORDER BY id LIMIT ?",
+                                params + [after_id, limit]).fetchall()
+        return [_row_to_message(row) for row in rows]
+    if before_id is not None:
+        query += " AND id < ?"
+        params.append(before_id)
+    rows = get_db().execute(f"{query} ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+    return [_row_to_message(row) for row in reversed(rows)]
+
+
+def mark_read(channel: str, chat_id: str) -> int:
+    """
+    Отмечает входящие сообщения переписки прочитанными.
+
+    Возвращает:
+        int: Сколько сообщений отмечено
+    """
+    db = get_db()
+    try:
+        with db:
+            marked = db.execute(
+                "UPDATE Communications SET is_read = 1 "
+                "WHERE channel = ? AND chat_id = ? AND direction = 'in' AND is_read = 0",
+                (channel, chat_id),
+            ).rowcount
+            db.execute("UPDATE Conversations SET unread = 0 WHERE channel = ? AND chat_id = ?",
+                       (channel, chat_id))
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при отметке сообщений прочитанными: {e}")
+        raise
+    return marked
@@ -1,14 +1,122 @@
 # backend/services/order_service.py
 
+import base64
+import json
 import sqlite3
 import logging
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterable, Iterator, Tuple
 from backend.database import get_db  # Исправлен импорт
+from backend.services import cache_service, currency_service, event_bus
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Колонки заявки в порядке, в котором их возвращают запросы ниже
+ORDER_COLUMNS = ('id', 'client_id', 'supplier_id', 'name', 'status',
+                 'total_cny', 'total_rub', 'total_usd', 'created_date', 'version', 'items_count')
+_SELECT_ORDER = f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders"
+
+# Варианты сортировки списка: колонка и направление.
+# Для каждого варианта есть индекс (колонка, id), см. backend/database/schema.py
+ORDER_SORTS = {
+    'date-desc': ('created_date', 'DESC'),
+    'date-asc': ('created_date', 'ASC'),
+    'amount-desc': ('total_cny', 'DESC'),
+    'amount-asc': ('total_cny', 'ASC'),
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Поля сумм и их валюты
+_TOTAL_FIELDS = (('total_cny', 'CNY'), ('total_rub', 'RUB'), ('total_usd', 'USD'))
+
+# Кеш заявок по id и страниц списка. Заявку по id сбрасывают update_order и
+# delete_order, страницы списка — любая запись в orders (ключ страницы содержит
+# поколение таблицы). Закешированные словари общие для всех читателей и не изменяются
+_order_cache = cache_service.TTLCache('order', 'orders', max_entries=10000, ttl=5.0)
+_list_cache = cache_service.TTLCache('order_list', 'orders', max_entries=1000, ttl=5.0)
+
+
+def configure_cache(max_orders: int, max_pages: int, ttl: float) -> None:
+    """
+    Задает размеры кешей заявок и страниц списка и срок жизни записей; 0 отключает кеш.
+
+    Аргументы:
+        max_orders (int): Сколько заявок по id хранить
+        max_pages (int): Сколько страниц list_orders хранить
+        ttl (float): Срок жизни записи, секунды
+    """
+    _order_cache.configure(max_orders, ttl)
+    _list_cache.configure(max_pages, ttl)
+
+
+def _orders_changed(order_id: Optional[int] = None) -> None:
+    # Вызывается после фиксации транзакции, иначе параллельное чтение
+    # успело бы закешировать прежние данные уже после инвалидации
+    cache_service.bump_generation('orders')
+    if order_id is not None:
+        _order_cache.invalidate(order_id)
+
+
+def orders_changed(order_ids: Iterable[int]) -> None:
+    """
+    Сбрасывает кеш после записи в заявки в обход order_service (например,
+    пакетной переоценки). Вызывается после фиксации транзакции; поколение
+    таблицы увеличивается один раз на весь набор.
+
+    Аргументы:
+        order_ids (Iterable[int]): Измененные заявки
+    """
+    cache_service.bump_generation('orders')
+    _order_cache.invalidate_many(order_ids)
+
+
+def _row_to_order(row) -> Dict[str, Any]:
+    return dict(zip(ORDER_COLUMNS, row))
+
+
+def _encode_cursor(sort_value: Any, order_id: int) -> str:
+    raw = json.dumps([sort_value, order_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, order_id = json.loads(base64.urlsafe_b64decode(padded))
+        return sort_value, int(order_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+
+
+def _sort_spec(sort: str) -> Tuple[str, str]:
+    if sort not in ORDER_SORTS:
+        raise ValueError(f"Неизвестная сортировка: {sort}")
+    return ORDER_SORTS[sort]
+
+
+def _order_filters(status: Optional[str], client_id: Optional[int],
+                   supplier_id: Optional[int], search: Optional[str]) -> Tuple[List[str], List[Any]]:
+    """Строит условия WHERE и параметры для фильтров списка заявок."""
+    conditions: List[str] = []
+    params: List[Any] = []
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if client_id is not None:
+        conditions.append("client_id = ?")
+        params.append(client_id)
+    if supplier_id is not None:
+        conditions.append("supplier_id = ?")
+        params.append(supplier_id)
+    if search:
+        conditions.append("(name LIKE ? ESCAPE '\\' OR CAST(id AS TEXT) LIKE ? ESCAPE '\\')")
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        params.extend([pattern, pattern])
+    return conditions, params
+
+
 def get_all_orders() -> List[Dict[str, Any]]:
     """
     Получает список всех заявок из базы данных.
@@ -23,38 +131,132 @@ def get_all_orders() -> List[Dict[str, Any]]:
             - total_cny (float): Сумма в юанях
             - total_rub (float): Сумма в рублях
             - total_usd (float): Сумма в долларах
+            - created_date (str): Дата создания
     """
     db = get_db()
     cursor = db.cursor()
     try:
-        cursor.execute("""
-            SELECT id, client_id, supplier_id, name, status, 
-                   total_cny, total_rub, total_usd 
-            FROM orders
-        """)
-        rows = cursor.fetchall()
-        orders = []
-        for row in rows:
-            orders.append({
-                'id': row[0],
-                'client_id': row[1],
-                'supplier_id': row[2],
-                'name': row[3],
-                'status': row[4],
-                'total_cny': row[5],
-                'total_rub': row[6],
-                'total_usd': row[7]
-            })
-        return orders
+        cursor.execute(_SELECT_ORDER)
+        return [_row_to_order(row) for row in cursor.fetchall()]
     except sqlite3.Error as e:
         logger.error(f"Ошибка при получении списка заявок: {e}")
         return []
     finally:
         cursor.close()
 
+def list_orders(status: Optional[str] = None,
+                client_id: Optional[int] = None,
+                supplier_id: Optional[int] = None,
+                search: Optional[str] = None,
+                sort: str = 'date-desc',
+                limit: int = DEFAULT_PAGE_SIZE,
+                cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Получает страницу заявок с фильтрами и keyset-пагинацией.
+
+    Страница выбирается условием (колонка сортировки, id) > / < значения из
+    курсора, поэтому каждая страница — это диапазон составного индекса,
+    а не OFFSET по всей таблице. Страницы кешируются до следующей записи
+    в orders или до истечения срока жизни записи кеша.
+
+    Аргументы:
+        status (str, опционально): Статус заявки
+        client_id (int, опционально): Идентификатор клиента
+        supplier_id (int, опционально): Идентификатор поставщика
+        search (str, опционально): Подстрока для поиска по номеру и названию
+        sort (str): Одно из значений ORDER_SORTS
+        limit (int): Размер страницы (не больше MAX_PAGE_SIZE)
+        cursor (str, опционально): Значение next_cursor предыдущей страницы
+
+    Возвращает:
+        Dict: {'orders': список заявок, 'next_cursor': курсор следующей страницы или None}
+    """
+    column, direction = _sort_spec(sort)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    key = (cache_service.generation('orders'), status, client_id, supplier_id, search, sort, limit, cursor)
+    return _list_cache.get_or_load(
+        key, lambda: _load_page(status, client_id, supplier_id, search, column, direction, limit, cursor))
+
+
+def _load_page(status: Optional[str], client_id: Optional[int], supplier_id: Optional[int],
+               search: Optional[str], column: str, direction: str, limit: int,
+               cursor: Optional[str]) -> Dict[str, Any]:
+    conditions, params = _order_filters(status, client_id, supplier_id, search)
+    if cursor:
+        sort_value, last_id = _decode_cursor(cursor)
+        comparison = '<' if direction == 'DESC' else '>'
+        conditions.append(f"({column}, id) {comparison} (?, ?)")
+        params.extend([sort_value, last_id])
+
+    query = _SELECT_ORDER
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {column} {direction}, id {direction} LIMIT ?"
+    # Берем на одну строку больше, чтобы узнать, есть ли следующая страница
+    params.append(limit + 1)
+
+    db = get_db()
+    db_cursor = db.cursor()
+    try:
+        db_cursor.execute(query, params)
+        orders = [_row_to_order(row) for row in db_cursor.fetchall()]
+    finally:
+        db_cursor.close()
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        next_cursor = _encode_cursor(last[column], last['id'])
+    return {'orders': orders, 'next_cursor': next_cursor}
+
+def iter_orders(status: Optional[str] = None,
+                client_id: Optional[int] = None,
+                supplier_id: Optional[int] = None,
+                search: Optional[str] = None,
+                sort: str = 'date-desc',
+                batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """
+    Построчно отдает все заявки, подходящие под фильтры, без ограничения страницы.
+
+    Строки читаются из курсора порциями по batch_size через fetchmany,
+    поэтому потребление памяти не зависит от размера таблицы.
+
+    Аргументы:
+        status, client_id, supplier_id, search, sort: Как в list_orders
+        batch_size (int): Сколько строк читать из курсора за раз
+
+    Возвращает:
+        Iterator[Dict]: Заявки в порядке сортировки
+    """
+    column, direction = _sort_spec(sort)
+    conditions, params = _order_filters(status, client_id, supplier_id, search)
+
+    query = _SELECT_ORDER
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {column} {direction}, id {direction}"
+    # Проверка аргументов выше выполняется сразу, а чтение — лениво, в генераторе
+    return _iter_rows(query, params, batch_size)
+
+def _iter_rows(query: str, params: List[Any], batch_size: int) -> Iterator[Dict[str, Any]]:
+    db = get_db()
+    db_cursor = db.cursor()
+    try:
+        db_cursor.execute(query, params)
+        while True:
+            rows = db_cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _row_to_order(row)
+    finally:
+        db_cursor.close()
+
 def get_order_by_id(order_id: int) -> Optional[Dict[str, Any]]:
     """
-    Получает заявку по её уникальному идентификатору.
+    Получает заявку по её уникальному идентификатору (из кеша, если она
+    читалась недавно).
     
     Аргументы:
         order_id (int): Уникальный идентификатор заявки
@@ -62,27 +264,21 @@ def get_order_by_id(order_id: int) -> Optional[Dict[str, Any]]:
     Возвращает:
         Optional[Dict]: Словарь с информацией о заявке или None, если заявка не найдена
     """
+    try:
+        key = int(order_id)
+    except (TypeError, ValueError):
+        return _load_order(order_id)
+    return _order_cache.get_or_load(key, lambda: _load_order(key))
+
+
+def _load_order(order_id: Any) -> Optional[Dict[str, Any]]:
     db = get_db()
     cursor = db.cursor()
     try:
-        cursor.execute("""
-            SELECT id, client_id, supplier_id, name, status, 
-                   total_cny, total_rub, total_usd 
-            FROM orders 
-            WHERE id = ?
-        """, (order_id,))
+        cursor.execute(f"{_SELECT_ORDER} WHERE id = ?", (order_id,))
         row = cursor.fetchone()
         if row:
-            return {
-                'id': row[0],
-                'client_id': row[1],
-                'supplier_id': row[2],
-                'name': row[3],
-                'status': row[4],
-                'total_cny': row[5],
-                'total_rub': row[6],
-                'total_usd': row[7]
-            }
+            return _row_to_order(row)
         return None
     except sqlite3.Error as e:
         logger.error(f"Ошибка при получении заявки с ID {order_id}: {e}")
@@ -92,27 +288,14 @@ def get_order_by_id(order_id: int) -> Optional[Dict[str, Any]]:
 
 def get_currency_rates() -> Dict[str, float]:
     """
-    Получает актуальные курсы валют из таблицы CurrencyRates.
-    Базовая валюта - CNY (юань).
+    Получает актуальные курсы валют из общего снимка курсов (см. currency_service).
+    Базовая валюта - CNY (юань). Запроса к базе данных не выполняется.
     
     Возвращает:
         Dict[str, float]: Словарь с курсами валют, где ключи - коды валют,
                           значения - курс по отношению к CNY
     """
-    db = get_db()
-    cursor = db.cursor()
-    try:
-        cursor.execute("SELECT currency_code, rate FROM currency_rates")
-        rows = cursor.fetchall()
-        rates = {}
-        for row in rows:
-            rates[row[0]] = row[1]
-        return rates
-    except sqlite3.Error as e:
-        logger.error(f"Ошибка при получении курсов валют: {e}")
-        return {}
-    finally:
-        cursor.close()
+    return dict(currency_service.get_snapshot().rates)
 
 def _convert_amount(amount: float, from_currency: str, to_currency: str, rates: Dict[str, float]) -> float:
     """
@@ -155,9 +338,14 @@ def create_order(data: Dict[str, Any]) -> Optional[int]:
             - total_cny (float, опционально): Сумма в юанях
             - total_rub (float, опционально): Сумма в рублях
             - total_usd (float, опционально): Сумма в долларах
+            - items (list, опционально): Позиции заявки (см. save_order_items);
+              если они есть, суммы заявки считаются по позициям
             
     Возвращает:
         Optional[int]: Идентификатор созданной заявки или None в случае ошибки
+
+    Исключения:
+        ValueError: Ошибка в позициях заявки
     """
     # Проверяем обязательные поля
     required_fields = ['client_id', 'supplier_id', 'name', 'status']
@@ -166,6 +354,9 @@ def create_order(data: Dict[str, Any]) -> Optional[int]:
             logger.error(f"Отсутствует обязательное поле: {field}")
             return None
     
+    items = _item_values([_validate_item(item, position)
+                          for position, item in enumerate(data.get('items') or [], start=1)])
+
     db = get_db()
     cursor = db.cursor()
     
@@ -192,12 +383,18 @@ def create_order(data: Dict[str, Any]) -> Optional[int]:
         # Выполняем вставку новой заявки
         cursor.execute("""
             INSERT INTO orders (client_id, supplier_id, name, status, 
-                               total_cny, total_rub, total_usd)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+                               total_cny, total_rub, total_usd, created_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
         """, (data['client_id'], data['supplier_id'], data['name'], 
               data['status'], total_cny, total_rub, total_usd))
+        if items:
+            # Триггеры Order_Products заменяют введенные суммы итогами позиций
+            order_id = cursor.lastrowid
+            db.executemany(_INSERT_ITEM, [(order_id,) + values for values in items])
         
         db.commit()
+        _orders_changed()
+        event_bus.publish('orders', {'type': 'created', 'id': cursor.lastrowid})
         return cursor.lastrowid
     except sqlite3.Error as e:
         logger.error(f"Ошибка при создании заявки: {e}")
@@ -206,84 +403,112 @@ def create_order(data: Dict[str, Any]) -> Optional[int]:
     finally:
         cursor.close()
 
-def update_order(order_id: int, data: Dict[str, Any]) -> int:  # Исправлено: добавлен тип данных для data
+class OrderVersionConflict(Exception):
+    """Заявка была изменена после того, как клиент прочитал её версию."""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Версия заявки изменилась (текущая версия {current_version})")
+        self.current_version = current_version
+
+
+_UPDATABLE_FIELDS = ('client_id', 'supplier_id', 'name', 'status')
+
+
+def _totals_assignments(data: Dict[str, Any], rates: Dict[str, float]) -> Tuple[List[str], List[Any]]:
+    """
+    Строит SET-выражения для сумм, сохраняя прежнее правило пересчета:
+    берется первая из total_cny/total_rub/total_usd, значение которой
+    отличается от текущего, остальные две пересчитываются по курсу.
+    Сравнение с текущими значениями делается в самом UPDATE через CASE,
+    поэтому предварительный SELECT не нужен.
+    """
+    provided = [(field, code, data[field]) for field, code in _TOTAL_FIELDS if field in data]
+    if not provided:
+        return [], []
+
+    assignments: List[str] = []
+    params: List[Any] = []
+    for target_field, target_code in _TOTAL_FIELDS:
+        branches = []
+        for field, code, value in provided:
+            branches.append(f"WHEN ? IS NOT {field} THEN ?")
+            params.extend([value, _convert_amount(value, code, target_code, rates)])
+        assignments.append(f"{target_field} = CASE {' '.join(branches)} ELSE {target_field} END")
+    return assignments, params
+
+
+def update_order(order_id: int, data: Dict[str, Any],
+                 expected_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
     """
-    Обновляет существующую заявку в базе данных.
+    Обновляет существующую заявку одним UPDATE ... RETURNING.
+
+    Пересчет сумм выполняется внутри запроса, а версия заявки
+    увеличивается на 1. Если передан expected_version, обновление
+    применяется только к этой версии (оптимистическая блокировка).
     
     Аргументы:
         order_id (int): Идентификатор заявки для обновления
         data (Dict): Словарь с полями для обновления
+        expected_version (int, опционально): Версия, которую видел клиент
         
     Возвращает:
-        int: Количество обновленных записей (0 или 1)
+        Optional[Dict]: Обновленная заявка или None, если заявка не найдена
+
+    Исключения:
+        ValueError: В data нет полей для обновления или меняются суммы заявки
+                    с позициями (они считаются по позициям)
+        OrderVersionConflict: Версия заявки не совпадает с expected_version
     """
-    if not data:
-        return 0
-    
+    assignments = [f"{key} = ?" for key in _UPDATABLE_FIELDS if key in data]
+    params: List[Any] = [data[key] for key in _UPDATABLE_FIELDS if key in data]
+
+    total_assignments, total_params = _totals_assignments(data, get_currency_rates())
+    assignments.extend(total_assignments)
+    params.extend(total_params)
+    if not assignments:
+        raise ValueError("Нет полей для обновления")
+    assignments.append("version = version + 1")
+
+    query = f"UPDATE orders SET {', '.join(assignments)} WHERE id = ?"
+    params.append(order_id)
+    if expected_version is not None:
+        query += " AND version = ?"
+        params.append(expected_version)
+    provided = [(field, data[field]) for field, _ in _TOTAL_FIELDS if field in data]
+    if provided:
+        # У заявки с позициями суммы можно передать только без изменений
+        # (например, форма редактирования отправляет заявку целиком)
+        query += f" AND (items_count = 0 OR ({' AND '.join(f'? IS {field}' for field, _ in provided)}))"
+        params.extend(value for _, value in provided)
+    query += f" RETURNING {', '.join(ORDER_COLUMNS)}"
+
     db = get_db()
     cursor = db.cursor()
-    
     try:
-        # Получаем текущие данные заявки
-        cursor.execute("""
-            SELECT total_cny, total_rub, total_usd 
-            FROM orders 
-            WHERE id = ?
-        """, (order_id,))
+        cursor.execute(query, params)
         row = cursor.fetchone()
-        
-        if not row:
-            logger.warning(f"Заявка с ID {order_id} не найдена")
-            return 0
-        
-        # Получаем курсы валют
-        rates = get_currency_rates()
-        
-        # Текущие значения сумм
-        current_cny, current_rub, current_usd = row
-        
-        # Новые значения сумм (если они обновляются)
-        new_cny = data.get('total_cny', current_cny)
-        new_rub = data.get('total_rub', current_rub)
-        new_usd = data.get('total_usd', current_usd)
-        
-        # Если обновляется сумма в одной валюте, пересчитываем остальные
-        if 'total_cny' in data and data['total_cny'] != current_cny:
-            new_rub = _convert_amount(new_cny, 'CNY', 'RUB', rates)
-            new_usd = _convert_amount(new_cny, 'CNY', 'USD', rates)
-        elif 'total_rub' in data and data['total_rub'] != current_rub:
-            new_cny = _convert_amount(new_rub, 'RUB', 'CNY', rates)
-            new_usd = _convert_amount(new_rub, 'RUB', 'USD', rates)
-        elif 'total_usd' in data and data['total_usd'] != current_usd:
-            new_cny = _convert_amount(new_usd, 'USD', 'CNY', rates)
-            new_rub = _convert_amount(new_usd, 'USD', 'RUB', rates)
-        
-        # Формируем SQL-запрос для обновления
-        update_fields = []
-        update_values = []
-        
-        for key, value in data.items():
-            if key in ['client_id', 'supplier_id', 'name', 'status']:
-                update_fields.append(f"{key} = ?")
-                update_values.append(value)
-        
-        # Добавляем обновленные суммы
-        update_fields.extend(["total_cny = ?", "total_rub = ?", "total_usd = ?"])
-        update_values.extend([new_cny, new_rub, new_usd])
-        
-        # Добавляем ID для WHERE-условия
-        update_values.append(order_id)
-        
-        # Выполняем обновление
-        query = f"UPDATE orders SET {', '.join(update_fields)} WHERE id = ?"
-        cursor.execute(query, update_values)
-        
         db.commit()
-        return cursor.rowcount
+        if row is not None:
+            order = _row_to_order(row)
+            _orders_changed(order['id'])
+            event_bus.publish('orders', {'type': 'updated', 'id': order['id'], 'order': order})
+            return order
+
+        # Ничего не обновилось: различаем отсутствующую заявку, конфликт версий
+        # и попытку изменить суммы заявки с позициями
+        if expected_version is not None or provided:
+            cursor.execute("SELECT version, items_count FROM orders WHERE id = ?", (order_id,))
+            current = cursor.fetchone()
+            if current is not None:
+                if expected_version is not None and current[0] != expected_version:
+                    raise OrderVersionConflict(current[0])
+                raise ValueError("Суммы заявки с позициями считаются по позициям и не меняются вручную")
+        logger.warning(f"Заявка с ID {order_id} не найдена")
+        return None
     except sqlite3.Error as e:
         logger.error(f"Ошибка при обновлении заявки с ID {order_id}: {e}")
         db.rollback()
-        return 0
+        raise
     finally:
         cursor.close()
 
@@ -303,10 +528,285 @@ def delete_order(order_id: int) -> int:
     try:
         cursor.execute("DELETE FROM orders WHERE id = ?", (order_id,))
         db.commit()
+        if cursor.rowcount:
+            _orders_changed(int(order_id))
+            event_bus.publish('orders', {'type': 'deleted', 'id': int(order_id)})
         return cursor.rowcount
     except sqlite3.Error as e:
         logger.error(f"Ошибка при удалении заявки с ID {order_id}: {e}")
         db.rollback()
         return 0
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+# Позиции заявки (Order_Products). Итоги заявки поддерживаются триггерами
+# (schema.ORDER_PRODUCTS_TRIGGERS) в той же транзакции, что и изменение позиций
+ITEM_COLUMNS = ('id', 'order_id', 'product', 'quantity', 'unit_price', 'currency',
+                'amount_cny', 'amount_rub', 'amount_usd', 'created_date')
+_SELECT_ITEMS = f"SELECT {', '.join(ITEM_COLUMNS)} FROM Order_Products"
+_ITEM_FIELDS = ('product', 'quantity', 'unit_price', 'currency')
+_INSERT_ITEM = """
+    INSERT INTO Order_Products (order_id, product, quantity, unit_price, currency,
+                                amount_cny, amount_rub, amount_usd)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+MAX_ITEM_CHANGES = 1000
+
+
+def _validate_item(data: Dict[str, Any], position: int,
+                   current: Optional[Dict[str, Any]] = None) -> Tuple[str, float, float, str]:
+    """
+    Проверяет позицию и приводит типы; недостающие поля берутся из current
+    (редактируемой позиции). Возвращает (product, quantity, unit_price, currency).
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"Позиция {position}: ожидается объект")
+    values = dict(current or {})
+    values.update({field: data[field] for field in _ITEM_FIELDS if field in data})
+
+    product = str(values.get('product') or '').strip()
+    if not product:
+        raise ValueError(f"Позиция {position}: отсутствует обязательное поле: product")
+    try:
+        quantity = float(values.get('quantity'))
+        unit_price = float(values.get('unit_price'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Позиция {position}: quantity и unit_price должны быть числами")
+    if quantity <= 0:
+        raise ValueError(f"Позиция {position}: quantity должно быть больше нуля")
+    if unit_price < 0:
+        raise ValueError(f"Позиция {position}: unit_price не может быть отрицательной")
+    currency = str(values.get('currency') or 'CNY').upper()
+    return product, quantity, unit_price, currency
+
+
+def _item_values(items: List[Tuple[str, float, float, str]]) -> List[Tuple[Any, ...]]:
+    """
+    Добавляет к позициям суммы в CNY, RUB и USD по текущему снимку курсов
+    одной векторной операцией. Возвращает кортежи колонок _INSERT_ITEM без order_id.
+
+    Исключения:
+        ValueError: Неизвестная валюта позиции
+    """
+    if not items:
+        return []
+    totals = currency_service.convert_batch(
+        [quantity * price for _, quantity, price, _ in items], [item[3] for item in items], ['CNY', 'RUB', 'USD'])
+    return [item + amounts for item, amounts in zip(items, zip(totals['CNY'], totals['RUB'], totals['USD']))]
+
+
+def _row_to_item(row) -> Dict[str, Any]:
+    return dict(zip(ITEM_COLUMNS, row))
+
+
+def get_order_items(order_id: int) -> List[Dict[str, Any]]:
+    """
+    Возвращает позиции заявки в порядке добавления.
+
+    Аргументы:
+        order_id (int): Идентификатор заявки
+
+    Возвращает:
+        List[Dict]: Позиции с полями ITEM_COLUMNS
+    """
+    rows = get_db().execute(f"{_SELECT_ITEMS} WHERE order_id = ? ORDER BY id", (order_id,)).fetchall()
+    return [_row_to_item(row) for row in rows]
+
+
+def save_order_items(order_id: int, items: List[Dict[str, Any]], delete: List[int] = (),
+                     expected_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Добавляет, изменяет и удаляет позиции заявки одной транзакцией.
+
+    Позиция без id добавляется, позиция с id изменяется (переданные поля
+    заменяют прежние). Суммы позиций в трех валютах считаются по текущему
+    курсу только для добавленных и измененных позиций; итоги заявки триггеры
+    меняют на разницу сумм, а версия заявки увеличивается на 1.
+
+    Аргументы:
+        order_id (int): Идентификатор заявки
+        items (List[Dict]): Позиции с полями product, quantity, unit_price,
+                            currency (по умолчанию CNY) и, для изменения, id
+        delete (List[int]): Идентификаторы удаляемых позиций
+        expected_version (int, опционально): Версия заявки, которую видел клиент
+
+    Возвращает:
+        Optional[Dict]: {'order': заявка с новыми итогами, 'items': все позиции}
+                        или None, если заявка не найдена
+
+    Исключения:
+        ValueError: Ошибка в позициях, неизвестная позиция или слишком много изменений
+        OrderVersionConflict: Версия заявки не совпадает с expected_version
+    """
+    if not isinstance(items, list) or not isinstance(delete, (list, tuple)):
+        raise ValueError("items и delete должны быть списками")
+    if not items and not delete:
+        raise ValueError("Нет позиций для изменения")
+    if len(items) + len(delete) > MAX_ITEM_CHANGES:
+        raise ValueError(f"Не больше {MAX_ITEM_CHANGES} изменений позиций за запрос")
+    try:
+        delete_ids = {int(item_id) for item_id in delete}
+        edited_ids = [int(item['id']) for item in items if isinstance(item, dict) and item.get('id') is not None]
+    except (TypeError, ValueError):
+        raise ValueError("Идентификаторы позиций должны быть целыми числами")
+    if len(set(edited_ids)) != len(edited_ids) or delete_ids & set(edited_ids):
+        raise ValueError("Каждая позиция может встречаться в запросе только один раз")
+    # Новые позиции проверяются до начала транзакции
+    new_items = [(position, item) for position, item in enumerate(items, start=1)
+                 if not isinstance(item, dict) or item.get('id') is None]
+    added = _item_values([_validate_item(item, position) for position, item in new_items])
+
+    query = "UPDATE orders SET version = version + 1 WHERE id = ?"
+    params: List[Any] = [order_id]
+    if expected_version is not None:
+        query += " AND version = ?"
+        params.append(expected_version)
+
+    db = get_db()
+    try:
+        with db:
+            # Версия заявки увеличивается первой: транзакция сразу берет блокировку
+            # записи, и параллельные изменения позиций этой заявки выполняются по очереди
+            if db.execute(query + " RETURNING id", params).fetchone() is None:
+                current = db.execute("SELECT version FROM orders WHERE id = ?", (order_id,)).fetchone()
+                if current is None:
+                    return None
+                raise OrderVersionConflict(current[0])
+
+            edited = []
+            if edited_ids or delete_ids:
+                ids = list(set(edited_ids) | delete_ids)
+                rows = db.execute(
+                    f"SELECT id, {', '.join(_ITEM_FIELDS)} FROM Order_Products "
+                    f"WHERE order_id = ? AND id IN ({', '.join('?' for _ in ids)})",
+                    [order_id] + ids,
+                ).fetchall()
+                current_items = {row[0]: dict(zip(_ITEM_FIELDS, row[1:])) for row in rows}
+                missing = sorted(set(ids) - current_items.keys())
+                if missing:
+                    raise ValueError(f"Позиции не найдены в заявке: {', '.join(map(str, missing))}")
+                edited_rows = [(position, item) for position, item in enumerate(items, start=1)
+                               if isinstance(item, dict) and item.get('id') is not None]
+                values = _item_values([_validate_item(item, position, current_items[int(item['id'])])
+                                       for position, item in edited_rows])
+                edited = [value + (int(item['id']),) for value, (_, item) in zip(values, edited_rows)]
+
+            if delete_ids:
+                db.executemany("DELETE FROM Order_Products WHERE id = ?", [(item_id,) for item_id in delete_ids])
+            if edited:
+                db.executemany(
+                    "UPDATE Order_Products SET product = ?, quantity = ?, unit_price = ?, currency = ?, "
+                    "amount_cny = ?, amount_rub = ?, amount_usd = ? WHERE id = ?", edited)
+            if added:
+                db.executemany(_INSERT_ITEM, [(order_id,) + value for value in added])
+
+            order = _row_to_order(db.execute(f"{_SELECT_ORDER} WHERE id = ?", (order_id,)).fetchone())
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при изменении позиций заявки с ID {order_id}: {e}")
+        raise
+
+    _orders_changed(order['id'])
+    event_bus.publish('orders', {'type': 'updated', 'id': order['id'], 'order': order})
+    return {'order': order, 'items': get_order_items(order['id'])}
+
+BULK_CHUNK_SIZE = 1000
+_INSERT_ORDER = """
+    INSERT INTO orders (client_id, supplier_id, name, status,
+                       total_cny, total_rub, total_usd, created_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+"""
+
+
+def _validate_bulk_row(data: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    Проверяет строку импорта и приводит типы.
+    Возвращает (client_id, supplier_id, name, status, сумма, валюта суммы).
+    """
+    for field in ('client_id', 'supplier_id', 'name', 'status'):
+        if data.get(field) in (None, ''):
+            raise ValueError(f"Отсутствует обязательное поле: {field}")
+    try:
+        client_id = int(data['client_id'])
+        supplier_id = int(data['supplier_id'])
+    except (TypeError, ValueError):
+        raise ValueError("client_id и supplier_id должны быть целыми числами")
+
+    # Как и в create_order, пересчет идет от первой положительной суммы
+    amount, code = 0.0, 'CNY'
+    for field, field_code in _TOTAL_FIELDS:
+        value = data.get(field)
+        if value in (None, ''):
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Поле {field} должно быть числом")
+        if value < 0:
+            raise ValueError(f"Поле {field} не может быть отрицательным")
+        if value > 0 and amount == 0:
+            amount, code = value, field_code
+    return client_id, supplier_id, str(data['name']), str(data['status']), amount, code
+
+
+def bulk_create_orders(rows: List[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Создает заявки пакетом.
+
+    Все строки проверяются за один проход, суммы во всех трех валютах
+    пересчитываются одной векторной операцией по одному снимку курсов,
+    а вставка идет через executemany порциями по chunk_size строк,
+    каждая порция — одна транзакция. Ошибочные строки пропускаются и
+    попадают в отчет, остальные сохраняются.
+
+    Аргументы:
+        rows (List[Dict]): Строки с теми же полями, что и у create_order
+        chunk_size (int): Сколько строк вставлять в одной транзакции
+
+    Возвращает:
+        Dict: {'created': число созданных заявок,
+               'errors': [{'row': номер строки с 1, 'error': текст}]}
+    """
+    errors: List[Dict[str, Any]] = []
+    valid: List[Tuple[int, Tuple[Any, ...]]] = []
+    for number, data in enumerate(rows, start=1):
+        if not isinstance(data, dict):
+            errors.append({'row': number, 'error': 'Строка должна быть объектом'})
+            continue
+        try:
+            valid.append((number, _validate_bulk_row(data)))
+        except ValueError as e:
+            errors.append({'row': number, 'error': str(e)})
+
+    created = 0
+    if valid:
+        totals = currency_service.convert_batch(
+            [row[4] for _, row in valid], [row[5] for _, row in valid], ['CNY', 'RUB', 'USD'])
+        params = [
+            (number, row[:4] + (cny, rub, usd))
+            for (number, row), cny, rub, usd in zip(valid, totals['CNY'], totals['RUB'], totals['USD'])
+        ]
+
+        db = get_db()
+        for start in range(0, len(params), chunk_size):
+            chunk = params[start:start + chunk_size]
+            try:
+                with db:
+                    db.executemany(_INSERT_ORDER, [values for _, values in chunk])
+                created += len(chunk)
+            except sqlite3.Error as e:
+                # Порция откатилась целиком; повторяем ее построчно, чтобы
+                # сохранить корректные строки и указать, какие именно ошибочны
+                logger.warning(f"Ошибка пакетной вставки заявок, повтор построчно: {e}")
+                for number, values in chunk:
+                    try:
+                        with db:
+                            db.execute(_INSERT_ORDER, values)
+                        created += 1
+                    except sqlite3.Error as row_error:
+                        errors.append({'row': number, 'error': str(row_error)})
+
+    errors.sort(key=lambda item: item['row'])
+    if created:
+        _orders_changed()
+        event_bus.publish('orders', {'type': 'bulk_created', 'count': created})
+    return {'created': created, 'errors': errors}
@@ -0,0 +1,271 @@
+# backend/services/revaluation_service.py
+"""
+Переоценка открытых заявок по новым курсам.
+
+Суммы заявки в RUB и USD хранятся пересчитанными по курсу на момент записи
+и устаревают при смене курсов. RevaluationWorker в фоновом потоке
+пересчитывает их у всех заявок с открытым статусом (не из closed_statuses):
+
+- у заявок без позиций total_rub и total_usd считаются от total_cny;
+- у заявок с позициями пересчитываются суммы позиций (Order_Products)
+  от цены и валюты позиции, итоги заявки обновляют триггеры.
+
+Заявки обрабатываются порциями по id, каждая порция — несколько UPDATE
+в одной короткой транзакции; между порциями поток делает паузу, чтобы
+запись из API получала блокировку без заметного ожидания. Если порция
+выполнялась дольше max_chunk_ms, следующая берется вдвое меньше.
+Меняются только строки, суммы которых отличаются от пересчитанных, у таких
+заявок увеличивается версия, поэтому повторная переоценка по тем же курсам
+ничего не пишет.
+
+Переоценка запускается после публикации новых курсов (событие 'rates'
+шины событий) или вручную через enqueue(). При нескольких воркерах gunicorn
+каждый переоценивает заявки после своего обновления курсов; вторая
+переоценка по тем же курсам только читает.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.database import close_db, get_db
+from backend.services import currency_service, event_bus, order_service
+
+logger = logging.getLogger(__name__)
+
+# Сколько завершенных заданий помнить для GET /api/orders/revaluation/<id>
+MAX_TRACKED_JOBS = 100
+
+# Порция не становится меньше этого числа заявок
+MIN_CHUNK_SIZE = 10
+
+DEFAULT_CLOSED_STATUSES = ('доставлен', 'отменен', 'закрыт')
+
+# Суммы позиции: количество * цена * коэффициент валюты позиции к CNY, RUB, USD.
+# Коэффициенты передаются строками VALUES, поэтому UPDATE ... FROM
+# обходится без CASE по всем валютам
+_ITEM_AMOUNTS = (('amount_cny', 'to_cny'), ('amount_rub', 'to_rub'), ('amount_usd', 'to_usd'))
+
+
+def _placeholders(count: int) -> str:
+    return ', '.join('?' * count)
+
+
+class RevaluationWorker:
+    """
+    Аргументы:
+        closed_statuses (Sequence[str]): Статусы закрытых заявок; их суммы не меняются
+        chunk_size (int): Наибольшее число заявок в одной транзакции
+        pause (float): Пауза между порциями, секунды
+        max_chunk_ms (float): Желаемая длительность транзакции порции, мс
+    """
+
+    def __init__(self, closed_statuses: Sequence[str] = DEFAULT_CLOSED_STATUSES, chunk_size: int = 500,
+                 pause: float = 0.05, max_chunk_ms: float = 50.0):
+        self.closed_statuses = tuple(closed_statuses)
+        self.chunk_size = max(MIN_CHUNK_SIZE, chunk_size)
+        self.pause = pause
+        self.max_chunk_ms = max_chunk_ms
+
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='order-revaluation', daemon=True)
+        self._thread.start()
+        event_bus.subscribe(self._on_event)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        event_bus.unsubscribe(self._on_event)
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, reason: str = 'manual') -> str:
+        """
+        Ставит переоценку в очередь и возвращает id задания. Если задание
+        уже ждет в очереди, возвращается его id: оно возьмет курсы на момент
+        своего запуска.
+        """
+        with self._lock:
+            if self._pending:
+                return self._pending[-1]
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'reason': reason,
+                'rates_version': None,
+                'total': None,
+                'processed': 0,
+                'changed': 0,
+                'items_changed': 0,
+                'created_at': datetime.utcnow().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+            }
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+            self._pending.append(job_id)
+        self._wakeup.set()
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _set_job(self, job_id: str, **fields) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _on_event(self, topic: str, event: Dict[str, Any]) -> None:
+        # Вызывается в потоке, опубликовавшем курсы: только ставим задание в очередь.
+        # Перечитанный из базы снимок (reloaded) новых курсов не содержит
+        if topic == 'rates' and event.get('type') == 'updated' and not event.get('reloaded'):
+            self.enqueue('rates')
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._stop.is_set():
+                with self._lock:
+                    if not self._pending:
+                        break
+                    job_id = self._pending.pop(0)
+                self.run_job(job_id)
+
+    def run_job(self, job_id: str) -> None:
+        """Выполняет задание в текущем потоке; итог и ошибка записываются в задание."""
+        self._set_job(job_id, status='running', started_at=datetime.utcnow().isoformat())
+        try:
+            result = self._revalue(job_id)
+            status = 'cancelled' if self._stop.is_set() else 'success'
+            self._set_job(job_id, status=status, finished_at=datetime.utcnow().isoformat(), **result)
+        except Exception as e:
+            logger.error(f"Ошибка переоценки заявок: {e}")
+            self._set_job(job_id, status='error', error=str(e), finished_at=datetime.utcnow().isoformat())
+        finally:
+            # Поток не держит соединение между заданиями
+            close_db()
+
+    def _factors(self, snapshot: currency_service.RateSnapshot) -> List[Tuple[str, float, float, float]]:
+        """(валюта, коэффициент к CNY, к RUB, к USD) по матрице кросс-курсов снимка."""
+        targets = snapshot.code_indexes(['CNY', 'RUB', 'USD'])
+        cross = snapshot.cross_rates
+        return [(code, *(float(cross[i, j]) for j in targets)) for i, code in enumerate(snapshot.codes)]
+
+    def _revalue(self, job_id: str) -> Dict[str, int]:
+        snapshot = currency_service.get_snapshot()
+        factors = self._factors(snapshot)
+        to_rub, to_usd = next(row[2:] for row in factors if row[0] == 'CNY')
+        closed = self.closed_statuses
+        open_filter = f"status NOT IN ({_placeholders(len(closed))})" if closed else "1"
+
+        db = get_db()
+        total = db.execute(f"SELECT COUNT(*) FROM orders WHERE {open_filter}", closed).fetchone()[0]
+        self._set_job(job_id, rates_version=snapshot.version, total=total)
+
+        values = ', '.join('(?, ?, ?, ?)' for _ in factors)
+        factor_params = [value for row in factors for value in row]
+        amounts = [f"quantity * unit_price * factors.{factor}" for _, factor in _ITEM_AMOUNTS]
+        update_items = (
+            f"WITH factors (currency, to_cny, to_rub, to_usd) AS (VALUES {values}) "
+            f"UPDATE Order_Products SET "
+            f"{', '.join(f'{column} = {amount}' for (column, _), amount in zip(_ITEM_AMOUNTS, amounts))} "
+            f"FROM factors WHERE factors.currency = Order_Products.currency "
+            f"AND Order_Products.order_id IN (SELECT id FROM orders WHERE id > ? AND id <= ? "
+            f"AND items_count > 0 AND {open_filter}) "
+            f"AND ({' OR '.join(f'{column} IS NOT {amount}' for (column, _), amount in zip(_ITEM_AMOUNTS, amounts))}) "
+            f"RETURNING order_id"
+        )
+        update_orders = (
+            f"UPDATE orders SET total_rub = total_cny * ?, total_usd = total_cny * ?, version = version + 1 "
+            f"WHERE id > ? AND id <= ? AND items_count = 0 AND {open_filter} "
+            f"AND (total_rub IS NOT total_cny * ? OR total_usd IS NOT total_cny * ?) "
+            f"RETURNING id"
+        )
+
+        processed = changed = items_changed = 0
+        chunk_size = self.chunk_size
+        last_id = 0
+        while not self._stop.is_set():
+            # Границы порции читаются до транзакции: блокировка записи держится только на UPDATE
+            ids = db.execute(f"SELECT id FROM orders WHERE id > ? AND {open_filter} ORDER BY id LIMIT ?",
+                             (last_id, *closed, chunk_size)).fetchall()
+            if not ids:
+                break
+            upper = ids[-1][0]
+
+            started = time.perf_counter()
+            with db:
+                item_orders = [row[0] for row in db.execute(
+                    update_items, (*factor_params, last_id, upper, *closed)).fetchall()]
+                order_ids = [row[0] for row in db.execute(
+                    update_orders, (to_rub, to_usd, last_id, upper, *closed, to_rub, to_usd)).fetchall()]
+                itemised = sorted(set(item_orders))
+                if itemised:
+                    db.execute(f"UPDATE orders SET version = version + 1 WHERE id IN ({_placeholders(len(itemised))})",
+                               itemised)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            if order_ids or itemised:
+                order_service.orders_changed(order_ids + itemised)
+            processed += len(ids)
+            changed += len(order_ids) + len(itemised)
+            items_changed += len(item_orders)
+            last_id = upper
+            self._set_job(job_id, processed=processed, changed=changed, items_changed=items_changed)
+
+            if elapsed_ms > self.max_chunk_ms:
+                chunk_size = max(MIN_CHUNK_SIZE, chunk_size // 2)
+            elif elapsed_ms < self.max_chunk_ms / 4:
+                chunk_size = min(self.chunk_size, chunk_size * 2)
+            self._stop.wait(self.pause)
+
+        if changed:
+            event_bus.publish('orders', {'type': 'revalued', 'count': changed})
+        logger.info(f"Переоценка заявок по курсам версии {snapshot.version}: "
+                    f"просмотрено {processed}, изменено {changed}, позиций {items_changed}")
+        return {'processed': processed, 'changed': changed, 'items_changed': items_changed}
+
+
+_worker: Optional[RevaluationWorker] = None
+_worker_lock = threading.Lock()
+
+
+def start_worker(closed_statuses: Sequence[str] = DEFAULT_CLOSED_STATUSES, chunk_size: int = 500,
+                 pause: float = 0.05, max_chunk_ms: float = 50.0) -> RevaluationWorker:
+    """Запускает общий для процесса поток переоценки заявок."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = RevaluationWorker(closed_statuses, chunk_size, pause, max_chunk_ms)
+            _worker.start()
+        return _worker
+
+
+def stop_worker() -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _worker.stop()
+            _worker = None
+
+
+def get_worker() -> Optional[RevaluationWorker]:
+    return _worker
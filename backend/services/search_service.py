@@ -0,0 +1,247 @@
+# backend/services/search_service.py
+"""
+Полнотекстовый поиск по заявкам, клиентам, поставщикам, сообщениям и документам.
+
+Для каждой таблицы есть индекс FTS5 с внешним содержимым (OrdersFts,
+ClientsFts, SuppliersFts, CommunicationsFts; у документов — DocumentsFts,
+который заполняет обработка документов). Индексы обновляются триггерами
+в той же транзакции, что и исходная строка, поэтому поиск сразу видит
+изменения.
+
+Токенизатор unicode61 приводит кириллицу и латиницу к нижнему регистру и
+убирает диакритику; ё заменяется на е и в индексе, и в запросе. Каждое
+слово запроса ищется по началу, все слова должны встретиться.
+
+Ранжирование. bm25 в FTS5 для каждого слова запроса считает, в скольких
+строках индекса оно встречается, — для слова из сотен тысяч строк это
+десятки миллисекунд при любом LIMIT. Поэтому bm25 (с весами колонок:
+название важнее заметок) применяется, только если каждое слово запроса
+встречается в индексе реже RANK_LIMIT раз; такие запросы узкие, и ранжировать
+их дешево. Для широких запросов индекс отдает самые новые совпадения: FTS5
+читает список документов с конца и останавливается после limit строк.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from backend.database import get_db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Маркеры найденных слов во фрагменте; клиент выделяет текст между ними
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+SNIPPET_TOKENS = 12
+
+# Слово, которое встречается в индексе хотя бы столько раз, делает запрос широким
+RANK_LIMIT = 500
+
+# Длины префиксов, для которых у индексов есть prefix-индекс (schema.SEARCH_FTS_OPTIONS)
+INDEXED_PREFIXES = (2, 3, 4)
+
+# Слова короче этого ищутся целиком: начало из одной буквы совпадает
+# с огромным числом терминов, и такой запрос перебирал бы почти весь индекс
+MIN_PREFIX = 2
+
+
+class SearchSource(NamedTuple):
+    index: str
+    table: str
+    # Колонки исходной таблицы, которые возвращаются вместе с результатом
+    columns: Tuple[str, ...]
+    title: str
+
+
+SEARCH_SOURCES = {
+    'order': SearchSource('OrdersFts', 'orders', ('name', 'status', 'client_id', 'supplier_id'), 'name'),
+    'client': SearchSource('ClientsFts', 'Clients', ('name', 'contact', 'phone', 'email', 'city'), 'name'),
+    'supplier': SearchSource('SuppliersFts', 'Suppliers', ('name', 'contact', 'phone', 'email', 'city'), 'name'),
+    'message': SearchSource('CommunicationsFts', 'Communications', ('channel', 'chat_id', 'sender', 'order_id',
+                                                                     'received_at'), 'sender'),
+    'document': SearchSource('DocumentsFts', 'Documents', ('filename', 'doc_type', 'order_id', 'shipment_id'),
+                             'filename'),
+}
+SEARCH_TYPES = tuple(SEARCH_SOURCES)
+
+
+def fold_text(text: str) -> str:
+    """Заменяет ё на е, как при индексации (schema.fold_sql)."""
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _words(text: str) -> List[str]:
+    words = [word.replace('"', '') for word in fold_text(text).split()]
+    return [word for word in words if word]
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Превращает поисковую строку пользователя в запрос FTS5: каждое слово
+    берется в кавычки (операторы FTS5 во вводе не интерпретируются) и ищется
+    по началу, все слова должны встретиться.
+
+    Возвращает:
+        Optional[str]: Запрос для MATCH или None, если в строке нет слов
+    """
+    words = _words(text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' if len(word) >= MIN_PREFIX else f'"{word}"' for word in words)
+
+
+def _parse_types(types: Optional[Iterable[str]]) -> List[str]:
+    if not types:
+        return list(SEARCH_TYPES)
+    result = []
+    for kind in types:
+        if kind not in SEARCH_SOURCES:
+            raise ValueError(f"Неизвестный тип результата поиска: {kind}")
+        if kind not in result:
+            result.append(kind)
+    return result
+
+
+def _is_frequent(index: str, phrase: str) -> bool:
+    """
+    Встречается ли phrase в индексе хотя бы RANK_LIMIT раз. Список документов
+    слова (и префикса из prefix-индекса) FTS5 читает лениво, поэтому проверка
+    стоит доли миллисекунды и не зависит от частоты слова.
+    """
+    row = get_db().execute(
+        f"SELECT rowid FROM {index} WHERE {index} MATCH ? LIMIT 1 OFFSET ?",
+        (phrase, RANK_LIMIT - 1),
+    ).fetchone()
+    return row is not None
+
+
+def _index_query(index: str, words: List[str]) -> Tuple[str, bool]:
+    """
+    Запрос MATCH для одного индекса и признак широкого запроса.
+
+    Префикс длиннее INDEXED_PREFIXES FTS5 ищет, сливая списки документов
+    всех слов с этим началом целиком, — для частого слова это десятки
+    миллисекунд. Частое слово такой длины ищется целиком: запрос с ним все
+    равно широкий и отдает самые новые совпадения, а список одного слова
+    читается лениво. Для редкого слова префикс оставляется — у длинного
+    начала немного продолжений.
+    """
+    parts = []
+    broad = False
+    for word in words:
+        exact = f'"{word}"'
+        if len(word) < MIN_PREFIX:
+            phrase, frequent = exact, _is_frequent(index, exact)
+        elif len(word) in INDEXED_PREFIXES:
+            phrase = f'"{word}"*'
+            frequent = _is_frequent(index, phrase)
+        else:
+            frequent = _is_frequent(index, exact)
+            phrase = exact if frequent else f'"{word}"*'
+        parts.append(phrase)
+        broad = broad or frequent
+    return ' '.join(parts), broad
+
+
+def _search_source(kind: str, words: List[str], limit: int) -> List[Dict[str, Any]]:
+    """Лучшие (или, для широкого запроса, самые новые) limit совпадений одного индекса."""
+    source = SEARCH_SOURCES[kind]
+    match, broad = _index_query(source.index, words)
+    db = get_db()
+    # snippet() считается только для строк, попавших в LIMIT
+    hits = db.execute(
+        f"SELECT rowid, {'NULL' if broad else 'rank'}, snippet({source.index}, -1, ?, ?, '…', ?) "
+        f"FROM {source.index} WHERE {source.index} MATCH ? "
+        f"ORDER BY {'rowid DESC' if broad else 'rank'} LIMIT ?",
+        (HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS, match, limit),
+    ).fetchall()
+    if not hits:
+        return []
+
+    ids = [hit[0] for hit in hits]
+    rows = db.execute(
+        f"SELECT id, {', '.join(source.columns)} FROM {source.table} "
+        f"WHERE id IN ({', '.join('?' for _ in ids)})",
+        ids,
+    ).fetchall()
+    fields = {row[0]: dict(zip(source.columns, row[1:])) for row in rows}
+
+    results = []
+    for rowid, rank, snippet in hits:
+        if rowid not in fields:
+            continue
+        data = fields[rowid]
+        title = data.get(source.title)
+        if kind == 'message' and not title:
+            title = data['chat_id']
+        results.append({
+            'type': kind,
+            'id': rowid,
+            'title': title,
+            'snippet': snippet,
+            # bm25 в FTS5 отрицателен: чем меньше, тем лучше; наружу — чем больше, тем лучше.
+            # У широкого запроса оценки нет (None)
+            'score': round(-rank, 4) if rank is not None else None,
+            'fields': data,
+        })
+    return results
+
+
+def search(q: str, types: Optional[Iterable[str]] = None, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """
+    Ищет по всем индексам и объединяет результаты.
+
+    Сначала идут результаты, ранжированные bm25 (по убыванию score), затем
+    результаты широких запросов — самые новые, поочередно из каждого индекса.
+    Запрос из одного числа дополнительно находит заявку с таким номером
+    (номер не входит в текст индекса) и ставит ее первой.
+
+    Аргументы:
+        q (str): Поисковая строка
+        types (Iterable[str], опционально): Типы результатов из SEARCH_TYPES; по умолчанию все
+        limit (int): Сколько результатов вернуть (не больше MAX_LIMIT)
+
+    Возвращает:
+        Dict: {'query': строка запроса, 'results': список результатов}; у результата
+              поля type, id, title, snippet (найденные слова между HIGHLIGHT_START
+              и HIGHLIGHT_END), score (None у широкого запроса) и fields — поля исходной строки
+
+    Исключения:
+        ValueError: Неизвестный тип результата
+    """
+    kinds = _parse_types(types)
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    results: List[Dict[str, Any]] = []
+
+    number = q.strip().lstrip('#')
+    if 'order' in kinds and number.isdigit():
+        row = get_db().execute("SELECT id, name, status, client_id, supplier_id FROM orders WHERE id = ?",
+                               (int(number),)).fetchone()
+        if row is not None:
+            fields = dict(zip(SEARCH_SOURCES['order'].columns, row[1:]))
+            results.append({'type': 'order', 'id': row[0], 'title': fields['name'], 'snippet': fields['name'],
+                            'score': None, 'fields': fields})
+
+    words = _words(q)
+    if not words:
+        return {'query': q, 'results': results}
+
+    # Каждый индекс отдает не больше limit строк. bm25 разных индексов сравним
+    # лишь приблизительно, но для общего списка этого достаточно
+    ranked: List[Dict[str, Any]] = []
+    recent: List[Tuple[int, int, Dict[str, Any]]] = []
+    for order, kind in enumerate(kinds):
+        for position, item in enumerate(_search_source(kind, words, limit)):
+            if item['score'] is None:
+                recent.append((position, order, item))
+            else:
+                ranked.append(item)
+    ranked.sort(key=lambda item: item['score'], reverse=True)
+    recent.sort(key=lambda entry: entry[:2])
+
+    exact = {(item['type'], item['id']) for item in results}
+    for item in ranked + [item for _, _, item in recent]:
+        if (item['type'], item['id']) not in exact:
+            results.append(item)
+    return {'query': q, 'results': results[:limit]}
@@ -0,0 +1,396 @@
+# backend/services/shipment_service.py
+
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.database import get_db
+from backend.services import event_bus
+
+logger = logging.getLogger(__name__)
+
+# Этапы доставки в порядке прохождения
+SHIPMENT_STAGES = ('created', 'picked_up', 'in_transit', 'customs', 'arrived', 'delivered', 'cancelled')
+# После этих этапов отгрузка больше не отслеживается
+FINAL_STAGES = ('delivered', 'cancelled')
+
+SHIPMENT_COLUMNS = ('id', 'order_id', 'carrier', 'tracking_number', 'origin', 'destination', 'eta',
+                    'current_stage', 'current_stage_at', 'current_location', 'created_date',
+                    'last_polled_at', 'poll_error')
+_SELECT_SHIPMENT = f"SELECT {', '.join(SHIPMENT_COLUMNS)} FROM Shipments"
+
+# Колонки этапа; все они есть в индексе idx_shipment_stages_timeline
+STAGE_COLUMNS = ('id', 'shipment_id', 'stage', 'ts', 'location', 'note', 'source')
+
+_EDITABLE_FIELDS = ('order_id', 'carrier', 'tracking_number', 'origin', 'destination', 'eta')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _row_to_shipment(row) -> Dict[str, Any]:
+    return dict(zip(SHIPMENT_COLUMNS, row))
+
+
+def _row_to_stage(row) -> Dict[str, Any]:
+    return dict(zip(STAGE_COLUMNS, row))
+
+
+def normalize_ts(value: Any = None) -> str:
+    """
+    Приводит время к формату CURRENT_TIMESTAMP (UTC, 'YYYY-MM-DD HH:MM:SS'),
+    чтобы этапы из разных источников сравнивались как строки.
+    """
+    if value in (None, ''):
+        moment = datetime.now(timezone.utc)
+    elif isinstance(value, datetime):
+        moment = value
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Некорректное время: {value}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _check_stage(stage: Any) -> str:
+    if stage not in SHIPMENT_STAGES:
+        raise ValueError(f"Неизвестный этап: {stage}. Допустимые: {', '.join(SHIPMENT_STAGES)}")
+    return stage
+
+
+def _shipment_fields(data: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    fields = [field for field in _EDITABLE_FIELDS if field in data]
+    values = []
+    for field in fields:
+        value = data[field]
+        if field == 'order_id' and value is not None:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError("order_id должен быть целым числом")
+        elif field == 'eta' and value not in (None, ''):
+            value = normalize_ts(value)
+        values.append(value)
+    return fields, values
+
+
+def get_shipment(shipment_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Получает отгрузку с текущим этапом.
+
+    Аргументы:
+        shipment_id (int): Идентификатор отгрузки
+
+    Возвращает:
+        Optional[Dict]: Отгрузка или None, если она не найдена
+    """
+    db = get_db()
+    row = db.execute(f"{_SELECT_SHIPMENT} WHERE id = ?", (shipment_id,)).fetchone()
+    return _row_to_shipment(row) if row else None
+
+
+def get_shipment_by_tracking(tracking_number: str, carrier: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Ищет отгрузку по трек-номеру (одно обращение к индексу idx_shipments_tracking).
+
+    Аргументы:
+        tracking_number (str): Трек-номер перевозчика
+        carrier (str, опционально): Перевозчик, если номера разных перевозчиков совпадают
+
+    Возвращает:
+        Optional[Dict]: Отгрузка или None, если она не найдена
+    """
+    query = f"{_SELECT_SHIPMENT} WHERE tracking_number = ?"
+    params: List[Any] = [tracking_number]
+    if carrier:
+        query += " AND carrier = ?"
+        params.append(carrier)
+    row = get_db().execute(query + " ORDER BY id DESC LIMIT 1", params).fetchone()
+    return _row_to_shipment(row) if row else None
+
+
+def list_shipments(stage: Optional[str] = None,
+                   order_id: Optional[int] = None,
+                   carrier: Optional[str] = None,
+                   limit: int = DEFAULT_PAGE_SIZE,
+                   cursor: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Получает страницу отгрузок, новые первыми.
+
+    Фильтр по этапу читает материализованный current_stage через индекс
+    (current_stage, id), история этапов при этом не просматривается.
+
+    Аргументы:
+        stage (str, опционально): Текущий этап
+        order_id (int, опционально): Заявка
+        carrier (str, опционально): Перевозчик
+        limit (int): Размер страницы (не больше MAX_PAGE_SIZE)
+        cursor (int, опционально): next_cursor предыдущей страницы
+
+    Возвращает:
+        Dict: {'shipments': список отгрузок, 'next_cursor': курсор следующей страницы или None}
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    conditions: List[str] = []
+    params: List[Any] = []
+    if stage:
+        conditions.append("current_stage = ?")
+        params.append(_check_stage(stage))
+    if order_id is not None:
+        conditions.append("order_id = ?")
+        params.append(order_id)
+    if carrier:
+        conditions.append("carrier = ?")
+        params.append(carrier)
+    if cursor is not None:
+        conditions.append("id < ?")
+        params.append(int(cursor))
+
+    query = _SELECT_SHIPMENT
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    shipments = [_row_to_shipment(row) for row in get_db().execute(query, params).fetchall()]
+    next_cursor = None
+    if len(shipments) > limit:
+        shipments = shipments[:limit]
+        next_cursor = shipments[-1]['id']
+    return {'shipments': shipments, 'next_cursor': next_cursor}
+
+
+def get_timeline(shipment_id: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Возвращает историю этапов отгрузки в хронологическом порядке.
+
+    Аргументы:
+        shipment_id (int): Идентификатор отгрузки
+
+    Возвращает:
+        Optional[List[Dict]]: Этапы или None, если отгрузка не найдена
+    """
+    db = get_db()
+    rows = db.execute(
+        f"SELECT {', '.join(STAGE_COLUMNS)} FROM ShipmentStages WHERE shipment_id = ? ORDER BY ts, id",
+        (shipment_id,),
+    ).fetchall()
+    if not rows and get_shipment(shipment_id) is None:
+        return None
+    return [_row_to_stage(row) for row in rows]
+
+
+def create_shipment(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Создает отгрузку и первый этап created в одной транзакции.
+
+    Аргументы:
+        data (Dict): order_id, carrier, tracking_number, origin, destination, eta
+                     (все поля необязательные)
+
+    Возвращает:
+        Dict: Созданная отгрузка
+
+    Исключения:
+        ValueError: Некорректные поля или трек-номер уже занят
+    """
+    fields, values = _shipment_fields(data)
+    placeholders = ', '.join('?' for _ in fields)
+    db = get_db()
+    try:
+        with db:
+            cursor = db.execute(
+                f"INSERT INTO Shipments ({', '.join(fields)}) VALUES ({placeholders})" if fields
+                else "INSERT INTO Shipments DEFAULT VALUES",
+                values,
+            )
+            shipment_id = cursor.lastrowid
+            db.execute(
+                "INSERT INTO ShipmentStages (shipment_id, stage, ts, source) VALUES (?, 'created', ?, 'manual')",
+                (shipment_id, normalize_ts()),
+            )
+    except sqlite3.IntegrityError:
+        raise ValueError("Отгрузка с таким трек-номером у этого перевозчика уже есть")
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при создании отгрузки: {e}")
+        raise
+
+    event_bus.publish('shipments', {'type': 'created', 'id': shipment_id})
+    return get_shipment(shipment_id)
+
+
+def append_stage(shipment_id: int, stage: str, ts: Any = None, location: Optional[str] = None,
+                 note: Optional[str] = None, source: str = 'manual') -> Optional[Dict[str, Any]]:
+    """
+    Добавляет этап в журнал отгрузки.
+
+    Текущий этап отгрузки обновляет триггер trg_shipment_stages_current в той же
+    транзакции; этап с более ранним ts, чем текущий, только дополняет историю.
+
+    Аргументы:
+        shipment_id (int): Идентификатор отгрузки
+        stage (str): Один из SHIPMENT_STAGES
+        ts (str, опционально): Время этапа; по умолчанию — текущее
+        location (str, опционально): Местоположение груза
+        note (str, опционально): Комментарий
+        source (str): Источник события: manual или имя перевозчика
+
+    Возвращает:
+        Optional[Dict]: {'stage': добавленный этап, 'shipment': отгрузка}
+                        или None, если отгрузка не найдена
+    """
+    _check_stage(stage)
+    ts = normalize_ts(ts)
+    db = get_db()
+    try:
+        with db:
+            # Вставка выполняется, только если отгрузка существует
+            row = db.execute(
+                f"""
+                INSERT INTO ShipmentStages (shipment_id, stage, ts, location, note, source)
+                SELECT ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM Shipments WHERE id = ?)
+                RETURNING {', '.join(STAGE_COLUMNS)}
+                """,
+                (shipment_id, stage, ts, location, note, source or 'manual', shipment_id),
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при добавлении этапа отгрузки {shipment_id}: {e}")
+        raise
+    if row is None:
+        return None
+
+    shipment = get_shipment(shipment_id)
+    event_bus.publish('shipments', {
+        'type': 'stage',
+        'id': shipment['id'],
+        'stage': stage,
+        'current_stage': shipment['current_stage'],
+        'current_location': shipment['current_location'],
+    })
+    return {'stage': _row_to_stage(row), 'shipment': shipment}
+
+
+def update_shipment(shipment_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Изменяет данные отгрузки (перевозчик, трек-номер, маршрут, ETA).
+    Этапы так не меняются — для них есть append_stage.
+
+    Возвращает:
+        Optional[Dict]: Обновленная отгрузка или None, если она не найдена
+
+    Исключения:
+        ValueError: Нет полей для обновления, некорректные поля или трек-номер занят
+    """
+    fields, values = _shipment_fields(data)
+    if not fields:
+        raise ValueError("Нет полей для обновления")
+    db = get_db()
+    try:
+        with db:
+            row = db.execute(
+                f"UPDATE Shipments SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ? "
+                f"RETURNING {', '.join(SHIPMENT_COLUMNS)}",
+                values + [shipment_id],
+            ).fetchone()
+    except sqlite3.IntegrityError:
+        raise ValueError("Отгрузка с таким трек-номером у этого перевозчика уже есть")
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при обновлении отгрузки {shipment_id}: {e}")
+        raise
+    if row is None:
+        return None
+    shipment = _row_to_shipment(row)
+    event_bus.publish('shipments', {'type': 'updated', 'id': shipment['id']})
+    return shipment
+
+
+def delete_shipment(shipment_id: int) -> int:
+    """
+    Удаляет отгрузку вместе с историей этапов.
+
+    Возвращает:
+        int: Количество удаленных отгрузок (0 или 1)
+
+    Исключения:
+        sqlite3.Error: Ошибка базы данных; транзакция откатывается
+    """
+    db = get_db()
+    try:
+        with db:
+            deleted = db.execute("DELETE FROM Shipments WHERE id = ?", (shipment_id,)).rowcount
+            # Триггер разрешает удаление этапов только после удаления отгрузки
+            db.execute("DELETE FROM ShipmentStages WHERE shipment_id = ?", (shipment_id,))
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при удалении отгрузки {shipment_id}: {e}")
+        raise
+    if deleted:
+        event_bus.publish('shipments', {'type': 'deleted', 'id': int(shipment_id)})
+    return deleted
+
+
+def get_active_shipments() -> List[Dict[str, Any]]:
+    """
+    Отгрузки, которые нужно отслеживать у перевозчика: с трек-номером и
+    перевозчиком на незавершенных этапах (читаются по частичному индексу
+    idx_shipments_active).
+
+    Возвращает:
+        List[Dict]: Отгрузки, упорядоченные по перевозчику
+    """
+    final = ', '.join(f"'{stage}'" for stage in FINAL_STAGES)
+    rows = get_db().execute(
+        f"{_SELECT_SHIPMENT} INDEXED BY idx_shipments_active "
+        f"WHERE tracking_number IS NOT NULL AND current_stage NOT IN ({final}) "
+        f"AND carrier IS NOT NULL ORDER BY carrier, id"
+    ).fetchall()
+    return [_row_to_shipment(row) for row in rows]
+
+
+def record_poll(stages: List[Dict[str, Any]], polled_ids: List[int],
+                errors: Optional[Dict[int, str]] = None, polled_at: Any = None) -> int:
+    """
+    Сохраняет результат опроса перевозчика одной транзакцией: новые этапы
+    вставляются через executemany, у опрошенных отгрузок обновляется
+    last_polled_at, у отгрузок с ошибкой — poll_error.
+
+    Аргументы:
+        stages (List[Dict]): Этапы с полями shipment_id, stage, ts, location, note, source
+        polled_ids (List[int]): Отгрузки, по которым перевозчик ответил
+        errors (Dict[int, str], опционально): Ошибки перевозчика по отгрузкам
+        polled_at: Время опроса; по умолчанию — текущее
+
+    Возвращает:
+        int: Количество добавленных этапов
+    """
+    polled_at = normalize_ts(polled_at)
+    rows = [(item['shipment_id'], _check_stage(item['stage']), normalize_ts(item.get('ts')),
+             item.get('location'), item.get('note'), item.get('source') or 'carrier')
+            for item in stages]
+    errors = errors or {}
+    db = get_db()
+    try:
+        with db:
+            db.executemany(
+                "INSERT INTO ShipmentStages (shipment_id, stage, ts, location, note, source) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.executemany(
+                "UPDATE Shipments SET last_polled_at = ?, poll_error = NULL WHERE id = ?",
+                [(polled_at, shipment_id) for shipment_id in polled_ids],
+            )
+            db.executemany(
+                "UPDATE Shipments SET poll_error = ? WHERE id = ?",
+                [(error, shipment_id) for shipment_id, error in errors.items()],
+            )
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при сохранении результатов опроса перевозчика: {e}")
+        raise
+
+    for shipment_id in sorted({row[0] for row in rows}):
+        event_bus.publish('shipments', {'type': 'stage', 'id': shipment_id})
+    return len(rows)
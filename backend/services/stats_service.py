@@ -0,0 +1,99 @@
+# backend/services/stats_service.py
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from backend.database import close_db, configure_pool, get_db
+from backend.database.schema import STATS_DIMENSIONS, rebuild_order_stats
+
+logger = logging.getLogger(__name__)
+
+_SUM_FIELDS = ('count', 'total_cny', 'total_rub', 'total_usd')
+
+
+def _row_to_stats(row) -> Dict[str, Any]:
+    return {
+        'count': row['count'],
+        'total_cny': row['sum_cny'],
+        'total_rub': row['sum_rub'],
+        'total_usd': row['sum_usd'],
+    }
+
+
+def get_summary() -> Dict[str, Any]:
+    """
+    Возвращает сводку по всем заявкам из таблицы агрегатов.
+    
+    Возвращает:
+        Dict: {'total': {count, total_cny, total_rub, total_usd},
+               'by_status': {статус: {count, total_cny, total_rub, total_usd}}}
+    """
+    db = get_db()
+    rows = db.execute(
+        "SELECT status, count, sum_cny, sum_rub, sum_usd FROM order_stats "
+        "WHERE dimension = 'all' AND count > 0"
+    ).fetchall()
+
+    by_status = {row['status']: _row_to_stats(row) for row in rows}
+    total = {field: sum(item[field] for item in by_status.values()) for field in _SUM_FIELDS}
+    return {'total': total, 'by_status': by_status}
+
+
+def get_groups(dimension: str, key: Optional[str] = None,
+               key_from: Optional[str] = None, key_to: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Возвращает агрегаты в разрезе клиента, поставщика или дня.
+    
+    Аргументы:
+        dimension (str): client, supplier или day
+        key (str, опционально): Конкретный клиент, поставщик или день (YYYY-MM-DD)
+        key_from, key_to (str, опционально): Диапазон ключей включительно, например дат
+        
+    Возвращает:
+        List[Dict]: Строки {key, status, count, total_cny, total_rub, total_usd}
+    """
+    if dimension not in STATS_DIMENSIONS or dimension == 'all':
+        raise ValueError(f"Неизвестный разрез статистики: {dimension}")
+
+    conditions = ["dimension = ?", "count > 0"]
+    params: List[Any] = [dimension]
+    if key is not None:
+        conditions.append("key = ?")
+        params.append(key)
+    if key_from is not None:
+        conditions.append("key >= ?")
+        params.append(key_from)
+    if key_to is not None:
+        conditions.append("key <= ?")
+        params.append(key_to)
+
+    db = get_db()
+    rows = db.execute(
+        "SELECT key, status, count, sum_cny, sum_rub, sum_usd FROM order_stats "
+        f"WHERE {' AND '.join(conditions)} ORDER BY key, status",
+        params,
+    ).fetchall()
+    return [dict(key=row['key'], status=row['status'], **_row_to_stats(row)) for row in rows]
+
+
+def rebuild_stats() -> None:
+    """Пересчитывает таблицу агрегатов по текущим заявкам (для восстановления)."""
+    rebuild_order_stats(get_db())
+    logger.info("Статистика заявок пересчитана")
+
+
+def main():
+    # python -m backend.services.stats_service — пересчет агрегатов
+    from backend.config import load_config
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # .env и окружение разбираются так же, как в create_app
+    configure_pool(load_config()['DATABASE_PATH'])
+    try:
+        rebuild_stats()
+    finally:
+        close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,45 @@
 import pytest
+from flask_jwt_extended import create_access_token
+
 from backend.main import create_app
+from backend import database
+from backend.services import currency_service
+
 
 @pytest.fixture
-def app(monkeypatch):
-    monkeypatch.setattr('backend.main.init_db', lambda: None)
-    app = create_app()
-    app.config.update({'TESTING': True})
+def app(db_path):
+    app = create_app({
+        'TESTING': True,
+        'DATABASE_PATH': db_path,
+        # Базу создает фикстура db_path, фоновые компоненты в тестах не нужны
+        'DB_MIGRATE': False,
+        'CURRENCY_UPDATE_ENABLED': False,
+        'WS_ENABLED': False,
+        'DOCUMENT_JOBS_ENABLED': False,
+        'MESSAGES_INGEST_ENABLED': False,
+        'REVALUATION_ENABLED': False,
+    })
     return app
 
+
 @pytest.fixture
 def client(app):
-    return app.test_client()
+    client = app.test_client()
+    with app.app_context():
+        token = create_access_token(identity='tester')
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Временная база данных SQLite, созданная миграциями с нуля."""
+    path = tmp_path / 'cargo_manager.db'
+    database.bootstrap_database(str(path))
+
+    monkeypatch.setattr(currency_service, '_snapshot', None)
+    monkeypatch.setattr(currency_service, '_history', None)
+    database.configure_pool(str(path))
+    yield str(path)
+    database.close_db()
+    database.configure_pool(None)
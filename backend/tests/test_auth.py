@@ -0,0 +1,98 @@
+import pytest
+
+from backend.database import get_db
+from backend.main import create_app
+from backend.services import auth_service
+
+
+@pytest.fixture
+def auth_app(db_path):
+    # Хеши считаются в потоке теста с малыми параметрами scrypt: проверка быстрая
+    return create_app({
+        'TESTING': True, 'DATABASE_PATH': db_path, 'DB_MIGRATE': False, 'CURRENCY_UPDATE_ENABLED': False,
+        'WS_ENABLED': False, 'DOCUMENT_JOBS_ENABLED': False, 'MESSAGES_INGEST_ENABLED': False,
+        'REVALUATION_ENABLED': False,
+        'AUTH_HASH_WORKERS': 0, 'AUTH_SCRYPT_N': 2 ** 10,
+    })
+
+
+def _login(client, username, password):
+    return client.post('/api/login', json={'username': username, 'password': password})
+
+
+def test_password_hash_roundtrip():
+    encoded = auth_service.hash_password('correct horse', n=2 ** 10, r=8, p=1)
+    assert encoded.startswith('scrypt$1024$8$1$')
+    assert auth_service.verify_password('correct horse', encoded)
+    assert not auth_service.verify_password('wrong horse', encoded)
+    assert not auth_service.verify_password('correct horse', 'plain$text')
+    # Та же соль не используется дважды
+    assert auth_service.hash_password('correct horse', n=2 ** 10) != auth_service.hash_password('correct horse',
+                                                                                               n=2 ** 10)
+
+
+def test_login_logout_and_revocation(auth_app):
+    client = auth_app.test_client()
+    with auth_app.app_context():
+        auth_service.create_user('manager', 'secret-password')
+        with pytest.raises(ValueError):
+            auth_service.create_user('Manager', 'another-password')
+        with pytest.raises(ValueError):
+            auth_service.create_user('short', 'short')
+
+    assert _login(client, 'manager', '').status_code == 400
+    assert _login(client, 'manager', 'wrong-password').status_code == 401
+    assert _login(client, 'nobody', 'secret-password').status_code == 401
+
+    token = _login(client, 'manager', 'secret-password').get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/api/orders', headers=headers).status_code == 200
+    # Повторная проверка того же токена берется из кеша
+    assert client.get('/api/orders', headers=headers).status_code == 200
+
+    assert client.post('/api/logout', headers=headers).status_code == 200
+    assert client.get('/api/orders', headers=headers).status_code == 401
+
+    # Блокировка отзывает выданные токены
+    token = _login(client, 'manager', 'secret-password').get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/api/orders', headers=headers).status_code == 200
+    with auth_app.app_context():
+        assert auth_service.set_active('manager', False)
+    assert client.get('/api/orders', headers=headers).status_code == 401
+    assert _login(client, 'manager', 'secret-password').status_code == 401
+
+
+def test_rehash_on_login_with_new_parameters(auth_app, db_path):
+    with auth_app.app_context():
+        auth_service.create_user('manager', 'secret-password')
+        auth_service.configure(0, 4, 10.0, 2 ** 11, 8, 1, 100, 30.0)
+        assert auth_service.authenticate('manager', 'secret-password')['username'] == 'manager'
+        encoded = get_db().execute("SELECT password_hash FROM Users").fetchone()[0]
+        assert encoded.startswith('scrypt$2048$8$1$')
+
+
+def test_hasher_pool_and_busy_limit():
+    hasher = auth_service.PasswordHasher(workers=1, max_pending=1, n=2 ** 10)
+    try:
+        encoded = hasher.hash('secret-password')
+        assert hasher.verify('secret-password', encoded)
+        assert not hasher.needs_rehash(encoded)
+
+        # Единственный слот занят: следующая проверка сразу получает отказ
+        hasher._slots.acquire()
+        with pytest.raises(auth_service.AuthBusyError):
+            hasher.verify('secret-password', encoded)
+        hasher._slots.release()
+    finally:
+        hasher.shutdown()
+
+
+def test_login_busy_returns_503(auth_app, monkeypatch):
+    def busy(username, password):
+        raise auth_service.AuthBusyError('busy')
+
+    monkeypatch.setattr(auth_service, 'authenticate', busy)
+    response = _login(auth_app.test_client(), 'manager', 'secret-password')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,76 @@
+import json
+import time
+
+from flask_jwt_extended import create_access_token
+
+from backend import background
+from backend.main import create_app
+from backend.services import currency_update_service, document_service, integration_service
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_leader_lock_is_taken_over_when_released(tmp_path):
+    path = str(tmp_path / 'leader.lock')
+    acquired = []
+    first = background.LeaderLock(path, lambda: acquired.append('first'), retry_interval=0.01)
+    second = background.LeaderLock(path, lambda: acquired.append('second'), retry_interval=0.01)
+    try:
+        first.start()
+        second.start()
+        assert first.held and not second.held
+        assert acquired == ['first']
+
+        # Лидер завершился: блокировку берет следующий процесс
+        first.stop()
+        assert _wait(lambda: second.held)
+        assert acquired == ['first', 'second']
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_background_components_run_only_in_leader(db_path, tmp_path):
+    rates_file = tmp_path / 'rates.json'
+    rates_file.write_text(json.dumps({'RUB': 12.0, 'USD': 0.137}))
+    lock_file = str(tmp_path / 'leader.lock')
+    # Блокировку держит другой воркер
+    other = background.LeaderLock(lock_file, lambda: None)
+    assert other.try_acquire()
+    try:
+        app = create_app({
+            'TESTING': True, 'DATABASE_PATH': db_path, 'DB_MIGRATE': False, 'WS_ENABLED': False,
+            'MESSAGES_INGEST_ENABLED': False, 'REVALUATION_ENABLED': False,
+            'CURRENCY_UPDATE_ENABLED': True, 'CURRENCY_PROVIDER': f'file:{rates_file}',
+            'DOCUMENT_JOBS_ENABLED': True, 'DOCUMENTS_DIR': str(tmp_path / 'documents'),
+            'TRACKING_POLL_ENABLED': True, 'TRACKING_CARRIERS': {'stub': {'url': 'http://127.0.0.1:9/track'}},
+            'BACKGROUND_LOCK_FILE': lock_file, 'BACKGROUND_LOCK_RETRY': 0.01,
+        })
+        # Ручное обновление курсов доступно, по расписанию курсы не обновляются
+        scheduler = currency_update_service.get_scheduler()
+        assert scheduler is not None and not scheduler.periodic
+        assert document_service.get_pipeline() is None
+        assert integration_service.get_poller() is None
+        with app.app_context():
+            headers = {'Authorization': f"Bearer {create_access_token(identity='tester')}"}
+        resp = app.test_client().post('/api/integrations/tracking/poll', headers=headers)
+        assert resp.status_code == 409
+        assert 'другой воркер' in resp.get_json()['error']
+        job_id = currency_update_service.request_rates_update()
+        assert _wait(lambda: currency_update_service.get_update_job(job_id)['status'] == 'success')
+
+        other.stop()
+        assert _wait(lambda: document_service.get_pipeline() is not None)
+        assert scheduler.periodic
+        assert integration_service.get_poller() is not None
+    finally:
+        other.stop()
+        background.stop()
+        document_service.stop_pipeline()
+        integration_service.stop_poller()
+        currency_update_service.stop_scheduler()
@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from backend.benchmarks import dataset, micro, results
+
+
+def _dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT id, client_id, supplier_id, name, status, total_cny, created_date "
+                            "FROM orders ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_dataset_is_seeded_and_consistent(tmp_path):
+    spec = dataset.DatasetSpec(orders=300, clients=20, suppliers=5, item_share=0.3, rate_years=1)
+    summary = dataset.open_dataset(str(tmp_path / 'a.db'), spec)
+    assert summary['orders'] == 300 and summary['items'] > 0
+    # Та же спецификация: база используется повторно
+    assert dataset.open_dataset(str(tmp_path / 'a.db'), spec) is None
+    dataset.generate(str(tmp_path / 'b.db'), spec)
+    assert _dump(tmp_path / 'a.db') == _dump(tmp_path / 'b.db')
+
+    conn = sqlite3.connect(tmp_path / 'a.db')
+    # Итоги заявок с позициями посчитаны триггерами
+    mismatched = conn.execute(
+        "SELECT COUNT(*) FROM orders o WHERE items_count > 0 AND abs(total_cny - "
+        "(SELECT SUM(amount_cny) FROM Order_Products p WHERE p.order_id = o.id)) > 1e-6").fetchone()[0]
+    assert mismatched == 0
+    assert conn.execute("SELECT SUM(count) FROM order_stats WHERE dimension = 'all'").fetchone()[0] == 300
+    assert conn.execute("SELECT COUNT(DISTINCT rate_date) FROM CurrencyRates").fetchone()[0] == 365
+    conn.close()
+
+
+def test_compare_flags_regressions(tmp_path):
+    path = str(tmp_path / 'runs' / 'base.json')
+    base = results.save(path, 'micro', {}, {'orders': {'list': {'p50_us': 100.0, 'ops_per_s': 1000.0, 'calls': 5}}})
+    assert results.load(path)['metrics'] == {'orders.list.p50_us': 100.0, 'orders.list.ops_per_s': 1000.0,
+                                             'orders.list.calls': 5}
+    current = dict(base, metrics={'orders.list.p50_us': 130.0, 'orders.list.ops_per_s': 1050.0,
+                                  'orders.list.calls': 1})
+    rows = {row['metric']: row for row in results.compare(base, current, threshold=0.1)}
+    assert rows['orders.list.p50_us']['regression']
+    assert rows['orders.list.p50_us']['change'] == pytest.approx(-0.3)
+    assert not rows['orders.list.ops_per_s']['regression']
+    assert not rows['orders.list.calls']['regression']
+    with pytest.raises(ValueError):
+        results.compare(base, dict(current, benchmark='http_load'))
+
+
+def test_micro_benchmarks_run_and_clean_up(tmp_path):
+    db_path = str(tmp_path / 'bench.db')
+    dataset.generate(db_path, dataset.DatasetSpec(orders=200, clients=10, suppliers=3, rate_years=1))
+    summary = micro.run(db_path, number=5, only='orders.')
+    assert set(summary) == {'orders'}
+    assert summary['orders']['get_by_id_cold']['calls'] == 5
+    assert summary['orders']['create']['p50_us'] > 0
+    assert len(_dump(db_path)) == 200
@@ -0,0 +1,93 @@
+from backend.database import get_db
+from backend.services import cache_service, order_service
+
+
+def _requests(cache, result):
+    return dict((tuple(labels), value) for labels, value in cache_service.CACHE_REQUESTS.series()).get(
+        (cache, result), 0)
+
+
+def test_ttl_cache_lru_expiry_and_generation(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_service.time, 'monotonic', lambda: now[0])
+    cache = cache_service.TTLCache('test_cache', 'test_table', max_entries=2, ttl=10)
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return f'value-{key}'
+
+    assert cache.get_or_load('a', lambda: load('a')) == 'value-a'
+    assert cache.get_or_load('a', lambda: load('a')) == 'value-a'
+    cache.get_or_load('b', lambda: load('b'))
+    # 'a' использовалась недавно, вытесняется 'b'
+    cache.get_or_load('a', lambda: load('a'))
+    cache.get_or_load('c', lambda: load('c'))
+    cache.get_or_load('a', lambda: load('a'))
+    cache.get_or_load('b', lambda: load('b'))
+    assert loads == ['a', 'b', 'c', 'b']
+
+    now[0] += 11
+    cache.get_or_load('a', lambda: load('a'))
+    assert loads[-1] == 'a'
+
+    # Запись в таблицу во время загрузки: результат не сохраняется
+    def racing_load():
+        cache_service.bump_generation('test_table')
+        return load('d')
+
+    cache.get_or_load('d', racing_load)
+    cache.get_or_load('d', lambda: load('d'))
+    assert loads[-2:] == ['d', 'd']
+    assert cache.get_or_load('missing', lambda: None) is None
+    assert 'missing' not in cache._entries
+
+    cache.get_or_load('e', lambda: load('e'))
+    cache.invalidate_many(['d', 'e', 'unknown'])
+    assert not cache._entries
+
+
+def test_order_caches_are_invalidated_by_writes(app, db_path):
+    with app.app_context():
+        order_id = order_service.create_order({'client_id': 1, 'supplier_id': 1, 'name': 'A', 'status': 'новая'})
+        hits = _requests('order', 'hit')
+        assert order_service.get_order_by_id(order_id)['name'] == 'A'
+        assert order_service.get_order_by_id(str(order_id))['name'] == 'A'
+        assert _requests('order', 'hit') == hits + 1
+
+        # Запись в обход сервиса не видна до инвалидации
+        db = get_db()
+        db.execute("UPDATE orders SET name = 'вручную' WHERE id = ?", (order_id,))
+        db.commit()
+        assert order_service.get_order_by_id(order_id)['name'] == 'A'
+        page = order_service.list_orders()
+        assert [o['name'] for o in page['orders']] == ['вручную']
+        assert order_service.list_orders() is page
+
+        order_service.update_order(order_id, {'status': 'в работе'})
+        assert order_service.get_order_by_id(order_id)['status'] == 'в работе'
+        other_id = order_service.create_order({'client_id': 1, 'supplier_id': 1, 'name': 'B', 'status': 'новая'})
+        assert {o['id'] for o in order_service.list_orders()['orders']} == {order_id, other_id}
+        order_service.delete_order(order_id)
+        assert order_service.get_order_by_id(order_id) is None
+        assert [o['id'] for o in order_service.list_orders()['orders']] == [other_id]
+
+
+def test_order_responses_are_conditional(app, client, db_path):
+    with app.app_context():
+        order_id = order_service.create_order({'client_id': 1, 'supplier_id': 1, 'name': 'A', 'status': 'новая'})
+
+    resp = client.get(f'/api/orders/{order_id}')
+    etag = resp.headers['ETag']
+    assert resp.headers['Cache-Control'] == 'private, no-cache'
+    resp = client.get(f'/api/orders/{order_id}', headers={'If-None-Match': etag})
+    assert resp.status_code == 304 and resp.data == b''
+
+    page_etag = client.get('/api/orders').headers['ETag']
+    assert client.get('/api/orders', headers={'If-None-Match': page_etag}).status_code == 304
+
+    client.put(f'/api/orders/{order_id}', json={'name': 'B'})
+    resp = client.get(f'/api/orders/{order_id}', headers={'If-None-Match': etag})
+    assert resp.status_code == 200 and resp.get_json()['name'] == 'B'
+    resp = client.get('/api/orders', headers={'If-None-Match': page_etag})
+    assert resp.status_code == 200 and resp.headers['ETag'] != page_etag
@@ -1,20 +1,76 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
 import backend.api.currency as currency_api
+from backend.database import get_db
+from backend.services.currency_update_service import (
+    CurrencyUpdateScheduler, FileRateProvider, RateProvider, get_scheduler)
+from backend.services import currency_service, order_service
+from backend.services.currency_service import RateSnapshot
 
 
 def test_get_rates(client, monkeypatch):
-    monkeypatch.setattr(currency_api, 'get_rates', lambda: ({'USD': 1.1}, 'time'))
+    snapshot = RateSnapshot(version=1, rates={'USD': 1.1}, last_update='time')
+    monkeypatch.setattr(currency_api, 'get_snapshot', lambda: snapshot)
     resp = client.get('/api/currency/rates')
     assert resp.status_code == 200
     assert resp.get_json() == {'rates': {'USD': 1.1}, 'last_update': 'time'}
+    assert resp.headers['ETag'] == f'"{snapshot.etag}"'
+
+
+def test_get_rates_not_modified(client, db_path):
+    etag = client.get('/api/currency/rates').headers['ETag']
+    resp = client.get('/api/currency/rates', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.get_data() == b''
+
+    with client.application.app_context():
+        currency_service.update_rates_now()
+    resp = client.get('/api/currency/rates', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+
+
+def test_snapshot_is_shared_and_versioned(app, db_path):
+    with app.app_context():
+        first = currency_service.get_snapshot()
+        assert first.rates == {'RUB': 12.0, 'USD': 0.137}
+        assert order_service.get_currency_rates() == dict(first.rates)
+
+        second = currency_service.publish_rates({'RUB': 13.0, 'USD': 0.14})
+        assert second.version == first.version + 1
+        assert order_service.get_currency_rates()['RUB'] == 13.0
+        assert currency_service.convert_amounts(1, 'CNY')['RUB'] == 13.0
+
+        # Новые курсы сохранены в базе и переживают перезагрузку снимка
+        currency_service.update_rates_now()
+        assert currency_service.get_snapshot().rates['RUB'] == 13.0
 
 
 def test_update_now(client, monkeypatch):
-    monkeypatch.setattr(currency_api, 'update_rates_now', lambda: ({'USD': 1.2}, 'now'))
+    monkeypatch.setattr(currency_api, 'request_rates_update', lambda: 'job-1')
     resp = client.post('/api/currency/update-now')
-    assert resp.status_code == 200
+    assert resp.status_code == 202
     body = resp.get_json()
-    assert body['status'] == 'success'
-    assert body['rates'] == {'USD': 1.2}
+    assert body['status'] == 'queued'
+    assert body['job_id'] == 'job-1'
+
+
+def test_update_now_disabled(client):
+    # Без CURRENCY_UPDATE_ENABLED запрос не запускает планировщик
+    assert client.post('/api/currency/update-now').status_code == 503
+    assert client.get('/api/currency/update-jobs/unknown').status_code == 404
+    assert get_scheduler() is None
+
+
+def test_update_job_status(client, monkeypatch):
+    jobs = {'job-1': {'id': 'job-1', 'status': 'success'}}
+    monkeypatch.setattr(currency_api, 'get_update_job', jobs.get)
+    assert client.get('/api/currency/update-jobs/job-1').get_json()['status'] == 'success'
+    assert client.get('/api/currency/update-jobs/nope').status_code == 404
 
 
 def test_conversions(client, monkeypatch):
@@ -27,3 +83,187 @@ def test_conversions(client, monkeypatch):
 def test_conversions_missing_amount(client):
     resp = client.get('/api/currency/conversions')
     assert resp.status_code == 400
+
+
+class FailingProvider(RateProvider):
+    name = 'failing'
+
+    def __init__(self):
+        self.calls = 0
+
+    def fetch(self):
+        self.calls += 1
+        raise ConnectionError('offline')
+
+
+def _updates(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT status, source FROM CurrencyUpdates ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_incomplete_provider_fails_on_creation():
+    class NoFetch(RateProvider):
+        name = 'no-fetch'
+
+    with pytest.raises(TypeError):
+        NoFetch()
+
+
+def test_scheduler_publishes_rates_from_file(db_path, tmp_path):
+    rates_file = tmp_path / 'rates.json'
+    rates_file.write_text(json.dumps({'rates': {'RUB': 11.5, 'USD': 0.14, 'EUR': 0.13}}))
+    scheduler = CurrencyUpdateScheduler(FileRateProvider(str(rates_file)))
+
+    assert scheduler.run_once()
+    assert currency_service.get_snapshot().rates['EUR'] == 0.13
+    assert _updates(db_path) == [('success', 'file')]
+
+
+def test_failed_publish_is_not_committed_with_error_row(db_path, tmp_path):
+    # Нулевой курс проходит в currency_rates, но нарушает CHECK истории курсов
+    rates_file = tmp_path / 'rates.json'
+    rates_file.write_text(json.dumps({'RUB': 12.5, 'USD': 0.0}))
+    scheduler = CurrencyUpdateScheduler(FileRateProvider(str(rates_file)))
+
+    assert not scheduler.run_once()
+    assert _updates(db_path) == [('error', 'file')]
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT rate FROM currency_rates WHERE currency_code = 'RUB'").fetchone() == (12.0,)
+    conn.close()
+
+
+def test_scheduler_backoff_and_circuit_breaker(db_path):
+    provider = FailingProvider()
+    scheduler = CurrencyUpdateScheduler(provider, interval=3600, jitter=0,
+                                        backoff_base=5, failure_threshold=3)
+    delays = []
+    for _ in range(3):
+        assert not scheduler.run_once()
+        delays.append(scheduler._delay())
+    assert delays == [5, 10, 20]
+
+    # Цепь разомкнута: источник больше не вызывается, задача сразу завершается ошибкой
+    assert not scheduler.run_once(['job'])
+    assert provider.calls == 3
+    assert [row[0] for row in _updates(db_path)] == ['error'] * 3
+
+
+def test_enqueue_runs_in_background(db_path, tmp_path):
+    rates_file = tmp_path / 'rates.json'
+    rates_file.write_text(json.dumps({'RUB': 10.0, 'USD': 0.15}))
+    scheduler = CurrencyUpdateScheduler(FileRateProvider(str(rates_file)), interval=3600)
+    scheduler.next_run = time.monotonic() + 3600
+    scheduler.start()
+    try:
+        job_id = scheduler.enqueue()
+        for _ in range(200):
+            if scheduler.get_job(job_id)['status'] == 'success':
+                break
+            time.sleep(0.01)
+        assert scheduler.get_job(job_id)['status'] == 'success'
+        assert currency_service.get_snapshot().rates['RUB'] == 10.0
+    finally:
+        scheduler.stop()
+
+
+def test_convert_batch_matches_single_conversions(db_path):
+    amounts = [10.0, 120.0, 1.37, 0.0]
+    codes = ['CNY', 'rub', 'USD', 'RUB']
+    result = currency_service.convert_batch(amounts, codes, ['CNY', 'RUB', 'USD'])
+    for i, (amount, code) in enumerate(zip(amounts, codes)):
+        expected = currency_service.convert_amounts(amount, code)
+        for target in ('CNY', 'RUB', 'USD'):
+            assert result[target][i] == pytest.approx(expected[target])
+
+
+def test_convert_batch_cross_rates(db_path):
+    currency_service.publish_rates({'RUB': 12.0, 'USD': 0.14, 'EUR': 0.125})
+    result = currency_service.convert_batch([14.0], 'USD')
+    assert set(result) == {'CNY', 'EUR', 'RUB', 'USD'}
+    assert result['EUR'][0] == pytest.approx(12.5)
+    assert result['USD'][0] == pytest.approx(14.0)
+
+
+def test_conversions_batch_endpoint(client, db_path):
+    resp = client.post('/api/currency/conversions/batch',
+                       json={'amounts': [1, 2], 'from': 'CNY', 'to': ['RUB']})
+    assert resp.status_code == 200
+    assert resp.get_json() == {'count': 2, 'conversions': {'RUB': [12.0, 24.0]}}
+
+    resp = client.post('/api/currency/conversions/batch',
+                       json={'amounts': [1], 'from': ['XXX']})
+    assert resp.status_code == 400
+    resp = client.post('/api/currency/conversions/batch', json={'amounts': 5})
+    assert resp.status_code == 400
+
+    # Строка в "to" означает одну валюту, а не набор символов
+    resp = client.post('/api/currency/conversions/batch',
+                       json={'amounts': [1, 2], 'from': 'CNY', 'to': 'RUB'})
+    assert resp.get_json()['conversions'] == {'RUB': [12.0, 24.0]}
+
+    # Нулевой курс или переполнение дали бы inf в ответе
+    with client.application.app_context():
+        db = get_db()
+        db.execute("UPDATE currency_rates SET rate = 0 WHERE currency_code = 'USD'")
+        db.commit()
+        currency_service.update_rates_now()
+    resp = client.post('/api/currency/conversions/batch',
+                       json={'amounts': [1], 'from': 'USD', 'to': 'RUB'})
+    assert resp.status_code == 400
+    assert 'USD' in resp.get_json()['error']
+    assert client.post('/api/currency/conversions/batch',
+                       json={'amounts': [1], 'from': 'CNY', 'to': 'RUB'}).status_code == 200
+    resp = client.post('/api/currency/conversions/batch',
+                       json={'amounts': [1e308], 'from': 'CNY', 'to': 'RUB'})
+    assert resp.status_code == 400
+    resp = client.post('/api/currency/conversions/batch',
+                       json={'amounts': [1e308], 'from': 'CNY', 'to': 'RUB', 'date': '2100-01-01'})
+    assert resp.status_code == 400
+
+
+def test_rate_history_as_of(db_path):
+    currency_service.import_history([
+        ('RUB', '2024-01-01', 10.0), ('RUB', '2024-02-01', 11.0), ('usd', '2024-01-15', 0.14),
+    ])
+    history = currency_service.get_history()
+    assert history.rate_on('RUB', '2024-01-31') == 10.0
+    assert history.rate_on('RUB', '2024-02-01 09:30:00') == 11.0
+    assert history.points('RUB', '2024-01-02', '2024-12-31') == [('2024-02-01', 11.0)]
+    with pytest.raises(ValueError):
+        history.rate_on('RUB', '2023-12-31')
+
+    # Публикация курсов добавляет точку за сегодня и сбрасывает индекс
+    currency_service.publish_rates({'RUB': 13.0, 'USD': 0.15}, source='test')
+    assert currency_service.rates_as_of('2100-01-01') == {'RUB': 13.0, 'USD': 0.15}
+    assert currency_service.rates_as_of('2024-01-20') == {'RUB': 10.0, 'USD': 0.14}
+
+    result = currency_service.convert_batch_as_of(
+        [10.0, 110.0, 1.4], ['RUB', 'RUB', 'USD'], ['2024-01-20', '2024-02-05', '2024-01-20'], ['CNY', 'RUB'])
+    assert result['CNY'] == pytest.approx([1.0, 10.0, 10.0])
+    assert result['RUB'] == pytest.approx([10.0, 110.0, 100.0])
+    single = currency_service.convert_amounts_as_of(110.0, 'RUB', '2024-02-05')
+    assert single['USD'] == pytest.approx(1.4)
+
+
+def test_conversions_as_of_endpoints(client, db_path):
+    resp = client.post('/api/currency/rates/history', json={'rates': [
+        {'code': 'RUB', 'date': '2024-01-01', 'rate': 10.0},
+        {'code': 'USD', 'date': '2024-01-01', 'rate': 0.125},
+    ]})
+    assert resp.get_json() == {'imported': 2}
+    assert client.post('/api/currency/rates/history', json={'rates': [{'code': 'RUB', 'date': 'вчера', 'rate': 1}]}) \
+        .status_code == 400
+
+    resp = client.get('/api/currency/conversions?amount=100&from=RUB&date=2024-03-01')
+    assert resp.get_json() == pytest.approx({'CNY': 10.0, 'RUB': 100.0, 'USD': 1.25})
+    resp = client.post('/api/currency/conversions/batch',
+                       json={'amounts': [100, 200], 'from': 'RUB', 'to': ['USD'], 'date': '2024-03-01'})
+    assert resp.get_json()['conversions']['USD'] == pytest.approx([1.25, 2.5])
+    resp = client.post('/api/currency/conversions/batch',
+                       json={'amounts': [100], 'from': 'RUB', 'dates': ['2020-01-01']})
+    assert resp.status_code == 400 and '2020-01-01' in resp.get_json()['error']
+
+    history = client.get('/api/currency/rates/history?code=rub').get_json()
+    assert history['code'] == 'RUB' and history['dates'][0] == '2024-01-01'
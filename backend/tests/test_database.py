@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from backend import database
+from backend.database.pool import ConnectionPool, PoolTimeoutError
+from backend.main import create_app
+from backend.services import order_service
+
+
+def test_pool_prewarms_and_sets_pragmas(db_path):
+    pool = ConnectionPool(db_path, max_size=3, min_size=2)
+    assert pool.stats()['size'] == 2
+
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    pool.release(conn)
+    pool.close()
+
+
+def test_pool_limits_size_and_records_waits(db_path):
+    pool = ConnectionPool(db_path, max_size=1, min_size=0, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    threading.Timer(0.02, pool.release, args=(conn,)).start()
+    again = pool.acquire(timeout=1)
+    assert again is conn
+
+    stats = pool.stats()
+    assert stats['size'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['waits'] == 1
+    assert stats['wait_time_max'] > 0
+    pool.release(again)
+    pool.close()
+
+
+def test_release_rolls_back_open_transaction(db_path):
+    pool = ConnectionPool(db_path, max_size=1, min_size=1)
+    conn = pool.acquire()
+    conn.execute("INSERT INTO orders (client_id, name, status) VALUES (1, 'x', 'новая')")
+    pool.release(conn)
+
+    conn = pool.acquire()
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 0
+    pool.release(conn)
+    pool.close()
+
+
+def test_connection_is_reused_within_app_context(app, db_path):
+    with app.app_context():
+        first = database.get_db()
+        assert database.get_db() is first
+        assert database.get_pool().stats()['in_use'] == 1
+    assert database.get_pool().stats()['in_use'] == 0
+
+
+def test_services_share_request_connection(app, db_path):
+    with app.app_context():
+        order_id = order_service.create_order({
+            'client_id': 1, 'supplier_id': 2, 'name': 'A', 'status': 'новая', 'total_cny': 10,
+        })
+        assert order_service.get_order_by_id(order_id)['total_rub'] == pytest.approx(120)
+        assert database.get_pool().stats()['in_use'] == 1
+
+
+def test_pool_uses_database_from_app_config(tmp_path, monkeypatch):
+    # Окружение (и .env) указывает на другую базу: приложение работает с базой из своей конфигурации
+    path = str(tmp_path / 'configured.db')
+    monkeypatch.setenv('DATABASE_PATH', str(tmp_path / 'other.db'))
+    app = create_app({'TESTING': True, 'DATABASE_PATH': path, 'DB_POOL_SIZE': 3, 'CURRENCY_UPDATE_ENABLED': False,
+                      'WS_ENABLED': False, 'DOCUMENT_JOBS_ENABLED': False, 'MESSAGES_INGEST_ENABLED': False,
+                      'REVALUATION_ENABLED': False})
+    try:
+        with app.app_context():
+            assert database.get_db_path() == path
+            assert database.get_db().execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 0
+            assert database.get_pool().stats()['max_size'] == 3
+    finally:
+        database.configure_pool(None)
@@ -0,0 +1,268 @@
+import hashlib
+import os
+import time
+import zlib
+
+import pytest
+
+from backend.services import document_processing, document_service
+
+
+@pytest.fixture
+def storage(app, tmp_path):
+    app.config['DOCUMENTS_DIR'] = str(tmp_path / 'documents')
+    app.config['DOCUMENTS_CHUNK_SIZE'] = 1024
+    return tmp_path / 'documents'
+
+
+def _order(client):
+    resp = client.post('/api/orders', json={'client_id': 1, 'supplier_id': 1, 'name': 'Заявка', 'status': 'new'})
+    return resp.get_json()['id']
+
+
+def _upload(client, content, chunk=1000, **fields):
+    resp = client.post('/api/documents/uploads', json={'filename': 'invoice.pdf', 'size': len(content),
+                                                       'content_type': 'application/pdf', **fields})
+    assert resp.status_code == 201
+    upload_id = resp.get_json()['id']
+    for start in range(0, len(content), chunk):
+        part = content[start:start + chunk]
+        resp = client.put(f'/api/documents/uploads/{upload_id}', data=part, headers={
+            'Content-Range': f'bytes {start}-{start + len(part) - 1}/{len(content)}'})
+        assert resp.status_code in (200, 201)
+    return resp.get_json()['document']
+
+
+def test_chunked_upload_and_dedupe(client, db_path, storage, monkeypatch):
+    order_id = _order(client)
+    content = os.urandom(3500)
+    sha256 = hashlib.sha256(content).hexdigest()
+
+    first = _upload(client, content, doc_type='invoice', order_id=order_id, sha256=sha256)
+    second = _upload(client, content, chunk=700, filename='C:\\scan\\copy.pdf')
+    assert first['sha256'] == second['sha256'] == sha256
+    assert first['order_id'] == order_id and first['doc_type'] == 'invoice'
+    assert second['filename'] == 'copy.pdf'
+
+    # Содержимое хранится один раз, незавершенных загрузок не осталось
+    assert [p.name for p in (storage / 'blobs').rglob('*') if p.is_file()] == [sha256]
+    assert list((storage / 'uploads').iterdir()) == []
+
+    listed = client.get(f'/api/documents?order_id={order_id}').get_json()['documents']
+    assert [d['id'] for d in listed] == [first['id']]
+
+    # Содержимое удаляется вместе с последним документом, который на него ссылается
+    assert client.delete(f"/api/documents/{first['id']}").status_code == 200
+    assert (storage / 'blobs' / sha256[:2] / sha256).exists()
+
+    # Ошибка удаления файла откатывает удаление документа и не выдается за 404
+    def fail_remove(path):
+        raise PermissionError(path)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(document_service.os, 'remove', fail_remove)
+        assert client.delete(f"/api/documents/{second['id']}").status_code == 500
+    assert client.get(f"/api/documents/{second['id']}").status_code == 200
+    thumbnail = storage / 'thumbs' / sha256[:2] / f'{sha256}.jpg'
+    thumbnail.parent.mkdir(parents=True)
+    thumbnail.write_bytes(b'jpeg')
+    assert client.delete(f"/api/documents/{second['id']}").status_code == 200
+    assert not (storage / 'blobs' / sha256[:2] / sha256).exists()
+    assert not thumbnail.exists()
+
+
+def test_resume_after_interrupted_upload(client, db_path, storage):
+    content = os.urandom(2000)
+    upload_id = client.post('/api/documents/uploads',
+                            json={'filename': 'scan.jpg', 'size': len(content)}).get_json()['id']
+    client.put(f'/api/documents/uploads/{upload_id}?offset=0', data=content[:800])
+
+    # Часть из будущего отклоняется, сервер сообщает, откуда продолжать
+    resp = client.put(f'/api/documents/uploads/{upload_id}?offset=1500', data=content[1500:])
+    assert resp.status_code == 409
+    assert resp.get_json()['received'] == 800
+    assert client.get(f'/api/documents/uploads/{upload_id}').get_json()['received'] == 800
+
+    # Повтор уже принятой части безопасен, хеш тогда пересчитывается по файлу
+    client.put(f'/api/documents/uploads/{upload_id}?offset=500', data=content[500:1200])
+    resp = client.put(f'/api/documents/uploads/{upload_id}?offset=1200', data=content[1200:])
+    assert resp.status_code == 201
+    assert resp.get_json()['document']['sha256'] == hashlib.sha256(content).hexdigest()
+    assert client.get(f'/api/documents/uploads/{upload_id}').status_code == 404
+
+
+def test_upload_validation(client, db_path, storage):
+    assert client.post('/api/documents/uploads', json={'filename': 'a.pdf', 'size': 0}).status_code == 400
+    assert client.post('/api/documents/uploads',
+                       json={'filename': 'a.pdf', 'size': 10, 'order_id': 999}).status_code == 400
+    assert client.post('/api/documents/uploads',
+                       json={'filename': 'a.pdf', 'size': 10, 'doc_type': 'memo'}).status_code == 400
+
+    upload_id = client.post('/api/documents/uploads',
+                            json={'filename': 'a.pdf', 'size': 10, 'sha256': '0' * 64}).get_json()['id']
+    assert client.put(f'/api/documents/uploads/{upload_id}', data=b'x' * 11).status_code == 400
+    assert client.put(f'/api/documents/uploads/{upload_id}', data=b'x' * 2048).status_code == 413
+    # Несовпадение контрольной суммы отменяет загрузку
+    resp = client.put(f'/api/documents/uploads/{upload_id}', data=b'x' * 10)
+    assert resp.status_code == 400
+    assert client.get(f'/api/documents/uploads/{upload_id}').status_code == 404
+
+
+def test_download_supports_ranges_and_etag(client, db_path, storage):
+    content = bytes(range(256)) * 8
+    document = _upload(client, content, chunk=1024)
+    url = f"/api/documents/{document['id']}/content"
+
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.data == content
+    assert resp.headers['Content-Type'] == 'application/pdf'
+    assert 'invoice.pdf' in resp.headers['Content-Disposition']
+    assert 'private' in resp.headers['Cache-Control']
+
+    resp = client.get(url, headers={'Range': 'bytes=100-199'})
+    assert resp.status_code == 206
+    assert resp.data == content[100:200]
+    assert resp.headers['Content-Range'] == f'bytes 100-199/{len(content)}'
+
+    assert client.get(url, headers={'If-None-Match': f'"{document["sha256"]}"'}).status_code == 304
+
+
+def test_links_follow_order_and_shipment_lifecycle(client, db_path, storage):
+    order_id = _order(client)
+    shipment_id = client.post('/api/shipments', json={'order_id': order_id}).get_json()['id']
+    document = _upload(client, b'packing list', doc_type='packing_list', order_id=order_id)
+
+    resp = client.put(f"/api/documents/{document['id']}", json={'shipment_id': shipment_id})
+    assert resp.get_json()['shipment_id'] == shipment_id
+    assert client.get(f'/api/documents?shipment_id={shipment_id}').get_json()['documents'][0]['id'] == document['id']
+
+    client.delete(f'/api/shipments/{shipment_id}')
+    client.delete(f'/api/orders/{order_id}')
+    with client.application.app_context():
+        kept = document_service.get_document(document['id'])
+    assert kept['order_id'] is None and kept['shipment_id'] is None
+
+
+def _pdf(text):
+    stream = zlib.compress(f'BT /F1 12 Tf 72 712 Td ({text}) Tj ET'.encode('latin-1'))
+    return (b'%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n'
+            b'2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj\n'
+            b'3 0 obj << /Type /Page /Parent 2 0 R /Contents 4 0 R >> endobj\n'
+            + f'4 0 obj << /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'.encode()
+            + stream + b'\nendstream\nendobj\n%%EOF\n')
+
+
+def test_builtin_pdf_text_extraction(tmp_path):
+    path = tmp_path / 'invoice.pdf'
+    path.write_bytes(_pdf(r'Commercial invoice \(No. 42\)'))
+    result = document_processing.process_file(str(path), 'invoice.pdf', None, str(tmp_path / 'thumb.jpg'))
+    assert result['text'] == 'Commercial invoice (No. 42)'
+    assert result['pages'] == 1
+
+
+@pytest.fixture
+def pipeline(app, db_path, storage):
+    pipeline = document_service.DocumentPipeline(str(storage), workers=2, max_attempts=2,
+                                                 retry_delay=0, poll_interval=0.05)
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr(document_service, '_pipeline', pipeline)
+    pipeline.start()
+    yield pipeline
+    pipeline.stop()
+    monkeypatch.undo()
+
+
+def _wait_job(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/api/documents/jobs/{job_id}').get_json()
+        if job['state'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'Задание {job_id} не завершилось: {job}')
+
+
+def _upload_file(client, content, filename, content_type):
+    upload_id = client.post('/api/documents/uploads', json={
+        'filename': filename, 'size': len(content), 'content_type': content_type}).get_json()['id']
+    return client.put(f'/api/documents/uploads/{upload_id}', data=content).get_json()
+
+
+def test_long_utf8_text_is_not_read_as_cp1251(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_processing, 'MAX_TEXT_CHARS', 5)
+    path = tmp_path / 'notes.txt'
+    # Лимит чтения (10 байт) приходится на середину двухбайтовой буквы
+    path.write_bytes(('a' + 'а' * 20).encode('utf-8'))
+    result = document_processing.process_file(str(path), 'notes.txt', None, str(tmp_path / 'thumb.jpg'))
+    assert result['text'] == 'aаааа'
+
+    path.write_bytes('Счёт'.encode('cp1251'))
+    result = document_processing.process_file(str(path), 'notes.txt', None, str(tmp_path / 'thumb.jpg'))
+    assert result['text'] == 'Счёт'
+
+
+def test_pdf_string_escapes():
+    unescape = document_processing._unescape_pdf_string
+    assert unescape(rb'a\(b\)\\c\n') == b'a(b)\\c\n'
+    assert unescape(rb'\101\0618\7') == b'A18\x07'
+    # \8 и \9 — не восьмеричные цифры: остается сам символ
+    assert unescape(rb'ab\9c\8') == b'ab9c8'
+    assert unescape(b'one\\\r\ntwo\\\nthree') == b'onetwothree'
+    assert unescape(rb'end\\') == b'end\\'
+
+
+def test_pipeline_indexes_text_in_background(client, pipeline):
+    text = _upload_file(client, 'Счёт на оплату: контейнер 40HC, Гуанчжоу'.encode('cp1251'),
+                        'schet.txt', 'text/plain')
+    pdf = _upload_file(client, _pdf('Packing list for container TGHU1234567'), 'packing.pdf', 'application/pdf')
+    # Загрузка не ждет обработки
+    assert text['job']['state'] == 'queued'
+
+    assert _wait_job(client, text['job']['id'])['state'] == 'done'
+    assert _wait_job(client, pdf['job']['id'])['state'] == 'done'
+
+    found = client.get('/api/documents?q=конт гуанч').get_json()['documents']
+    assert [d['id'] for d in found] == [text['document']['id']]
+    found = client.get('/api/documents?q=tghu').get_json()['documents']
+    assert [d['id'] for d in found] == [pdf['document']['id']]
+    assert client.get(f"/api/documents/{pdf['document']['id']}").get_json()['pages'] == 1
+
+    # То же содержимое повторно не обрабатывается: текст копируется из индекса
+    copy = _upload_file(client, _pdf('Packing list for container TGHU1234567'), 'copy.pdf', 'application/pdf')
+    assert _wait_job(client, copy['job']['id'])['state'] == 'done'
+    assert {d['id'] for d in client.get('/api/documents?q=TGHU').get_json()['documents']} == \
+        {pdf['document']['id'], copy['document']['id']}
+
+
+def test_failed_job_is_retried_then_failed(client, pipeline, storage):
+    pipeline.stop()
+    result = _upload_file(client, b'%PDF-1.4 broken', 'broken.pdf', 'application/pdf')
+    os.remove(storage / 'blobs' / result['document']['sha256'][:2] / result['document']['sha256'])
+    pipeline.start()
+
+    job = _wait_job(client, result['job']['id'])
+    assert job['state'] == 'failed'
+    assert job['attempts'] == 2
+    assert job['error']
+
+    # После исправления документ можно поставить в очередь снова
+    resp = client.post(f"/api/documents/{result['document']['id']}/process")
+    assert resp.status_code == 202
+    assert resp.get_json()['id'] != job['id']
+
+
+def test_expired_lease_returns_job_to_queue(app, client, db_path, storage):
+    result = _upload_file(client, b'notes', 'notes.txt', 'text/plain')
+    with app.app_context():
+        job = document_service.claim_job(lease=600)
+        assert job['id'] == result['job']['id'] and job['state'] == 'running'
+        # Пока аренда не истекла, задание никому не выдается
+        assert document_service.claim_job(lease=600) is None
+
+        # Процесс, взявший задание, «упал»: аренда истекла
+        db = document_service.get_db()
+        with db:
+            db.execute("UPDATE DocumentJobs SET lease_until = '2000-01-01 00:00:00' WHERE id = ?", (job['id'],))
+        again = document_service.claim_job(lease=600)
+    assert again['id'] == job['id'] and again['attempts'] == 2
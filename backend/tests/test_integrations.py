@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.integrations.stub_carrier import StubCarrier
+from backend.services import integration_service, shipment_service
+from backend.services.integration_service import CarrierConfig, TrackingPoller
+
+
+@pytest.fixture
+def carrier():
+    stub = StubCarrier(latency=0.02).start_in_thread()
+    yield stub
+    stub.stop()
+
+
+def _create(app, count, carrier='stub', **fields):
+    with app.app_context():
+        return [shipment_service.create_shipment(
+            dict(carrier=carrier, tracking_number=f'{carrier}-{i}', **fields))['id'] for i in range(count)]
+
+
+def _poll(poller, *nows):
+    async def run():
+        try:
+            return [await poller.poll_once(now) for now in nows]
+        finally:
+            await poller.close()
+    return asyncio.run(run())
+
+
+def test_poll_appends_new_stages_in_batches(app, db_path, carrier):
+    ids = _create(app, 5)
+    for i in range(4):
+        carrier.set_event(f'stub-{i}', 'in_transit', '2030-01-01T10:00:00Z', location='Урумчи')
+    # stub-4 перевозчик не знает
+
+    poller = TrackingPoller([CarrierConfig('stub', carrier.url, batch_size=2, rate_limit=0)], interval=600)
+    now = time.time()
+    first, second, third = _poll(poller, now, now + 1, now + 700)
+
+    assert first == {'polled': 4, 'skipped': 0, 'stages': 4, 'errors': 1}
+    assert sorted(size for _, size in carrier.requests[:3]) == [1, 2, 2]
+    # Сразу после опроса отгрузкам еще рано обновляться, ошибочная опрашивается снова
+    assert second['skipped'] == 4
+    # Повторный ответ с тем же этапом не дублирует историю
+    assert third['stages'] == 0
+
+    with app.app_context():
+        shipment = shipment_service.get_shipment(ids[0])
+        assert shipment['current_stage'] == 'in_transit'
+        assert shipment['current_location'] == 'Урумчи'
+        assert shipment['last_polled_at'] is not None
+        assert [s['stage'] for s in shipment_service.get_timeline(ids[0])] == ['created', 'in_transit']
+        failed = shipment_service.get_shipment(ids[4])
+        assert failed['poll_error'] == 'not found'
+        assert failed['last_polled_at'] is None
+
+
+def test_far_eta_is_polled_less_often():
+    poller = TrackingPoller([], interval=600, eta_window=3600, slow_interval=7200)
+    now = time.time()
+    polled = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now - 1800))
+    far = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now + 86400))
+    near = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now + 600))
+
+    assert poller.is_due({'last_polled_at': None, 'eta': far}, now)
+    assert not poller.is_due({'last_polled_at': polled, 'eta': far}, now)
+    assert poller.is_due({'last_polled_at': polled, 'eta': near}, now)
+    assert poller.is_due({'last_polled_at': polled, 'eta': None}, now)
+
+
+def test_concurrency_and_rate_limit(app, db_path, carrier):
+    _create(app, 6)
+    for i in range(6):
+        carrier.set_event(f'stub-{i}', 'picked_up')
+    config = CarrierConfig('stub', carrier.url, batch_size=1, concurrency=2, rate_limit=20)
+    _poll(TrackingPoller([config]), time.time())
+
+    times = sorted(ts for ts, _ in carrier.requests)
+    assert len(times) == 6
+    assert carrier.max_in_flight <= 2
+    # Не больше 20 запросов в секунду: 6 запросов занимают не меньше 5 / 20 с
+    assert times[-1] - times[0] >= 0.24
+
+
+def test_tracking_metrics_endpoint(app, client, db_path, carrier, monkeypatch):
+    _create(app, 2)
+    carrier.set_event('stub-0', 'customs')
+    poller = TrackingPoller([CarrierConfig('stub', carrier.url, rate_limit=0)])
+    _poll(poller, time.time())
+    monkeypatch.setattr(integration_service, '_poller', poller)
+
+    data = client.get('/api/integrations/tracking/metrics').get_json()
+    stub = data['carriers']['stub']
+    assert stub['requests'] == 1 and stub['polled'] == 2 and stub['stages_added'] == 1
+    assert stub['latency_ms']['max'] >= 20
+    assert data['staleness']['active'] == 2
+    assert data['staleness']['never_polled'] == 1
+    errors = {item['tracking_number']: item['poll_error'] for item in data['staleness']['stalest']}
+    assert errors == {'stub-0': None, 'stub-1': 'not found'}
+
+
+def test_poll_trigger_requires_enabled_poller(client, db_path):
+    assert client.post('/api/integrations/tracking/poll').status_code == 409
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from backend.services import message_service
+from backend.services.message_service import BufferFullError, MessageIngestor, RingBuffer
+
+SECRET = 'test-webhook-secret'
+
+
+@pytest.fixture
+def ingestor(app, db_path, monkeypatch):
+    app.config['MESSAGES_WEBHOOK_SECRET'] = SECRET
+    ingestor = MessageIngestor(capacity=100, batch_size=3, flush_interval=60)
+    monkeypatch.setattr(message_service, '_ingestor', ingestor)
+    ingestor.start()
+    yield ingestor
+    ingestor.stop()
+
+
+def _webhook(client, payload, secret=SECRET):
+    return client.post('/api/messages/webhook', json=payload, headers={'X-Webhook-Secret': secret})
+
+
+def _message(chat, n, **fields):
+    return {'channel': 'wechat', 'chat_id': chat, 'external_id': f'{chat}-{n}', 'body': f'сообщение {n}', **fields}
+
+
+def test_ring_buffer_wraps_around():
+    buffer = RingBuffer(4)
+    assert buffer.push_many([1, 2, 3])
+    assert buffer.pop_many(2) == [1, 2]
+    assert buffer.push_many([4, 5, 6])
+    assert not buffer.push_many([7])
+    assert buffer.pop_many(10) == [3, 4, 5, 6]
+    assert len(buffer) == 0
+
+
+def test_batches_are_bounded_by_size_and_keep_order(client, ingestor):
+    # Чаты вперемешку: 7 сообщений — две полные пачки по 3 и остаток
+    for n in range(1, 8):
+        assert _webhook(client, _message('a' if n % 2 else 'b', n)).status_code == 202
+    # Повторная доставка того же сообщения отсекается
+    _webhook(client, _message('a', 1))
+    assert ingestor.flush(timeout=5)
+
+    metrics = client.get('/api/messages/ingest/metrics').get_json()
+    assert metrics['batches'] == 3 and metrics['max_batch'] == 3
+    assert metrics['inserted'] == 7 and metrics['duplicates'] == 1
+
+    messages = client.get('/api/messages/conversations/wechat/a').get_json()['messages']
+    assert [m['external_id'] for m in messages] == ['a-1', 'a-3', 'a-5', 'a-7']
+    newer = client.get(f"/api/messages/conversations/wechat/a?after_id={messages[1]['id']}").get_json()
+    assert [m['external_id'] for m in newer['messages']] == ['a-5', 'a-7']
+
+    conversations = client.get('/api/messages/conversations').get_json()['conversations']
+    assert [(c['chat_id'], c['messages'], c['unread']) for c in conversations] == [('a', 4, 4), ('b', 3, 3)]
+    assert client.post('/api/messages/conversations/wechat/a/read').get_json() == {'marked': 4}
+    assert client.get('/api/messages/conversations').get_json()['conversations'][0]['unread'] == 0
+
+
+def test_partial_batch_is_flushed_after_interval(db_path):
+    ingestor = MessageIngestor(capacity=100, batch_size=100, flush_interval=0.05)
+    ingestor.start()
+    try:
+        started = time.monotonic()
+        ticket = ingestor.submit(message_service.parse_webhook(_message('c', 1)))
+        assert ingestor.wait_flushed(ticket, timeout=5)
+        assert time.monotonic() - started < 2
+        assert ingestor.snapshot()['batches'] == 1
+    finally:
+        ingestor.stop()
+
+
+def test_stop_writes_buffered_messages(app, db_path):
+    ingestor = MessageIngestor(capacity=100, batch_size=100, flush_interval=60)
+    ingestor.start()
+    ingestor.submit(message_service.parse_webhook({'messages': [_message('d', n) for n in range(5)]}))
+    ingestor.stop()
+    with app.app_context():
+        assert len(message_service.get_messages('wechat', 'd')) == 5
+
+
+def test_telegram_update_and_webhook_errors(client, ingestor, monkeypatch):
+    update = {'update_id': 1, 'message': {'message_id': 10, 'date': 1767225600, 'text': 'Где груз?',
+                                          'chat': {'id': 555, 'type': 'private'},
+                                          'from': {'id': 555, 'username': 'ivanov'}}}
+    resp = client.post('/api/messages/webhook', json=update,
+                       headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})
+    assert resp.status_code == 202
+    assert _webhook(client, update, secret='wrong').status_code == 403
+    assert _webhook(client, {'channel': 'fax', 'chat_id': 1}).status_code == 400
+
+    ingestor.flush(timeout=5)
+    message = client.get('/api/messages/conversations/telegram/555').get_json()['messages'][0]
+    assert message['sender'] == 'ivanov' and message['body'] == 'Где груз?'
+    assert message['sent_at'] == '2026-01-01 00:00:00'
+
+    # Буфер заполнен — мессенджеру предлагается повторить доставку позже
+    monkeypatch.setattr(ingestor, 'submit', lambda rows: (_ for _ in ()).throw(BufferFullError('full')))
+    resp = _webhook(client, _message('e', 1))
+    assert resp.status_code == 503 and resp.headers['Retry-After'] == '1'
+
+
+def test_ack_after_flush(app, client, ingestor):
+    app.config['MESSAGES_ACK_AFTER_FLUSH'] = True
+    ingestor.flush_interval = 0.01
+    resp = _webhook(client, _message('f', 1))
+    assert resp.status_code == 200
+    # Ответ пришел после записи: сообщение уже в базе
+    assert len(client.get('/api/messages/conversations/wechat/f').get_json()['messages']) == 1
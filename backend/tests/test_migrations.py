@@ -0,0 +1,59 @@
+import sqlite3
+
+from backend.database import bootstrap_database
+from backend.database.migrations import MIGRATIONS, applied_versions
+
+
+def _tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_bootstrap_creates_schema_from_clean_file(tmp_path):
+    path = tmp_path / 'nested' / 'cargo_manager.db'
+    assert bootstrap_database(str(path)) == [m.version for m in MIGRATIONS]
+
+    conn = sqlite3.connect(path)
+    assert {'orders', 'currency_rates', 'Currencies', 'CurrencyUpdates', 'order_stats'} <= _tables(conn)
+    assert dict(conn.execute("SELECT currency_code, rate FROM currency_rates")) == {'RUB': 12.0, 'USD': 0.137}
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(orders)")}
+    assert 'idx_orders_status_created' in indexes
+    conn.close()
+
+    # Повторный запуск ничего не меняет
+    assert bootstrap_database(str(path)) == []
+
+
+def test_bootstrap_upgrades_existing_database(tmp_path):
+    # База в том виде, в каком она была до миграций: без created_date, version и Currencies
+    path = tmp_path / 'legacy.db'
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            supplier_id INTEGER,
+            name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            total_cny REAL,
+            total_rub REAL,
+            total_usd REAL
+        );
+        CREATE TABLE currency_rates (currency_code TEXT PRIMARY KEY, rate REAL NOT NULL);
+        INSERT INTO currency_rates VALUES ('RUB', 11.5);
+        INSERT INTO orders (client_id, name, status, total_cny) VALUES (1, 'A', 'новая', 10), (2, 'B', 'новая', NULL);
+    """)
+    conn.close()
+
+    bootstrap_database(str(path))
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute("SELECT total_cny, version, created_date FROM orders ORDER BY id").fetchall()
+    assert [row['total_cny'] for row in rows] == [10, 0]
+    assert all(row['version'] == 1 and row['created_date'] for row in rows)
+    # Существующий курс не перезаписывается начальным значением
+    assert conn.execute("SELECT rate FROM currency_rates WHERE currency_code = 'RUB'").fetchone()[0] == 11.5
+    stats = conn.execute("SELECT count, sum_cny FROM order_stats WHERE dimension = 'all'").fetchone()
+    assert tuple(stats) == (2, 10)
+    assert applied_versions(conn) == [m.version for m in MIGRATIONS]
+    conn.close()
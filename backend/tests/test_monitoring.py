@@ -0,0 +1,116 @@
+import time
+
+from backend import monitoring
+from backend.database import get_db
+from backend.main import create_app
+from backend.monitoring import metrics, sql
+
+
+def test_normalize_sql_replaces_literals():
+    assert sql.normalize_sql("SELECT * FROM orders WHERE id IN (1, 2, 3) AND name = 'it''s'\n  LIMIT 10") == \
+        "SELECT * FROM orders WHERE id IN (?, ...) AND name = ? LIMIT ?"
+    assert sql.normalize_sql("SELECT * FROM orders WHERE id IN (?, ?, ?)") == \
+        "SELECT * FROM orders WHERE id IN (?, ...)"
+    # Цифры в именах колонок и таблиц не трогаются
+    assert sql.normalize_sql("SELECT col1 FROM t2 WHERE x = -1.5") == "SELECT col1 FROM t2 WHERE x = ?"
+
+
+def test_render_and_merge_histograms(tmp_path):
+    registry = metrics.Registry()
+    latency = registry.histogram('latency_seconds', 'Задержка', ('route',), buckets=(0.1, 1.0))
+    calls = registry.counter('calls_total', 'Вызовы', ('route',))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, '/a')
+    calls.inc('/a', value=3)
+
+    text = metrics.render(registry.snapshot())
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+    assert 'calls_total{route="/a"} 3' in text
+    assert metrics.quantile((0.1, 1.0), [1, 1, 1], 0.5) == 1.0
+    assert metrics.quantile((0.1, 1.0), [1, 1, 1], 0.95) is None
+
+    # Два воркера и один завершившийся: суммы складываются
+    store = metrics.SnapshotStore(str(tmp_path))
+    store.save(registry.snapshot(), pid=1)
+    store.save(registry.snapshot(), pid=2)
+    store.retire(registry.snapshot(), pid=2)
+    store.save(registry.snapshot(), pid=3)
+    merged = store.collect()
+    assert merged['calls_total']['series'] == [[['/a'], 9.0]]
+    assert merged['latency_seconds']['series'][0][1][0] == [3, 3, 3]
+    assert not (tmp_path / '2.json').exists()
+
+
+def test_instrumented_connection_records_statements(app, db_path):
+    with app.app_context():
+        db = get_db()
+        assert isinstance(db, sql.InstrumentedConnection)
+        db.executemany("INSERT INTO orders (client_id, supplier_id, name, status) VALUES (?, ?, ?, ?)",
+                       [(1, 1, f'Заявка {i}', 'новый') for i in range(5)])
+        db.commit()
+        rows = db.execute("SELECT name FROM orders WHERE id > 2 ORDER BY id").fetchall()
+        # Строки остаются sqlite3.Row, атрибуты курсора доступны
+        assert rows[0]['name'] == 'Заявка 2'
+        assert db.execute("DELETE FROM orders WHERE id = 5").rowcount == 1
+
+    series = {labels[0]: value for labels, value in sql.SQL_DURATION.series()}
+    assert series['INSERT INTO orders (client_id, supplier_id, name, status) VALUES (?, ?, ?, ?)'][2] >= 1
+    assert 'SELECT name FROM orders WHERE id > ? ORDER BY id' in series
+
+
+def test_metrics_endpoint(app, client, db_path):
+    client.get('/api/orders')
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/orders"}' in text
+    assert 'http_requests_total{method="GET",route="/api/orders",status="200"}' in text
+    assert 'sql_query_duration_seconds_bucket{statement="' in text
+    assert 'db_pool_connections{state="in_use"}' in text
+
+    top = client.get('/api/metrics/sql?limit=5').get_json()['statements']
+    assert 0 < len(top) <= 5
+    assert top[0]['total_ms'] >= top[-1]['total_ms'] and top[0]['calls'] >= 1
+
+
+def test_metrics_token(app, db_path):
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    client = app.test_client()
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+
+
+def test_profiler_dumps_slow_request_stacks(tmp_path, db_path):
+    app = create_app({
+        'TESTING': True, 'DATABASE_PATH': db_path, 'DB_MIGRATE': False, 'CURRENCY_UPDATE_ENABLED': False,
+        'WS_ENABLED': False, 'DOCUMENT_JOBS_ENABLED': False, 'MESSAGES_INGEST_ENABLED': False,
+        'REVALUATION_ENABLED': False,
+        'PROFILER_ENABLED': True, 'PROFILER_DIR': str(tmp_path / 'profiles'),
+        'PROFILER_INTERVAL': 0.001, 'PROFILER_SLOW_MS': 30,
+    })
+
+    @app.route('/test/slow')
+    def slow_view():
+        time.sleep(0.1)
+        return 'ok'
+
+    @app.route('/test/fast')
+    def fast_view():
+        return 'ok'
+
+    try:
+        client = app.test_client()
+        client.get('/test/fast')
+        assert client.get('/test/slow').status_code == 200
+        files = list((tmp_path / 'profiles').glob('*.folded'))
+        assert len(files) == 1 and 'GET_test_slow' in files[0].name
+        stack, count = files[0].read_text(encoding='utf-8').splitlines()[0].rsplit(' ', 1)
+        assert stack.split(';')[-1].endswith('test_monitoring:slow_view') and int(count) > 5
+    finally:
+        monitoring.stop()
@@ -1,11 +1,69 @@
+from backend.database import get_db
 from backend.services import order_service
 
 def test_get_orders(client, monkeypatch):
-    fake_orders = [{'id': 1, 'name': 'Order 1'}]
-    monkeypatch.setattr(order_service, 'get_all_orders', lambda: fake_orders)
-    resp = client.get('/api/orders')
+    fake_page = {'orders': [{'id': 1, 'name': 'Order 1'}], 'next_cursor': None}
+    calls = []
+    def fake_list_orders(**kwargs):
+        calls.append(kwargs)
+        return fake_page
+    monkeypatch.setattr(order_service, 'list_orders', fake_list_orders)
+    resp = client.get('/api/orders?status=в работе&client_id=3&sort=amount-asc&limit=10')
     assert resp.status_code == 200
-    assert resp.get_json() == {'orders': fake_orders}
+    assert resp.get_json() == fake_page
+    assert calls[0]['status'] == 'в работе'
+    assert calls[0]['client_id'] == 3
+    assert calls[0]['sort'] == 'amount-asc'
+    assert calls[0]['limit'] == 10
+
+def test_get_orders_bad_sort(client):
+    resp = client.get('/api/orders?sort=name')
+    assert resp.status_code == 400
+
+def _seed_orders(count):
+    from backend.database import get_db
+    db = get_db()
+    db.executemany(
+        "INSERT INTO orders (client_id, supplier_id, name, status, total_cny, created_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(i % 3, 1, f'Order {i}', 'в работе' if i % 2 else 'доставлен', float(i % 5),
+          f'2024-01-{i % 28 + 1:02d} 10:00:00') for i in range(count)])
+    db.commit()
+
+def test_list_orders_keyset_pages_cover_all_rows(app, db_path):
+    with app.app_context():
+        _seed_orders(23)
+        for sort in order_service.ORDER_SORTS:
+            seen, cursor = [], None
+            while True:
+                page = order_service.list_orders(sort=sort, limit=5, cursor=cursor)
+                seen.extend(page['orders'])
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            assert len({o['id'] for o in seen}) == 23
+            column, direction = order_service.ORDER_SORTS[sort]
+            keys = [(o[column], o['id']) for o in seen]
+            assert keys == sorted(keys, reverse=(direction == 'DESC'))
+
+def test_list_orders_filters(app, db_path):
+    with app.app_context():
+        _seed_orders(12)
+        page = order_service.list_orders(status='доставлен', client_id=0, limit=100)
+        assert page['orders']
+        assert all(o['status'] == 'доставлен' and o['client_id'] == 0 for o in page['orders'])
+        page = order_service.list_orders(search='Order 11')
+        assert [o['name'] for o in page['orders']] == ['Order 11']
+
+def test_list_orders_uses_index(app, db_path):
+    from backend.database import get_db
+    with app.app_context():
+        plan = get_db().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM orders WHERE status = ? "
+            "AND (created_date, id) < (?, ?) ORDER BY created_date DESC, id DESC",
+            ('в работе', '2024-01-10', 5)).fetchall()
+        assert any('idx_orders_status_created' in row[3] for row in plan)
+        assert not any('TEMP B-TREE' in row[3] for row in plan)
 
 def test_get_order_found(client, monkeypatch):
     order = {'id': '123', 'name': 'Order 123'}
@@ -34,3 +92,190 @@ def test_create_order(client, monkeypatch):
 def test_create_order_missing_field(client):
     resp = client.post('/api/orders', json={'client_id': 1})
     assert resp.status_code == 400
+
+def test_stream_orders_ndjson(app, client, db_path):
+    import json
+    with app.app_context():
+        _seed_orders(450)
+    resp = client.get('/api/orders?status=доставлен', headers={'Accept': 'application/x-ndjson'})
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
+    lines = resp.get_data(as_text=True).splitlines()
+    assert len(lines) == 225
+    assert all(json.loads(line)['status'] == 'доставлен' for line in lines)
+
+def test_stream_orders_json_array(app, client, db_path):
+    from backend.database import get_pool
+    with app.app_context():
+        _seed_orders(450)
+    resp = client.get('/api/orders?stream=1&sort=amount-asc')
+    orders = resp.get_json()
+    assert len(orders) == 450
+    amounts = [o['total_cny'] for o in orders]
+    assert amounts == sorted(amounts)
+    assert get_pool().stats()['in_use'] == 0
+
+def test_stream_orders_empty(client, db_path):
+    resp = client.get('/api/orders?stream=1')
+    assert resp.get_json() == []
+
+def test_iter_orders_validates_eagerly(app, db_path):
+    import pytest
+    with app.app_context():
+        _seed_orders(10)
+        with pytest.raises(ValueError):
+            order_service.iter_orders(sort='name')
+        rows = order_service.iter_orders(batch_size=3)
+        assert next(rows)['id']
+        assert len(list(rows)) == 9
+
+def test_bulk_create_orders_json(app, client, db_path):
+    payload = [
+        {'client_id': 1, 'supplier_id': 2, 'name': 'A', 'status': 'новая', 'total_cny': 10},
+        {'client_id': 1, 'supplier_id': 2, 'name': 'B', 'status': 'новая', 'total_rub': 120},
+        {'client_id': 1, 'name': 'C', 'status': 'новая'},
+        {'client_id': 'x', 'supplier_id': 2, 'name': 'D', 'status': 'новая'},
+    ]
+    resp = client.post('/api/orders/bulk', json=payload)
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body['created'] == 2
+    assert body['total'] == 4
+    assert [e['row'] for e in body['errors']] == [3, 4]
+
+    with app.app_context():
+        orders = {o['name']: o for o in order_service.get_all_orders()}
+    assert orders['A']['total_rub'] == 120
+    assert orders['B']['total_cny'] == 10
+    assert orders['B']['total_usd'] == 1.37
+
+def test_bulk_create_orders_csv_upload(client, db_path):
+    import io
+    data = 'client_id,supplier_id,name,status,total_cny\n1,2,Первая,новая,5\n1,2,Вторая,новая,\n'
+    resp = client.post('/api/orders/bulk', data={'file': (io.BytesIO(data.encode('utf-8-sig')), 'orders.csv')},
+                       content_type='multipart/form-data')
+    assert resp.get_json() == {'created': 2, 'errors': [], 'total': 2}
+
+def test_bulk_create_orders_chunk_failure_keeps_good_rows(app, db_path):
+    with app.app_context():
+        from backend.database import get_db
+        get_db().execute("CREATE TRIGGER reject_bad BEFORE INSERT ON orders "
+                         "WHEN NEW.name = 'bad' BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+        rows = [{'client_id': 1, 'supplier_id': 1, 'name': n, 'status': 'новая'}
+                for n in ('a', 'bad', 'c', 'd', 'e')]
+        result = order_service.bulk_create_orders(rows, chunk_size=2)
+        assert result['created'] == 4
+        assert result['errors'] == [{'row': 2, 'error': 'rejected'}]
+
+def test_bulk_create_orders_rejects_non_list(client):
+    resp = client.post('/api/orders/bulk', json={'name': 'x'})
+    assert resp.status_code == 400
+
+def _create(app, **fields):
+    data = {'client_id': 1, 'supplier_id': 2, 'name': 'A', 'status': 'новая'}
+    data.update(fields)
+    with app.app_context():
+        return order_service.create_order(data)
+
+def test_update_order_recalculates_in_one_statement(app, db_path):
+    order_id = _create(app, total_cny=10)
+    with app.app_context():
+        updated = order_service.update_order(order_id, {'status': 'в работе', 'total_rub': 240})
+        assert updated['status'] == 'в работе'
+        assert updated['total_cny'] == 20
+        assert updated['total_usd'] == 20 * 0.137
+        assert updated['version'] == 2
+
+        # total_cny совпадает с текущим, поэтому пересчет идет от total_usd
+        updated = order_service.update_order(order_id, {'total_cny': 20, 'total_usd': 1.37})
+        assert updated['total_cny'] == 10
+        assert updated['total_rub'] == 120
+
+        assert order_service.update_order(999, {'name': 'x'}) is None
+
+def test_update_order_version_conflict(app, db_path):
+    import pytest
+    order_id = _create(app)
+    with app.app_context():
+        assert order_service.update_order(order_id, {'name': 'B'}, expected_version=1)['version'] == 2
+        with pytest.raises(order_service.OrderVersionConflict) as exc:
+            order_service.update_order(order_id, {'name': 'C'}, expected_version=1)
+        assert exc.value.current_version == 2
+        assert order_service.get_order_by_id(order_id)['name'] == 'B'
+
+def test_put_order_with_if_match(app, client, db_path):
+    order_id = _create(app)
+    etag = client.get(f'/api/orders/{order_id}').headers['ETag']
+
+    resp = client.put(f'/api/orders/{order_id}', json={'name': 'B'}, headers={'If-Match': etag})
+    assert resp.status_code == 200
+    assert resp.get_json()['name'] == 'B'
+    assert resp.headers['ETag'] != etag
+
+    resp = client.put(f'/api/orders/{order_id}', json={'name': 'C'}, headers={'If-Match': etag})
+    assert resp.status_code == 412
+    assert resp.get_json()['version'] == 2
+
+    # ETag другой заявки — тот же конфликт, а не ошибка запроса
+    resp = client.put(f'/api/orders/{order_id}', json={'name': 'C'}, headers={'If-Match': '"999-2"'})
+    assert resp.status_code == 412
+    assert resp.get_json()['version'] == 2
+    resp = client.put(f'/api/orders/{order_id}', json={'name': 'C'}, headers={'If-Match': '"garbage"'})
+    assert resp.status_code == 400
+
+    assert client.put('/api/orders/999', json={'name': 'x'}).status_code == 404
+    assert client.put(f'/api/orders/{order_id}', json={'unknown': 1}).status_code == 400
+
+
+def test_order_items_keep_totals_in_sync(app, client, db_path):
+    import pytest
+    order_id = _create(app, total_cny=999)
+    resp = client.patch(f'/api/orders/{order_id}/items', json={'items': [
+        {'product': 'Кроссовки', 'quantity': 10, 'unit_price': 5},
+        {'product': 'Коробки', 'quantity': 2, 'unit_price': 12, 'currency': 'rub'},
+    ]})
+    assert resp.status_code == 200
+    order, items = resp.get_json()['order'], resp.get_json()['items']
+    # Первая позиция заменяет введенную вручную сумму
+    assert order['total_cny'] == pytest.approx(52)
+    assert order['total_rub'] == pytest.approx(624)
+    assert order['items_count'] == 2 and order['version'] == 2
+    assert items[1]['currency'] == 'RUB' and items[1]['amount_cny'] == pytest.approx(2)
+
+    etag = resp.headers['ETag']
+    resp = client.patch(f'/api/orders/{order_id}/items', headers={'If-Match': etag},
+                        json={'items': [{'id': items[0]['id'], 'quantity': 20}], 'delete': [items[1]['id']]})
+    assert resp.get_json()['order']['total_cny'] == pytest.approx(100)
+    assert resp.get_json()['order']['items_count'] == 1
+    assert client.patch(f'/api/orders/{order_id}/items', headers={'If-Match': etag},
+                        json={'delete': [items[0]['id']]}).status_code == 412
+
+    with app.app_context():
+        stats = get_db().execute("SELECT sum_cny FROM order_stats WHERE dimension = 'all'").fetchone()
+        assert stats[0] == pytest.approx(100)
+        # Суммы заявки с позициями не меняются вручную, но могут прийти без изменений
+        with pytest.raises(ValueError):
+            order_service.update_order(order_id, {'total_cny': 1})
+        assert order_service.update_order(order_id, {'name': 'B', 'total_cny': 100.0})['name'] == 'B'
+
+    resp = client.patch(f'/api/orders/{order_id}/items', json={'delete': [items[0]['id']]})
+    assert resp.get_json()['order']['total_cny'] == 0 and resp.get_json()['items'] == []
+    assert client.get(f'/api/orders/{order_id}/items').get_json() == {'items': []}
+
+
+def test_order_items_validation(app, client, db_path):
+    order_id = _create(app)
+    for body in ({'items': [{'product': 'A', 'quantity': 0, 'unit_price': 1}]},
+                 {'items': [{'product': 'A', 'quantity': 1, 'unit_price': 1, 'currency': 'EUR'}]},
+                 {'items': [{'id': 12345, 'quantity': 2}]},
+                 {}):
+        assert client.patch(f'/api/orders/{order_id}/items', json=body).status_code == 400
+    assert client.patch('/api/orders/999/items', json={'delete': [1]}).status_code == 404
+    with app.app_context():
+        assert order_service.get_order_by_id(order_id)['version'] == 1
+
+    resp = client.post('/api/orders', json={'client_id': 1, 'supplier_id': 2, 'name': 'C', 'status': 'новая',
+                                            'items': [{'product': 'Лампы', 'quantity': 3, 'unit_price': 2}]})
+    with app.app_context():
+        order = order_service.get_order_by_id(resp.get_json()['id'])
+    assert order['total_cny'] == 6 and order['items_count'] == 1
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from backend.database import get_db
+from backend.services import currency_service, order_service, revaluation_service
+
+
+def _totals(order_id):
+    return tuple(get_db().execute("SELECT total_cny, total_rub, total_usd, version FROM orders WHERE id = ?",
+                                  (order_id,)).fetchone())
+
+
+def test_revaluation_updates_open_orders(app, db_path):
+    with app.app_context():
+        open_id = order_service.create_order({'client_id': 1, 'supplier_id': 1, 'name': 'A', 'status': 'в работе',
+                                              'total_cny': 100})
+        closed_id = order_service.create_order({'client_id': 1, 'supplier_id': 1, 'name': 'B', 'status': 'доставлен',
+                                                'total_cny': 100})
+        items_id = order_service.create_order({'client_id': 1, 'supplier_id': 1, 'name': 'C', 'status': 'новая',
+                                               'items': [{'product': 'x', 'quantity': 2, 'unit_price': 120,
+                                                          'currency': 'RUB'}]})
+        assert order_service.get_order_by_id(open_id)['total_rub'] == 1200
+        currency_service.publish_rates({'RUB': 10.0, 'USD': 0.125})
+
+        worker = revaluation_service.RevaluationWorker(chunk_size=10, pause=0)
+        job_id = worker.enqueue()
+        worker.run_job(job_id)
+        job = worker.get_job(job_id)
+        assert job['status'] == 'success'
+        assert (job['total'], job['processed'], job['changed'], job['items_changed']) == (2, 2, 2, 1)
+
+        assert _totals(open_id) == pytest.approx((100, 1000, 12.5, 2))
+        assert _totals(closed_id) == pytest.approx((100, 1200, 13.7, 1))
+        # Позиция в рублях: рубли прежние, юани и доллары по новому курсу
+        assert _totals(items_id) == pytest.approx((24.0, 240.0, 3.0, 2))
+        # Кеш заявки сброшен
+        assert order_service.get_order_by_id(open_id)['total_rub'] == 1000
+
+        # Повторная переоценка по тем же курсам ничего не пишет
+        job_id = worker.enqueue()
+        worker.run_job(job_id)
+        assert worker.get_job(job_id)['changed'] == 0
+        assert _totals(open_id)[3] == 2
+
+
+def test_rate_update_triggers_background_revaluation(app, client, db_path):
+    assert client.post('/api/orders/revaluation').status_code == 503
+    with app.app_context():
+        order_id = order_service.create_order({'client_id': 1, 'supplier_id': 1, 'name': 'A', 'status': 'новая',
+                                               'total_cny': 10})
+    worker = revaluation_service.start_worker(pause=0)
+    try:
+        with app.app_context():
+            currency_service.publish_rates({'RUB': 11.0, 'USD': 0.15})
+        deadline = time.monotonic() + 5
+        with app.app_context():
+            while _totals(order_id)[1] != 110 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert _totals(order_id)[1] == 110
+
+        resp = client.post('/api/orders/revaluation')
+        assert resp.status_code == 202
+        job_id = resp.get_json()['job_id']
+        while worker.get_job(job_id)['status'] in ('queued', 'running') and time.monotonic() < deadline:
+            time.sleep(0.01)
+        job = client.get(f'/api/orders/revaluation/{job_id}').get_json()
+        assert job['status'] == 'success' and job['changed'] == 0
+        assert client.get('/api/orders/revaluation/nope').status_code == 404
+    finally:
+        revaluation_service.stop_worker()
@@ -0,0 +1,81 @@
+from backend.database import get_db
+from backend.services import search_service
+
+
+def _seed(app):
+    with app.app_context():
+        db = get_db()
+        db.executemany("INSERT INTO orders (id, client_id, supplier_id, name, status) VALUES (?, ?, ?, ?, ?)",
+                       [(1, 1, 1, 'Ёлочные игрушки для Иванова', 'в работе'),
+                        (2, 1, 2, 'Запчасти Shenzhen Motors', 'доставлен'),
+                        (42, 2, 2, 'Кроссовки', 'в работе')])
+        db.execute("INSERT INTO Clients (id, name, contact, phone, city) "
+                   "VALUES (1, 'ООО Ромашка', 'Иванов Петр', '+7 900 123-45-67', 'Новосибирск')")
+        db.execute("INSERT INTO Suppliers (id, name, contact, city) "
+                   "VALUES (2, 'Shenzhen Motors Co', 'Li Wei', 'Шэньчжэнь')")
+        db.execute("INSERT INTO Communications (channel, chat_id, sender, body, received_at) "
+                   "VALUES ('telegram', '555', 'ivanov', 'Когда придут елочные игрушки?', '2026-01-01 10:00:00')")
+        db.commit()
+
+
+def test_search_across_sources_with_prefix_and_snippets(app, client, db_path):
+    _seed(app)
+    results = client.get('/api/search?q=игруш').get_json()['results']
+    assert {(r['type'], r['id']) for r in results} == {('order', 1), ('message', 1)}
+    message = next(r for r in results if r['type'] == 'message')
+    # ё и е не различаются, регистр не важен
+    for q in ('ЁЛОЧН', 'елочн'):
+        found = client.get(f'/api/search?q={q}').get_json()['results']
+        assert {(r['type'], r['id']) for r in found} == {('order', 1), ('message', 1)}
+    # Фрагмент строится по исходному тексту, с ё
+    order = next(r for r in found if r['type'] == 'order')
+    assert order['snippet'] == '<mark>Ёлочные</mark> игрушки для Иванова'
+    assert message['title'] == 'ivanov' and message['fields']['chat_id'] == '555'
+    assert '<mark>игрушки</mark>' in message['snippet']
+
+    # Все слова должны встретиться; совпадение в названии весит больше, чем в контакте
+    results = client.get('/api/search?q=shenzhen mot').get_json()['results']
+    assert [(r['type'], r['id']) for r in results][:2] in ([('order', 2), ('supplier', 2)],
+                                                            [('supplier', 2), ('order', 2)])
+    assert client.get('/api/search?q=иванов&types=client').get_json()['results'][0]['title'] == 'ООО Ромашка'
+
+
+def test_search_indexes_follow_changes(app, db_path):
+    _seed(app)
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE Clients SET name = 'ООО Василек' WHERE id = 1")
+        db.execute("DELETE FROM orders WHERE id = 2")
+        db.commit()
+        assert search_service.search('ромашка')['results'] == []
+        assert [r['id'] for r in search_service.search('василек', types=['client'])['results']] == [1]
+        assert [r['type'] for r in search_service.search('motors')['results']] == ['supplier']
+
+
+def test_search_by_order_number_and_bad_input(app, client, db_path):
+    _seed(app)
+    results = client.get('/api/search?q=%2342').get_json()['results']
+    assert results[0]['type'] == 'order' and results[0]['id'] == 42
+    assert client.get('/api/search?q=').get_json()['results'] == []
+    # Операторы FTS5 во вводе не интерпретируются
+    assert client.get('/api/search?q="OR NEAR(').status_code == 200
+    assert client.get('/api/search?q=x&types=planet').status_code == 400
+
+
+def test_broad_query_returns_newest_matches(app, db_path, monkeypatch):
+    _seed(app)
+    monkeypatch.setattr(search_service, 'RANK_LIMIT', 2)
+    with app.app_context():
+        db = get_db()
+        db.executemany("INSERT INTO orders (client_id, name, status) VALUES (1, ?, 'новый')",
+                       [('Игрушки плюшевые',), ('Игрушки деревянные',)])
+        db.commit()
+        results = search_service.search('игрушки', types=['order', 'message'])['results']
+        # В заявках слово встречается 3 раза — запрос широкий, новые первыми;
+        # в сообщениях — один раз, там результат ранжирован bm25 и идет первым
+        assert [(r['type'], r['title']) for r in results] == [
+            ('message', 'ivanov'),
+            ('order', 'Игрушки деревянные'), ('order', 'Игрушки плюшевые'), ('order', 'Ёлочные игрушки для Иванова'),
+        ]
+        assert results[0]['score'] is not None and results[1]['score'] is None
+        assert results[1]['snippet'] == '<mark>Игрушки</mark> деревянные'
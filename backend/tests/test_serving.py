@@ -0,0 +1,69 @@
+import os
+import runpy
+import shutil
+from datetime import datetime, timedelta
+
+from backend import database
+from backend.services import currency_service
+
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+
+def test_ready_when_database_and_rates_are_fresh(client, db_path):
+    resp = client.get('/api/ready')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data['status'] == 'ready'
+    assert data['checks']['database']['pool']['max_size'] >= 1
+    assert data['checks']['rates']['ok'] is True
+
+
+def test_not_ready_when_rates_are_stale(app, client, db_path):
+    app.config['RATES_MAX_AGE'] = 60
+    stale = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+    with currency_service._refresh_lock:
+        currency_service._publish({'RUB': 12.0, 'USD': 0.137}, stale)
+
+    resp = client.get('/api/ready')
+    assert resp.status_code == 503
+    data = resp.get_json()
+    assert data['checks']['database']['ok'] is True
+    assert data['checks']['rates']['ok'] is False
+    assert data['checks']['rates']['age_seconds'] >= 300
+
+
+def test_not_ready_without_database(client, tmp_path):
+    database.configure_pool(str(tmp_path / 'missing.db'))
+    resp = client.get('/api/ready')
+    assert resp.status_code == 503
+    assert resp.get_json()['checks']['database']['ok'] is False
+
+
+def test_gunicorn_config_from_env(monkeypatch):
+    monkeypatch.setenv('GUNICORN_WORKERS', '3')
+    monkeypatch.setenv('GUNICORN_THREADS', '8')
+    monkeypatch.setenv('GUNICORN_KEEPALIVE', '15')
+    # Конфигурация дописывает переменные в окружение: подменяем его
+    # копией, чтобы значения не достались следующим тестам
+    environ = {name: value for name, value in os.environ.items()
+               if name not in ('WS_ENABLED', 'METRICS_DIR', 'BACKGROUND_LOCK_FILE', 'AUTH_HASH_WORKERS')}
+    monkeypatch.setattr(os, 'environ', environ)
+
+    try:
+        conf = runpy.run_path(GUNICORN_CONF)
+        assert conf['workers'] == 3
+        assert conf['threads'] == 8
+        assert conf['keepalive'] == 15
+        assert conf['worker_class'] == 'gthread'
+        assert conf['preload_app'] is False
+        # Push-сервер не включается, когда воркеров несколько
+        assert environ['WS_ENABLED'] == '0'
+        assert os.path.isdir(environ['METRICS_DIR'])
+        # Фоновые компоненты — в одном воркере, пароли — без отдельного пула процессов
+        assert os.path.isdir(os.path.dirname(environ['BACKGROUND_LOCK_FILE']))
+        assert environ['AUTH_HASH_WORKERS'] == '0'
+    finally:
+        if 'METRICS_DIR' in environ:
+            shutil.rmtree(environ['METRICS_DIR'], ignore_errors=True)
+        if 'BACKGROUND_LOCK_FILE' in environ:
+            shutil.rmtree(os.path.dirname(environ['BACKGROUND_LOCK_FILE']), ignore_errors=True)
@@ -0,0 +1,115 @@
+import sqlite3
+
+import pytest
+
+from backend.database import get_db
+from backend.services import shipment_service
+
+
+def _plan(query, params=()):
+    return ' '.join(row[3] for row in get_db().execute(f"EXPLAIN QUERY PLAN {query}", params))
+
+
+def test_append_stage_updates_current_stage(app, db_path):
+    with app.app_context():
+        shipment = shipment_service.create_shipment({'carrier': 'cdek', 'tracking_number': 'T1'})
+        assert shipment['current_stage'] == 'created'
+
+        # Событие перевозчика заменяет created, даже если произошло раньше
+        shipment_service.append_stage(shipment['id'], 'picked_up', ts='2020-01-01T10:00:00', location='Иу')
+        result = shipment_service.append_stage(shipment['id'], 'in_transit', ts='2020-01-02T10:00:00+03:00')
+        assert result['shipment']['current_stage'] == 'in_transit'
+        assert result['shipment']['current_stage_at'] == '2020-01-02 07:00:00'
+
+        # Запоздавшее событие попадает в историю, но текущий этап не меняет
+        shipment_service.append_stage(shipment['id'], 'picked_up', ts='2020-01-01T12:00:00')
+        current = shipment_service.get_shipment_by_tracking('T1')
+        assert current['current_stage'] == 'in_transit'
+
+        timeline = shipment_service.get_timeline(shipment['id'])
+        assert [stage['stage'] for stage in timeline] == ['picked_up', 'picked_up', 'in_transit', 'created']
+        assert timeline[0]['location'] == 'Иу'
+
+
+def test_stage_log_is_append_only(app, db_path):
+    with app.app_context():
+        shipment = shipment_service.create_shipment({})
+        db = get_db()
+        with pytest.raises(sqlite3.IntegrityError):
+            db.execute("UPDATE ShipmentStages SET stage = 'delivered'")
+        with pytest.raises(sqlite3.IntegrityError):
+            db.execute("DELETE FROM ShipmentStages")
+        db.rollback()
+
+        assert shipment_service.delete_shipment(shipment['id']) == 1
+        assert db.execute("SELECT COUNT(*) FROM ShipmentStages").fetchone()[0] == 0
+
+
+def test_lookups_use_indexes(app, db_path):
+    with app.app_context():
+        timeline = _plan("SELECT id, shipment_id, stage, ts, location, note, source FROM ShipmentStages "
+                         "WHERE shipment_id = ? ORDER BY ts, id", (1,))
+        assert 'COVERING INDEX idx_shipment_stages_timeline' in timeline
+        assert 'TEMP B-TREE' not in timeline
+
+        by_stage = _plan("SELECT * FROM Shipments WHERE current_stage = ? ORDER BY id DESC LIMIT 50",
+                         ('in_transit',))
+        assert 'idx_shipments_stage' in by_stage
+        assert 'TEMP B-TREE' not in by_stage
+
+
+def test_list_by_stage_with_cursor(app, db_path):
+    with app.app_context():
+        ids = [shipment_service.create_shipment({'order_id': 1})['id'] for _ in range(5)]
+        for shipment_id in ids[:3]:
+            shipment_service.append_stage(shipment_id, 'customs')
+
+        first = shipment_service.list_shipments(stage='customs', limit=2)
+        assert [s['id'] for s in first['shipments']] == [ids[2], ids[1]]
+        second = shipment_service.list_shipments(stage='customs', limit=2, cursor=first['next_cursor'])
+        assert [s['id'] for s in second['shipments']] == [ids[0]]
+        assert second['next_cursor'] is None
+
+        with pytest.raises(ValueError):
+            shipment_service.list_shipments(stage='lost')
+
+
+def test_shipments_api(client, db_path):
+    resp = client.post('/api/shipments', json={'carrier': 'cdek', 'tracking_number': 'CN1', 'order_id': 7})
+    assert resp.status_code == 201
+    shipment_id = resp.get_json()['id']
+    assert client.post('/api/shipments', json={'carrier': 'cdek', 'tracking_number': 'CN1'}).status_code == 400
+
+    resp = client.post(f'/api/shipments/{shipment_id}/stages', json={'stage': 'arrived', 'location': 'Москва'})
+    assert resp.status_code == 201
+    assert resp.get_json()['shipment']['current_location'] == 'Москва'
+    assert client.post(f'/api/shipments/{shipment_id}/stages', json={'stage': 'lost'}).status_code == 400
+    assert client.post('/api/shipments/999/stages', json={'stage': 'arrived'}).status_code == 404
+
+    resp = client.get('/api/shipments/track/CN1')
+    assert resp.status_code == 200
+    assert resp.get_json()['current_stage'] == 'arrived'
+
+    resp = client.get(f'/api/shipments/{shipment_id}?timeline=1')
+    assert [stage['stage'] for stage in resp.get_json()['stages']] == ['created', 'arrived']
+
+    resp = client.get('/api/shipments?stage=arrived&order_id=7')
+    assert [s['id'] for s in resp.get_json()['shipments']] == [shipment_id]
+
+    assert client.put(f'/api/shipments/{shipment_id}', json={'eta': '2030-05-01'}).get_json()['eta'] == \
+        '2030-05-01 00:00:00'
+
+    # Ошибка базы данных при удалении — 500, а не 404
+    with client.application.app_context():
+        db = get_db()
+        db.execute("CREATE TRIGGER block_delete BEFORE DELETE ON Shipments "
+                   "BEGIN SELECT RAISE(ABORT, 'удаление запрещено'); END")
+        db.commit()
+    assert client.delete(f'/api/shipments/{shipment_id}').status_code == 500
+    with client.application.app_context():
+        db = get_db()
+        db.execute("DROP TRIGGER block_delete")
+        db.commit()
+
+    assert client.delete(f'/api/shipments/{shipment_id}').status_code == 200
+    assert client.get(f'/api/shipments/{shipment_id}/stages').status_code == 404
@@ -0,0 +1,27 @@
+from backend.benchmarks.startup import measure, parse_importtime
+
+# Собственное время импорта модулей backend.* при create_app(); сейчас ~20 мс,
+# запас покрывает разброс на медленных машинах, но не новый тяжелый импорт
+BACKEND_IMPORT_BUDGET_MS = 80
+
+# Модули, которые нужны только включенным фоновым компонентам или отдельным
+# эндпоинтам и не должны загружаться при запуске приложения
+LAZY_MODULES = ('numpy', 'websockets', 'backend.websocket.server', 'aiohttp')
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   backend.config\n"
+        "import time:      3456 |       3576 | backend.main\n"
+    )
+    modules = parse_importtime(output)
+    assert modules['backend.main'].self_us == 3456
+    assert modules['backend.config'].cumulative_us == 120
+
+
+def test_create_app_startup_budget():
+    result = measure()
+    loaded = [name for name in LAZY_MODULES if name in result['modules']]
+    assert loaded == []
+    assert result['backend_ms'] < BACKEND_IMPORT_BUDGET_MS
@@ -0,0 +1,72 @@
+import pytest
+
+from backend import database
+from backend.database import get_db
+from backend.services import order_service, stats_service
+
+
+def _snapshot():
+    return get_db().execute(
+        "SELECT dimension, key, status, count, round(sum_cny, 6), round(sum_rub, 6), round(sum_usd, 6) "
+        "FROM order_stats WHERE count != 0 ORDER BY 1, 2, 3").fetchall()
+
+
+def _order(**fields):
+    data = {'client_id': 1, 'supplier_id': 2, 'name': 'A', 'status': 'новая'}
+    data.update(fields)
+    return data
+
+
+def test_stats_follow_order_writes(app, db_path):
+    with app.app_context():
+        first = order_service.create_order(_order(total_cny=10))
+        second = order_service.create_order(_order(client_id=2, total_cny=5))
+        order_service.bulk_create_orders([_order(status='в работе', total_cny=1)] * 3)
+
+        summary = stats_service.get_summary()
+        assert summary['total']['count'] == 5
+        assert summary['total']['total_cny'] == pytest.approx(18)
+        assert summary['by_status']['в работе']['count'] == 3
+
+        order_service.update_order(first, {'status': 'в работе', 'total_cny': 20})
+        order_service.delete_order(second)
+
+        summary = stats_service.get_summary()
+        assert summary['total']['count'] == 4
+        assert summary['by_status']['в работе']['total_cny'] == pytest.approx(23)
+        assert 'новая' not in summary['by_status']
+
+        clients = stats_service.get_groups('client')
+        assert {row['key'] for row in clients} == {'1'}
+
+        incremental = _snapshot()
+        stats_service.rebuild_stats()
+        assert _snapshot() == incremental
+
+
+def test_rebuild_command_uses_configured_database(app, db_path, monkeypatch):
+    with app.app_context():
+        order_service.create_order(_order(total_cny=10))
+        db = get_db()
+        db.execute("DELETE FROM order_stats")
+        db.commit()
+
+    # Команда запускается без приложения: база берется из настроек, как в create_app
+    database.configure_pool(None)
+    monkeypatch.setenv('DATABASE_PATH', db_path)
+    stats_service.main()
+    with app.app_context():
+        assert stats_service.get_summary()['total']['count'] == 1
+
+
+def test_stats_endpoint(app, client, db_path):
+    with app.app_context():
+        order_service.create_order(_order(total_cny=10))
+
+    body = client.get('/api/stats').get_json()
+    assert body['total']['count'] == 1
+    assert body['by_status']['новая']['total_rub'] == pytest.approx(120)
+
+    body = client.get('/api/stats?group=day').get_json()
+    assert len(body['groups']) == 1
+    assert client.get('/api/stats?group=name').status_code == 400
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+
+import jwt
+import pytest
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidStatus
+
+from backend.database import close_db, get_db
+from backend.services import auth_service, event_bus, order_service
+from backend.websocket.server import CLOSE_TOKEN_REVOKED, ClientSession, PushServer
+
+SECRET = 'test-secret-key-with-enough-length-for-hs256'
+
+
+def _token(**claims):
+    payload = {'sub': 'tester', 'type': 'access'}
+    payload.update(claims)
+    return jwt.encode(payload, SECRET, algorithm='HS256')
+
+
+@pytest.fixture
+def push_server():
+    server = PushServer(SECRET, port=0, coalesce_window=0.02).start_in_thread()
+    yield server
+    server.stop()
+
+
+async def _subscribe(server, topics, token=None):
+    ws = await connect(f'ws://localhost:{server.port}/?token={token or _token()}')
+    await ws.send(json.dumps({'action': 'subscribe', 'topics': topics}))
+    assert json.loads(await ws.recv()) == {'subscribed': sorted(topics)}
+    return ws
+
+
+def test_rejects_missing_or_invalid_token(push_server):
+    async def scenario():
+        for url in (f'ws://localhost:{push_server.port}/',
+                    f'ws://localhost:{push_server.port}/?token=garbage'):
+            with pytest.raises(InvalidStatus) as exc:
+                await connect(url)
+            assert exc.value.response.status_code == 401
+    asyncio.run(scenario())
+
+
+def test_bursts_are_coalesced_per_topic(push_server):
+    async def scenario():
+        orders_ws = await _subscribe(push_server, ['orders'])
+        rates_ws = await _subscribe(push_server, ['rates'])
+
+        for version in range(5):
+            event_bus.publish('orders', {'type': 'updated', 'id': 1, 'version': version})
+            event_bus.publish('rates', {'type': 'updated', 'version': version})
+        event_bus.publish('orders', {'type': 'deleted', 'id': 2})
+
+        message = json.loads(await asyncio.wait_for(orders_ws.recv(), 2))
+        assert message['topic'] == 'orders'
+        assert message['events'] == [{'type': 'updated', 'id': 1, 'version': 4},
+                                     {'type': 'deleted', 'id': 2}]
+        message = json.loads(await asyncio.wait_for(rates_ws.recv(), 2))
+        assert message == {'topic': 'rates', 'events': [{'type': 'updated', 'version': 4}]}
+        await orders_ws.close()
+        await rates_ws.close()
+    asyncio.run(scenario())
+
+
+def test_overflow_turns_into_resync(push_server):
+    push_server.max_pending = 3
+    async def scenario():
+        ws = await _subscribe(push_server, ['orders'])
+        for order_id in range(10):
+            event_bus.publish('orders', {'type': 'created', 'id': order_id})
+        message = json.loads(await asyncio.wait_for(ws.recv(), 2))
+        assert message['events'] == [{'type': 'resync'}]
+        await ws.close()
+    asyncio.run(scenario())
+
+
+class _DroppedConnection:
+    """Клиент, отключившийся во время отправки."""
+
+    def __init__(self, hang=False):
+        self.hang = hang
+
+    async def send(self, message):
+        if self.hang:
+            await asyncio.sleep(10)
+        raise ConnectionClosed(None, None)
+
+    async def close(self, code=1000, reason=''):
+        raise ConnectionClosed(None, None)
+
+
+@pytest.mark.parametrize('hang', [False, True])
+def test_sender_stops_quietly_when_client_drops(hang):
+    server = PushServer(SECRET, coalesce_window=0, send_timeout=0.05)
+
+    async def scenario():
+        session = ClientSession(_DroppedConnection(hang), {'sub': 'tester'}, 10)
+        session.push('orders', {'type': 'created', 'id': 1})
+        # Задача завершается без исключения, которое некому было бы забрать
+        await asyncio.wait_for(server._sender(session), 2)
+    asyncio.run(scenario())
+
+
+def test_revoked_token_is_disconnected_and_rejected(push_server, db_path):
+    db = get_db()
+    with db:
+        user_id = db.execute("INSERT INTO Users (username, password_hash) VALUES ('manager', 'x') "
+                             "RETURNING id").fetchall()[0][0]
+    claims = {'jti': 'session-1', 'uid': user_id, 'exp': int(time.time()) + 600}
+    token = _token(**claims)
+
+    def revoke():
+        try:
+            auth_service.revoke_token(claims)
+        finally:
+            close_db()
+
+    async def scenario():
+        ws = await _subscribe(push_server, ['orders'], token)
+        # Выход: открытое соединение закрывается, новое не открывается
+        await asyncio.to_thread(revoke)
+        with pytest.raises(ConnectionClosed) as closed:
+            await asyncio.wait_for(ws.recv(), 2)
+        assert closed.value.rcvd.code == CLOSE_TOKEN_REVOKED
+        with pytest.raises(InvalidStatus) as exc:
+            await connect(f'ws://localhost:{push_server.port}/?token={token}')
+        assert exc.value.response.status_code == 401
+    try:
+        asyncio.run(scenario())
+    finally:
+        close_db()
+
+
+def test_order_service_publishes_after_commit(app, db_path):
+    events = []
+    subscriber = lambda topic, event: events.append((topic, event))
+    event_bus.subscribe(subscriber)
+    try:
+        with app.app_context():
+            order_id = order_service.create_order(
+                {'client_id': 1, 'supplier_id': 2, 'name': 'A', 'status': 'новая'})
+            order_service.update_order(order_id, {'name': 'B'})
+            order_service.delete_order(order_id)
+    finally:
+        event_bus.unsubscribe(subscriber)
+    assert [event['type'] for topic, event in events if topic == 'orders'] == [
+        'created', 'updated', 'deleted']
@@ -0,0 +1,283 @@
+"""
+WebSocket-сервер для push-уведомлений об изменениях заявок, отгрузок и курсов валют.
+
+Сервер работает в том же процессе, что и Flask-приложение: сервисы публикуют
+события в backend.services.event_bus после фиксации транзакции, а сервер
+рассылает их подписанным клиентам.
+
+Протокол:
+    ws://host:WS_PORT/?token=<JWT>          — подключение (или заголовок Authorization)
+    {"action": "subscribe", "topics": ["orders", "rates", "shipments"]}
+    {"action": "unsubscribe", "topics": ["rates"]}
+    <- {"topic": "orders", "events": [...]}  — пачка событий за окно склейки
+
+Отозванный токен (выход, смена пароля, блокировка пользователя) не
+открывает соединение, а уже открытые им соединения закрываются с кодом
+CLOSE_TOKEN_REVOKED по событию 'auth' шины событий.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from typing import Any, Dict, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+import jwt
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from backend.database import close_db
+from backend.services import auth_service, event_bus
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ('orders', 'rates', 'shipments', 'messages')
+
+# Код закрытия для клиента, который не успевает читать события
+CLOSE_SLOW_CONSUMER = 4008
+# Код закрытия соединения, токен которого отозван
+CLOSE_TOKEN_REVOKED = 4001
+
+
+def _token_revoked(claims: Dict[str, Any]) -> bool:
+    # Выполняется в пуле потоков asyncio: проверка может читать базу
+    try:
+        return auth_service.is_token_revoked(claims)
+    except sqlite3.Error as e:
+        logger.error(f"Не удалось проверить отзыв токена: {e}")
+        return True
+    finally:
+        close_db()
+
+
+def _coalesce_key(topic: str, event: Dict[str, Any]) -> Any:
+    """Событие с тем же ключом заменяет предыдущее, еще не отправленное."""
+    if topic == 'rates':
+        return 'rates'
+    if event.get('id') is not None:
+        return event['id']
+    return event.get('type')
+
+
+class ClientSession:
+    """Подписки и буфер неотправленных событий одного клиента."""
+
+    def __init__(self, ws: ServerConnection, claims: Dict[str, Any], max_pending: int):
+        self.ws = ws
+        self.identity = str(claims.get('sub', ''))
+        self.jti = claims.get('jti')
+        self.user_id = claims.get('uid')
+        self.max_pending = max_pending
+        self.topics: Set[str] = set()
+        self.pending: Dict[str, 'OrderedDict[Any, Dict[str, Any]]'] = {}
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, topic: str, event: Dict[str, Any]) -> None:
+        buffer = self.pending.setdefault(topic, OrderedDict())
+        if 'resync' in buffer:
+            # Клиент уже отстал и все равно перечитает данные целиком
+            self.dropped += 1
+            return
+        key = _coalesce_key(topic, event)
+        buffer.pop(key, None)
+        buffer[key] = event
+        if len(buffer) > self.max_pending:
+            self.dropped += len(buffer)
+            buffer.clear()
+            buffer['resync'] = {'type': 'resync'}
+        self.wakeup.set()
+
+
+class PushServer:
+    """
+    Рассылает события event_bus подписанным клиентам.
+
+    Аргументы:
+        secret (str): Ключ JWT (тот же, что JWT_SECRET_KEY приложения)
+        coalesce_window (float): Сколько секунд копить события перед отправкой
+        max_pending (int): Сколько неотправленных событий держать на клиента и тему;
+                           при переполнении клиенту отправляется одно событие resync
+        send_timeout (float): Сколько ждать отправки; медленный клиент отключается
+    """
+
+    def __init__(self, secret: str, host: str = 'localhost', port: int = 5001,
+                 coalesce_window: float = 0.05, max_pending: int = 1000,
+                 send_timeout: float = 5.0):
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.coalesce_window = coalesce_window
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+
+        self.sessions: Set[ClientSession] = set()
+        self.by_topic: Dict[str, Set[ClientSession]] = {topic: set() for topic in TOPICS}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Future] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Аутентификация -------------------------------------------------
+
+    def _claims(self, token: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not token:
+            return None
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=['HS256'])
+        except jwt.PyJWTError:
+            return None
+        if claims.get('type', 'access') != 'access':
+            return None
+        return claims
+
+    def _token(self, request) -> Optional[str]:
+        query = parse_qs(urlparse(request.path).query)
+        if query.get('token'):
+            return query['token'][0]
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer '):
+            return header[len('Bearer '):]
+        return None
+
+    async def _process_request(self, connection: ServerConnection, request):
+        claims = self._claims(self._token(request))
+        if claims is None or await asyncio.to_thread(_token_revoked, claims):
+            return connection.respond(HTTPStatus.UNAUTHORIZED, 'Требуется действительный JWT\n')
+        return None
+
+    def _revoke(self, event: Dict[str, Any]) -> None:
+        # Отзыв касается только токенов пользователей (claim uid)
+        for session in list(self.sessions):
+            if session.user_id is None:
+                continue
+            if session.jti == event.get('jti') or session.user_id == event.get('user_id'):
+                asyncio.ensure_future(session.ws.close(CLOSE_TOKEN_REVOKED, 'token revoked'))
+
+    # --- События ----------------------------------------------------------
+
+    def _on_event(self, topic: str, event: Dict[str, Any]) -> None:
+        # Вызывается в потоке издателя (обработчик Flask, планировщик курсов)
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        if topic == 'auth':
+            if event.get('type') == 'revoked':
+                loop.call_soon_threadsafe(self._revoke, event)
+            return
+        loop.call_soon_threadsafe(self.dispatch, topic, event)
+
+    def dispatch(self, topic: str, event: Dict[str, Any]) -> None:
+        for session in self.by_topic.get(topic, ()):
+            session.push(topic, event)
+
+    # --- Соединения -------------------------------------------------------
+
+    async def _sender(self, session: ClientSession) -> None:
+        while True:
+            await session.wakeup.wait()
+            # Окно склейки: события за это время уходят одной пачкой
+            await asyncio.sleep(self.coalesce_window)
+            session.wakeup.clear()
+            batch, session.pending = session.pending, {}
+            for topic, events in batch.items():
+                if not events:
+                    continue
+                message = json.dumps({'topic': topic, 'events': list(events.values())},
+                                     ensure_ascii=False)
+                try:
+                    await asyncio.wait_for(session.ws.send(message), self.send_timeout)
+                except ConnectionClosed:
+                    # Клиент отключился: сессию убирает _handler
+                    return
+                except asyncio.TimeoutError:
+                    logger.warning(f"Клиент {session.identity} не успевает читать события, отключаем")
+                    try:
+                        await session.ws.close(CLOSE_SLOW_CONSUMER, 'slow consumer')
+                    except ConnectionClosed:
+                        pass
+                    return
+
+    def _subscribe(self, session: ClientSession, topics, subscribe: bool) -> None:
+        for topic in topics or ():
+            if topic not in self.by_topic:
+                continue
+            if subscribe:
+                session.topics.add(topic)
+                self.by_topic[topic].add(session)
+            else:
+                session.topics.discard(topic)
+                self.by_topic[topic].discard(session)
+                session.pending.pop(topic, None)
+
+    async def handler(self, ws: ServerConnection) -> None:
+        session = ClientSession(ws, self._claims(self._token(ws.request)) or {}, self.max_pending)
+        self.sessions.add(session)
+        sender = asyncio.create_task(self._sender(session))
+        try:
+            async for raw in ws:
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    continue
+                action = message.get('action')
+                if action in ('subscribe', 'unsubscribe'):
+                    self._subscribe(session, message.get('topics'), action == 'subscribe')
+                    await ws.send(json.dumps({'subscribed': sorted(session.topics)}))
+        except ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            self._subscribe(session, list(session.topics), False)
+            self.sessions.discard(session)
+
+    # --- Запуск -----------------------------------------------------------
+
+    async def serve_forever(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._stopped = self.loop.create_future()
+        event_bus.subscribe(self._on_event)
+        try:
+            async with serve(self.handler, self.host, self.port,
+                             process_request=self._process_request,
+                             max_queue=32) as server:
+                # Порт 0 означает «любой свободный» — запоминаем фактический
+                self.port = server.sockets[0].getsockname()[1]
+                self._ready.set()
+                await self._stopped
+        finally:
+            event_bus.unsubscribe(self._on_event)
+
+    def start_in_thread(self, timeout: float = 5.0) -> 'PushServer':
+        """Запускает сервер в отдельном потоке со своим циклом asyncio."""
+        error = []
+
+        def run():
+            try:
+                asyncio.run(self.serve_forever())
+            except Exception as e:
+                error.append(e)
+                self._ready.set()
+
+        self._thread = threading.Thread(target=run, name='websocket-server', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError('WebSocket-сервер не запустился')
+        if error:
+            raise error[0]
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self.loop is not None and self._stopped is not None:
+            self.loop.call_soon_threadsafe(
+                lambda: self._stopped.done() or self._stopped.set_result(None))
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def start_server(secret: str, host: str = 'localhost', port: int = 5001) -> PushServer:
+    """Запускает push-сервер в фоновом потоке."""
+    return PushServer(secret, host=host, port=port).start_in_thread()
@@ -0,0 +1,11 @@
+"""
+WSGI-точка входа для продакшен-сервера.
+
+Запуск из корня проекта (несколько процессов-воркеров с потоками):
+    gunicorn -c backend/gunicorn.conf.py
+
+Для разработки по-прежнему используется python backend/main.py.
+"""
+from backend.main import create_app
+
+app = create_app()
@@ -1,13 +1,153 @@
-import React from 'react'
+import React, { useEffect, useState } from 'react'
+import {
+  DOCUMENT_TYPES,
+  deleteDocument,
+  downloadDocument,
+  getDocuments,
+  uploadDocument
+} from '../../services/documentService'
 
-const Documents = () => (
-  <div className="max-w-7xl mx-auto fade-in">
-    <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
-      <h1 className="text-xl font-bold text-gray-900">Документы</h1>
-      <p className="text-gray-600 mt-2">Страница в разработке.</p>
+const formatSize = size => {
+  if (size >= 1024 * 1024) return `${(size / 1024 / 1024).toFixed(1)} МБ`
+  if (size >= 1024) return `${Math.round(size / 1024)} КБ`
+  return `${size} Б`
+}
+
+const Documents = () => {
+  const [orderId, setOrderId] = useState('')
+  const [docType, setDocType] = useState('')
+  const [query, setQuery] = useState('')
+  const [documents, setDocuments] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [file, setFile] = useState(null)
+  const [progress, setProgress] = useState(null)
+  const [error, setError] = useState(null)
+
+  const filters = () => {
+    const params = {}
+    if (orderId) params.order_id = orderId
+    if (docType) params.doc_type = docType
+    // Поиск по тексту работает для документов, которые уже обработаны в фоне
+    if (query.trim()) params.q = query.trim()
+    return params
+  }
+
+  const load = () => {
+    getDocuments(filters())
+      .then(data => {
+        setDocuments(data.documents)
+        setNextCursor(data.next_cursor)
+        setError(null)
+      })
+      .catch(err => setError(err.error || err.message))
+  }
+
+  useEffect(load, [orderId, docType, query])
+
+  const loadMore = () => {
+    getDocuments({ ...filters(), cursor: nextCursor }).then(data => {
+      setDocuments(prev => [...prev, ...data.documents])
+      setNextCursor(data.next_cursor)
+    })
+  }
+
+  const upload = async e => {
+    e.preventDefault()
+    if (!file) return
+    setProgress(0)
+    try {
+      const meta = { doc_type: docType || 'other' }
+      if (orderId) meta.order_id = orderId
+      await uploadDocument(file, meta, setProgress)
+      setFile(null)
+      load()
+    } catch (err) {
+      // Повторная загрузка того же файла продолжится с принятого места
+      setError(err.error || err.message)
+    } finally {
+      setProgress(null)
+    }
+  }
+
+  const remove = async document => {
+    await deleteDocument(document.id)
+    setDocuments(prev => prev.filter(item => item.id !== document.id))
+  }
+
+  return (
+    <div className="max-w-7xl mx-auto fade-in">
+      <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
+        <div className="flex items-center justify-between mb-4">
+          <h1 className="text-xl font-bold text-gray-900">Документы</h1>
+          <div className="flex gap-2">
+            <input className="border border-gray-300 rounded-lg px-3 py-2 text-sm w-56" placeholder="Поиск по тексту"
+              value={query} onChange={e => setQuery(e.target.value)} />
+            <input className="border border-gray-300 rounded-lg px-3 py-2 text-sm w-32" placeholder="№ заявки"
+              value={orderId} onChange={e => setOrderId(e.target.value.replace(/\D/g, ''))} />
+            <select className="border border-gray-300 rounded-lg px-3 py-2 text-sm" value={docType}
+              onChange={e => setDocType(e.target.value)}>
+              <option value="">Все типы</option>
+              {Object.entries(DOCUMENT_TYPES).map(([key, label]) => (
+                <option key={key} value={key}>{label}</option>
+              ))}
+            </select>
+          </div>
+        </div>
+
+        <form className="flex items-center gap-3 mb-4" onSubmit={upload}>
+          <input type="file" className="text-sm" onChange={e => setFile(e.target.files[0] || null)} />
+          <button type="submit" className="button-primary px-4 py-2 rounded-lg" disabled={!file || progress !== null}>
+            Загрузить
+          </button>
+          {progress !== null && (
+            <span className="text-sm text-gray-600">{Math.round(progress * 100)}%</span>
+          )}
+        </form>
+
+        {error && <p className="text-red-600 text-sm mb-3">{error}</p>}
+
+        <table className="w-full text-sm">
+          <thead>
+            <tr className="text-left text-gray-500 border-b">
+              <th className="py-2">Файл</th>
+              <th>Тип</th>
+              <th>Заявка</th>
+              <th>Отгрузка</th>
+              <th>Страниц</th>
+              <th>Размер</th>
+              <th>Загружен</th>
+              <th />
+            </tr>
+          </thead>
+          <tbody>
+            {documents.map(document => (
+              <tr key={document.id} className="border-b last:border-0">
+                <td className="py-2">
+                  <button className="text-indigo-600 hover:underline" onClick={() => downloadDocument(document)}>
+                    {document.filename}
+                  </button>
+                </td>
+                <td>{DOCUMENT_TYPES[document.doc_type] ?? document.doc_type}</td>
+                <td>{document.order_id ?? '—'}</td>
+                <td>{document.shipment_id ?? '—'}</td>
+                <td>{document.pages ?? '—'}</td>
+                <td>{formatSize(document.size)}</td>
+                <td>{document.created_date}</td>
+                <td className="text-right">
+                  <button className="text-red-600 hover:underline" onClick={() => remove(document)}>Удалить</button>
+                </td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+
+        {documents.length === 0 && !error && <p className="text-gray-600 mt-4">Документов нет.</p>}
+        {nextCursor && (
+          <button className="button-secondary px-4 py-2 rounded-lg mt-4" onClick={loadMore}>Показать еще</button>
+        )}
+      </div>
     </div>
-  </div>
-)
+  )
+}
 
 export default Documents
-
@@ -1,6 +1,6 @@
-import React from 'react'
+import React, { useEffect, useState } from 'react'
 import { Link, useNavigate } from 'react-router-dom'
-import { useSelector } from 'react-redux'
+import { getOrderStats } from '../../services/statsService'
 import { Home as HomeIcon, MessageCircle, Package, FileText, Users, Factory, Settings, Plus } from 'lucide-react'
 
 const StatCard = ({ title, value, subtitle, to }) => (
@@ -28,9 +28,14 @@ const ActionTile = ({ to, icon: Icon, title, desc, accent = 'text-indigo-600' })
 
 const Home = () => {
   const navigate = useNavigate()
-  const orders = useSelector(state => state.orders.orders)
+  const [stats, setStats] = useState(null)
 
-  const totalOrders = orders?.length ?? 0
+  // Счетчики берутся из агрегатов на сервере, а не из списка всех заявок
+  useEffect(() => {
+    getOrderStats().then(setStats).catch(() => setStats(null))
+  }, [])
+
+  const totalOrders = stats?.total.count ?? 0
 
   return (
     <div className="max-w-7xl mx-auto fade-in">
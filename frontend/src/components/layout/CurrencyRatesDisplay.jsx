@@ -13,9 +13,10 @@ const CurrencyRatesDisplay = () => {
   
   useEffect(() => {
     dispatch(loadCurrencyRates())
+    // Сервер отдает ETag, поэтому повторный запрос без изменений — это дешевый 304
     const interval = setInterval(() => {
-      dispatch(refreshCurrencyRates())
-    }, 24 * 60 * 60 * 1000)
+      dispatch(loadCurrencyRates())
+    }, 5 * 60 * 1000)
     return () => clearInterval(interval)
   }, [dispatch])
   
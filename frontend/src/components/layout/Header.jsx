@@ -1,18 +1,47 @@
 import React from 'react'
 import CurrencyRatesDisplay from './CurrencyRatesDisplay.jsx'
-import { useState } from 'react'
+import { useEffect, useState } from 'react'
+import { useNavigate } from 'react-router-dom'
 import { Menu, X, Bell, Search } from 'lucide-react'
+import { SEARCH_TYPES, resultPath, search, splitSnippet } from '../../services/searchService'
+
+// Пауза после ввода перед запросом поиска, мс
+const SEARCH_DEBOUNCE_MS = 250
 
 const Header = ({ onMobileMenuToggle, isMobileMenuOpen }) => {
   const [searchQuery, setSearchQuery] = useState('')
   const [isSearchActive, setIsSearchActive] = useState(false)
-  
+  const [results, setResults] = useState([])
+  const navigate = useNavigate()
+
+  // Поиск по мере ввода: запрос уходит после паузы, устаревшие ответы отбрасываются
+  useEffect(() => {
+    const q = searchQuery.trim()
+    if (q.length < 2) {
+      setResults([])
+      return undefined
+    }
+    let cancelled = false
+    const timer = setTimeout(() => {
+      search(q, { limit: 10 })
+        .then(found => { if (!cancelled) setResults(found) })
+        .catch(() => { if (!cancelled) setResults([]) })
+    }, SEARCH_DEBOUNCE_MS)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [searchQuery])
+
+  const openResult = result => {
+    setSearchQuery('')
+    setResults([])
+    navigate(resultPath(result))
+  }
+
   const handleSearch = (e) => {
     e.preventDefault()
-    if (searchQuery.trim()) {
-      console.log('Поиск:', searchQuery)
-      // TODO: подключить поисковую навигацию
-    }
+    if (results.length) openResult(results[0])
   }
 
   return (
@@ -64,6 +93,28 @@ const Header = ({ onMobileMenuToggle, isMobileMenuOpen }) => {
                   <X size={16} />
                 </button>
               )}
+              {isSearchActive && results.length > 0 && (
+                <div className="absolute left-0 right-0 mt-2 bg-white rounded-xl shadow-lg border border-gray-100 py-1 z-50">
+                  {results.map(result => (
+                    <button
+                      key={`${result.type}:${result.id}`}
+                      type="button"
+                      onMouseDown={() => openResult(result)}
+                      className="block w-full text-left px-4 py-2 hover:bg-gray-50"
+                    >
+                      <div className="text-sm font-medium text-gray-900">
+                        <span className="text-xs text-indigo-600 mr-2">{SEARCH_TYPES[result.type]}</span>
+                        {result.title}
+                      </div>
+                      <div className="text-xs text-gray-500 truncate">
+                        {splitSnippet(result.snippet).map(([text, marked], index) => (
+                          marked ? <mark key={index}>{text}</mark> : <span key={index}>{text}</span>
+                        ))}
+                      </div>
+                    </button>
+                  ))}
+                </div>
+              )}
             </form>
           </div>
           
@@ -1,13 +1,116 @@
-import React from 'react'
+import React, { useEffect, useState } from 'react'
+import {
+  MESSAGE_CHANNELS,
+  getConversations,
+  getMessages,
+  markConversationRead
+} from '../../services/messageService'
 
-const Messages = () => (
-  <div className="max-w-7xl mx-auto fade-in">
-    <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
-      <h1 className="text-xl font-bold text-gray-900">Сообщения</h1>
-      <p className="text-gray-600 mt-2">Страница в разработке.</p>
+const conversationKey = conversation => `${conversation.channel}:${conversation.chat_id}`
+
+const Messages = () => {
+  const [conversations, setConversations] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [selected, setSelected] = useState(null)
+  const [messages, setMessages] = useState([])
+  const [error, setError] = useState(null)
+
+  const loadConversations = () => {
+    getConversations()
+      .then(data => {
+        setConversations(data.conversations)
+        setNextCursor(data.next_cursor)
+        setError(null)
+      })
+      .catch(err => setError(err.error || err.message))
+  }
+
+  useEffect(loadConversations, [])
+
+  const loadMore = () => {
+    getConversations({ cursor: nextCursor }).then(data => {
+      setConversations(prev => [...prev, ...data.conversations])
+      setNextCursor(data.next_cursor)
+    })
+  }
+
+  const open = async conversation => {
+    setSelected(conversation)
+    try {
+      setMessages(await getMessages(conversation.channel, conversation.chat_id))
+      if (conversation.unread) {
+        await markConversationRead(conversation.channel, conversation.chat_id)
+        setConversations(prev => prev.map(item =>
+          conversationKey(item) === conversationKey(conversation) ? { ...item, unread: 0 } : item))
+      }
+    } catch (err) {
+      setError(err.error || err.message)
+    }
+  }
+
+  // Новые сообщения дочитываются после последнего полученного id
+  const refresh = async () => {
+    if (!selected) return
+    const lastId = messages.length ? messages[messages.length - 1].id : undefined
+    const newer = await getMessages(selected.channel, selected.chat_id, { after_id: lastId })
+    setMessages(prev => [...prev, ...newer])
+    loadConversations()
+  }
+
+  return (
+    <div className="max-w-7xl mx-auto fade-in">
+      <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
+        <div className="flex items-center justify-between mb-4">
+          <h1 className="text-xl font-bold text-gray-900">Сообщения</h1>
+          <button className="button-secondary px-4 py-2 rounded-lg" onClick={selected ? refresh : loadConversations}>
+            Обновить
+          </button>
+        </div>
+
+        {error && <p className="text-red-600 text-sm mb-3">{error}</p>}
+
+        <div className="flex gap-6">
+          <div className="w-80 shrink-0">
+            {conversations.map(conversation => (
+              <button key={conversationKey(conversation)} onClick={() => open(conversation)}
+                className={`w-full text-left px-3 py-2 rounded-lg mb-1 text-sm ${
+                  selected && conversationKey(selected) === conversationKey(conversation)
+                    ? 'bg-indigo-50 text-indigo-700' : 'hover:bg-gray-50'}`}>
+                <div className="flex justify-between">
+                  <span className="font-medium">{conversation.title || conversation.chat_id}</span>
+                  {conversation.unread > 0 && (
+                    <span className="bg-indigo-600 text-white rounded-full px-2 text-xs">{conversation.unread}</span>
+                  )}
+                </div>
+                <div className="text-gray-500 text-xs">
+                  {MESSAGE_CHANNELS[conversation.channel] ?? conversation.channel} · {conversation.last_message_at}
+                </div>
+              </button>
+            ))}
+            {conversations.length === 0 && !error && <p className="text-gray-600">Переписок нет.</p>}
+            {nextCursor && (
+              <button className="button-secondary px-4 py-2 rounded-lg mt-2" onClick={loadMore}>Показать еще</button>
+            )}
+          </div>
+
+          <div className="flex-1 border-l border-gray-200 pl-6">
+            {!selected && <p className="text-gray-600">Выберите переписку.</p>}
+            {messages.map(message => (
+              <div key={message.id} className={`mb-3 ${message.direction === 'out' ? 'text-right' : ''}`}>
+                <div className={`inline-block rounded-lg px-3 py-2 text-sm ${
+                  message.direction === 'out' ? 'bg-indigo-50' : 'bg-gray-100'}`}>
+                  {message.body}
+                </div>
+                <div className="text-gray-400 text-xs mt-1">
+                  {message.sender ? `${message.sender} · ` : ''}{message.sent_at}
+                </div>
+              </div>
+            ))}
+          </div>
+        </div>
+      </div>
     </div>
-  </div>
-)
+  )
+}
 
 export default Messages
-
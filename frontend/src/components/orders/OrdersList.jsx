@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react'
 import { useDispatch, useSelector } from 'react-redux'
 import { fetchOrders } from '../../services/orderActions'
+import { getOrderStats } from '../../services/statsService'
 import OrderCard from './OrderCard.jsx'
 import Loader from '../common/Loader.jsx'
 import ErrorBoundary from '../common/ErrorBoundary.jsx'
@@ -15,46 +16,26 @@ const OrdersList = () => {
   const [searchTerm, setSearchTerm] = useState('')
   const [selectedStatus, setSelectedStatus] = useState('all')
   const [sortBy, setSortBy] = useState('date-desc')
+  const [stats, setStats] = useState(null)
   
-  const filteredOrders = React.useMemo(() => {
-    let result = [...orders]
-    
-    if (searchTerm) {
-      const term = searchTerm.toLowerCase()
-      result = result.filter(order => 
-        String(order.id).toLowerCase().includes(term) ||
-        order.name.toLowerCase().includes(term) ||
-        (order.client_name && order.client_name.toLowerCase().includes(term))
-      )
-    }
-    
-    if (selectedStatus !== 'all') {
-      result = result.filter(order => order.status === selectedStatus)
-    }
-    
-    switch (sortBy) {
-      case 'date-asc':
-        result.sort((a, b) => new Date(a.created_date) - new Date(b.created_date))
-        break
-      case 'date-desc':
-        result.sort((a, b) => new Date(b.created_date) - new Date(a.created_date))
-        break
-      case 'amount-asc':
-        result.sort((a, b) => a.total_cny - b.total_cny)
-        break
-      case 'amount-desc':
-        result.sort((a, b) => b.total_cny - a.total_cny)
-        break
-      default:
-        break
-    }
-    
-    return result
-  }, [orders, searchTerm, selectedStatus, sortBy])
-  
+  // Фильтры, поиск и сортировка выполняются на сервере
+  const queryParams = React.useMemo(() => {
+    const params = { sort: sortBy }
+    if (searchTerm) params.q = searchTerm
+    if (selectedStatus !== 'all') params.status = selectedStatus
+    return params
+  }, [searchTerm, selectedStatus, sortBy])
+
   useEffect(() => {
-    dispatch(fetchOrders())
-  }, [dispatch])
+    dispatch(fetchOrders(queryParams))
+  }, [dispatch, queryParams])
+
+  // Итоги считаются по всем заявкам на сервере, а не по загруженной странице
+  useEffect(() => {
+    getOrderStats().then(setStats).catch(() => setStats(null))
+  }, [orders])
+
+  const statusCount = status => stats?.by_status[status]?.count ?? 0
 
   // Синхронизируем фильтр статуса с query-параметрами (?status=active|done)
   useEffect(() => {
@@ -65,12 +46,12 @@ const OrdersList = () => {
     else setSelectedStatus('all')
   }, [location.search])
   
-  if (loading) {
+  if (loading && orders.length === 0) {
     return <Loader />
   }
   
   if (error) {
-    return <ErrorBoundary message={error} onRetry={() => dispatch(fetchOrders())} />
+    return <ErrorBoundary message={error} onRetry={() => dispatch(fetchOrders(queryParams))} />
   }
   
   return (
@@ -100,27 +81,27 @@ const OrdersList = () => {
       <div className="grid grid-cols-1 md:grid-cols-4 gap-4 mb-6">
         <div className="info-panel">
           <div className="info-panel-title">Всего заказов</div>
-          <div className="info-panel-value">{orders.length}</div>
+          <div className="info-panel-value">{stats?.total.count ?? 0}</div>
         </div>
         <div className="info-panel">
           <div className="info-panel-title">В работе</div>
-          <div className="info-panel-value text-blue-600">{orders.filter(o => o.status === 'в работе').length}</div>
+          <div className="info-panel-value text-blue-600">{statusCount('в работе')}</div>
         </div>
         <div className="info-panel">
           <div className="info-panel-title">На таможне</div>
-          <div className="info-panel-value text-yellow-600">{orders.filter(o => o.status === 'на таможне').length}</div>
+          <div className="info-panel-value text-yellow-600">{statusCount('на таможне')}</div>
         </div>
         <div className="info-panel">
           <div className="info-panel-title">Сумма (CNY)</div>
           <div className="info-panel-value">
-            {orders.reduce((sum, order) => sum + (order.total_cny || 0), 0).toLocaleString('ru-RU', { minimumFractionDigits: 2 })} CNY
+            {(stats?.total.total_cny ?? 0).toLocaleString('ru-RU', { minimumFractionDigits: 2 })} CNY
           </div>
         </div>
       </div>
       
       {/* Сетка заказов */}
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-        {filteredOrders.map(order => (
+        {orders.map(order => (
           <OrderCard key={order.id} order={order} />
         ))}
       </div>
@@ -21,6 +21,10 @@ vi.mock('../../services/orderActions', () => ({
   fetchOrders: () => ({ type: 'FETCH_ORDERS' })
 }))
 
+vi.mock('../../services/statsService', () => ({
+  getOrderStats: () => Promise.resolve({ total: { count: 2, total_cny: 300 }, by_status: {} })
+}))
+
 describe('OrdersList', () => {
   it('renders orders from store', () => {
     render(
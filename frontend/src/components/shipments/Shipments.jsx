@@ -1,13 +1,80 @@
-import React from 'react'
+import React, { useEffect, useState } from 'react'
+import { getShipments, SHIPMENT_STAGES } from '../../services/shipmentService'
 
-const Shipments = () => (
-  <div className="max-w-7xl mx-auto fade-in">
-    <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
-      <h1 className="text-xl font-bold text-gray-900">Отгрузки</h1>
-      <p className="text-gray-600 mt-2">Страница в разработке.</p>
+const Shipments = () => {
+  const [stage, setStage] = useState('')
+  const [shipments, setShipments] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [error, setError] = useState(null)
+
+  // Фильтр по этапу читает текущий этап отгрузки на сервере, без истории
+  useEffect(() => {
+    const params = stage ? { stage } : {}
+    getShipments(params)
+      .then(data => {
+        setShipments(data.shipments)
+        setNextCursor(data.next_cursor)
+        setError(null)
+      })
+      .catch(err => setError(err.error || err.message))
+  }, [stage])
+
+  const loadMore = () => {
+    const params = stage ? { stage, cursor: nextCursor } : { cursor: nextCursor }
+    getShipments(params).then(data => {
+      setShipments(prev => [...prev, ...data.shipments])
+      setNextCursor(data.next_cursor)
+    })
+  }
+
+  return (
+    <div className="max-w-7xl mx-auto fade-in">
+      <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
+        <div className="flex items-center justify-between mb-4">
+          <h1 className="text-xl font-bold text-gray-900">Отгрузки</h1>
+          <select className="border border-gray-300 rounded-lg px-3 py-2 text-sm" value={stage}
+            onChange={e => setStage(e.target.value)}>
+            <option value="">Все этапы</option>
+            {Object.entries(SHIPMENT_STAGES).map(([key, label]) => (
+              <option key={key} value={key}>{label}</option>
+            ))}
+          </select>
+        </div>
+
+        {error && <p className="text-red-600 text-sm mb-3">{error}</p>}
+
+        <table className="w-full text-sm">
+          <thead>
+            <tr className="text-left text-gray-500 border-b">
+              <th className="py-2">№</th>
+              <th>Заявка</th>
+              <th>Перевозчик</th>
+              <th>Трек-номер</th>
+              <th>Этап</th>
+              <th>Где груз</th>
+            </tr>
+          </thead>
+          <tbody>
+            {shipments.map(shipment => (
+              <tr key={shipment.id} className="border-b last:border-0">
+                <td className="py-2">{shipment.id}</td>
+                <td>{shipment.order_id ?? '—'}</td>
+                <td>{shipment.carrier ?? '—'}</td>
+                <td>{shipment.tracking_number ?? '—'}</td>
+                <td>{SHIPMENT_STAGES[shipment.current_stage] ?? shipment.current_stage}</td>
+                <td>{shipment.current_location ?? '—'}</td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+
+        {shipments.length === 0 && !error && <p className="text-gray-600 mt-4">Отгрузок нет.</p>}
+        {nextCursor && (
+          <button className="button-secondary px-4 py-2 rounded-lg mt-4" onClick={loadMore}>Показать еще</button>
+        )}
+      </div>
     </div>
-  </div>
-)
+  )
+}
 
 export default Shipments
-
@@ -1,13 +1,71 @@
-import React from 'react'
+import React, { useState } from 'react'
+import { Search } from 'lucide-react'
+import { getShipmentStages, SHIPMENT_STAGES, trackShipment } from '../../services/shipmentService'
 
-const Tracker = () => (
-  <div className="max-w-7xl mx-auto fade-in">
-    <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
-      <h1 className="text-xl font-bold text-gray-900">Трекер грузов</h1>
-      <p className="text-gray-600 mt-2">Страница в разработке.</p>
+const Tracker = () => {
+  const [trackingNumber, setTrackingNumber] = useState('')
+  const [shipment, setShipment] = useState(null)
+  const [stages, setStages] = useState([])
+  const [error, setError] = useState(null)
+
+  const handleSubmit = async e => {
+    e.preventDefault()
+    if (!trackingNumber.trim()) return
+    try {
+      const found = await trackShipment(trackingNumber.trim())
+      setShipment(found)
+      setStages(await getShipmentStages(found.id))
+      setError(null)
+    } catch (err) {
+      setShipment(null)
+      setStages([])
+      setError(err.error || err.message)
+    }
+  }
+
+  return (
+    <div className="max-w-7xl mx-auto fade-in">
+      <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-6">
+        <h1 className="text-xl font-bold text-gray-900 mb-4">Трекер грузов</h1>
+
+        <form onSubmit={handleSubmit} className="flex gap-2 mb-4">
+          <input className="border border-gray-300 rounded-lg px-3 py-2 flex-1" placeholder="Трек-номер"
+            value={trackingNumber} onChange={e => setTrackingNumber(e.target.value)} />
+          <button type="submit" className="button-primary px-4 py-2 rounded-lg inline-flex items-center">
+            <Search size={16} className="mr-2" />
+            Найти
+          </button>
+        </form>
+
+        {error && <p className="text-red-600 text-sm">{error}</p>}
+
+        {shipment && (
+          <div>
+            <div className="info-panel mb-4">
+              <div className="text-sm text-gray-500">Текущий этап</div>
+              <div className="text-lg font-semibold text-gray-900">
+                {SHIPMENT_STAGES[shipment.current_stage] ?? shipment.current_stage}
+              </div>
+              <div className="text-sm text-gray-600">
+                {shipment.current_location ?? 'Местоположение неизвестно'} · {shipment.current_stage_at}
+              </div>
+            </div>
+
+            <ol className="border-l-2 border-indigo-200 pl-4 space-y-3">
+              {stages.map(stage => (
+                <li key={stage.id}>
+                  <div className="font-medium text-gray-900">{SHIPMENT_STAGES[stage.stage] ?? stage.stage}</div>
+                  <div className="text-xs text-gray-500">
+                    {stage.ts}{stage.location ? ` · ${stage.location}` : ''}{stage.note ? ` · ${stage.note}` : ''}
+                  </div>
+                </li>
+              ))}
+            </ol>
+          </div>
+        )}
+      </div>
     </div>
-  </div>
-)
+  )
+}
 
 export default Tracker
-
@@ -63,12 +63,25 @@ export const loadCurrencyRates = () => async (dispatch) => {
   }
 };
 
+// Ждет завершения фоновой задачи обновления курсов
+const waitForUpdateJob = async (jobId, attempts = 20, delayMs = 500) => {
+  for (let i = 0; i < attempts; i++) {
+    const { data } = await api.get(`/currency/update-jobs/${jobId}`);
+    if (data.status === 'success') return data;
+    if (data.status === 'error') throw new Error(data.error || 'Не удалось обновить курсы');
+    await new Promise(resolve => setTimeout(resolve, delayMs));
+  }
+  return null;
+};
+
 // Принудительно обновляет курсы валют
 export const refreshCurrencyRates = () => async (dispatch) => {
   try {
     dispatch({ type: 'CURRENCY_RATES_LOADING' });
     
-    await api.post('/currency/update-now');
+    // Сервер ставит обновление в очередь и сразу возвращает id задачи
+    const { data: job } = await api.post('/currency/update-now');
+    await waitForUpdateJob(job.job_id);
     
     // После обновления получаем новые курсы
     const response = await api.get('/currency/rates');
@@ -90,11 +103,11 @@ export const refreshCurrencyRates = () => async (dispatch) => {
   }
 };
 
-// Получает конвертированные суммы
-export const getConvertedAmounts = (amount, currencyCode) => async (dispatch) => {
+// Получает конвертированные суммы; с датой (ГГГГ-ММ-ДД) — по курсам на эту дату
+export const getConvertedAmounts = (amount, currencyCode, date) => async (dispatch) => {
   try {
     const response = await api.get('/currency/conversions', {
-      params: { amount, from: currencyCode }
+      params: date ? { amount, from: currencyCode, date } : { amount, from: currencyCode }
     });
     return response.data;
   } catch (error) {
@@ -0,0 +1,92 @@
+import api from './api'
+
+// Типы документов (ключи совпадают с DOCUMENT_TYPES на сервере)
+export const DOCUMENT_TYPES = {
+  invoice: 'Инвойс',
+  packing_list: 'Упаковочный лист',
+  customs_declaration: 'Таможенная декларация',
+  contract: 'Контракт',
+  photo: 'Фото',
+  other: 'Другое'
+}
+
+// Незавершенные загрузки запоминаются, чтобы после обрыва продолжить с принятого байта
+const uploadKey = file => `document-upload:${file.name}:${file.size}:${file.lastModified}`
+
+const startUpload = async (file, meta) => {
+  const saved = localStorage.getItem(uploadKey(file))
+  if (saved) {
+    try {
+      const response = await api.get(`/documents/uploads/${saved}`)
+      return response.data
+    } catch (err) {
+      localStorage.removeItem(uploadKey(file))
+    }
+  }
+  const response = await api.post('/documents/uploads', {
+    ...meta,
+    filename: file.name,
+    size: file.size,
+    content_type: file.type || null
+  })
+  localStorage.setItem(uploadKey(file), response.data.id)
+  return response.data
+}
+
+/**
+ * Загружает файл по частям; meta — doc_type, order_id, shipment_id.
+ * onProgress получает долю загруженного (0..1). Возвращает созданный документ.
+ */
+export const uploadDocument = async (file, meta = {}, onProgress = () => {}) => {
+  const upload = await startUpload(file, meta)
+  const chunkSize = upload.chunk_size || 8 * 1024 * 1024
+  let offset = upload.received
+
+  while (true) {
+    const end = Math.min(offset + chunkSize, file.size)
+    let data
+    try {
+      const response = await api.put(`/documents/uploads/${upload.id}`, file.slice(offset, end), {
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`
+        },
+        timeout: 0
+      })
+      data = response.data
+    } catch (err) {
+      // Сервер ждет другую часть — продолжаем с того байта, который он назвал
+      if (err.received === undefined) throw err
+      offset = err.received
+      continue
+    }
+    onProgress(data.upload.received / file.size)
+    if (data.document) {
+      localStorage.removeItem(uploadKey(file))
+      return data.document
+    }
+    offset = data.upload.received
+  }
+}
+
+// Страница документов: { documents, next_cursor }; params — order_id, shipment_id, doc_type, cursor
+export const getDocuments = async (params = {}) => {
+  const response = await api.get('/documents', { params })
+  return response.data
+}
+
+// Скачивает содержимое документа (запрос с авторизацией, поэтому через Blob)
+export const downloadDocument = async document => {
+  const response = await api.get(`/documents/${document.id}/content`, { responseType: 'blob', timeout: 0 })
+  const url = URL.createObjectURL(response.data)
+  const link = window.document.createElement('a')
+  link.href = url
+  link.download = document.filename
+  link.click()
+  URL.revokeObjectURL(url)
+}
+
+export const deleteDocument = async id => {
+  const response = await api.delete(`/documents/${id}`)
+  return response.data
+}
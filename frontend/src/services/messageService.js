@@ -0,0 +1,28 @@
+import api from './api'
+
+// Каналы мессенджеров (ключи совпадают с MESSAGE_CHANNELS на сервере)
+export const MESSAGE_CHANNELS = {
+  telegram: 'Telegram',
+  wechat: 'WeChat',
+  whatsapp: 'WhatsApp',
+  email: 'Email',
+  other: 'Другое'
+}
+
+// Страница переписок: { conversations, next_cursor }
+export const getConversations = async (params = {}) => {
+  const response = await api.get('/messages/conversations', { params })
+  return response.data
+}
+
+// Сообщения переписки; params — after_id (дочитать новые), before_id, limit
+export const getMessages = async (channel, chatId, params = {}) => {
+  const response = await api.get(
+    `/messages/conversations/${channel}/${encodeURIComponent(chatId)}`, { params })
+  return response.data.messages
+}
+
+export const markConversationRead = async (channel, chatId) => {
+  const response = await api.post(`/messages/conversations/${channel}/${encodeURIComponent(chatId)}/read`)
+  return response.data
+}
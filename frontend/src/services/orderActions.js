@@ -8,15 +8,17 @@ export const FETCH_ORDER_REQUEST = 'FETCH_ORDER_REQUEST'
 export const FETCH_ORDER_SUCCESS = 'FETCH_ORDER_SUCCESS'
 export const FETCH_ORDER_FAILURE = 'FETCH_ORDER_FAILURE'
 
-// Получение списка заявок
-export const fetchOrders = () => async (dispatch) => {
+// Получение страницы заявок; фильтрация, поиск и сортировка выполняются на сервере.
+// params: { status, client_id, supplier_id, q, sort, limit, cursor }
+export const fetchOrders = (params = {}) => async (dispatch) => {
   dispatch({ type: FETCH_ORDERS_REQUEST })
   
   try {
-    const response = await api.get('/orders')
+    const response = await api.get('/orders', { params })
     dispatch({
       type: FETCH_ORDERS_SUCCESS,
-      payload: response.data.orders
+      payload: response.data.orders,
+      nextCursor: response.data.next_cursor
     })
   } catch (error) {
     dispatch({
@@ -42,4 +44,28 @@ export const fetchOrder = (id) => async (dispatch) => {
       payload: error.message || 'Не удалось загрузить заявку'
     })
   }
-}
\ No newline at end of file
+}
+// Позиции заявки; итоги заявки сервер пересчитывает сам
+export const getOrderItems = async (id) => {
+  const response = await api.get(`/orders/${id}/items`)
+  return response.data.items
+}
+
+// items: позиции без id добавляются, с id — изменяются; remove — id удаляемых позиций.
+// Возвращает { order, items } с пересчитанными суммами заявки
+export const saveOrderItems = async (id, items = [], remove = []) => {
+  const response = await api.patch(`/orders/${id}/items`, { items, delete: remove })
+  return response.data
+}
+
+// Переоценка открытых заявок по текущим курсам; возвращает id задания
+export const startRevaluation = async () => {
+  const response = await api.post('/orders/revaluation')
+  return response.data.job_id
+}
+
+// Ход переоценки: status, total, processed, changed
+export const getRevaluationJob = async (jobId) => {
+  const response = await api.get(`/orders/revaluation/${jobId}`)
+  return response.data
+}
@@ -0,0 +1,47 @@
+import api from './api'
+
+// Подписи типов результатов (ключи совпадают с SEARCH_TYPES на сервере)
+export const SEARCH_TYPES = {
+  order: 'Заявка',
+  client: 'Клиент',
+  supplier: 'Поставщик',
+  message: 'Сообщение',
+  document: 'Документ'
+}
+
+// Поиск: { query, results }; params — types (через запятую), limit
+export const search = async (q, params = {}) => {
+  const response = await api.get('/search', { params: { q, ...params } })
+  return response.data.results
+}
+
+// Разбивает фрагмент на части [текст, выделен ли]; найденные слова сервер обрамляет <mark></mark>
+export const splitSnippet = snippet => {
+  const parts = []
+  String(snippet ?? '').split('<mark>').forEach((chunk, index) => {
+    if (index === 0) {
+      if (chunk) parts.push([chunk, false])
+      return
+    }
+    const [marked, rest] = chunk.split('</mark>')
+    parts.push([marked, true])
+    if (rest) parts.push([rest, false])
+  })
+  return parts
+}
+
+// Куда перейти по результату поиска
+export const resultPath = result => {
+  switch (result.type) {
+    case 'order':
+      return `/orders/${result.id}`
+    case 'message':
+      return '/messages'
+    case 'document':
+      return '/documents'
+    case 'client':
+      return '/clients'
+    default:
+      return '/suppliers'
+  }
+}
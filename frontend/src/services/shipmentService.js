@@ -0,0 +1,30 @@
+import api from './api'
+
+// Названия этапов доставки (ключи совпадают с SHIPMENT_STAGES на сервере)
+export const SHIPMENT_STAGES = {
+  created: 'Создана',
+  picked_up: 'Забрана у поставщика',
+  in_transit: 'В пути',
+  customs: 'Таможня',
+  arrived: 'Прибыла',
+  delivered: 'Доставлена',
+  cancelled: 'Отменена'
+}
+
+// Страница отгрузок: { shipments, next_cursor }; params — stage, order_id, carrier, cursor
+export const getShipments = async (params = {}) => {
+  const response = await api.get('/shipments', { params })
+  return response.data
+}
+
+// Отгрузка по трек-номеру с текущим этапом
+export const trackShipment = async trackingNumber => {
+  const response = await api.get(`/shipments/track/${encodeURIComponent(trackingNumber)}`)
+  return response.data
+}
+
+// История этапов отгрузки
+export const getShipmentStages = async shipmentId => {
+  const response = await api.get(`/shipments/${shipmentId}/stages`)
+  return response.data.stages
+}
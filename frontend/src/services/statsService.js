@@ -0,0 +1,7 @@
+import api from './api'
+
+// Сводка по заявкам: { total: {...}, by_status: { статус: {...} } }
+export const getOrderStats = async () => {
+  const response = await api.get('/stats')
+  return response.data
+}
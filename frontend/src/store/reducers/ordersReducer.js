@@ -1,6 +1,7 @@
 const initialState = {
   orders: [],
   order: null,
+  nextCursor: null,
   loading: false,
   error: null
 };
@@ -19,7 +20,8 @@ export default function ordersReducer(state = initialState, action) {
       return {
         ...state,
         loading: false,
-        orders: action.payload
+        orders: action.payload,
+        nextCursor: action.nextCursor ?? null
       };
       
     case 'FETCH_ORDER_SUCCESS':
@@ -27,7 +27,7 @@ for /f "tokens=5" %%P in ('netstat -ano ^| findstr /R /C:":5173.*LISTENING"') do
 )
 
 echo [5/6] Starting backend at http://localhost:5000 ...
-start "Cargo os API" cmd /c "cd /d backend && python main.py"
+start "Cargo os API" cmd /c "python -m backend.main"
 
 echo [6/6] Starting frontend at http://localhost:5173 ...
 start "Cargo os Frontend (Frontend)" cmd /k "cd /d frontend && npm install --loglevel=error || (echo ОШИБКА: Установка зависимостей не удалась (код: !errorlevel!) && pause && exit /b 1) && npm run dev || (echo ОШИБКА: Запуск фронтенда не удался (код: !errorlevel!) && pause && exit /b 1)"